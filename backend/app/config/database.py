@@ -1,7 +1,18 @@
 import os
+import asyncio
+import logging
+import time
+from collections import deque
 from contextlib import asynccontextmanager
+from contextvars import ContextVar
 import aiomysql
 from dotenv import load_dotenv
+from fastapi import HTTPException
+from app.dependencias.redis import r_async
+from app.utils.query_stats import CursorInstrumentado
+from app.utils.metricas import GaugeCallback
+
+logger = logging.getLogger(__name__)
 
 def find_env_file():
     current_dir = os.path.abspath(os.path.dirname(__file__))
@@ -19,37 +30,431 @@ if env_file:
 else:
     print("No se encontró el archivo .env")
 
+# ⚙️ Configuración de pools (variables de entorno)
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", 1))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", 10))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 3600))
+DB_ACQUIRE_TIMEOUT = float(os.getenv("DB_ACQUIRE_TIMEOUT", 5))
+
+# Pool separado para exportaciones y estadísticas (0 = usar el principal)
+DB_REPORTING_POOL_MAX = int(os.getenv("DB_REPORTING_POOL_MAX", 3))
+DB_REPORTING_ACQUIRE_TIMEOUT = float(os.getenv("DB_REPORTING_ACQUIRE_TIMEOUT", 15))
+
+# Réplicas de solo lectura: "host1:3306,host2:3306" (vacío = todo va al primario)
+DB_REPLICA_HOSTS = [h.strip() for h in os.getenv("DB_REPLICA_HOSTS", "").split(",") if h.strip()]
+DB_REPLICA_POOL_MAX = int(os.getenv("DB_REPLICA_POOL_MAX", 5))
+DB_REPLICA_ACQUIRE_TIMEOUT = float(os.getenv("DB_REPLICA_ACQUIRE_TIMEOUT", 2))
+DB_REPLICA_HEALTH_INTERVAL = float(os.getenv("DB_REPLICA_HEALTH_INTERVAL", 10))
+DB_REPLICA_MAX_LAG = int(os.getenv("DB_REPLICA_MAX_LAG", 30))
+# Ventana "read-your-writes": tras escribir, las lecturas del usuario van al primario
+DB_READ_YOUR_WRITES_SECONDS = int(os.getenv("DB_READ_YOUR_WRITES_SECONDS", 5))
+
 pool = None
+reporting_pool = None
+replicas: list[dict] = []
+_tarea_salud = None
+_siguiente_replica = 0
 
+# Usuario autenticado del request actual (lo fija get_current_user)
+_usuario_request: ContextVar[str | None] = ContextVar("usuario_request", default=None)
+_escrituras_locales: dict[str, float] = {}
 
-async def init_db(app):
-    global pool
-    print("Cargando variables de entorno...")
 
-    pool = await aiomysql.create_pool(
-        host=os.getenv("DB_HOST"),
-        port=int(os.getenv("DB_PORT")),
+def _nuevas_metricas():
+    return {
+        "esperando": 0,
+        "adquisiciones": 0,
+        "timeouts": 0,
+        "espera_total_ms": 0.0,
+        "espera_max_ms": 0.0,
+        "esperas_recientes": deque(maxlen=1000),
+    }
+
+
+_metricas = {"default": _nuevas_metricas(), "reporting": _nuevas_metricas()}
+
+
+async def _crear_pool(minsize: int, maxsize: int, host: str | None = None, port: int | None = None):
+    return await aiomysql.create_pool(
+        host=host or os.getenv("DB_HOST"),
+        port=port or int(os.getenv("DB_PORT")),
         user=os.getenv("DB_USER"),
         password=os.getenv("DB_PASSWORD"),
         db=os.getenv("DB_NAME"),
-        minsize=1,
-        maxsize=10,
+        minsize=minsize,
+        maxsize=maxsize,
+        pool_recycle=DB_POOL_RECYCLE,
     )
-    print("Pool de conexiones MySQL inicializado.")
+
+
+async def init_db(app):
+    global pool, reporting_pool
+    print("Cargando variables de entorno...")
+
+    pool = await _crear_pool(DB_POOL_MIN, DB_POOL_MAX)
+    print(f"Pool de conexiones MySQL inicializado ({DB_POOL_MIN}-{DB_POOL_MAX}).")
+
+    if DB_REPORTING_POOL_MAX > 0:
+        reporting_pool = await _crear_pool(1, DB_REPORTING_POOL_MAX)
+        print(f"Pool de reportes MySQL inicializado (máx {DB_REPORTING_POOL_MAX}).")
+
+    await _iniciar_replicas()
+
+
+# ============================================================
+# 📖 RÉPLICAS DE LECTURA
+# ============================================================
+
+async def _iniciar_replicas():
+    global _tarea_salud
+    for direccion in DB_REPLICA_HOSTS:
+        host, _, puerto = direccion.partition(":")
+        replica = {
+            "nombre": f"replica:{direccion}",
+            "host": host,
+            "port": int(puerto or os.getenv("DB_PORT") or 3306),
+            "pool": None,
+            "sana": False,
+            "lag_s": None,
+            "ultimo_error": None,
+        }
+        _metricas[replica["nombre"]] = _nuevas_metricas()
+        replicas.append(replica)
+        await _revisar_replica(replica)
+
+    if replicas:
+        _tarea_salud = asyncio.create_task(_vigilar_replicas())
+
+
+async def _revisar_replica(replica: dict):
+    """Health check: conecta si hace falta, SELECT 1 y retraso de replicación"""
+    try:
+        if replica["pool"] is None:
+            replica["pool"] = await asyncio.wait_for(
+                _crear_pool(1, DB_REPLICA_POOL_MAX, replica["host"], replica["port"]),
+                timeout=DB_REPLICA_ACQUIRE_TIMEOUT,
+            )
+        conn = await asyncio.wait_for(replica["pool"].acquire(), timeout=DB_REPLICA_ACQUIRE_TIMEOUT)
+        try:
+            async with conn.cursor(aiomysql.DictCursor) as cursor:
+                await cursor.execute("SELECT 1")
+                lag = None
+                try:
+                    await cursor.execute("SHOW REPLICA STATUS")
+                    estado = await cursor.fetchone()
+                    if estado:
+                        lag = estado.get("Seconds_Behind_Source")
+                except Exception:
+                    pass  # MySQL sin privilegio REPLICATION CLIENT o versión antigua
+            await conn.rollback()
+        finally:
+            replica["pool"].release(conn)
+
+        replica["lag_s"] = lag
+        sana = lag is None or lag <= DB_REPLICA_MAX_LAG
+        replica["ultimo_error"] = None if sana else f"retraso {lag}s"
+    except Exception as e:
+        sana = False
+        replica["ultimo_error"] = str(e) or type(e).__name__
+
+    if sana != replica["sana"]:
+        if sana:
+            logger.info(f"✅ Réplica {replica['nombre']} disponible")
+        else:
+            logger.warning(f"⚠️ Réplica {replica['nombre']} no disponible: {replica['ultimo_error']}")
+    replica["sana"] = sana
+
+
+async def _vigilar_replicas():
+    while True:
+        await asyncio.sleep(DB_REPLICA_HEALTH_INTERVAL)
+        for replica in replicas:
+            await _revisar_replica(replica)
+
+
+def fijar_usuario_request(usuario_id):
+    """Asocia el request actual a un usuario (para read-your-writes)"""
+    _usuario_request.set(str(usuario_id) if usuario_id is not None else None)
+
+
+async def marcar_escritura(usuario_id):
+    """Durante DB_READ_YOUR_WRITES_SECONDS las lecturas del usuario van al primario"""
+    if not replicas or usuario_id is None:
+        return
+    usuario_id = str(usuario_id)
+    _escrituras_locales[usuario_id] = time.monotonic() + DB_READ_YOUR_WRITES_SECONDS
+    if r_async is not None:
+        try:
+            await r_async.setex(f"rw:{usuario_id}", DB_READ_YOUR_WRITES_SECONDS, "1")
+        except Exception:
+            pass
+
+
+async def _escribio_recientemente(usuario_id: str) -> bool:
+    expira = _escrituras_locales.get(usuario_id)
+    if expira is not None:
+        if expira > time.monotonic():
+            return True
+        _escrituras_locales.pop(usuario_id, None)
+
+    # Otro worker pudo atender la escritura
+    if r_async is not None:
+        try:
+            return bool(await r_async.exists(f"rw:{usuario_id}"))
+        except Exception:
+            return True  # sin Redis no se puede garantizar: ir al primario
+    return False
+
+
+async def _adquirir_replica():
+    """Conexión de una réplica sana (round-robin) o None para usar el primario"""
+    global _siguiente_replica
+    usuario_id = _usuario_request.get()
+    if usuario_id is not None and await _escribio_recientemente(usuario_id):
+        return None, None
+
+    sanas = [rep for rep in replicas if rep["sana"]]
+    for _ in range(len(sanas)):
+        replica = sanas[_siguiente_replica % len(sanas)]
+        _siguiente_replica += 1
+        try:
+            conn = await _adquirir(replica["pool"], replica["nombre"], DB_REPLICA_ACQUIRE_TIMEOUT)
+            return replica, conn
+        except Exception as e:
+            replica["sana"] = False
+            replica["ultimo_error"] = str(e) or type(e).__name__
+            logger.warning(f"⚠️ Réplica {replica['nombre']} no disponible, usando primario")
+    return None, None
+
+
+async def _adquirir(p, workload: str, timeout: float):
+    """Toma una conexión del pool con timeout; si se agota responde 503 rápido"""
+    metricas = _metricas[workload]
+    inicio = time.perf_counter()
+    metricas["esperando"] += 1
+    try:
+        conn = await asyncio.wait_for(p.acquire(), timeout=timeout)
+    except asyncio.TimeoutError:
+        metricas["timeouts"] += 1
+        logger.warning(f"⚠️ Timeout adquiriendo conexión del pool '{workload}' ({timeout}s)")
+        raise HTTPException(
+            status_code=503,
+            detail="Base de datos ocupada, intenta de nuevo en unos segundos.",
+            headers={"Retry-After": "2"}
+        )
+    finally:
+        metricas["esperando"] -= 1
+
+    espera_ms = (time.perf_counter() - inicio) * 1000
+    metricas["adquisiciones"] += 1
+    metricas["espera_total_ms"] += espera_ms
+    metricas["espera_max_ms"] = max(metricas["espera_max_ms"], espera_ms)
+    metricas["esperas_recientes"].append(espera_ms)
+    return conn
+
+
+def _seleccionar_pool(workload: str):
+    if workload == "reporting" and reporting_pool is not None:
+        return reporting_pool, DB_REPORTING_ACQUIRE_TIMEOUT, "reporting"
+    return pool, DB_ACQUIRE_TIMEOUT, "default"
+
+
+async def _liberar(p, conn):
+    """
+    Devuelve la conexión al pool. Si quedó una transacción abierta (p. ej. un
+    SELECT sin commit) se hace rollback; si no, aiomysql cerraría la conexión.
+    """
+    try:
+        if not conn.closed and conn.get_transaction_status():
+            await conn.rollback()
+    except Exception:
+        conn.close()
+    p.release(conn)
+
+
+class UnidadDeTrabajo:
+    """
+    Una sola conexión por request, adquirida la primera vez que se usa.
+    Las funciones de los modelos la reciben como `uow` y la comparten en vez
+    de abrir un get_cursor() (y un checkout del pool) cada una.
+    """
+
+    def __init__(self, workload: str = "default", intent: str = "write"):
+        self.workload = workload
+        self.intent = intent
+        self._pool = None
+        self._conn = None
+        self.usuario_escritura = None
+
+    async def conexion(self):
+        if self._conn is None:
+            if self.intent == "read" and replicas:
+                replica, self._conn = await _adquirir_replica()
+                if self._conn is not None:
+                    self._pool = replica["pool"]
+                    return self._conn
+            self._pool, timeout, self.workload = _seleccionar_pool(self.workload)
+            self._conn = await _adquirir(self._pool, self.workload, timeout)
+        return self._conn
+
+    @asynccontextmanager
+    async def transaccion(self):
+        """Agrupa varias operaciones en un commit (o rollback si algo falla)"""
+        conn = await self.conexion()
+        await conn.begin()
+        try:
+            yield conn
+        except Exception:
+            await conn.rollback()
+            raise
+        await conn.commit()
+
+    async def cerrar(self):
+        if self._conn is not None:
+            await _liberar(self._pool, self._conn)
+            self._conn = None
+
+
+async def get_db():
+    """Dependencia FastAPI: unidad de trabajo del request (misma instancia en todas las dependencias)"""
+    uow = UnidadDeTrabajo()
+    try:
+        yield uow
+    finally:
+        await uow.cerrar()
+        # Renueva la ventana read-your-writes al terminar un request de escritura
+        await marcar_escritura(uow.usuario_escritura)
+
+
+async def get_db_lectura():
+    """Como get_db, pero la conexión sale de una réplica (rutas GET públicas)"""
+    uow = UnidadDeTrabajo(intent="read")
+    try:
+        yield uow
+    finally:
+        await uow.cerrar()
 
 
 @asynccontextmanager
-async def get_cursor():
-    global pool
-    async with pool.acquire() as conn:
+async def _abrir_cursor(conn, streaming: bool):
+    if not streaming:
         async with conn.cursor(aiomysql.DictCursor) as cursor:
+            yield CursorInstrumentado(cursor)
+        return
+
+    # 🌊 SSDictCursor: las filas llegan del servidor a medida que se leen (memoria constante).
+    # Cerrar el cursor lee y descarta lo que falte del resultado; si el consumidor cortó
+    # antes (cliente desconectado, error) se cierra la conexión y el pool la descarta.
+    cursor = await conn.cursor(aiomysql.SSDictCursor)
+    try:
+        yield CursorInstrumentado(cursor)
+    except BaseException:
+        conn.close()
+        raise
+    await cursor.close()
+
+
+@asynccontextmanager
+async def get_cursor(
+    workload: str = "default",
+    uow: UnidadDeTrabajo | None = None,
+    intent: str | None = None,
+    streaming: bool = False,
+):
+    """
+    Conexión + DictCursor del pool.
+    workload="reporting" usa el pool de reportes (exportaciones, estadísticas)
+    para que no compita con auth y préstamos.
+    intent="read" envía la consulta a una réplica sana si hay; si no hay, o el
+    usuario escribió hace menos de DB_READ_YOUR_WRITES_SECONDS, va al primario.
+    Si se pasa `uow`, reutiliza la conexión del request en lugar de pedir otra;
+    la réplica o el primario los decide la unidad de trabajo, y un intent que
+    no coincida con el suyo es un error.
+    streaming=True usa un cursor de servidor (SSDictCursor) para recorrer
+    resultados grandes con fetchmany sin cargarlos completos en memoria.
+    Cada execute queda medido en app.utils.query_stats.
+    """
+    if uow is not None:
+        if intent is not None and intent != uow.intent:
+            raise ValueError(f"intent={intent!r} no coincide con la unidad de trabajo ({uow.intent!r})")
+        conn = await uow.conexion()
+        async with _abrir_cursor(conn, streaming) as cursor:
+            yield conn, cursor
+        return
+
+    conn = None
+    if intent == "read" and replicas:
+        replica, conn = await _adquirir_replica()
+        if conn is not None:
+            p = replica["pool"]
+
+    if conn is None:
+        p, timeout, workload = _seleccionar_pool(workload)
+        conn = await _adquirir(p, workload, timeout)
+    try:
+        async with _abrir_cursor(conn, streaming) as cursor:
             yield conn, cursor
+    finally:
+        await _liberar(p, conn)
+
+
+def obtener_metricas_pool() -> dict:
+    """Saturación de los pools: conexiones en uso, esperando y latencia de adquisición"""
+    resultado = {}
+    pools = [("default", pool), ("reporting", reporting_pool)]
+    pools += [(rep["nombre"], rep["pool"]) for rep in replicas]
+    for workload, p in pools:
+        if p is None:
+            continue
+        metricas = _metricas[workload]
+        esperas = sorted(metricas["esperas_recientes"])
+        adquisiciones = metricas["adquisiciones"] or 1
+        resultado[workload] = {
+            "tamano": p.size,
+            "maximo": p.maxsize,
+            "en_uso": p.size - p.freesize,
+            "libres": p.freesize,
+            "esperando": metricas["esperando"],
+            "adquisiciones": metricas["adquisiciones"],
+            "timeouts": metricas["timeouts"],
+            "espera_promedio_ms": round(metricas["espera_total_ms"] / adquisiciones, 2),
+            "espera_p95_ms": round(esperas[int(len(esperas) * 0.95)], 2) if esperas else 0.0,
+            "espera_max_ms": round(metricas["espera_max_ms"], 2),
+        }
+    for rep in replicas:
+        if rep["nombre"] in resultado:
+            resultado[rep["nombre"]].update(sana=rep["sana"], lag_s=rep["lag_s"], ultimo_error=rep["ultimo_error"])
+    return resultado
+
+
+def _muestras_pool(*campos):
+    def func():
+        return [((nombre, *campos[1:]), datos[campos[0]]) for nombre, datos in obtener_metricas_pool().items()]
+    return func
+
+
+GaugeCallback("aeternum_db_pool_in_use", "Conexiones MySQL en uso", ("pool",), _muestras_pool("en_uso"))
+GaugeCallback("aeternum_db_pool_free", "Conexiones MySQL libres", ("pool",), _muestras_pool("libres"))
+GaugeCallback("aeternum_db_pool_max", "Tamaño máximo del pool MySQL", ("pool",), _muestras_pool("maximo"))
+GaugeCallback("aeternum_db_pool_waiting", "Coroutines esperando una conexión", ("pool",), _muestras_pool("esperando"))
+GaugeCallback("aeternum_db_pool_acquisitions_total", "Conexiones adquiridas", ("pool",),
+              _muestras_pool("adquisiciones"), tipo="counter")
+GaugeCallback("aeternum_db_pool_acquire_timeouts_total", "Timeouts adquiriendo conexión (503)", ("pool",),
+              _muestras_pool("timeouts"), tipo="counter")
+GaugeCallback("aeternum_db_replica_healthy", "Réplica de lectura sana (1) o no (0)", ("pool",),
+              lambda: [((rep["nombre"],), int(rep["sana"])) for rep in replicas])
 
 
 async def close_db():
-    global pool
-    if pool is not None:
-        pool.close()
-        await pool.wait_closed()
-        pool = None
-        print("Pool de conexiones cerrado.")
+    global pool, reporting_pool, _tarea_salud
+    if _tarea_salud is not None:
+        _tarea_salud.cancel()
+        _tarea_salud = None
+    for p in [pool, reporting_pool] + [rep["pool"] for rep in replicas]:
+        if p is not None:
+            p.close()
+            await p.wait_closed()
+    pool = None
+    reporting_pool = None
+    replicas.clear()
+    print("Pool de conexiones cerrado.")
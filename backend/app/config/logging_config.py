@@ -0,0 +1,182 @@
+import copy
+import json
+import logging
+import os
+import queue
+import sys
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from app.utils.metricas import GaugeCallback
+
+# ⚙️ Configuración (variables de entorno)
+# LOG_LEVEL: nivel raíz. LOG_LEVELS: por módulo, p. ej. "app.models=WARNING,app.utils.security=DEBUG"
+# LOG_FORMAT: "json" (producción) o "texto" (desarrollo)
+# LOG_MUESTREO_DEBUG: deja pasar 1 de cada N líneas DEBUG por punto del código
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+LOG_MUESTREO_DEBUG = int(os.getenv("LOG_MUESTREO_DEBUG", 20))
+LOG_QUEUE_MAX = int(os.getenv("LOG_QUEUE_MAX", 10000))
+
+# Id del request actual (lo fija RequestIdMiddleware)
+request_id_actual: ContextVar[str] = ContextVar("request_id", default="-")
+
+_listener: QueueListener | None = None
+_descartados = 0
+
+
+class ColaNoBloqueante(QueueHandler):
+    """
+    Encola el registro y vuelve de inmediato; la escritura a stdout la hace el
+    hilo del QueueListener. Si la cola está llena el registro se descarta en
+    vez de bloquear el event loop.
+    """
+
+    def enqueue(self, record):
+        global _descartados
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _descartados += 1
+
+    def prepare(self, record):
+        # Solo resuelve el mensaje y la traza; el formateo (JSON) ocurre en el listener
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class ContextoFilter(logging.Filter):
+    """Agrega el request_id del contexto (corre en el hilo que loguea)"""
+
+    def filter(self, record):
+        record.request_id = request_id_actual.get()
+        return True
+
+
+class MuestreoFilter(logging.Filter):
+    """Deja pasar 1 de cada `cada` registros DEBUG por (módulo, línea)"""
+
+    def __init__(self, cada: int):
+        super().__init__()
+        self.cada = max(1, cada)
+        self._conteos: dict[tuple, int] = {}
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or self.cada == 1:
+            return True
+        clave = (record.name, record.lineno)
+        n = self._conteos.get(clave, 0)
+        self._conteos[clave] = n + 1
+        if n % self.cada:
+            return False
+        record.muestreo = self.cada
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        datos = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "nivel": record.levelname,
+            "logger": record.name,
+            "mensaje": record.getMessage(),
+            "request_id": getattr(record, "request_id", "-"),
+        }
+        if getattr(record, "muestreo", None):
+            datos["muestreo"] = record.muestreo
+        if record.exc_text:
+            datos["traza"] = record.exc_text
+        return json.dumps(datos, ensure_ascii=False, default=str)
+
+
+class TextoFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s [%(request_id)s] %(name)s: %(message)s")
+
+
+def _niveles_por_modulo() -> dict[str, str]:
+    niveles = {}
+    for par in LOG_LEVELS.split(","):
+        if "=" in par:
+            modulo, nivel = par.split("=", 1)
+            niveles[modulo.strip()] = nivel.strip().upper()
+    return niveles
+
+
+def configurar_logging():
+    """Configura el logging de la app (idempotente). Se llama al importar app.main"""
+    global _listener
+    if _listener is not None:
+        return
+
+    salida = logging.StreamHandler(sys.stdout)
+    salida.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else TextoFormatter())
+
+    cola = queue.Queue(maxsize=LOG_QUEUE_MAX)
+    handler = ColaNoBloqueante(cola)
+    handler.addFilter(MuestreoFilter(LOG_MUESTREO_DEBUG))
+    handler.addFilter(ContextoFilter())
+
+    raiz = logging.getLogger()
+    for anterior in list(raiz.handlers):
+        raiz.removeHandler(anterior)
+    raiz.addHandler(handler)
+    raiz.setLevel(LOG_LEVEL)
+
+    for modulo, nivel in _niveles_por_modulo().items():
+        logging.getLogger(modulo).setLevel(nivel)
+
+    _listener = QueueListener(cola, salida, respect_handler_level=False)
+    _listener.start()
+
+
+def detener_logging():
+    """Vacía la cola y detiene el hilo escritor (shutdown de la app)"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def logs_descartados() -> int:
+    return _descartados
+
+
+GaugeCallback("aeternum_logs_dropped_total", "Registros de log descartados por cola llena", (),
+              lambda: [((), _descartados)], tipo="counter")
+
+
+class RequestIdMiddleware:
+    """Middleware ASGI: toma X-Request-ID (o genera uno) y lo devuelve en la respuesta"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        request_id = None
+        for nombre, valor in scope.get("headers", []):
+            if nombre == b"x-request-id":
+                request_id = valor.decode("latin-1")[:64]
+                break
+        request_id = request_id or uuid.uuid4().hex[:16]
+        token = request_id_actual.set(request_id)
+
+        async def send_con_id(mensaje):
+            if mensaje["type"] == "http.response.start":
+                mensaje["headers"] = list(mensaje.get("headers", [])) + [(b"x-request-id", request_id.encode("latin-1"))]
+            await send(mensaje)
+
+        try:
+            await self.app(scope, receive, send_con_id)
+        finally:
+            request_id_actual.reset(token)
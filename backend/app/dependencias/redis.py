@@ -1,13 +1,44 @@
 import redis
+import redis.asyncio
 import os
+import time
 from dotenv import load_dotenv
+from app.utils.metricas import REDIS_LATENCIA, REDIS_ERRORES
 
 load_dotenv()
 
 IS_LOCAL = os.getenv("RAILWAY_ENVIRONMENT") is None
 
+
+# 📈 Clientes que miden la latencia de cada comando (aeternum_redis_command_duration_seconds)
+class RedisInstrumentado(redis.Redis):
+    def execute_command(self, *args, **options):
+        comando = str(args[0]).upper() if args else "?"
+        inicio = time.perf_counter()
+        try:
+            return super().execute_command(*args, **options)
+        except Exception:
+            REDIS_ERRORES.inc(comando)
+            raise
+        finally:
+            REDIS_LATENCIA.observar(time.perf_counter() - inicio, comando)
+
+
+class RedisAsyncInstrumentado(redis.asyncio.Redis):
+    async def execute_command(self, *args, **options):
+        comando = str(args[0]).upper() if args else "?"
+        inicio = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        except Exception:
+            REDIS_ERRORES.inc(comando)
+            raise
+        finally:
+            REDIS_LATENCIA.observar(time.perf_counter() - inicio, comando)
+
+
 try:
-    r = redis.Redis(
+    r = RedisInstrumentado(
         host=os.getenv("REDIS_HOST"),
         port=int(os.getenv("REDIS_PORT")),
         password=os.getenv("REDIS_PASSWORD"),
@@ -18,6 +49,15 @@ try:
     r.ping()
     print("✅ Redis conectado exitosamente")
 
+    # ⚡ Cliente async para rutas calientes (middlewares) que no deben bloquear el loop
+    r_async = RedisAsyncInstrumentado(
+        host=os.getenv("REDIS_HOST"),
+        port=int(os.getenv("REDIS_PORT")),
+        password=os.getenv("REDIS_PASSWORD"),
+        ssl=not IS_LOCAL,
+        socket_timeout=3,
+    )
+
 except Exception as e:
     print("⚠️ Redis no disponible:", e)
     
@@ -28,3 +68,4 @@ except Exception as e:
         def delete(self, *args, **kwargs): pass
 
     r = FakeRedis()
+    r_async = None
@@ -1,10 +1,15 @@
 from fastapi import FastAPI
+from app.config.logging_config import configurar_logging, detener_logging, RequestIdMiddleware
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi_cache import FastAPICache
-from fastapi_cache.backends.inmemory import InMemoryBackend
+from fastapi.responses import PlainTextResponse
 from app.scheduler import start_scheduler, stop_scheduler
+from app.utils.cpu_offload import iniciar_pool_cpu, cerrar_pool_cpu, obtener_metricas_cpu
+from app.utils.sugerencias import iniciar_sugerencias, detener_sugerencias
 from pathlib import Path  # ← AGREGAR
 
+# 📝 Logging asíncrono (JSON) antes de importar routers y modelos
+configurar_logging()
+
 # Importar routers
 from app.routes import (
     auth_routes,
@@ -15,12 +20,15 @@ from app.routes import (
     prestamo_router,
     prestamo_fisico_router,
     estadisticas_router,
-    search_router
+    search_router,
+    recomendaciones_router
 )
-from app.routes.bibliotecario import users_router, book_router, catalogs, upload_routes
+from app.routes.bibliotecario import users_router, book_router, catalogs, upload_routes, monitoreo_router
 
-from app.config.database import init_db, close_db
+from app.config.database import init_db, close_db, obtener_metricas_pool
 from app.dependencias.redis import r
+from app.middleware.rate_limit import RateLimitMiddleware
+from app.utils.metricas import MetricasHTTPMiddleware, exportar_metricas
 
 app = FastAPI(title="Aeternum API", version="1.0.0")
 
@@ -29,6 +37,9 @@ UPLOAD_DIR = Path("uploads/book_covers")
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 print(f"📁 Directorio de uploads creado/verificado: {UPLOAD_DIR.resolve()}")
 
+# Rate limiting y control de admisión (antes de CORS para que los 429/503 lleven sus headers)
+app.add_middleware(RateLimitMiddleware)
+
 # Configuración CORS
 origins = [
     "http://localhost",
@@ -49,20 +60,30 @@ app.add_middleware(
     expose_headers=["Content-Disposition"]  
 )
 
+# Latencia por ruta: el más externo para medir también los 429/503 del rate limit
+app.add_middleware(MetricasHTTPMiddleware)
+
+# X-Request-ID en logs y respuestas
+app.add_middleware(RequestIdMiddleware)
+
 # Eventos de inicio y cierre
 @app.on_event("startup")
 async def on_startup():
     print("🚀 Iniciando aplicación Aeternum...")
     await init_db(app)
-    FastAPICache.init(InMemoryBackend())  
+    iniciar_pool_cpu()
+    iniciar_sugerencias()
     start_scheduler()
     print("✅ Aeternum iniciada con scheduler y cache")
 
 @app.on_event("shutdown")
 async def on_shutdown():
     stop_scheduler()
+    detener_sugerencias()
+    cerrar_pool_cpu()
     await close_db()
     print("🛑 Aplicación detenida correctamente.")
+    detener_logging()
 
 # Rutas principales
 app.include_router(auth_routes.router)
@@ -78,6 +99,8 @@ app.include_router(book_router.router)
 app.include_router(catalogs.router)
 app.include_router(upload_routes.router)
 app.include_router(search_router.router)
+app.include_router(recomendaciones_router.router)
+app.include_router(monitoreo_router.router)
 
 @app.get("/")
 async def root():
@@ -94,3 +117,21 @@ async def root():
         "redis": "✅ Disponible" if disponible else "⚠️ Fallback local",
 
     }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metricas_prometheus():
+    """Métricas en formato de texto Prometheus (HTTP, pools, Redis, caché, servicios externos, jobs)"""
+    return PlainTextResponse(exportar_metricas(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/metrics/cpu")
+async def metricas_cpu():
+    """Estado del pool de procesos para bcrypt (cola, espera, rechazos)"""
+    return obtener_metricas_cpu()
+
+
+@app.get("/metrics/db")
+async def metricas_db():
+    """Saturación de los pools MySQL (en uso, esperando, latencia de adquisición)"""
+    return obtener_metricas_pool()
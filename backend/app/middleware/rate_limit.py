@@ -0,0 +1,180 @@
+import math
+import os
+import time
+from dataclasses import dataclass
+from jose import jwt
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import JSONResponse
+
+from app.dependencias.redis import r_async
+from app.utils.security import SECRET_KEY, ALGORITHM
+
+# ⚙️ Máximo de requests simultáneas por proceso antes de responder 503
+MAX_REQUESTS_EN_VUELO = int(os.getenv("MAX_REQUESTS_EN_VUELO", 64))
+RATE_LIMIT_ACTIVO = os.getenv("RATE_LIMIT_ACTIVO", "1") != "0"
+
+# Rutas que nunca se limitan (health checks / métricas)
+RUTAS_EXENTAS = ("/metrics", "/docs", "/openapi.json")
+
+
+@dataclass(frozen=True)
+class Politica:
+    nombre: str
+    capacidad: int      # ráfaga máxima (tokens del bucket)
+    por_minuto: float   # recarga sostenida
+
+
+# 🧾 Políticas por grupo de rutas y rol: (prefijos, {rol: Politica})
+# El primer prefijo que coincide gana; "anonimo" aplica sin token válido.
+POLITICAS = [
+    (("/admin/books/export", "/admin/users/export"), {
+        "bibliotecario": Politica("export", 3, 6),
+    }),
+    # Autocompletado: una request por tecla; bucket propio para no gastar el de /search
+    (("/search/suggest",), {
+        "anonimo": Politica("suggest", 60, 300),
+        "usuario": Politica("suggest", 120, 600),
+        "bibliotecario": Politica("suggest", 120, 600),
+    }),
+    (("/search",), {
+        "anonimo": Politica("search", 10, 30),
+        "usuario": Politica("search", 20, 60),
+        "bibliotecario": Politica("search", 30, 120),
+    }),
+    (("/auth", "/password"), {
+        "anonimo": Politica("auth", 10, 20),
+    }),
+    (("/autores", "/editoriales", "/generos", "/uploads", "/reviews/ratings", "/reviews/comments"), {
+        "anonimo": Politica("catalogo", 120, 600),
+    }),
+]
+POLITICA_DEFAULT = {
+    "anonimo": Politica("default", 30, 120),
+    "usuario": Politica("default", 60, 300),
+    "bibliotecario": Politica("default", 120, 600),
+}
+
+# 🪣 Token bucket atómico en Redis: retorna {permitido, espera_ms}
+_LUA_TOKEN_BUCKET = """
+local capacidad = tonumber(ARGV[1])
+local tasa = tonumber(ARGV[2])
+local ahora = tonumber(ARGV[3])
+local datos = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(datos[1]) or capacidad
+local ts = tonumber(datos[2]) or ahora
+tokens = math.min(capacidad, tokens + (ahora - ts) * tasa)
+local permitido = 0
+local espera = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    permitido = 1
+else
+    espera = math.ceil((1 - tokens) / tasa)
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', ahora)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacidad / tasa) + 1000)
+return {permitido, espera}
+"""
+
+_script_bucket = None
+_buckets_locales: dict[str, tuple] = {}
+_en_vuelo = 0
+
+
+def resolver_politica(path: str, rol: str) -> Politica:
+    """Busca la política del path para el rol (con herencia anonimo → usuario)"""
+    for prefijos, por_rol in POLITICAS:
+        if path.startswith(prefijos):
+            return por_rol.get(rol) or por_rol.get("usuario") or por_rol.get("anonimo") \
+                or POLITICA_DEFAULT.get(rol, POLITICA_DEFAULT["anonimo"])
+    return POLITICA_DEFAULT.get(rol, POLITICA_DEFAULT["anonimo"])
+
+
+def _identidad(request) -> tuple[str, str]:
+    """(rol, identidad) a partir del JWT sin consultar BD; si no hay token, la IP"""
+    auth = request.headers.get("authorization", "")
+    if auth.lower().startswith("bearer "):
+        try:
+            payload = jwt.decode(auth[7:], SECRET_KEY, algorithms=[ALGORITHM])
+            rol = payload.get("rol") or payload.get("role") or "usuario"
+            return rol, f"u{payload.get('sub')}"
+        except Exception:
+            pass
+    ip = request.client.host if request.client else "desconocida"
+    return "anonimo", f"ip{ip}"
+
+
+def _consumir_local(clave: str, politica: Politica, ahora_ms: int) -> tuple[bool, int]:
+    tasa = politica.por_minuto / 60000  # tokens por ms
+    if len(_buckets_locales) > 50_000:
+        _buckets_locales.clear()
+    tokens, ts = _buckets_locales.get(clave, (politica.capacidad, ahora_ms))
+    tokens = min(politica.capacidad, tokens + (ahora_ms - ts) * tasa)
+    if tokens >= 1:
+        _buckets_locales[clave] = (tokens - 1, ahora_ms)
+        return True, 0
+    _buckets_locales[clave] = (tokens, ahora_ms)
+    return False, math.ceil((1 - tokens) / tasa)
+
+
+async def consumir_token(clave: str, politica: Politica) -> tuple[bool, int]:
+    """Consume un token del bucket. Retorna (permitido, espera_ms)"""
+    global _script_bucket
+    ahora_ms = int(time.time() * 1000)
+
+    if r_async is not None:
+        try:
+            if _script_bucket is None:
+                _script_bucket = r_async.register_script(_LUA_TOKEN_BUCKET)
+            permitido, espera = await _script_bucket(
+                keys=[clave],
+                args=[politica.capacidad, politica.por_minuto / 60000, ahora_ms],
+            )
+            return bool(permitido), int(espera)
+        except Exception:
+            pass
+
+    return _consumir_local(clave, politica, ahora_ms)
+
+
+class RateLimitMiddleware(BaseHTTPMiddleware):
+    """
+    Control de admisión:
+    1. Tope global de requests en vuelo por proceso → 503 (protege el pool de BD)
+    2. Token bucket por política (ruta + rol) e identidad → 429 con Retry-After
+    """
+
+    async def dispatch(self, request, call_next):
+        global _en_vuelo
+        path = request.url.path
+
+        if request.method == "OPTIONS" or path == "/" or path.startswith(RUTAS_EXENTAS):
+            return await call_next(request)
+
+        if _en_vuelo >= MAX_REQUESTS_EN_VUELO:
+            return JSONResponse(
+                status_code=503,
+                content={"detail": "Servidor saturado, intenta de nuevo en unos segundos."},
+                headers={"Retry-After": "1"},
+            )
+
+        if RATE_LIMIT_ACTIVO:
+            rol, identidad = _identidad(request)
+            politica = resolver_politica(path, rol)
+            permitido, espera_ms = await consumir_token(f"rl:{politica.nombre}:{identidad}", politica)
+
+            if not permitido:
+                return JSONResponse(
+                    status_code=429,
+                    content={"detail": "Demasiadas solicitudes. Intenta de nuevo más tarde."},
+                    headers={
+                        "Retry-After": str(max(1, math.ceil(espera_ms / 1000))),
+                        "X-RateLimit-Policy": politica.nombre,
+                    },
+                )
+
+        _en_vuelo += 1
+        try:
+            return await call_next(request)
+        finally:
+            _en_vuelo -= 1
@@ -0,0 +1,21 @@
+-- Ledger de ejecuciones de tareas programadas y último fencing token por job
+
+CREATE TABLE IF NOT EXISTS job_runs (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    job VARCHAR(100) NOT NULL,
+    fencing_token BIGINT NOT NULL,
+    worker VARCHAR(150) NOT NULL,
+    estado ENUM('ejecutando', 'ok', 'error', 'lease_perdido') NOT NULL DEFAULT 'ejecutando',
+    iniciado_en DATETIME(3) NOT NULL,
+    finalizado_en DATETIME(3) NULL,
+    duracion_ms INT NULL,
+    filas_afectadas INT NULL,
+    detalle TEXT NULL,
+    KEY idx_job_runs_job_inicio (job, iniciado_en)
+);
+
+CREATE TABLE IF NOT EXISTS job_locks (
+    job VARCHAR(100) PRIMARY KEY,
+    fencing_token BIGINT NOT NULL DEFAULT 0,
+    actualizado_en DATETIME(3) NOT NULL
+);
@@ -0,0 +1,5 @@
+-- Búsqueda diaria de préstamos por vencer sin recordatorio (app/task/recordatorios.py)
+-- Igualdad en estado y marca, rango en fecha_devolucion
+
+ALTER TABLE prestamos_fisicos
+    ADD INDEX idx_pf_recordatorio (estado, correo_recordatorio_enviado, fecha_devolucion);
@@ -0,0 +1,5 @@
+-- Transición nocturna a 'atrasado' y avisos de atraso (app/task/atrasos.py):
+-- igualdad en estado, rango en fecha_devolucion
+
+ALTER TABLE prestamos_fisicos
+    ADD INDEX idx_pf_estado_vencimiento (estado, fecha_devolucion);
@@ -0,0 +1,10 @@
+-- Rollup de préstamos por mes de creación y estado (app/models/prestamos_mensuales_model.py).
+-- Lo mantienen las transacciones que crean préstamos o cambian su estado;
+-- llenar o reconstruir con: python -m app.scripts.reconstruir_prestamos_mensuales
+
+CREATE TABLE IF NOT EXISTS prestamos_mensuales (
+    mes DATE NOT NULL,
+    estado VARCHAR(20) NOT NULL,
+    total INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (mes, estado)
+);
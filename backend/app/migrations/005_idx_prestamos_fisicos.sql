@@ -0,0 +1,10 @@
+-- Préstamos del usuario (mis préstamos, límite de activos, mora): igualdad en usuario_id y estado.
+-- Alertas del dashboard: estado IN (...) + rango en fecha_recogida (antes DATE(fecha_recogida) = ...).
+-- Rankings y rollup mensual: rango en created_at.
+-- INPLACE / LOCK=NONE: la tabla sigue aceptando escrituras mientras se construye el índice
+
+ALTER TABLE prestamos_fisicos
+    ADD INDEX idx_pf_usuario_estado (usuario_id, estado),
+    ADD INDEX idx_pf_estado_recogida (estado, fecha_recogida),
+    ADD INDEX idx_pf_created (created_at),
+    ALGORITHM=INPLACE, LOCK=NONE;
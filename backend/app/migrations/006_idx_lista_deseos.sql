@@ -0,0 +1,6 @@
+-- Wishlist del usuario ordenada por fecha (wishlist_router) y ranking por ventana de fechas
+
+ALTER TABLE lista_deseos
+    ADD INDEX idx_ld_usuario_fecha (usuario_id, fecha_agregado),
+    ADD INDEX idx_ld_fecha (fecha_agregado),
+    ALGORITHM=INPLACE, LOCK=NONE;
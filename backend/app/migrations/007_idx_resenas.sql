@@ -0,0 +1,10 @@
+-- Promedio de calificaciones por libro: (libro_id, puntuacion) lo resuelve solo con el índice.
+-- Comentarios de un libro, más recientes primero.
+
+ALTER TABLE calificaciones
+    ADD INDEX idx_cal_libro_puntuacion (libro_id, puntuacion),
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+ALTER TABLE comentarios
+    ADD INDEX idx_com_libro_fecha (libro_id, fecha_comentario),
+    ALGORITHM=INPLACE, LOCK=NONE;
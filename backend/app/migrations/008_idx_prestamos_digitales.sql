@@ -0,0 +1,5 @@
+-- Préstamos digitales: filtro por rango de fecha_prestamo (listado y ranking por ventana)
+
+ALTER TABLE prestamos
+    ADD INDEX idx_p_fecha_prestamo (fecha_prestamo),
+    ALGORITHM=INPLACE, LOCK=NONE;
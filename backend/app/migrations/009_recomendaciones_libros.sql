@@ -0,0 +1,10 @@
+-- Vecinos más similares de cada libro (app/task/recomendaciones.py, job nocturno).
+-- Una fila por libro: `vecinos` es [[libro_id, score], ...] de mayor a menor, así
+-- /recommendations lee una sola fila por clave primaria.
+
+CREATE TABLE IF NOT EXISTS recomendaciones_libros (
+    libro_id INT NOT NULL PRIMARY KEY,
+    vecinos JSON NOT NULL,
+    actualizado_en DATETIME NOT NULL,
+    KEY idx_rec_actualizado (actualizado_en)
+);
@@ -1,11 +1,16 @@
 from datetime import date, timedelta, datetime
 import pytz
 from app.config.database import get_cursor
+from app.models.prestamos_mensuales_model import obtener_rollup_mensual
+from app.utils.rankings import ORIGENES, VENTANAS, top_libros
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 async def obtener_estadisticas_bibliotecario():
     """Obtiene estadísticas generales para el dashboard del bibliotecario"""
-    async with get_cursor() as (conn, cursor):
+    async with get_cursor("reporting", intent="read") as (conn, cursor):
         try:
             hoy = date.today()
             
@@ -36,13 +41,12 @@ async def obtener_estadisticas_bibliotecario():
             result = await cursor.fetchone()
             para_recoger_hoy = result["total"] if result else 0
             
-            # ⚠ Préstamos vencidos (fecha_devolucion < hoy y estado IN ('activo', 'atrasado'))
+            # ⚠ Préstamos vencidos: el job nocturno los pasa a 'atrasado', basta el estado
             await cursor.execute("""
                 SELECT COUNT(*) as total
                 FROM prestamos_fisicos
-                WHERE fecha_devolucion < %s 
-                AND estado IN ('activo', 'atrasado')
-            """, (hoy,))
+                WHERE estado = 'atrasado'
+            """)
             result = await cursor.fetchone()
             vencidos = result["total"] if result else 0
             
@@ -57,13 +61,13 @@ async def obtener_estadisticas_bibliotecario():
             }
             
         except Exception as e:
-            print(f"❌ Error obtener_estadisticas_bibliotecario: {e}")
+            logger.error(f"❌ Error obtener_estadisticas_bibliotecario: {e}")
             return {"status": "error", "message": str(e)}
 
 
 async def obtener_prestamos_recientes(limit: int = 10):
     """Obtiene los préstamos más recientes con información del usuario"""
-    async with get_cursor() as (conn, cursor):
+    async with get_cursor("reporting", intent="read") as (conn, cursor):
         try:
             await cursor.execute("""
                 SELECT 
@@ -94,19 +98,19 @@ async def obtener_prestamos_recientes(limit: int = 10):
             }
             
         except Exception as e:
-            print(f"❌ Error obtener_prestamos_recientes: {e}")
+            logger.error(f"❌ Error obtener_prestamos_recientes: {e}")
             return {"status": "error", "message": str(e)}
 
 
 async def obtener_alertas_bibliotecario():
     """Obtiene alertas de libros que se recogen hoy y préstamos por vencer"""
-    async with get_cursor() as (conn, cursor):
+    async with get_cursor("reporting", intent="read") as (conn, cursor):
         try:
             tz = pytz.timezone("America/Bogota")
             hoy = datetime.now(tz).date()
             manana = hoy + timedelta(days=1)
 
-            # 📘 Libros que se recogen hoy (comparando por rango de fecha local)
+            # 📘 Libros que se recogen hoy (rango sobre la columna: usa idx_pf_estado_recogida)
             await cursor.execute("""
                 SELECT 
                     p.id,
@@ -118,11 +122,12 @@ async def obtener_alertas_bibliotecario():
                     p.fecha_recogida
                 FROM prestamos_fisicos p
                 JOIN usuarios u ON p.usuario_id = u.id
-                WHERE DATE(p.fecha_recogida) = DATE(%s)
+                WHERE p.fecha_recogida >= %s
+                AND p.fecha_recogida < %s
                 AND p.estado IN ('pendiente', 'activo')
                 ORDER BY p.fecha_recogida ASC
                 LIMIT 5
-            """, (hoy,))
+            """, (hoy, manana))
             recogen_hoy = await cursor.fetchall()
 
 
@@ -154,82 +159,84 @@ async def obtener_alertas_bibliotecario():
             }
 
         except Exception as e:
-            print(f"❌ Error obtener_alertas_bibliotecario: {e}")
+            logger.error(f"❌ Error obtener_alertas_bibliotecario: {e}")
             return {"status": "error", "message": str(e)}
 
 
-async def obtener_datos_grafica_prestamos():
-    """Obtiene datos para gráfica de préstamos por mes (últimos 6 meses)"""
-    async with get_cursor() as (conn, cursor):
-        try:
-            await cursor.execute("""
-                SELECT 
-                    DATE_FORMAT(created_at, '%Y-%m') as mes,
-                    COUNT(*) as total,
-                    SUM(CASE WHEN estado = 'devuelto' THEN 1 ELSE 0 END) as devueltos,
-                    SUM(CASE WHEN estado = 'activo' THEN 1 ELSE 0 END) as activos,
-                    SUM(CASE WHEN estado = 'atrasado' THEN 1 ELSE 0 END) as atrasados,
-                    SUM(CASE WHEN estado = 'cancelado' THEN 1 ELSE 0 END) as cancelados
-                FROM prestamos_fisicos
-                WHERE created_at >= DATE_SUB(CURDATE(), INTERVAL 6 MONTH)
-                GROUP BY DATE_FORMAT(created_at, '%Y-%m')
-                ORDER BY mes DESC
-            """)
-            
-            datos = await cursor.fetchall()
-            
-            return {
-                "status": "success",
-                "grafica": datos
-            }
-            
-        except Exception as e:
-            print(f"❌ Error obtener_datos_grafica_prestamos: {e}")
-            return {"status": "error", "message": str(e)}
+async def obtener_datos_grafica_prestamos(desde: str | None = None, hasta: str | None = None):
+    """
+    Obtiene datos para gráfica de préstamos por mes (por defecto, últimos 6 meses).
+    Sale del rollup prestamos_mensuales: el costo depende de los meses pedidos,
+    no de cuántos préstamos haya.
+    """
+    try:
+        if desde is None:
+            hoy = date.today()
+            inicio_mes = (hoy.year * 12 + hoy.month - 1) - 6
+            desde = date(inicio_mes // 12, inicio_mes % 12 + 1, 1).isoformat()
 
-async def obtener_libros_populares(tipo: str = "prestamos"):
+        datos = await obtener_rollup_mensual(desde, hasta)
+
+        return {
+            "status": "success",
+            "grafica": datos
+        }
+
+    except Exception as e:
+        logger.error(f"❌ Error obtener_datos_grafica_prestamos: {e}")
+        return {"status": "error", "message": str(e)}
+
+async def obtener_libros_populares(tipo: str = "prestamos", ventana: str = "total", limit: int = 5):
     """
     Obtiene los libros más populares según el tipo:
     - tipo="prestamos": libros más prestados.
     - tipo="wishlist": libros más guardados en lista de deseos.
+    `ventana`: "7d", "30d" o "total". El top sale del sorted set de Redis
+    (app/utils/rankings.py); si no está disponible se calcula en SQL.
     """
-    async with get_cursor() as (conn, cursor):
-        try:
-            if tipo == "wishlist":
-                query = """
-                    SELECT 
-                        l.id,
-                        l.titulo,
-                        l.autor_id,
-                        a.nombre AS autor,
-                        COUNT(w.libro_id) AS total
-                    FROM wishlist w
-                    JOIN libros l ON w.libro_id = l.id
-                    LEFT JOIN autores a ON l.autor_id = a.id
-                    GROUP BY l.id, l.titulo, a.nombre
-                    ORDER BY total DESC
-                    LIMIT 5
-                """
-            else:
-                query = """
-                    SELECT 
-                        l.id,
-                        l.titulo,
-                        l.autor_id,
-                        a.nombre AS autor,
-                        COUNT(p.libro_id) AS total
-                    FROM prestamos_fisicos p
-                    JOIN libros l ON p.libro_id = l.id
-                    LEFT JOIN autores a ON l.autor_id = a.id
-                    GROUP BY l.id, l.titulo, a.nombre
-                    ORDER BY total DESC
-                    LIMIT 5
-                """
-            
-            await cursor.execute(query)
-            libros = await cursor.fetchall()
+    if ventana not in VENTANAS:
+        return {"status": "error", "message": f"Ventana inválida. Valores permitidos: {list(VENTANAS)}"}
+    ranking = "wishlist" if tipo == "wishlist" else "prestamos"
 
-            return {"status": "success", "libros": libros}
-        except Exception as e:
-            print(f"❌ Error obtener_libros_populares: {e}")
-            return {"status": "error", "message": str(e)}
+    try:
+        top = await top_libros(ranking, ventana, limit)
+        if top is None:
+            top = await _top_libros_sql(ranking, ventana, limit)
+        if not top:
+            return {"status": "success", "libros": []}
+
+        async with get_cursor("reporting", intent="read") as (conn, cursor):
+            await cursor.execute(f"""
+                SELECT 
+                    l.id,
+                    l.titulo,
+                    l.autor_id,
+                    a.nombre AS autor
+                FROM libros l
+                LEFT JOIN autores a ON l.autor_id = a.id
+                WHERE l.id IN ({", ".join(["%s"] * len(top))})
+            """, [libro_id for libro_id, _ in top])
+            detalles = {l["id"]: l for l in await cursor.fetchall()}
+
+        libros = [{**detalles[libro_id], "total": total} for libro_id, total in top if libro_id in detalles]
+        return {"status": "success", "libros": libros}
+    except Exception as e:
+        logger.error(f"❌ Error obtener_libros_populares: {e}")
+        return {"status": "error", "message": str(e)}
+
+
+async def _top_libros_sql(ranking: str, ventana: str, limit: int) -> list[tuple[int, int]]:
+    """Respaldo sin Redis: GROUP BY sobre la tabla de eventos"""
+    tabla, columna = ORIGENES[ranking]
+    dias = VENTANAS[ventana]
+    filtro = f"WHERE {columna} >= CURDATE() - INTERVAL {dias - 1} DAY" if dias else ""
+    async with get_cursor("reporting", intent="read") as (conn, cursor):
+        await cursor.execute(f"""
+            SELECT libro_id, COUNT(*) AS total
+            FROM {tabla}
+            {filtro}
+            GROUP BY libro_id
+            ORDER BY total DESC
+            LIMIT %s
+        """, (limit,))
+        return [(f["libro_id"], f["total"]) for f in await cursor.fetchall()]
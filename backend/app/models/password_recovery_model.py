@@ -1,5 +1,8 @@
 from datetime import datetime, timedelta
 from app.config.database import get_cursor
+import logging
+
+logger = logging.getLogger(__name__)
 
 RECOVERY_EXPIRY_HOURS = 1
 RECOVERY_TABLE = "solicitudes_recuperacion_contrasena"
@@ -20,7 +23,7 @@ async def create_recovery_request(user_id: int, token: str):
             await cursor.execute(query, (user_id, token, datetime.now(), expiry_time, 0))
             await conn.commit()
         except Exception as e:
-            print(f"❌ Error creando solicitud de recuperación: {e}")
+            logger.error(f"❌ Error creando solicitud de recuperación: {e}")
             await conn.rollback()
         finally:
             pass
@@ -39,7 +42,7 @@ async def get_recovery_request_by_token(token: str):
             recovery = await cursor.fetchone()
             return recovery
         except Exception as e:
-            print(f"❌ Error al buscar token de recuperación: {e}")
+            logger.error(f"❌ Error al buscar token de recuperación: {e}")
             return None
         finally:
             # El async with se encarga de cerrar.
@@ -55,7 +58,7 @@ async def mark_token_as_used(token: str):
             await cursor.execute(query, (token,))
             await conn.commit()
         except Exception as e:
-            print(f"❌ Error al marcar token como usado: {e}")
+            logger.error(f"❌ Error al marcar token como usado: {e}")
             await conn.rollback()
         finally:
             pass
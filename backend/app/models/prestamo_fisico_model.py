@@ -1,5 +1,12 @@
+import asyncio
+import os
+import random
 from datetime import datetime, timedelta
-from app.config.database import get_cursor
+import pymysql
+from app.config.database import get_cursor, UnidadDeTrabajo
+from app.utils.contadores import ESTADOS_VIGENTES, ajustar_contadores
+from app.models.prestamos_mensuales_model import registrar_alta, capturar_estados, registrar_cambio_estado
+from app.utils.rankings import registrar_evento
 from datetime import datetime
 import pytz
 from app.utils.email_prestamos import (
@@ -7,126 +14,191 @@ from app.utils.email_prestamos import (
     send_prestamo_cancelado,
     send_prestamo_atrasado
 )
+import logging
 
+logger = logging.getLogger(__name__)
 
-async def crear_prestamo_fisico(usuario_id: int, libro_id: int, fecha_recogida: str):
-    async with get_cursor() as (conn, cursor):
-        try:
-            # 🔹 VALIDAR LÍMITE DE 2 PRÉSTAMOS ACTIVOS
-            await cursor.execute("""
-                SELECT COUNT(*) as total
-                FROM prestamos_fisicos
-                WHERE usuario_id = %s 
-                AND estado IN ('pendiente', 'activo')
-            """, (usuario_id,))
-            result = await cursor.fetchone()
-            
-            if result["total"] >= 2:
-                return {
-                    "status": "error", 
-                    "message": "Has alcanzado el límite de 2 préstamos físicos activos. Devuelve o cancela un préstamo para solicitar uno nuevo."
-                }
-            
-            # 🔹 Validar que el libro existe
-            await cursor.execute("""
-                SELECT id, titulo, autor_id, cantidad_disponible, openlibrary_key
-                FROM libros
-                WHERE id = %s
-            """, (libro_id,))
-            libro = await cursor.fetchone()
-            if not libro:
-                return {"status": "error", "message": "Libro no encontrado"}
-
-            # 🔹 Obtener nombre del autor (si existe)
-            autor_nombre = "Desconocido"
-            if libro["autor_id"]:
-                await cursor.execute("SELECT nombre FROM autores WHERE id = %s", (libro["autor_id"],))
-                autor_result = await cursor.fetchone()
-                if autor_result:
-                    autor_nombre = autor_result["nombre"]
-
-            # 🔹 Calcular fechas de recogida y devolución
-            fecha_recogida_obj = datetime.strptime(fecha_recogida, "%Y-%m-%d")
-            fecha_devolucion_obj = fecha_recogida_obj + timedelta(days=12)
-            fecha_devolucion = fecha_devolucion_obj.strftime("%Y-%m-%d")
-
-            # 🔹 Obtener datos del usuario
-            await cursor.execute("""
-                SELECT nombre, apellido, correo
-                FROM usuarios
-                WHERE id = %s
-            """, (usuario_id,))
-            usuario = await cursor.fetchone()
-            if not usuario:
-                return {"status": "error", "message": "Usuario no encontrado"}
+# 🔁 Deadlock (1213) y lock wait timeout (1205): se reintenta la transacción completa
+ERRORES_REINTENTABLES = (1213, 1205)
+PRESTAMO_REINTENTOS = int(os.getenv("PRESTAMO_REINTENTOS", 3))
 
-            # 🔹 Insertar préstamo físico
-            await cursor.execute("""
-                INSERT INTO prestamos_fisicos 
-                (usuario_id, libro_id, titulo, autor, openlibrary_key, 
-                 fecha_recogida, fecha_devolucion, estado)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, 'pendiente')
-            """, (
-                usuario_id,
-                libro_id,
-                libro["titulo"],
-                autor_nombre,
-                libro["openlibrary_key"],
-                fecha_recogida,
-                fecha_devolucion
-            ))
-
-            prestamo_id = cursor.lastrowid
-
-            # 🔹 Descontar stock
-            await cursor.execute("""
-                UPDATE libros
-                SET cantidad_disponible = cantidad_disponible - 1
-                WHERE id = %s
-            """, (libro_id,))
 
-            await conn.commit()
+def _delta_vigentes(estado_anterior: str, estado_nuevo: str) -> int:
+    """Cambio en el conteo de préstamos vigentes del usuario al pasar de un estado a otro"""
+    return (estado_nuevo in ESTADOS_VIGENTES) - (estado_anterior in ESTADOS_VIGENTES)
+
 
-            # 🔹 Enviar correo de confirmación
+class SinEjemplares(Exception):
+    """El UPDATE condicional no descontó stock: otro préstamo tomó el último ejemplar"""
+
+
+async def crear_prestamo_fisico(usuario_id: int, libro_id: int, fecha_recogida: str, uow: UnidadDeTrabajo | None = None):
+    """
+    Crea el préstamo descontando stock con un UPDATE condicional (nunca vende
+    de más). El correo de confirmación NO se envía aquí: el resultado trae
+    `notificacion` para que la ruta lo mande en background con
+    `enviar_confirmacion_prestamo`, ya con la transacción cerrada.
+    """
+    # 🔹 Calcular fechas de recogida y devolución
+    fecha_recogida_obj = datetime.strptime(fecha_recogida, "%Y-%m-%d")
+    fecha_devolucion_obj = fecha_recogida_obj + timedelta(days=12)
+    fecha_devolucion = fecha_devolucion_obj.strftime("%Y-%m-%d")
+
+    # El límite de 2 lo decide el COUNT dentro de la transacción: el contador de
+    # Redis puede quedar alto tras un llenado concurrente y no debe rechazar solo
+    async with get_cursor(uow=uow) as (conn, cursor):
+        for intento in range(1, PRESTAMO_REINTENTOS + 1):
             try:
-                nombre_completo = f"{usuario['nombre']} {usuario['apellido']}"
-                await send_prestamo_confirmacion(
-                    recipient_email=usuario["correo"],
-                    nombre_usuario=nombre_completo,
-                    titulo_libro=libro["titulo"],
-                    fecha_recogida=fecha_recogida,
-                    fecha_devolucion=fecha_devolucion
-                )
+                # Transacción nueva: la lectura del conteo no debe usar un snapshot
+                # abierto antes en el request por otra consulta sobre la misma conexión
+                await conn.begin()
 
+                # 🔹 Bloquear al usuario (serializa sus solicitudes) y contar sus préstamos
+                #    activos en el mismo viaje; los atrasados siguen contando para el límite
                 await cursor.execute("""
-                    UPDATE prestamos_fisicos
-                    SET correo_confirmacion_enviado = TRUE
+                    SELECT u.nombre, u.apellido, u.correo,
+                        (SELECT COUNT(*)
+                         FROM prestamos_fisicos pf
+                         WHERE pf.usuario_id = u.id
+                         AND pf.estado IN ('pendiente', 'activo', 'atrasado')) as total
+                    FROM usuarios u
+                    WHERE u.id = %s
+                    FOR UPDATE
+                """, (usuario_id,))
+                usuario = await cursor.fetchone()
+                if not usuario:
+                    await conn.rollback()
+                    return {"status": "error", "message": "Usuario no encontrado"}
+
+                if usuario["total"] >= 2:
+                    await conn.rollback()
+                    return {
+                        "status": "error", 
+                        "message": "Has alcanzado el límite de 2 préstamos físicos activos. Devuelve o cancela un préstamo para solicitar uno nuevo."
+                    }
+
+                # 🔹 Libro + autor en una sola consulta (sin bloquear la fila del libro)
+                await cursor.execute("""
+                    SELECT l.id, l.titulo, l.cantidad_disponible, l.openlibrary_key,
+                           COALESCE(a.nombre, 'Desconocido') as autor
+                    FROM libros l
+                    LEFT JOIN autores a ON l.autor_id = a.id
+                    WHERE l.id = %s
+                """, (libro_id,))
+                libro = await cursor.fetchone()
+                if not libro:
+                    await conn.rollback()
+                    return {"status": "error", "message": "Libro no encontrado"}
+                if libro["cantidad_disponible"] <= 0:
+                    raise SinEjemplares()
+
+                # 🔹 Descontar stock solo si queda. Va antes del INSERT: el chequeo de FK
+                #    del INSERT toma un lock compartido sobre el libro y subirlo a
+                #    exclusivo con otros préstamos en curso provoca deadlocks
+                await cursor.execute("""
+                    UPDATE libros
+                    SET cantidad_disponible = cantidad_disponible - 1
                     WHERE id = %s
-                """, (prestamo_id,))
+                    AND cantidad_disponible > 0
+                """, (libro_id,))
+                if cursor.rowcount == 0:
+                    raise SinEjemplares()
+
+                # 🔹 Insertar préstamo físico
+                await cursor.execute("""
+                    INSERT INTO prestamos_fisicos 
+                    (usuario_id, libro_id, titulo, autor, openlibrary_key, 
+                     fecha_recogida, fecha_devolucion, estado)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, 'pendiente')
+                """, (
+                    usuario_id,
+                    libro_id,
+                    libro["titulo"],
+                    libro["autor"],
+                    libro["openlibrary_key"],
+                    fecha_recogida,
+                    fecha_devolucion
+                ))
+
+                prestamo_id = cursor.lastrowid
+                # 📅 Rollup mensual al final: su fila del mes es la más disputada
+                await registrar_alta(cursor, prestamo_id)
                 await conn.commit()
+                await ajustar_contadores(usuario_id, +1, {libro_id: -1})
+                await registrar_evento("prestamos", libro_id)
+                break
+
+            except SinEjemplares:
+                await conn.rollback()
+                return {"status": "error", "message": "No hay ejemplares disponibles de este libro"}
+
+            except pymysql.err.OperationalError as e:
+                await conn.rollback()
+                if e.args[0] not in ERRORES_REINTENTABLES or intento == PRESTAMO_REINTENTOS:
+                    logger.error(f"❌ Error en crear_prestamo_fisico: {e}")
+                    return {"status": "error", "message": str(e)}
+                logger.warning(f"🔁 Conflicto de locks creando préstamo (intento {intento}): {e}")
+                await asyncio.sleep(random.uniform(0.01, 0.05) * intento)
 
             except Exception as e:
-                print(f"⚠️ Error al enviar correo (préstamo creado exitosamente): {e}")
-
-            return {
-                "status": "success",
-                "message": "Préstamo físico creado exitosamente",
-                "prestamo_id": prestamo_id,
-                "fechas": {
-                    "recogida": fecha_recogida,
-                    "devolucion": fecha_devolucion,
-                    "dias_prestamo": 12
-                }
-            }
+                await conn.rollback()
+                logger.error(f"❌ Error en crear_prestamo_fisico: {e}")
+                return {"status": "error", "message": str(e)}
+
+    return {
+        "status": "success",
+        "message": "Préstamo físico creado exitosamente",
+        "prestamo_id": prestamo_id,
+        "fechas": {
+            "recogida": fecha_recogida,
+            "devolucion": fecha_devolucion,
+            "dias_prestamo": 12
+        },
+        "notificacion": {
+            "prestamo_id": prestamo_id,
+            "correo": usuario["correo"],
+            "nombre_usuario": f"{usuario['nombre']} {usuario['apellido']}",
+            "titulo_libro": libro["titulo"],
+            "fecha_recogida": fecha_recogida,
+            "fecha_devolucion": fecha_devolucion,
+        },
+    }
+
+
+async def enviar_confirmacion_prestamo(
+    prestamo_id: int,
+    correo: str,
+    nombre_usuario: str,
+    titulo_libro: str,
+    fecha_recogida: str,
+    fecha_devolucion: str
+):
+    """Envía la confirmación fuera de la transacción (BackgroundTasks) y la marca como enviada"""
+    try:
+        enviado, _ = await send_prestamo_confirmacion(
+            recipient_email=correo,
+            nombre_usuario=nombre_usuario,
+            titulo_libro=titulo_libro,
+            fecha_recogida=fecha_recogida,
+            fecha_devolucion=fecha_devolucion
+        )
+        if not enviado:
+            return
+
+        async with get_cursor() as (conn, cursor):
+            await cursor.execute("""
+                UPDATE prestamos_fisicos
+                SET correo_confirmacion_enviado = TRUE
+                WHERE id = %s
+            """, (prestamo_id,))
+            await conn.commit()
 
-        except Exception as e:
-            await conn.rollback()
-            print(f"❌ Error en crear_prestamo_fisico:", e)
-            return {"status": "error", "message": str(e)}
+    except Exception as e:
+        logger.warning(f"⚠️ Error al enviar correo (préstamo creado exitosamente): {e}")
 
 
-async def obtener_prestamos_usuario(usuario_id: int):
-    async with get_cursor() as (conn, cursor):
+async def obtener_prestamos_usuario(usuario_id: int, uow: UnidadDeTrabajo | None = None):
+    async with get_cursor(uow=uow) as (conn, cursor):
         try:
             await cursor.execute("""
                 SELECT 
@@ -159,15 +231,15 @@ async def obtener_prestamos_usuario(usuario_id: int):
             return {"status": "success", "prestamos": prestamos}
 
         except Exception as e:
-            print(f"❌ Error obtener_prestamos_usuario:", e)
+            logger.error(f"❌ Error obtener_prestamos_usuario: {e}")
             return {"status": "error", "message": str(e)}
 
 
-async def cancelar_prestamo_fisico(prestamo_id: int, usuario_id: int):
-    async with get_cursor() as (conn, cursor):
+async def cancelar_prestamo_fisico(prestamo_id: int, usuario_id: int, uow: UnidadDeTrabajo | None = None):
+    async with get_cursor(uow=uow) as (conn, cursor):
         try:
             await cursor.execute("""
-                SELECT p.id, p.libro_id, p.titulo, u.nombre, u.apellido, u.correo
+                SELECT p.id, p.libro_id, p.titulo, p.estado, u.nombre, u.apellido, u.correo
                 FROM prestamos_fisicos p
                 JOIN usuarios u ON p.usuario_id = u.id
                 WHERE p.id = %s AND p.usuario_id = %s AND p.estado != 'cancelado'
@@ -178,6 +250,7 @@ async def cancelar_prestamo_fisico(prestamo_id: int, usuario_id: int):
                 return {"status": "error", "message": "Préstamo no encontrado o ya cancelado"}
 
             # 🔹 Cancelar préstamo
+            capturados = await capturar_estados(cursor, "id = %s", (prestamo_id,))
             await cursor.execute("""
                 UPDATE prestamos_fisicos
                 SET estado = 'cancelado', fecha_devolucion_real = CURRENT_DATE()
@@ -191,7 +264,11 @@ async def cancelar_prestamo_fisico(prestamo_id: int, usuario_id: int):
                 WHERE id = %s
             """, (prestamo["libro_id"],))
 
+            await registrar_cambio_estado(cursor, capturados, "cancelado")
             await conn.commit()
+            await ajustar_contadores(
+                usuario_id, _delta_vigentes(prestamo["estado"], "cancelado"), {prestamo["libro_id"]: +1}
+            )
 
             # 🔹 Enviar correo de cancelación
             try:
@@ -208,26 +285,26 @@ async def cancelar_prestamo_fisico(prestamo_id: int, usuario_id: int):
                 """, (prestamo_id,))
                 await conn.commit()
             except Exception as e:
-                print(f"⚠️ Error correo cancelación:", e)
+                logger.warning(f"⚠️ Error correo cancelación: {e}")
 
             return {"status": "success", "message": "Préstamo cancelado exitosamente"}
 
         except Exception as e:
             await conn.rollback()
-            print(f"❌ Error cancelar préstamo:", e)
+            logger.error(f"❌ Error cancelar préstamo: {e}")
             return {"status": "error", "message": str(e)}
 
 
-async def actualizar_estado_prestamo(prestamo_id: int, nuevo_estado: str):
+async def actualizar_estado_prestamo(prestamo_id: int, nuevo_estado: str, uow: UnidadDeTrabajo | None = None):
     estados_validos = ["pendiente", "activo", "devuelto", "atrasado", "cancelado"]
 
     if nuevo_estado not in estados_validos:
         return {"status": "error", "message": f"Estado inválido. Estados permitidos: {estados_validos}"}
 
-    async with get_cursor() as (conn, cursor):
+    async with get_cursor(uow=uow) as (conn, cursor):
         try:
             await cursor.execute("""
-                SELECT p.id, p.libro_id, p.estado, p.fecha_devolucion, u.correo, u.nombre, u.apellido, p.titulo
+                SELECT p.id, p.usuario_id, p.libro_id, p.estado, p.fecha_devolucion, u.correo, u.nombre, u.apellido, p.titulo
                 FROM prestamos_fisicos p
                 JOIN usuarios u ON p.usuario_id = u.id
                 WHERE p.id = %s
@@ -239,6 +316,9 @@ async def actualizar_estado_prestamo(prestamo_id: int, nuevo_estado: str):
             if prestamo["estado"] == "devuelto":
                 return {"status": "error", "message": "El préstamo ya fue devuelto"}
 
+            # 📅 Estado vigente (bloqueado) para mover el rollup mensual
+            capturados = await capturar_estados(cursor, "id = %s", (prestamo_id,))
+
             # 🔹 Si se marca como atrasado
             if nuevo_estado == "atrasado":
                 await cursor.execute("""
@@ -246,7 +326,9 @@ async def actualizar_estado_prestamo(prestamo_id: int, nuevo_estado: str):
                     SET estado = 'atrasado'
                     WHERE id = %s
                 """, (prestamo_id,))
+                await registrar_cambio_estado(cursor, capturados, "atrasado")
                 await conn.commit()
+                await ajustar_contadores(prestamo["usuario_id"], _delta_vigentes(prestamo["estado"], "atrasado"))
 
                 try:
                     await send_prestamo_atrasado(
@@ -262,7 +344,7 @@ async def actualizar_estado_prestamo(prestamo_id: int, nuevo_estado: str):
                     """, (prestamo_id,))
                     await conn.commit()
                 except Exception as e:
-                    print(f"⚠️ Error correo atrasado:", e)
+                    logger.warning(f"⚠️ Error correo atrasado: {e}")
 
                 return {"status": "success", "message": "Préstamo marcado como atrasado ✅"}
 
@@ -286,17 +368,23 @@ async def actualizar_estado_prestamo(prestamo_id: int, nuevo_estado: str):
                     WHERE id = %s
                 """, (nuevo_estado, prestamo_id))
 
+            await registrar_cambio_estado(cursor, capturados, nuevo_estado)
             await conn.commit()
+            await ajustar_contadores(
+                prestamo["usuario_id"],
+                _delta_vigentes(prestamo["estado"], nuevo_estado),
+                {prestamo["libro_id"]: +1} if nuevo_estado == "devuelto" else None,
+            )
             return {"status": "success", "message": f"Estado actualizado a '{nuevo_estado}' ✅"}
 
         except Exception as e:
             await conn.rollback()
-            print("❌ Error actualizar estado:", e)
+            logger.error(f"❌ Error actualizar estado: {e}")
             return {"status": "error", "message": str(e)}
 
 async def cancelar_prestamos_por_desactivacion_cuenta(usuario_id: int):
     """
-    Cancela todos los préstamos activos/pendientes cuando un usuario desactiva su cuenta
+    Cancela todos los préstamos activos/pendientes/atrasados cuando un usuario desactiva su cuenta
     NO envía correo, solo libera los libros
     """
     from datetime import datetime
@@ -311,13 +399,13 @@ async def cancelar_prestamos_por_desactivacion_cuenta(usuario_id: int):
             SELECT libro_id, id as prestamo_id
             FROM prestamos_fisicos
             WHERE usuario_id = %s
-            AND estado IN ('pendiente', 'activo')
+            AND estado IN ('pendiente', 'activo', 'atrasado')
         """, (usuario_id,))
         
         libros_a_liberar = await cursor.fetchall()
         
         if not libros_a_liberar:
-            print(f"ℹ️ Usuario {usuario_id} no tiene préstamos activos")
+            logger.debug(f"ℹ️ Usuario {usuario_id} no tiene préstamos activos")
             return {
                 "status": "success", 
                 "message": "No había préstamos activos",
@@ -325,19 +413,22 @@ async def cancelar_prestamos_por_desactivacion_cuenta(usuario_id: int):
                 "libros_liberados": 0
             }
         
-        print(f"📚 Usuario {usuario_id} tiene {len(libros_a_liberar)} préstamos a cancelar")
+        logger.debug(f"📚 Usuario {usuario_id} tiene {len(libros_a_liberar)} préstamos a cancelar")
         
         # 2️⃣ Cancelar préstamos (USAR fecha_devolucion_real en lugar de fecha_actualizacion)
+        capturados = await capturar_estados(
+            cursor, "usuario_id = %s AND estado IN ('pendiente', 'activo', 'atrasado')", (usuario_id,)
+        )
         await cursor.execute("""
             UPDATE prestamos_fisicos
             SET estado = 'cancelado',
                 fecha_devolucion_real = %s
             WHERE usuario_id = %s
-            AND estado IN ('pendiente', 'activo')
+            AND estado IN ('pendiente', 'activo', 'atrasado')
         """, (ahora.date(), usuario_id))
         
         prestamos_cancelados = cursor.rowcount
-        print(f"✅ {prestamos_cancelados} préstamos marcados como cancelados")
+        logger.info(f"✅ {prestamos_cancelados} préstamos marcados como cancelados")
         
         # 3️⃣ Liberar libros (incrementar cantidad disponible)
         for libro in libros_a_liberar:
@@ -346,11 +437,17 @@ async def cancelar_prestamos_por_desactivacion_cuenta(usuario_id: int):
                 SET cantidad_disponible = cantidad_disponible + 1
                 WHERE id = %s
             """, (libro['libro_id'],))
-            print(f" Libro {libro['libro_id']} liberado (préstamo {libro['prestamo_id']})")
+            logger.debug(f" Libro {libro['libro_id']} liberado (préstamo {libro['prestamo_id']})")
         
+        await registrar_cambio_estado(cursor, capturados, "cancelado")
         await conn.commit()
         
-        print(f"🎉 Proceso completado: {prestamos_cancelados} préstamos cancelados, {len(libros_a_liberar)} libros liberados")
+        liberados_por_libro: dict[int, int] = {}
+        for libro in libros_a_liberar:
+            liberados_por_libro[libro['libro_id']] = liberados_por_libro.get(libro['libro_id'], 0) + 1
+        await ajustar_contadores(usuario_id, -prestamos_cancelados, liberados_por_libro)
+        
+        logger.info(f"🎉 Proceso completado: {prestamos_cancelados} préstamos cancelados, {len(libros_a_liberar)} libros liberados")
         
         return {
             "status": "success",
@@ -1,14 +1,18 @@
 from datetime import datetime
 from fastapi import HTTPException
-from app.config.database import get_cursor
+from app.config.database import get_cursor, UnidadDeTrabajo
+from app.utils.rankings import VENTANAS, registrar_evento, top_libros
 from app.models.wishlist_model import (
     split_autor_name,
     get_or_create_autor,
     ensure_book_is_persisted,
 )
+import logging
 
+logger = logging.getLogger(__name__)
 
-async def registrar_prestamo(usuario_id: int, libro_data: dict):
+
+async def registrar_prestamo(usuario_id: int, libro_data: dict, uow: UnidadDeTrabajo | None = None):
     """
     Registra un préstamo digital con un solo clic.
     Usa las funciones de wishlist_model para no duplicar código.
@@ -17,15 +21,15 @@ async def registrar_prestamo(usuario_id: int, libro_data: dict):
         raise HTTPException(status_code=400, detail="Datos incompletos")
 
     # 1️⃣ Asegurar que el libro y autor existan
-    libro_id = await ensure_book_is_persisted(libro_data)
+    libro_id = await ensure_book_is_persisted(libro_data, uow=uow)
     if not libro_id:
         raise HTTPException(status_code=500, detail="Error al crear o encontrar el libro")
 
     nombre, apellido = split_autor_name(libro_data["autor"])
-    autor_id = await get_or_create_autor(nombre, apellido)
+    autor_id = await get_or_create_autor(nombre, apellido, uow=uow)
 
     # 2️⃣ Registrar el préstamo
-    async with get_cursor() as (conn, cursor):
+    async with get_cursor(uow=uow) as (conn, cursor):
         try:
             await cursor.execute(
                 """
@@ -35,67 +39,164 @@ async def registrar_prestamo(usuario_id: int, libro_data: dict):
                 (usuario_id, libro_id, libro_data["titulo"], autor_id, datetime.now())
             )
             await conn.commit()
+            await registrar_evento("digitales", libro_id)
             return {"status": "success", "message": "Préstamo registrado con éxito"}
 
         except Exception as e:
             await conn.rollback()
-            print(f"❌ Error al registrar préstamo: {e}")
+            logger.error(f"❌ Error al registrar préstamo: {e}")
             raise HTTPException(status_code=500, detail="Error interno al registrar préstamo")
 
 
-async def obtener_todos_prestamos_digitales():
-    """Obtiene todos los préstamos digitales con info del usuario"""
-    async with get_cursor() as (conn, cursor):
+_SELECT_PRESTAMOS_DIGITALES = """
+    SELECT 
+        p.id,
+        p.usuario_id,
+        p.libro_id,
+        p.titulo,
+        p.fecha_prestamo,
+        u.nombre as usuario_nombre,
+        u.apellido as usuario_apellido,
+        u.correo as usuario_correo,
+        a.nombre as autor_nombre,
+        a.apellido as autor_apellido,
+        l.openlibrary_key
+    FROM prestamos p
+    JOIN usuarios u ON p.usuario_id = u.id
+    LEFT JOIN autores a ON p.autor_id = a.id
+    LEFT JOIN libros l ON p.libro_id = l.id
+"""
+
+
+def _filtros_prestamos_digitales(
+    usuario_id: int | None,
+    libro_id: int | None,
+    desde: str | None,
+    hasta: str | None,
+    antes_de: int | None = None,
+) -> tuple[str, list]:
+    """WHERE común al listado paginado y al streaming"""
+    condiciones, params = [], []
+    if usuario_id is not None:
+        condiciones.append("p.usuario_id = %s")
+        params.append(usuario_id)
+    if libro_id is not None:
+        condiciones.append("p.libro_id = %s")
+        params.append(libro_id)
+    if desde is not None:
+        condiciones.append("p.fecha_prestamo >= %s")
+        params.append(desde)
+    if hasta is not None:
+        condiciones.append("p.fecha_prestamo < %s + INTERVAL 1 DAY")
+        params.append(hasta)
+    if antes_de is not None:
+        condiciones.append("p.id < %s")
+        params.append(antes_de)
+    return (f"WHERE {' AND '.join(condiciones)}" if condiciones else ""), params
+
+
+async def obtener_todos_prestamos_digitales(
+    usuario_id: int | None = None,
+    libro_id: int | None = None,
+    desde: str | None = None,
+    hasta: str | None = None,
+    cursor_id: int | None = None,
+    limit: int = 100,
+):
+    """
+    Préstamos digitales con info del usuario, paginados por keyset sobre p.id
+    (más recientes primero). `cursor_id` es el `siguiente` de la página anterior:
+    cada página cuesta lo mismo sin importar qué tan atrás esté, a diferencia de OFFSET.
+    """
+    where, params = _filtros_prestamos_digitales(usuario_id, libro_id, desde, hasta, cursor_id)
+    async with get_cursor("reporting", intent="read") as (conn, cursor):
         try:
-            await cursor.execute("""
-                SELECT 
-                    p.id,
-                    p.usuario_id,
-                    p.libro_id,
-                    p.titulo,
-                    p.fecha_prestamo,
-                    u.nombre as usuario_nombre,
-                    u.apellido as usuario_apellido,
-                    u.correo as usuario_correo,
-                    a.nombre as autor_nombre,
-                    a.apellido as autor_apellido,
-                    l.openlibrary_key
-                FROM prestamos p
-                JOIN usuarios u ON p.usuario_id = u.id
-                LEFT JOIN autores a ON p.autor_id = a.id
-                LEFT JOIN libros l ON p.libro_id = l.id
-                ORDER BY p.fecha_prestamo DESC
-            """)
+            await cursor.execute(f"""
+                {_SELECT_PRESTAMOS_DIGITALES}
+                {where}
+                ORDER BY p.id DESC
+                LIMIT %s
+            """, [*params, limit + 1])
 
-            prestamos = await cursor.fetchall()
-            return {"status": "success", "prestamos": prestamos}
+            prestamos = list(await cursor.fetchall())
+            siguiente = None
+            if len(prestamos) > limit:
+                prestamos = prestamos[:limit]
+                siguiente = prestamos[-1]["id"]
+            return {"status": "success", "prestamos": prestamos, "siguiente": siguiente}
 
         except Exception as e:
-            print(f"❌ Error obtener_todos_prestamos_digitales: {e}")
+            logger.error(f"❌ Error obtener_todos_prestamos_digitales: {e}")
             return {"status": "error", "message": str(e)}
 
 
-async def obtener_libros_digitales_populares(limit: int = 10):
-    """Obtiene los libros digitales más prestados"""
-    async with get_cursor() as (conn, cursor):
-        try:
-            await cursor.execute("""
+async def recorrer_prestamos_digitales(
+    usuario_id: int | None = None,
+    libro_id: int | None = None,
+    desde: str | None = None,
+    hasta: str | None = None,
+    lote: int = 1000,
+):
+    """
+    Generador con todos los préstamos que cumplen los filtros, leídos con un
+    cursor de servidor en lotes de `lote` filas: la memoria no depende del
+    tamaño del historial. Retiene una conexión del pool de reportes mientras dura.
+    """
+    where, params = _filtros_prestamos_digitales(usuario_id, libro_id, desde, hasta)
+    async with get_cursor("reporting", intent="read", streaming=True) as (conn, cursor):
+        await cursor.execute(f"""
+            {_SELECT_PRESTAMOS_DIGITALES}
+            {where}
+            ORDER BY p.id DESC
+        """, params)
+        while True:
+            filas = await cursor.fetchmany(lote)
+            if not filas:
+                break
+            for fila in filas:
+                yield fila
+
+
+async def obtener_libros_digitales_populares(limit: int = 10, ventana: str = "total"):
+    """Obtiene los libros digitales más prestados (ranking de Redis; SQL si no está)"""
+    if ventana not in VENTANAS:
+        return {"status": "error", "message": f"Ventana inválida. Valores permitidos: {list(VENTANAS)}"}
+
+    try:
+        top = await top_libros("digitales", ventana, limit)
+        async with get_cursor("reporting", intent="read") as (conn, cursor):
+            if top is None:
+                dias = VENTANAS[ventana]
+                await cursor.execute(f"""
+                    SELECT libro_id, COUNT(*) as total
+                    FROM prestamos
+                    {f"WHERE fecha_prestamo >= CURDATE() - INTERVAL {dias - 1} DAY" if dias else ""}
+                    GROUP BY libro_id
+                    ORDER BY total DESC
+                    LIMIT %s
+                """, (limit,))
+                top = [(f["libro_id"], f["total"]) for f in await cursor.fetchall()]
+            if not top:
+                return {"status": "success", "libros": []}
+
+            await cursor.execute(f"""
                 SELECT 
-                    p.titulo,
+                    l.id,
+                    l.titulo,
                     CONCAT(a.nombre, ' ', a.apellido) as autor,
-                    l.openlibrary_key,
-                    COUNT(*) as total_prestamos
-                FROM prestamos p
-                LEFT JOIN autores a ON p.autor_id = a.id
-                LEFT JOIN libros l ON p.libro_id = l.id
-                GROUP BY p.titulo, a.nombre, a.apellido, l.openlibrary_key
-                ORDER BY total_prestamos DESC
-                LIMIT %s
-            """, (limit,))
+                    l.openlibrary_key
+                FROM libros l
+                LEFT JOIN autores a ON l.autor_id = a.id
+                WHERE l.id IN ({", ".join(["%s"] * len(top))})
+            """, [libro_id for libro_id, _ in top])
+            detalles = {l.pop("id"): l for l in await cursor.fetchall()}
 
-            libros = await cursor.fetchall()
-            return {"status": "success", "libros": libros}
+        libros = [
+            {**detalles[libro_id], "total_prestamos": total}
+            for libro_id, total in top if libro_id in detalles
+        ]
+        return {"status": "success", "libros": libros}
 
-        except Exception as e:
-            print(f"❌ Error obtener_libros_digitales_populares: {e}")
-            return {"status": "error", "message": str(e)}
\ No newline at end of file
+    except Exception as e:
+        logger.error(f"❌ Error obtener_libros_digitales_populares: {e}")
+        return {"status": "error", "message": str(e)}
\ No newline at end of file
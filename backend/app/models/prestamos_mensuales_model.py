@@ -0,0 +1,132 @@
+from app.config.database import get_cursor
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 📅 Rollup prestamos_mensuales: (mes, estado) -> total de préstamos creados ese mes
+# que hoy están en ese estado. `mes` es el primer día del mes de created_at.
+# Se mantiene dentro de la misma transacción que cambia prestamos_fisicos:
+#   alta:            registrar_alta(cursor, prestamo_id)
+#   cambio de estado: capturados = await capturar_estados(cursor, filtro, params)
+#                    ... UPDATE ...
+#                    await registrar_cambio_estado(cursor, capturados, estado_nuevo)
+# Conviene llamarlo justo antes del commit: las filas del mes en curso son calientes
+# y así el lock se retiene el menor tiempo posible.
+
+_MES_SQL = "DATE_FORMAT(created_at, '%%Y-%%m-01')"
+
+
+async def registrar_alta(cursor, prestamo_id: int):
+    """Suma el préstamo recién insertado a su (mes, estado)"""
+    await cursor.execute(f"""
+        INSERT INTO prestamos_mensuales (mes, estado, total)
+        SELECT {_MES_SQL}, estado, 1
+        FROM prestamos_fisicos
+        WHERE id = %s
+        ON DUPLICATE KEY UPDATE total = total + VALUES(total)
+    """, (prestamo_id,))
+
+
+async def capturar_estados(cursor, filtro: str, params) -> list[dict]:
+    """
+    Conteo por (mes, estado) de las filas que va a tocar un UPDATE de estado.
+    Llamar ANTES del UPDATE y con el mismo filtro: FOR UPDATE lee la versión
+    vigente de las filas y las bloquea, así el UPDATE toca exactamente lo contado.
+    """
+    await cursor.execute(f"""
+        SELECT {_MES_SQL} as mes, estado, COUNT(*) as total
+        FROM prestamos_fisicos
+        WHERE {filtro}
+        GROUP BY mes, estado
+        FOR UPDATE
+    """, params)
+    return await cursor.fetchall()
+
+
+async def registrar_cambio_estado(cursor, capturados: list[dict], estado_nuevo: str):
+    """Mueve los conteos capturados de su estado anterior a `estado_nuevo`"""
+    deltas: dict[tuple, int] = {}
+    for fila in capturados:
+        if fila["estado"] == estado_nuevo:
+            continue
+        anterior = (str(fila["mes"]), fila["estado"])
+        nuevo = (str(fila["mes"]), estado_nuevo)
+        deltas[anterior] = deltas.get(anterior, 0) - fila["total"]
+        deltas[nuevo] = deltas.get(nuevo, 0) + fila["total"]
+
+    deltas = {clave: delta for clave, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    # Siempre en el mismo orden (mes, estado): dos transacciones que tocan las
+    # mismas filas las bloquean en igual secuencia y no se cruzan
+    filas = sorted(deltas.items())
+    await cursor.execute(
+        f"""
+        INSERT INTO prestamos_mensuales (mes, estado, total)
+        VALUES {", ".join(["(%s, %s, %s)"] * len(filas))}
+        ON DUPLICATE KEY UPDATE total = total + VALUES(total)
+        """,
+        [valor for (mes, estado), delta in filas for valor in (mes, estado, delta)],
+    )
+
+
+async def obtener_rollup_mensual(desde: str, hasta: str | None = None) -> list[dict]:
+    """
+    Totales por mes entre `desde` y `hasta` (fechas 'YYYY-MM-DD', se toma el mes).
+    Lee solo filas del rollup: O(meses), sin tocar prestamos_fisicos.
+    """
+    async with get_cursor("reporting", intent="read") as (conn, cursor):
+        await cursor.execute("""
+            SELECT
+                DATE_FORMAT(mes, '%%Y-%%m') as mes,
+                SUM(total) as total,
+                SUM(CASE WHEN estado = 'devuelto' THEN total ELSE 0 END) as devueltos,
+                SUM(CASE WHEN estado = 'activo' THEN total ELSE 0 END) as activos,
+                SUM(CASE WHEN estado = 'atrasado' THEN total ELSE 0 END) as atrasados,
+                SUM(CASE WHEN estado = 'cancelado' THEN total ELSE 0 END) as cancelados
+            FROM prestamos_mensuales
+            WHERE mes >= DATE_FORMAT(%s, '%%Y-%%m-01')
+            AND mes <= DATE_FORMAT(COALESCE(%s, CURDATE()), '%%Y-%%m-01')
+            GROUP BY prestamos_mensuales.mes
+            HAVING SUM(total) > 0
+            ORDER BY mes DESC
+        """, (desde, hasta))
+        return await cursor.fetchall()
+
+
+async def reconstruir_prestamos_mensuales() -> dict:
+    """
+    Backfill: recalcula el rollup completo desde prestamos_fisicos en una sola
+    transacción. El INSERT ... SELECT bloquea en modo compartido las filas que
+    lee, así que los cambios de estado concurrentes esperan y no se pierde ninguno.
+    Retorna las diferencias encontradas contra el rollup anterior.
+    """
+    async with get_cursor() as (conn, cursor):
+        try:
+            await conn.begin()
+            await cursor.execute("SELECT mes, estado, total FROM prestamos_mensuales FOR UPDATE")
+            anterior = {(str(f["mes"]), f["estado"]): f["total"] for f in await cursor.fetchall()}
+
+            await cursor.execute("DELETE FROM prestamos_mensuales")
+            await cursor.execute(f"""
+                INSERT INTO prestamos_mensuales (mes, estado, total)
+                SELECT {_MES_SQL}, estado, COUNT(*)
+                FROM prestamos_fisicos
+                GROUP BY 1, 2
+            """, ())
+            await cursor.execute("SELECT mes, estado, total FROM prestamos_mensuales")
+            nuevo = {(str(f["mes"]), f["estado"]): f["total"] for f in await cursor.fetchall()}
+            await conn.commit()
+        except Exception:
+            await conn.rollback()
+            raise
+
+    diferencias = {
+        f"{mes} {estado}": {"antes": anterior.get((mes, estado), 0), "ahora": nuevo.get((mes, estado), 0)}
+        for mes, estado in sorted(set(anterior) | set(nuevo))
+        if anterior.get((mes, estado), 0) != nuevo.get((mes, estado), 0)
+    }
+    if diferencias:
+        logger.warning(f"⚠️ Rollup prestamos_mensuales corregido en {len(diferencias)} fila(s)")
+    return {"filas": len(nuevo), "diferencias": diferencias}
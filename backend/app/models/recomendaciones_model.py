@@ -0,0 +1,105 @@
+import json
+import logging
+import os
+
+from app.config.database import get_cursor
+from app.models.estadisticas_model import obtener_libros_populares
+from app.utils.cache import cacheado
+
+logger = logging.getLogger(__name__)
+
+# El job nocturno invalida el tag "recomendaciones"; el TTL solo acota datos de libros
+RECOMENDACIONES_CACHE_TTL = int(os.getenv("RECOMENDACIONES_CACHE_TTL", 6 * 3600))
+# Libros recientes del usuario que se usan como semilla de sus recomendaciones
+RECOMENDACIONES_SEMILLAS = int(os.getenv("RECOMENDACIONES_SEMILLAS", 10))
+
+
+# Las consultas van al primario: estas funciones están en caché y se invalidan al
+# escribir (libros, préstamos, wishlist); una réplica atrasada llenaría la caché
+# con lo anterior a la escritura.
+async def _detalles_libros(puntuados: list[tuple[int, float]], limit: int) -> list[dict]:
+    """Datos de los libros activos en el orden dado, con su score, hasta `limit`"""
+    if not puntuados:
+        return []
+    async with get_cursor() as (conn, cursor):
+        await cursor.execute(f"""
+            SELECT
+                l.id,
+                l.titulo,
+                l.openlibrary_key,
+                l.cover_id,
+                l.imagen_local,
+                l.cantidad_disponible,
+                CONCAT(a.nombre, ' ', a.apellido) AS autor
+            FROM libros l
+            LEFT JOIN autores a ON l.autor_id = a.id
+            WHERE l.id IN ({", ".join(["%s"] * len(puntuados))})
+            AND l.estado = 'Activo'
+        """, [libro_id for libro_id, _ in puntuados])
+        detalles = {l["id"]: l for l in await cursor.fetchall()}
+    libros = [{**detalles[libro_id], "score": score} for libro_id, score in puntuados if libro_id in detalles]
+    return libros[:limit]
+
+
+@cacheado("recomendaciones_libro", ttl=RECOMENDACIONES_CACHE_TTL, tags=["recomendaciones", "libros"])
+async def obtener_recomendaciones_libro(libro_id: int, limit: int = 10) -> list[dict]:
+    """Libros similares a `libro_id` (una fila por PK + detalles; en caché)"""
+    async with get_cursor() as (conn, cursor):
+        await cursor.execute("SELECT vecinos FROM recomendaciones_libros WHERE libro_id = %s", (libro_id,))
+        fila = await cursor.fetchone()
+    if not fila:
+        return []
+    return await _detalles_libros([tuple(v) for v in json.loads(fila["vecinos"])], limit)
+
+
+# Tags del usuario: pedir un préstamo (físico o digital) o tocar la wishlist lo
+# invalida, para no seguir recomendando lo que acaba de tomar
+@cacheado("recomendaciones_usuario", ttl=600, tags=lambda usuario_id, **_: [
+    "recomendaciones", "libros",
+    f"wishlist:{usuario_id}", f"prestamos_usuario:{usuario_id}", f"user_loans:{usuario_id}",
+])
+async def obtener_recomendaciones_usuario(usuario_id: int, limit: int = 10) -> list[dict]:
+    """
+    Suma los vecinos de los libros recientes del usuario (préstamos y wishlist),
+    sin repetir los que ya tiene. Sin historial: los más prestados de 30 días.
+    """
+    async with get_cursor() as (conn, cursor):
+        await cursor.execute("""
+            SELECT libro_id, MAX(fecha) AS fecha FROM (
+                (SELECT libro_id, created_at AS fecha FROM prestamos_fisicos
+                 WHERE usuario_id = %s ORDER BY created_at DESC LIMIT %s)
+                UNION ALL
+                (SELECT libro_id, fecha_prestamo FROM prestamos
+                 WHERE usuario_id = %s ORDER BY fecha_prestamo DESC LIMIT %s)
+                UNION ALL
+                (SELECT libro_id, fecha_agregado FROM lista_deseos
+                 WHERE usuario_id = %s ORDER BY fecha_agregado DESC LIMIT %s)
+            ) recientes
+            GROUP BY libro_id
+            ORDER BY fecha DESC
+            LIMIT %s
+        """, (usuario_id, RECOMENDACIONES_SEMILLAS) * 3 + (RECOMENDACIONES_SEMILLAS,))
+        semillas = [f["libro_id"] for f in await cursor.fetchall()]
+
+        vecinos = []
+        if semillas:
+            await cursor.execute(f"""
+                SELECT vecinos FROM recomendaciones_libros
+                WHERE libro_id IN ({", ".join(["%s"] * len(semillas))})
+            """, semillas)
+            vecinos = [json.loads(f["vecinos"]) for f in await cursor.fetchall()]
+
+    if not vecinos:
+        populares = await obtener_libros_populares("prestamos", "30d", limit)
+        top = [(l["id"], 0.0) for l in populares.get("libros", [])]
+        return await _detalles_libros(top, limit)
+
+    vistos = set(semillas)
+    puntajes: dict[int, float] = {}
+    for lista in vecinos:
+        for libro_id, score in lista:
+            if libro_id not in vistos:
+                puntajes[libro_id] = puntajes.get(libro_id, 0.0) + score
+    # Se piden de más: algunos pueden estar inactivos
+    top = sorted(puntajes.items(), key=lambda par: par[1], reverse=True)[:limit * 2]
+    return [{**l, "score": round(l["score"], 4)} for l in await _detalles_libros(top, limit)]
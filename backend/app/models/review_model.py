@@ -1,8 +1,12 @@
-from app.config.database import get_cursor
+from app.config.database import get_cursor, UnidadDeTrabajo
+from app.utils.cache import cacheado, invalidar_tags
+import logging
+
+logger = logging.getLogger(__name__)
 
 # 🟢 Insertar o actualizar calificación
-async def insert_rating(usuario_id: int, libro_id: int, puntuacion: float) -> bool:
-    async with get_cursor() as (conn, cursor):
+async def insert_rating(usuario_id: int, libro_id: int, puntuacion: float, uow: UnidadDeTrabajo | None = None) -> bool:
+    async with get_cursor(uow=uow) as (conn, cursor):
         try:
             await cursor.execute("""
                 INSERT INTO calificaciones (usuario_id, libro_id, puntuacion)
@@ -12,14 +16,14 @@ async def insert_rating(usuario_id: int, libro_id: int, puntuacion: float) -> bo
             await conn.commit()
             return True
         except Exception as e:
-            print(f"❌ Error al insertar/actualizar calificación: {e}")
+            logger.error(f"❌ Error al insertar/actualizar calificación: {e}")
             await conn.rollback()
             return False
 
 
 # 🟢 Obtener promedio y cantidad de votos
-async def get_average_rating(libro_id: int) -> dict:
-    async with get_cursor() as (conn, cursor):
+async def get_average_rating(libro_id: int, uow: UnidadDeTrabajo | None = None) -> dict:
+    async with get_cursor(uow=uow) as (conn, cursor):
         await cursor.execute("""
             SELECT 
                 AVG(puntuacion) AS promedio,
@@ -38,8 +42,8 @@ async def get_average_rating(libro_id: int) -> dict:
 
 
 # 🟢 Obtener calificación de un usuario
-async def get_user_rating(usuario_id: int, libro_id: int) -> int | None:
-    async with get_cursor() as (conn, cursor):
+async def get_user_rating(usuario_id: int, libro_id: int, uow: UnidadDeTrabajo | None = None) -> int | None:
+    async with get_cursor(uow=uow) as (conn, cursor):
         await cursor.execute("""
             SELECT puntuacion FROM calificaciones
             WHERE usuario_id = %s AND libro_id = %s
@@ -49,48 +53,65 @@ async def get_user_rating(usuario_id: int, libro_id: int) -> int | None:
 
 
 # 🟢 Insertar comentario
-async def insert_comment(usuario_id: int, libro_id: int, texto: str) -> bool:
-    async with get_cursor() as (conn, cursor):
+async def insert_comment(usuario_id: int, libro_id: int, texto: str, uow: UnidadDeTrabajo | None = None) -> bool:
+    async with get_cursor(uow=uow) as (conn, cursor):
         try:
             await cursor.execute("""
                 INSERT INTO comentarios (usuario_id, libro_id, texto, fecha_comentario)
                 VALUES (%s, %s, %s, NOW())
             """, (usuario_id, libro_id, texto))
             await conn.commit()
+            invalidar_tags(f"comentarios:{libro_id}")
             return True
         except Exception as e:
-            print(f"❌ Error DB al insertar comentario: {e}")
+            logger.error(f"❌ Error DB al insertar comentario: {e}")
             await conn.rollback()
             return False
 
 
-# 🟢 Obtener todos los comentarios de un libro
-async def get_comments_by_book(libro_id: int) -> list[dict]:
-    async with get_cursor() as (conn, cursor):
-        try:
-            await cursor.execute("""
-                SELECT 
-                    c.id,
-                    c.texto,
-                    c.fecha_comentario,
-                    u.nombre AS nombre_usuario,
-                    c.usuario_id
-                FROM comentarios c
-                INNER JOIN usuarios u ON c.usuario_id = u.id
-                WHERE c.libro_id = %s
-                ORDER BY c.fecha_comentario DESC
-            """, (libro_id,))
-            comments = await cursor.fetchall()
-            return comments or []
-        except Exception as e:
-            print(f"❌ Error al obtener comentarios: {e}")
-            return []
+# 🟢 Obtener todos los comentarios de un libro (caché por libro, se invalida al escribir)
+# Siempre del primario: un miss justo después de invalidar que lea una réplica
+# atrasada dejaría en caché lo anterior a la escritura durante todo el TTL.
+@cacheado("comentarios", ttl=600, tags=lambda libro_id, **_: [f"comentarios:{libro_id}"])
+async def _comentarios_libro(libro_id: int, uow: UnidadDeTrabajo | None = None) -> list[dict]:
+    async with get_cursor(uow=uow) as (conn, cursor):
+        await cursor.execute("""
+            SELECT 
+                c.id,
+                c.texto,
+                c.fecha_comentario,
+                u.nombre AS nombre_usuario,
+                c.usuario_id
+            FROM comentarios c
+            INNER JOIN usuarios u ON c.usuario_id = u.id
+            WHERE c.libro_id = %s
+            ORDER BY c.fecha_comentario DESC
+        """, (libro_id,))
+        return await cursor.fetchall() or []
+
+
+async def get_comments_by_book(libro_id: int, uow: UnidadDeTrabajo | None = None) -> list[dict]:
+    try:
+        # La uow de get_db_lectura es de una réplica: no se usa para llenar la caché
+        primario = uow if uow is not None and uow.intent != "read" else None
+        return await _comentarios_libro(libro_id, uow=primario)
+    except Exception as e:
+        # Los errores no se cachean: el próximo request vuelve a consultar
+        logger.error(f"❌ Error al obtener comentarios: {e}")
+        return []
+
+async def _libro_del_comentario(cursor, comment_id: int) -> int | None:
+    """Libro del comentario, para invalidar su caché después de editar/eliminar"""
+    await cursor.execute("SELECT libro_id FROM comentarios WHERE id = %s", (comment_id,))
+    fila = await cursor.fetchone()
+    return fila["libro_id"] if fila else None
 
 # 🟢 NUEVO: Actualizar comentario
-async def update_comment(comment_id: int, usuario_id: int, new_text: str) -> bool:
+async def update_comment(comment_id: int, usuario_id: int, new_text: str, uow: UnidadDeTrabajo | None = None) -> bool:
     """Actualiza el texto de un comentario, solo si el usuario_id coincide."""
-    async with get_cursor() as (conn, cursor):
+    async with get_cursor(uow=uow) as (conn, cursor):
         try:
+            libro_id = await _libro_del_comentario(cursor, comment_id)
             # ❗ Solo actualiza si el ID del comentario y el ID del usuario coinciden
             await cursor.execute("""
                 UPDATE comentarios 
@@ -101,22 +122,24 @@ async def update_comment(comment_id: int, usuario_id: int, new_text: str) -> boo
             # rowcount > 0 indica que se actualizó al menos una fila
             if cursor.rowcount > 0:
                 await conn.commit()
+                invalidar_tags(f"comentarios:{libro_id}")
                 return True
             
             # Si rowcount es 0, el comentario no existe o no pertenece a ese usuario
             return False
             
         except Exception as e:
-            print(f"❌ Error DB al actualizar comentario: {e}")
+            logger.error(f"❌ Error DB al actualizar comentario: {e}")
             await conn.rollback()
             return False
 
 
 # 🟢 NUEVO: Eliminar comentario
-async def delete_comment(comment_id: int, usuario_id: int) -> bool:
+async def delete_comment(comment_id: int, usuario_id: int, uow: UnidadDeTrabajo | None = None) -> bool:
     """Elimina un comentario, solo si el usuario_id coincide."""
-    async with get_cursor() as (conn, cursor):
+    async with get_cursor(uow=uow) as (conn, cursor):
         try:
+            libro_id = await _libro_del_comentario(cursor, comment_id)
             # ❗ Solo elimina si el ID del comentario y el ID del usuario coinciden
             await cursor.execute("""
                 DELETE FROM comentarios 
@@ -126,10 +149,11 @@ async def delete_comment(comment_id: int, usuario_id: int) -> bool:
             # rowcount > 0 indica que se eliminó al menos una fila
             if cursor.rowcount > 0:
                 await conn.commit()
+                invalidar_tags(f"comentarios:{libro_id}")
                 return True
             return False
             
         except Exception as e:
-            print(f"❌ Error DB al eliminar comentario: {e}")
+            logger.error(f"❌ Error DB al eliminar comentario: {e}")
             await conn.rollback()
             return False
\ No newline at end of file
@@ -1,6 +1,9 @@
 from datetime import datetime, timedelta
-from app.config.database import get_cursor
+from app.config.database import get_cursor, UnidadDeTrabajo
 from typing import Optional, Dict, Any
+import logging
+
+logger = logging.getLogger(__name__)
 
 # 🔹 Obtener usuario por correo
 async def get_user_by_email(email: str):
@@ -32,7 +35,7 @@ async def create_user(data: dict) -> int:
             # Si no se especifica estado, usar 'Activo' por defecto (retrocompatibilidad)
             estado = data.get("estado", "Activo")
             
-            print(f"💾 [CREATE_USER] Insertando usuario: {data.get('correo')}")
+            logger.debug(f"💾 [CREATE_USER] Insertando usuario: {data.get('correo')}")
             
             sql = """
                 INSERT INTO usuarios (nombre, apellido, tipo_identificacion, num_identificacion, correo, clave, rol, estado)
@@ -52,11 +55,11 @@ async def create_user(data: dict) -> int:
             await conn.commit()
             user_id = cursor.lastrowid
             
-            print(f"✅ [CREATE_USER] Usuario creado con ID: {user_id}")
+            logger.info(f"✅ [CREATE_USER] Usuario creado con ID: {user_id}")
             return user_id
             
         except Exception as e:
-            print(f"❌ [CREATE_USER] Error al crear usuario: {e}")
+            logger.error(f"❌ [CREATE_USER] Error al crear usuario: {e}")
             await conn.rollback()
             raise  # Re-lanzar la excepción para que el endpoint la maneje
 
@@ -107,8 +110,8 @@ async def reset_login_attempts(user_id: int):
 
 
 # 🔹 Obtener usuario por ID (✅ FUNCIÓN ÚNICA)
-async def get_user_by_id(user_id: int):
-    async with get_cursor() as (conn, cursor):
+async def get_user_by_id(user_id: int, uow: UnidadDeTrabajo | None = None):
+    async with get_cursor(uow=uow) as (conn, cursor):
         await cursor.execute(
             "SELECT * FROM usuarios WHERE id = %s",
             (user_id,)
@@ -125,7 +128,7 @@ async def update_password(user_id: int, hashed_password: str) -> bool:
             await conn.commit()
             return True
         except Exception as e:
-            print(f"Error update_password: {e}")
+            logger.error(f"Error update_password: {e}")
             await conn.rollback()
             return False
 
@@ -164,7 +167,7 @@ async def update_user_by_id(
             return cursor.rowcount > 0
         except Exception as e:
             await conn.rollback()
-            print("❌ Error update_user_by_id:", e)
+            logger.error(f"❌ Error update_user_by_id: {e}")
             return False
 
 
@@ -182,7 +185,7 @@ async def deactivate_user_by_id(user_id: int) -> bool:
             return cursor.rowcount > 0
         except Exception as e:
             await conn.rollback()
-            print("❌ Error deactivate_user_by_id:", e)
+            logger.error(f"❌ Error deactivate_user_by_id: {e}")
             return False
 
 
@@ -200,7 +203,7 @@ async def reactivate_user_by_id(user_id: int) -> bool:
             return cursor.rowcount > 0
         except Exception as e:
             await conn.rollback()
-            print("❌ Error reactivate_user_by_id:", e)
+            logger.error(f"❌ Error reactivate_user_by_id: {e}")
             return False
 
 
@@ -219,7 +222,7 @@ async def update_user_status(user_id: int, new_status: str) -> bool:
             return cursor.rowcount > 0
         except Exception as e:
             await conn.rollback()
-            print("❌ Error update_user_status:", e)
+            logger.error(f"❌ Error update_user_status: {e}")
             return False
 
 
@@ -235,7 +238,7 @@ async def delete_user(user_id: int) -> bool:
             return cursor.rowcount > 0
         except Exception as e:
             await conn.rollback()
-            print("❌ Error delete_user:", e)
+            logger.error(f"❌ Error delete_user: {e}")
             return False
 
 # Agregar estos métodos al final de tu archivo user_model.py
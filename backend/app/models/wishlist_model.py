@@ -1,6 +1,10 @@
 from fastapi import HTTPException
 from datetime import datetime
-from app.config.database import get_cursor
+from app.config.database import get_cursor, UnidadDeTrabajo
+from app.utils.rankings import registrar_evento
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 def normalize_ol_key(olKey: str) -> str:
@@ -12,18 +16,18 @@ def normalize_ol_key(olKey: str) -> str:
     return olKey.strip()
 
 
-async def libro_exists(openlibrary_key: str):
+async def libro_exists(openlibrary_key: str, uow: UnidadDeTrabajo | None = None):
     """Verifica si un libro existe en la tabla `libros`."""
     normalized_key = normalize_ol_key(openlibrary_key)
-    async with get_cursor() as (conn, cursor):
+    async with get_cursor(uow=uow) as (conn, cursor):
         await cursor.execute("SELECT id FROM libros WHERE openlibrary_key = %s", (normalized_key,))
         return await cursor.fetchone()
 
 
-async def create_libro(openlibrary_key: str, titulo: str, autor_id: int, cover_id: int | None):
+async def create_libro(openlibrary_key: str, titulo: str, autor_id: int, cover_id: int | None, uow: UnidadDeTrabajo | None = None):
     """Inserta un nuevo libro."""
     normalized_key = normalize_ol_key(openlibrary_key)
-    async with get_cursor() as (conn, cursor):
+    async with get_cursor(uow=uow) as (conn, cursor):
         try:
             await cursor.execute("""
                 INSERT INTO libros (openlibrary_key, titulo, autor_id, cover_id)
@@ -32,7 +36,7 @@ async def create_libro(openlibrary_key: str, titulo: str, autor_id: int, cover_i
             await conn.commit()
             return cursor.lastrowid
         except Exception as e:
-            print(f"❌ Error DB al crear libro: {e}")
+            logger.error(f"❌ Error DB al crear libro: {e}")
             await conn.rollback()
             return None
 
@@ -47,9 +51,9 @@ def split_autor_name(autor_completo: str):
     return autor_completo, ""
 
 
-async def get_or_create_autor(nombre: str, apellido: str):
+async def get_or_create_autor(nombre: str, apellido: str, uow: UnidadDeTrabajo | None = None):
     """Obtiene o crea un autor."""
-    async with get_cursor() as (conn, cursor):
+    async with get_cursor(uow=uow) as (conn, cursor):
         try:
             await cursor.execute("SELECT id FROM autores WHERE nombre=%s AND apellido=%s", (nombre, apellido))
             autor = await cursor.fetchone()
@@ -63,13 +67,13 @@ async def get_or_create_autor(nombre: str, apellido: str):
             await conn.commit()
             return cursor.lastrowid
         except Exception as e:
-            print(f"❌ Error DB al obtener/crear autor: {e}")
+            logger.error(f"❌ Error DB al obtener/crear autor: {e}")
             await conn.rollback()
             return None
 
-async def get_or_create_genero(nombre_genero: str):
+async def get_or_create_genero(nombre_genero: str, uow: UnidadDeTrabajo | None = None):
     """Obtiene o crea un género."""
-    async with get_cursor() as (conn, cursor):
+    async with get_cursor(uow=uow) as (conn, cursor):
         try:
             await cursor.execute("SELECT id FROM generos WHERE nombre=%s", (nombre_genero,))
             genero = await cursor.fetchone()
@@ -84,12 +88,12 @@ async def get_or_create_genero(nombre_genero: str):
             return cursor.lastrowid
         except Exception as e:
             await conn.rollback()
-            print(f"❌ Error DB al obtener/crear género: {e}")
+            logger.error(f"❌ Error DB al obtener/crear género: {e}")
             return None
 
-async def get_or_create_editorial(nombre_editorial: str):
+async def get_or_create_editorial(nombre_editorial: str, uow: UnidadDeTrabajo | None = None):
     """Obtiene o crea una editorial."""
-    async with get_cursor() as (conn, cursor):
+    async with get_cursor(uow=uow) as (conn, cursor):
         try:
             await cursor.execute("SELECT id FROM editoriales WHERE nombre=%s", (nombre_editorial,))
             editorial = await cursor.fetchone()
@@ -104,16 +108,16 @@ async def get_or_create_editorial(nombre_editorial: str):
             return cursor.lastrowid
         except Exception as e:
             await conn.rollback()
-            print(f"❌ Error DB al obtener/crear editorial: {e}")
+            logger.error(f"❌ Error DB al obtener/crear editorial: {e}")
             return None
 
 
-async def add_to_wishlist(usuario_id: int, libro_id: int):
+async def add_to_wishlist(usuario_id: int, libro_id: int, uow: UnidadDeTrabajo | None = None):
     """Añade un libro a la lista de deseos del usuario."""
-    async with get_cursor() as (conn, cursor):
+    async with get_cursor(uow=uow) as (conn, cursor):
         try:
             # ✅ DEBUGGING: Imprimir lo que estamos buscando
-            print(f"🔍 Verificando si existe: usuario_id={usuario_id}, libro_id={libro_id}")
+            logger.debug(f"🔍 Verificando si existe: usuario_id={usuario_id}, libro_id={libro_id}")
             
             await cursor.execute(
                 "SELECT id FROM lista_deseos WHERE usuario_id=%s AND libro_id=%s",
@@ -121,29 +125,30 @@ async def add_to_wishlist(usuario_id: int, libro_id: int):
             )
             exists = await cursor.fetchone()
             
-            print(f"🔍 Resultado de búsqueda: {exists}")
+            logger.debug(f"🔍 Resultado de búsqueda: {exists}")
             
             if exists:
-                print(f"⚠️ Ya existe en lista_deseos con id={exists['id']}")
+                logger.debug(f"⚠️ Ya existe en lista_deseos con id={exists['id']}")
                 return False
 
-            print(f"✅ Insertando en lista_deseos...")
+            logger.debug(f"✅ Insertando en lista_deseos...")
             await cursor.execute(
                 "INSERT INTO lista_deseos (usuario_id, libro_id) VALUES (%s, %s)",
                 (usuario_id, libro_id),
             )
             await conn.commit()
-            print(f"✅ Insertado correctamente")
+            await registrar_evento("wishlist", libro_id)
+            logger.debug(f"✅ Insertado correctamente")
             return True
         except Exception as e:
-            print(f"❌ Error DB al añadir a lista de deseos: {e}")
+            logger.error(f"❌ Error DB al añadir a lista de deseos: {e}")
             await conn.rollback()
             return False
 
 
-async def get_wishlist(usuario_id: int):
+async def get_wishlist(usuario_id: int, uow: UnidadDeTrabajo | None = None):
     """Obtiene la lista de deseos del usuario."""
-    async with get_cursor() as (conn, cursor):
+    async with get_cursor(uow=uow) as (conn, cursor):
         try:
             await cursor.execute("""
                 SELECT 
@@ -165,32 +170,30 @@ async def get_wishlist(usuario_id: int):
             """, (usuario_id,))
             
             result = await cursor.fetchall()
-            print(f"📊 Query ejecutada, resultados: {len(result) if result else 0}")
+            logger.debug(f"📊 Query ejecutada, resultados: {len(result) if result else 0}")
             return result or []
         except Exception as e:
-            print(f"❌ Error en get_wishlist: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception(f"❌ Error en get_wishlist: {e}")
             return []
 
 
-async def ensure_book_is_persisted(libro_data: dict) -> int | None:
+async def ensure_book_is_persisted(libro_data: dict, uow: UnidadDeTrabajo | None = None) -> int | None:
     """Garantiza que el libro y sus relaciones existan en la DB para la lista de deseos."""
 
     normalized_key = normalize_ol_key(libro_data["openlibrary_key"])
 
     # ✅ Crear las entidades relacionadas (autor, género, editorial)
     nombre_autor, apellido_autor = split_autor_name(libro_data.get("autor", "Desconocido"))
-    autor_id = await get_or_create_autor(nombre_autor, apellido_autor)
-    genero_id = await get_or_create_genero(libro_data.get("genero", "No Clasificado"))
-    editorial_id = await get_or_create_editorial(libro_data.get("editorial", "Desconocida"))
+    autor_id = await get_or_create_autor(nombre_autor, apellido_autor, uow=uow)
+    genero_id = await get_or_create_genero(libro_data.get("genero", "No Clasificado"), uow=uow)
+    editorial_id = await get_or_create_editorial(libro_data.get("editorial", "Desconocida"), uow=uow)
 
     if not autor_id or not genero_id or not editorial_id:
-        print(f"❌ Error al crear entidades relacionadas")
+        logger.error(f"❌ Error al crear entidades relacionadas")
         return None
 
     # ✅ Verificar si el libro ya existe
-    async with get_cursor() as (conn, cursor):
+    async with get_cursor(uow=uow) as (conn, cursor):
         try:
             await cursor.execute(
                 "SELECT id FROM libros WHERE openlibrary_key = %s",
@@ -199,11 +202,11 @@ async def ensure_book_is_persisted(libro_data: dict) -> int | None:
             libro_existente = await cursor.fetchone()
 
             if libro_existente:
-                print(f"📚 Libro ya existe con id={libro_existente['id']}")
+                logger.debug(f"📚 Libro ya existe con id={libro_existente['id']}")
                 return libro_existente["id"]
 
         except Exception as e:
-            print(f"❌ Error al verificar libro existente: {e}")
+            logger.error(f"❌ Error al verificar libro existente: {e}")
 
     # ✅ Si no existe, crear el libro
     titulo = libro_data.get("titulo")
@@ -241,14 +244,14 @@ async def ensure_book_is_persisted(libro_data: dict) -> int | None:
         else:
             fecha_publicacion = None
     except Exception as e:
-        print(f"⚠️ Error al normalizar fecha_publicacion: {e}")
+        logger.warning(f"⚠️ Error al normalizar fecha_publicacion: {e}")
         fecha_publicacion = None
 
     # ✅ Insertar el nuevo libro
-    async with get_cursor() as (conn, cursor):
+    async with get_cursor(uow=uow) as (conn, cursor):
         try:
-            print(f"📝 Creando nuevo libro: {titulo}")
-            print(f"📝 Con: genero_id={genero_id}, editorial_id={editorial_id}, fecha_publicacion={fecha_publicacion}, cover_id={cover_id}")
+            logger.debug(f"📝 Creando nuevo libro: {titulo}")
+            logger.debug(f"📝 Con: genero_id={genero_id}, editorial_id={editorial_id}, fecha_publicacion={fecha_publicacion}, cover_id={cover_id}")
 
             await cursor.execute(
                 """
@@ -261,27 +264,25 @@ async def ensure_book_is_persisted(libro_data: dict) -> int | None:
 
             await conn.commit()
             libro_id = cursor.lastrowid
-            print(f"✅ Libro creado con id={libro_id}")
+            logger.info(f"✅ Libro creado con id={libro_id}")
             return libro_id
 
         except Exception as e:
             await conn.rollback()
-            print(f"❌ Error en ensure_book_is_persisted: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception(f"❌ Error en ensure_book_is_persisted: {e}")
             return None
 
 
 # También actualiza ensure_book_for_loan (línea ~265):
-async def ensure_book_for_loan(libro_data: dict) -> dict | None:
+async def ensure_book_for_loan(libro_data: dict, uow: UnidadDeTrabajo | None = None) -> dict | None:
     """
     Garantiza que el libro exista en la DB para préstamos físicos.
     """
     nombre_autor, apellido_autor = split_autor_name(libro_data.get("autor", "Desconocido"))
-    autor_id = await get_or_create_autor(nombre_autor, apellido_autor)
+    autor_id = await get_or_create_autor(nombre_autor, apellido_autor, uow=uow)
     
-    genero_id = await get_or_create_genero(libro_data.get("genero", "No Clasificado"))
-    editorial_id = await get_or_create_editorial(libro_data.get("editorial", "Desconocida"))
+    genero_id = await get_or_create_genero(libro_data.get("genero", "No Clasificado"), uow=uow)
+    editorial_id = await get_or_create_editorial(libro_data.get("editorial", "Desconocida"), uow=uow)
     
     if not autor_id or not genero_id or not editorial_id:
         return None 
@@ -298,7 +299,7 @@ async def ensure_book_for_loan(libro_data: dict) -> dict | None:
     
     fecha_publicacion = libro_data.get("fecha_publicacion", None)
 
-    async with get_cursor() as (conn, cursor):
+    async with get_cursor(uow=uow) as (conn, cursor):
         try:
             # Buscar libro existente
             await cursor.execute(
@@ -331,14 +332,12 @@ async def ensure_book_for_loan(libro_data: dict) -> dict | None:
 
         except Exception as e:
             await conn.rollback()
-            print(f"❌ Error en ensure_book_for_loan: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception(f"❌ Error en ensure_book_for_loan: {e}")
             return None
 
-async def eliminar_de_lista_deseos(usuario_id: int, libro_id: int):
+async def eliminar_de_lista_deseos(usuario_id: int, libro_id: int, uow: UnidadDeTrabajo | None = None):
     """Elimina un libro de la lista de deseos del usuario."""
-    async with get_cursor() as (conn, cursor):
+    async with get_cursor(uow=uow) as (conn, cursor):
         await cursor.execute(
             "SELECT * FROM lista_deseos WHERE usuario_id = %s AND libro_id = %s",
             (usuario_id, libro_id)
@@ -346,7 +345,7 @@ async def eliminar_de_lista_deseos(usuario_id: int, libro_id: int):
         existe = await cursor.fetchone()
 
         if not existe:
-            print(f"⚠️ No existe en DB: usuario_id={usuario_id}, libro_id={libro_id}")
+            logger.warning(f"⚠️ No existe en DB: usuario_id={usuario_id}, libro_id={libro_id}")
             raise HTTPException(status_code=404, detail="Libro no encontrado en la lista de deseos.")
 
         await cursor.execute(
@@ -354,4 +353,6 @@ async def eliminar_de_lista_deseos(usuario_id: int, libro_id: int):
             (usuario_id, libro_id)
         )
         await conn.commit()
+        # Se resta del día en que se agregó, para que las ventanas 7d/30d cuadren
+        await registrar_evento("wishlist", libro_id, -1, existe.get("fecha_agregado"))
         return {"message": "Libro eliminado correctamente"}
\ No newline at end of file
@@ -1,18 +1,25 @@
 from fastapi import APIRouter, HTTPException, Request, BackgroundTasks
 from pydantic import BaseModel, EmailStr
 from app.models import user_model
-from app.utils.security import verify_password, hash_password, create_access_token
+from app.utils.security import verify_password_async, hash_password_async, create_access_token
 from datetime import datetime, timedelta
 from app.schemas.user_schema import UserLogin, UserRegister
 from app.utils.email_welcome import send_verification_email
 from app.dependencias.redis import r
+from app.utils.login_limiter import (
+    MAX_ATTEMPTS,
+    reservar_intento,
+    bloquear_cuenta,
+    limpiar_intentos,
+)
 import secrets
 import os
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/auth", tags=["Auth"])
 
-MAX_ATTEMPTS = 3
-LOCK_TIME_SECONDS = 15 * 60  # 15 min
 FRONTEND_URL = os.getenv("FRONTEND_URL", "https://aeternum-app-production.up.railway.app")
 
 
@@ -22,46 +29,37 @@ class ReenviarVerificacionRequest(BaseModel):
 
 
 @router.post("/login")
-async def login(user_data: UserLogin):
-    # 1️⃣ Verificar si el usuario existe
+async def login(user_data: UserLogin, request: Request):
+    # 1️⃣ Reservar el intento (correo + IP) ANTES de tocar la BD o bcrypt
+    ip = request.client.host if request.client else "desconocida"
+    intento = reservar_intento(user_data.correo, ip)
+
+    if intento["bloqueo"] == "correo":
+        raise HTTPException(
+            status_code=403, 
+            detail="Cuenta bloqueada temporalmente por intentos fallidos. Intenta en 15 minutos."
+        )
+    if intento["bloqueo"] == "ip":
+        raise HTTPException(
+            status_code=429,
+            detail="Demasiados intentos de inicio de sesión desde esta red. Intenta más tarde.",
+            headers={"Retry-After": str(intento["retry_after"])}
+        )
+
+    # 2️⃣ Verificar si el usuario existe
     user = await user_model.get_user_by_email(user_data.correo)
     if not user:
         raise HTTPException(status_code=401, detail="Correo o contraseña son incorrectos.")
 
     user_id = user["id"]
-    attempts_key = f"login_attempts:{user_id}"
-    lock_key = f"account_locked:{user_id}"
-
-    # 2️⃣ Verificar si la cuenta está bloqueada temporalmente (intentos fallidos)
-    try:
-        if r.get(lock_key):
-            raise HTTPException(
-                status_code=403, 
-                detail="Cuenta bloqueada temporalmente por intentos fallidos. Intenta en 15 minutos."
-            )
-    except:
-        pass  # Si Redis falla, continuar sin bloqueo
-
-    # 3️⃣ Verificar contraseña
-    try:
-        attempts = int(r.get(attempts_key) or 0)
-    except:
-        attempts = 0
-
-    if not verify_password(user_data.clave, user["clave"]):
-        attempts += 1
-        try:
-            r.setex(attempts_key, LOCK_TIME_SECONDS, attempts)
-        except:
-            pass
 
+    # 3️⃣ Verificar contraseña (el intento ya quedó contado)
+    if not await verify_password_async(user_data.clave, user["clave"]):
+        attempts = intento["intento"]
         remaining = MAX_ATTEMPTS - attempts
 
         if attempts >= MAX_ATTEMPTS:
-            try:
-                r.setex(lock_key, LOCK_TIME_SECONDS, "1")
-            except:
-                pass
+            bloquear_cuenta(user_data.correo)
             raise HTTPException(
                 status_code=403, 
                 detail="Cuenta bloqueada temporalmente por múltiples intentos fallidos. Intenta en 15 minutos."
@@ -72,6 +70,9 @@ async def login(user_data: UserLogin):
             detail=f"Contraseña incorrecta. Intentos restantes: {remaining}"
         )
 
+    # Contraseña correcta - Limpiar intentos fallidos
+    limpiar_intentos(user_data.correo, ip, intento["miembro"])
+
     # 4️⃣ Verificar estado ANTES de generar token
     estado = user.get("estado", "").strip()
     
@@ -100,23 +101,16 @@ async def login(user_data: UserLogin):
             detail=f"Tu cuenta está en estado '{estado}'. Contacta al administrador."
         )
 
-    # 5️⃣ Login exitoso - Limpiar intentos fallidos
-    try:
-        r.delete(attempts_key)
-        r.delete(lock_key)
-    except:
-        pass
-
-    # 6️⃣ Verificar si la sesión fue invalidada manualmente por admin
+    # 5️⃣ Verificar si la sesión fue invalidada manualmente por admin
     session_invalid_key = f"user_session_invalid:{user_id}"
     try:
         if r.get(session_invalid_key):
             r.delete(session_invalid_key)
-            print(f"🔓 Sesión invalidada limpiada para usuario {user_id} (nuevo login)")
+            logger.info(f"🔓 Sesión invalidada limpiada para usuario {user_id} (nuevo login)")
     except:
         pass
 
-    # 7️⃣ Generar token
+    # 6️⃣ Generar token
     token = create_access_token({
         "sub": str(user_id),
         "correo": user["correo"],
@@ -147,7 +141,7 @@ async def register_user(user: UserRegister, request: Request):
     if await user_model.id_exists(user.num_identificacion):
         raise HTTPException(status_code=400, detail="El número de identificación ya está registrado.")
 
-    hashed = hash_password(user.clave)
+    hashed = await hash_password_async(user.clave)
 
     # Crear usuario en estado "Pendiente"
     user_id = await user_model.create_user({
@@ -171,13 +165,13 @@ async def register_user(user: UserRegister, request: Request):
     token = secrets.token_urlsafe(32)
     expires_at = datetime.now() + timedelta(hours=24)
     
-    print(f"🔑 [REGISTER] Generando token para user_id={user_id}")
+    logger.debug(f"🔑 [REGISTER] Generando token para user_id={user_id}")
     
     try:
         await user_model.save_verification_token(user_id, token, expires_at)
-        print(f"✅ [REGISTER] Token guardado en BD")
+        logger.debug(f"✅ [REGISTER] Token guardado en BD")
     except Exception as e:
-        print(f"❌ [REGISTER] Error guardando token: {e}")
+        logger.error(f"❌ [REGISTER] Error guardando token: {e}")
         await user_model.delete_user(user_id)
         raise HTTPException(
             status_code=500,
@@ -211,14 +205,14 @@ async def register_user(user: UserRegister, request: Request):
 async def verify_email(token: str, user_id: int):
     """Verifica el correo electrónico del usuario usando el token"""
     
-    print(f"🔍 Verificando token para user_id={user_id}")
+    logger.debug(f"🔍 Verificando token para user_id={user_id}")
     
     try:
         # Obtener token de la BD
         stored_token_data = await user_model.get_verification_token(user_id)
         
         if not stored_token_data:
-            print("❌ Token no encontrado en BD")
+            logger.warning("❌ Token no encontrado en BD")
             raise HTTPException(
                 status_code=400,
                 detail="El enlace ha expirado o ya fue utilizado."
@@ -228,9 +222,7 @@ async def verify_email(token: str, user_id: int):
         expires_at = stored_token_data["expires_at"]
         used = stored_token_data["used"]
         
-        print(f"✅ Token encontrado en BD")
-        print(f"   Expira: {expires_at}")
-        print(f"   Usado: {used}")
+        logger.debug(f"✅ Token encontrado en BD (expira: {expires_at}, usado: {used})")
         
         # Verificar si ya fue usado
         if used:
@@ -248,13 +240,13 @@ async def verify_email(token: str, user_id: int):
         
         # Verificar que el token coincida
         if token != stored_token:
-            print(f"❌ Tokens NO coinciden")
+            logger.warning(f"❌ Tokens NO coinciden")
             raise HTTPException(
                 status_code=400,
                 detail="Token inválido."
             )
         
-        print(f"✅ Token válido, activando usuario")
+        logger.debug(f"✅ Token válido, activando usuario")
         
         # Marcar token como usado
         await user_model.mark_token_as_used(user_id)
@@ -268,14 +260,14 @@ async def verify_email(token: str, user_id: int):
                 detail="No se pudo actualizar el estado del usuario."
             )
         
-        print(f"✅ Usuario {user_id} verificado exitosamente")
+        logger.info(f"✅ Usuario {user_id} verificado exitosamente")
         
         return {"message": "Correo verificado exitosamente. Ya puedes iniciar sesión."}
         
     except HTTPException:
         raise
     except Exception as e:
-        print(f"❌ Error inesperado: {e}")
+        logger.error(f"❌ Error inesperado: {e}")
         raise HTTPException(
             status_code=500,
             detail="Error al verificar el correo."
@@ -309,14 +301,14 @@ async def reenviar_verificacion(
     user_id = user["id"]
     expires_at = datetime.now() + timedelta(hours=24)
     
-    print(f"🔑 Generando nuevo token para user_id={user_id}")
+    logger.debug(f"🔑 Generando nuevo token para user_id={user_id}")
     
     try:
         # Guardar en BD
         await user_model.save_verification_token(user_id, token, expires_at)
-        print(f"✅ Token guardado en BD")
+        logger.debug(f"✅ Token guardado en BD")
     except Exception as e:
-        print(f"❌ Error guardando token: {e}")
+        logger.error(f"❌ Error guardando token: {e}")
         raise HTTPException(
             status_code=500,
             detail="Error al generar token de verificación."
@@ -344,6 +336,6 @@ async def reenviar_verificacion(
         user_name
     )
     
-    print(f"📧 Email programado para: {correo}")
+    logger.info(f"📧 Email programado para: {correo}")
     
     return {"message": response_message}
\ No newline at end of file
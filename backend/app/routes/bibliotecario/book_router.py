@@ -3,24 +3,16 @@ from fastapi.responses import StreamingResponse
 from typing import Any, Dict
 from app.utils.security import get_current_user
 from app.config.database import get_cursor
+from app.utils.dependencias_pesadas import cargar_pandas, cargar_fpdf
+from app.utils.contadores import invalidar_libro
+from app.utils.cache import invalidar_tags
+from app.utils.sugerencias import actualizar_libro
 from io import BytesIO
 from datetime import datetime
 from pathlib import Path
+import logging
 
-# Importaciones condicionales
-try:
-    import pandas as pd
-    PANDAS_AVAILABLE = True
-except ImportError:
-    PANDAS_AVAILABLE = False
-    print("⚠️ pandas no instalado. Instala con: pip install pandas openpyxl")
-
-try:
-    from fpdf import FPDF
-    FPDF_AVAILABLE = True
-except ImportError:
-    FPDF_AVAILABLE = False
-    print("⚠️ fpdf2 no instalado. Instala con: pip install fpdf2")
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/admin/books", tags=["Admin - Books"])
 
@@ -139,8 +131,8 @@ async def create_book(
         )
 
     # ← AGREGADO: Log para debug
-    print(f"📚 Creando libro: {titulo}")
-    print(f"🖼️ Imagen local: {imagen_local}")
+    logger.info(f"📚 Creando libro: {titulo}")
+    logger.debug(f"🖼️ Imagen local: {imagen_local}")
 
     async with get_cursor() as (conn, cursor):
         await cursor.execute("""
@@ -158,7 +150,9 @@ async def create_book(
         await conn.commit()
         libro_id = cursor.lastrowid
 
-    print(f"✅ Libro creado con ID: {libro_id}")
+    logger.info(f"✅ Libro creado con ID: {libro_id}")
+    invalidar_tags("libros")
+    await actualizar_libro(libro_id)
 
     return {
         "status": "success",
@@ -214,9 +208,9 @@ async def update_book(
                 if old_image_path.exists():
                     try:
                         old_image_path.unlink()
-                        print(f"🗑️ Imagen antigua eliminada: {old_image_path}")
+                        logger.debug(f"🗑️ Imagen antigua eliminada: {old_image_path}")
                     except Exception as e:
-                        print(f"⚠️ No se pudo eliminar imagen antigua: {e}")
+                        logger.warning(f"⚠️ No se pudo eliminar imagen antigua: {e}")
 
         await cursor.execute("""
             UPDATE libros 
@@ -237,6 +231,11 @@ async def update_book(
                 detail="Libro no encontrado"
             )
 
+    # 🔢 El stock pudo cambiar a mano: el contador se recalcula en la próxima lectura
+    await invalidar_libro(book_id)
+    invalidar_tags("libros")
+    await actualizar_libro(book_id)
+
     return {"status": "success", "message": "Libro actualizado correctamente"}
 
 
@@ -261,6 +260,9 @@ async def deactivate_book(
                 detail="Libro no encontrado"
             )
 
+    invalidar_tags("libros")
+    await actualizar_libro(book_id)
+
     return {
         "status": "success", 
         "message": f"Libro {book_id} desactivado correctamente."
@@ -288,6 +290,9 @@ async def activate_book(
                 detail="Libro no encontrado"
             )
 
+    invalidar_tags("libros")
+    await actualizar_libro(book_id)
+
     return {
         "status": "success", 
         "message": f"Libro {book_id} activado correctamente."
@@ -300,13 +305,9 @@ async def export_books_excel(current_user: dict = Depends(get_current_user)):
     """Exporta todos los libros a un archivo Excel"""
     verify_librarian_role(current_user)
 
-    if not PANDAS_AVAILABLE:
-        raise HTTPException(
-            status_code=500, 
-            detail="pandas no está instalado. Ejecuta: pip install pandas openpyxl"
-        )
+    pd = await cargar_pandas()
 
-    async with get_cursor() as (conn, cursor):
+    async with get_cursor("reporting", intent="read") as (conn, cursor):
         await cursor.execute("""
             SELECT 
                 l.id as 'ID',
@@ -367,13 +368,9 @@ async def export_books_pdf(current_user: dict = Depends(get_current_user)):
     """Exporta todos los libros a un archivo PDF"""
     verify_librarian_role(current_user)
 
-    if not FPDF_AVAILABLE:
-        raise HTTPException(
-            status_code=500, 
-            detail="fpdf2 no está instalado. Ejecuta: pip install fpdf2"
-        )
+    FPDF = await cargar_fpdf()
 
-    async with get_cursor() as (conn, cursor):
+    async with get_cursor("reporting", intent="read") as (conn, cursor):
         await cursor.execute("""
             SELECT 
                 l.id, l.titulo, a.nombre as autor, e.nombre as editorial,
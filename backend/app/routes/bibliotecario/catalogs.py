@@ -8,7 +8,7 @@ router = APIRouter(tags=["Catálogos"])
 # 📚 AUTORES
 @router.get("/autores/")
 async def get_autores(current_user: dict = Depends(get_current_user)):
-    async with get_cursor() as (conn, cursor):
+    async with get_cursor(intent="read") as (conn, cursor):
         await cursor.execute("SELECT id, nombre FROM autores ORDER BY nombre")
         autores = await cursor.fetchall()
     return autores
@@ -17,7 +17,7 @@ async def get_autores(current_user: dict = Depends(get_current_user)):
 # 🏢 EDITORIALES
 @router.get("/editoriales/")
 async def get_editoriales(current_user: dict = Depends(get_current_user)):
-    async with get_cursor() as (conn, cursor):
+    async with get_cursor(intent="read") as (conn, cursor):
         await cursor.execute("SELECT id, nombre FROM editoriales ORDER BY nombre")
         editoriales = await cursor.fetchall()
     return editoriales
@@ -26,7 +26,7 @@ async def get_editoriales(current_user: dict = Depends(get_current_user)):
 # 🎭 GÉNEROS
 @router.get("/generos/")
 async def get_generos(current_user: dict = Depends(get_current_user)):
-    async with get_cursor() as (conn, cursor):
+    async with get_cursor(intent="read") as (conn, cursor):
         await cursor.execute("SELECT id, nombre FROM generos ORDER BY nombre")
         generos = await cursor.fetchall()
     return generos
\ No newline at end of file
@@ -0,0 +1,60 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from app.utils.security import get_current_user
+from app.utils.query_stats import (
+    SLOW_QUERY_MS,
+    obtener_estadisticas_queries,
+    reiniciar_estadisticas_queries,
+)
+from app.config.database import obtener_metricas_pool
+from app.task.jobs import obtener_ejecuciones, obtener_leases
+
+router = APIRouter(prefix="/admin/monitoreo", tags=["Admin - Monitoreo"])
+
+ORDENES_VALIDOS = ("total_ms", "p95_ms", "p99_ms", "llamadas", "promedio_ms", "max_ms", "filas_promedio")
+
+
+def verify_librarian_role(current_user: dict):
+    if current_user.get("rol") != "bibliotecario":
+        raise HTTPException(status_code=403, detail="Acceso denegado: se requiere rol de bibliotecario.")
+
+
+# 📊 Latencia por sentencia SQL normalizada
+@router.get("/queries")
+async def estadisticas_queries(
+    top: int = Query(50, ge=1, le=500),
+    orden: str = Query("total_ms"),
+    current_user: dict = Depends(get_current_user)
+):
+    verify_librarian_role(current_user)
+    if orden not in ORDENES_VALIDOS:
+        raise HTTPException(status_code=400, detail=f"Orden inválido. Usa: {', '.join(ORDENES_VALIDOS)}")
+
+    return {
+        "slow_query_ms": SLOW_QUERY_MS,
+        "pools": obtener_metricas_pool(),
+        "queries": obtener_estadisticas_queries(top, orden),
+    }
+
+
+# 🧹 Reiniciar contadores (p. ej. antes de una prueba de carga)
+@router.delete("/queries")
+async def reiniciar_queries(current_user: dict = Depends(get_current_user)):
+    verify_librarian_role(current_user)
+    reiniciar_estadisticas_queries()
+    return {"message": "Estadísticas de queries reiniciadas"}
+
+
+# ⏱️ Últimas ejecuciones de tareas programadas y dueño actual de cada lease
+@router.get("/jobs")
+async def ejecuciones_jobs(
+    job: str | None = Query(None),
+    limit: int = Query(50, ge=1, le=500),
+    current_user: dict = Depends(get_current_user)
+):
+    verify_librarian_role(current_user)
+    ejecuciones = await obtener_ejecuciones(job, limit)
+    jobs = sorted({e["job"] for e in ejecuciones} | ({job} if job else set()))
+    return {
+        "leases": await obtener_leases(jobs),
+        "ejecuciones": ejecuciones,
+    }
@@ -6,6 +6,9 @@ import uuid
 from typing import Optional
 from app.utils.security import get_current_user
 import os
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/uploads", tags=["Uploads"])
 
@@ -72,7 +75,7 @@ async def upload_book_cover(
             shutil.copyfileobj(file.file, buffer)
         
         # ← AGREGAR: Log para debug
-        print(f"✅ Archivo guardado: {file_path.resolve()}")
+        logger.info(f"✅ Archivo guardado: {file_path.resolve()}")
         
         # Retornar la ruta relativa que se guardará en la BD
         relative_path = f"book_covers/{unique_filename}"
@@ -88,7 +91,7 @@ async def upload_book_cover(
         # Si hay error, eliminar el archivo si se creó
         if file_path.exists():
             file_path.unlink()
-        print(f"❌ Error al guardar archivo: {str(e)}")
+        logger.error(f"❌ Error al guardar archivo: {str(e)}")
         raise HTTPException(
             status_code=500,
             detail=f"Error al guardar el archivo: {str(e)}"
@@ -106,10 +109,10 @@ async def get_uploaded_file(file_path: str):
     full_path = UPLOAD_DIR.parent / file_path
     
     # ← AGREGAR: Log para debug
-    print(f"🔍 Buscando archivo: {full_path.resolve()}")
+    logger.debug(f"🔍 Buscando archivo: {full_path.resolve()}")
     
     if not full_path.exists() or not full_path.is_file():
-        print(f"❌ Archivo NO encontrado: {full_path.resolve()}")
+        logger.warning(f"❌ Archivo NO encontrado: {full_path.resolve()}")
         raise HTTPException(status_code=404, detail="Archivo no encontrado")
     
     # Verificar que el archivo esté dentro del directorio permitido
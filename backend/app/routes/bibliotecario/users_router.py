@@ -3,24 +3,14 @@ from fastapi.responses import StreamingResponse
 from typing import Any, Dict
 from app.utils.security import get_current_user
 from app.config.database import get_cursor
+from app.utils.dependencias_pesadas import cargar_pandas, cargar_fpdf
+from app.utils.cache_ns import invalidar_ns
 from io import BytesIO
 from datetime import datetime
 import asyncio
+import logging
 
-# Importaciones condicionales para evitar errores si no están instaladas
-try:
-    import pandas as pd
-    PANDAS_AVAILABLE = True
-except ImportError:
-    PANDAS_AVAILABLE = False
-    print("⚠️ pandas no instalado. Instala con: pip install pandas openpyxl")
-
-try:
-    from fpdf import FPDF
-    FPDF_AVAILABLE = True
-except ImportError:
-    FPDF_AVAILABLE = False
-    print("⚠️ fpdf2 no instalado. Instala con: pip install fpdf2")
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/admin/users", tags=["Admin - Users"])
 
@@ -42,13 +32,10 @@ async def clear_user_cache_async(user_id: int, include_session_invalidation: boo
     
     def _clear_cache():
         try:
-            print(f"🧹 Iniciando limpieza de caché para usuario {user_id} (include_session_invalidation={include_session_invalidation})")
+            logger.debug(f"🧹 Iniciando limpieza de caché para usuario {user_id} (include_session_invalidation={include_session_invalidation})")
             
             # 🔥 Lista completa de claves posibles de caché de usuario
             keys_to_delete = [
-                f"login_attempts:{user_id}",
-                f"account_locked:{user_id}",
-                f"prestamos_fisicos_usuario:{user_id}",
                 f"user_data:{user_id}",
                 f"user_estado:{user_id}",
                 f"user_info:{user_id}",
@@ -58,7 +45,7 @@ async def clear_user_cache_async(user_id: int, include_session_invalidation: boo
             # Solo limpiar sesión inválida si se especifica (al reactivar)
             if include_session_invalidation:
                 keys_to_delete.append(f"user_session_invalid:{user_id}")
-                print(f"  ⚠️ Se incluirá limpieza de user_session_invalid:{user_id}")
+                logger.debug(f"  ⚠️ Se incluirá limpieza de user_session_invalid:{user_id}")
             
             # Intentar borrar todas las claves
             deleted_count = 0
@@ -66,15 +53,18 @@ async def clear_user_cache_async(user_id: int, include_session_invalidation: boo
                 result = r.delete(key)
                 if result:
                     deleted_count += 1
-                    print(f"    ✅ Eliminada: {key}")
+                    logger.debug(f"    ✅ Eliminada: {key}")
                 
-            print(f"✅ Limpieza completada: {deleted_count} claves eliminadas de {len(keys_to_delete)} intentadas")
+            logger.info(f"✅ Limpieza completada: {deleted_count} claves eliminadas de {len(keys_to_delete)} intentadas")
+            
+            # Cachés de préstamos del usuario: namespace versionado
+            invalidar_ns(f"prestamos_usuario:{user_id}")
             
             # ⚠️ IMPORTANTE: NO hacer ninguna actualización de BD aquí
             # Esta función es SOLO para Redis
             
         except Exception as e:
-            print(f"❌ Error limpiando caché: {e}")
+            logger.error(f"❌ Error limpiando caché: {e}")
     
     loop = asyncio.get_event_loop()
     await loop.run_in_executor(None, _clear_cache)
@@ -89,7 +79,7 @@ async def invalidate_session_async(user_id: int):
         try:
             r.setex(f"user_session_invalid:{user_id}", 3600, "1")
         except Exception as e:
-            print(f"⚠️ Error invalidando sesión: {e}")
+            logger.warning(f"⚠️ Error invalidando sesión: {e}")
     
     loop = asyncio.get_event_loop()
     await loop.run_in_executor(None, _invalidate)
@@ -140,8 +130,8 @@ async def create_user_by_admin(
         raise HTTPException(status_code=400, detail="El número de identificación ya está registrado")
     
     # Hash de contraseña
-    from app.utils.security import hash_password
-    hashed = hash_password(clave)
+    from app.utils.security import hash_password_async
+    hashed = await hash_password_async(clave)
     
     # Crear usuario directamente como ACTIVO (sin verificación)
     user_id = await user_model.create_user({
@@ -278,9 +268,9 @@ async def deactivate_user_by_admin(
             
             try:
                 resultado_prestamos = await cancelar_prestamos_por_desactivacion_cuenta(user_id)
-                print(f"📚 Préstamos cancelados del usuario {user_id}: {resultado_prestamos}")
+                logger.info(f"📚 Préstamos cancelados del usuario {user_id}: {resultado_prestamos}")
             except Exception as e:
-                print(f"⚠️ Error al cancelar préstamos: {e}")
+                logger.warning(f"⚠️ Error al cancelar préstamos: {e}")
 
             # Desactivar cuenta
             await cursor.execute("""
@@ -320,13 +310,13 @@ async def reactivate_user_by_admin(
     async with get_cursor() as (conn, cursor):
         try:
             # 1️⃣ Verificar que el usuario existe
-            await cursor.execute("SELECT id, estado FROM usuarios WHERE id = %s", (user_id,))
+            await cursor.execute("SELECT id, estado, correo FROM usuarios WHERE id = %s", (user_id,))
             user = await cursor.fetchone()
             
             if not user:
                 raise HTTPException(status_code=404, detail="Usuario no encontrado")
 
-            print(f"📋 Estado ANTES de reactivar: {user['estado']}")
+            logger.debug(f"📋 Estado ANTES de reactivar: {user['estado']}")
 
             if user["estado"] == "Activo":
                 return {"status": "warning", "message": "El usuario ya está activo"}
@@ -339,48 +329,49 @@ async def reactivate_user_by_admin(
             """, (user_id,))
             
             await conn.commit()
-            print(f"✅ Usuario {user_id} actualizado a 'Activo' en BD")
+            logger.info(f"✅ Usuario {user_id} actualizado a 'Activo' en BD")
 
             # 3️⃣ Verificar que se guardó correctamente
             await cursor.execute("SELECT estado FROM usuarios WHERE id = %s", (user_id,))
             verificacion = await cursor.fetchone()
-            print(f"🔍 Verificación post-update: Estado = {verificacion['estado']}")
+            logger.debug(f"🔍 Verificación post-update: Estado = {verificacion['estado']}")
 
             if verificacion['estado'] != 'Activo':
                 raise Exception(f"Error: El estado no se actualizó correctamente. Estado actual: {verificacion['estado']}")
 
             # 4️⃣ AHORA SÍ limpiar Redis - DESPUÉS de confirmar que BD está OK
             from app.dependencias.redis import r
+            from app.utils.login_limiter import limpiar_bloqueo_login
             
             def _limpiar_sesion_completa():
                 try:
+                    limpiar_bloqueo_login(user["correo"])
+
                     keys_criticas = [
                         f"user_session_invalid:{user_id}",
-                        f"login_attempts:{user_id}",
-                        f"account_locked:{user_id}",
                         f"user_estado:{user_id}",
                         f"user_data:{user_id}",
-                        f"prestamos_fisicos_usuario:{user_id}",
                     ]
+                    invalidar_ns(f"prestamos_usuario:{user_id}")
                     
                     deleted = 0
                     for key in keys_criticas:
                         result = r.delete(key)
                         if result:
                             deleted += 1
-                            print(f"  🗑️ Eliminada: {key}")
+                            logger.debug(f"  🗑️ Eliminada: {key}")
                     
-                    print(f"✅ Redis limpiado para usuario {user_id} ({deleted} claves)")
+                    logger.info(f"✅ Redis limpiado para usuario {user_id} ({deleted} claves)")
                     
                     # Verificar que la marca de sesión inválida se eliminó
                     if r.get(f"user_session_invalid:{user_id}"):
-                        print(f"⚠️ ALERTA: user_session_invalid:{user_id} aún existe!")
+                        logger.warning(f"⚠️ ALERTA: user_session_invalid:{user_id} aún existe!")
                         r.delete(f"user_session_invalid:{user_id}")  # Forzar eliminación
                     else:
-                        print(f"✅ Confirmado: user_session_invalid:{user_id} eliminada")
+                        logger.debug(f"✅ Confirmado: user_session_invalid:{user_id} eliminada")
                         
                 except Exception as e:
-                    print(f"❌ Error limpiando Redis: {e}")
+                    logger.error(f"❌ Error limpiando Redis: {e}")
             
             # Ejecutar limpieza de Redis
             loop = asyncio.get_event_loop()
@@ -389,7 +380,7 @@ async def reactivate_user_by_admin(
             # 5️⃣ Verificación final del estado
             await cursor.execute("SELECT estado FROM usuarios WHERE id = %s", (user_id,))
             estado_final = await cursor.fetchone()
-            print(f"🎯 Estado FINAL del usuario {user_id}: {estado_final['estado']}")
+            logger.info(f"🎯 Estado FINAL del usuario {user_id}: {estado_final['estado']}")
 
             return {
                 "status": "success", 
@@ -401,7 +392,7 @@ async def reactivate_user_by_admin(
             raise
         except Exception as e:
             await conn.rollback()
-            print(f"❌ Error en reactivación: {str(e)}")
+            logger.error(f"❌ Error en reactivación: {str(e)}")
             raise HTTPException(status_code=500, detail=f"Error al reactivar: {str(e)}")
 
 
@@ -411,13 +402,9 @@ async def export_users_excel(current_user: dict = Depends(get_current_user)):
     """Exporta todos los usuarios a un archivo Excel"""
     verify_librarian_role(current_user)
 
-    if not PANDAS_AVAILABLE:
-        raise HTTPException(
-            status_code=500, 
-            detail="pandas no está instalado. Ejecuta: pip install pandas openpyxl"
-        )
+    pd = await cargar_pandas()
 
-    async with get_cursor() as (conn, cursor):
+    async with get_cursor("reporting", intent="read") as (conn, cursor):
         await cursor.execute("""
             SELECT 
                 id as 'ID',
@@ -485,13 +472,9 @@ async def export_users_pdf(current_user: dict = Depends(get_current_user)):
     """Exporta todos los usuarios a un archivo PDF"""
     verify_librarian_role(current_user)
 
-    if not FPDF_AVAILABLE:
-        raise HTTPException(
-            status_code=500, 
-            detail="fpdf2 no está instalado. Ejecuta: pip install fpdf2"
-        )
+    FPDF = await cargar_fpdf()
 
-    async with get_cursor() as (conn, cursor):
+    async with get_cursor("reporting", intent="read") as (conn, cursor):
         await cursor.execute("""
             SELECT 
                 id,
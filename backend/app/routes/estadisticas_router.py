@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import date
+from fastapi import APIRouter, Depends, HTTPException, Query
 from app.models.estadisticas_model import (
     obtener_estadisticas_bibliotecario,
     obtener_prestamos_recientes,
@@ -66,12 +67,17 @@ async def alertas_bibliotecario(
 
 @router.get("/bibliotecario/grafica-prestamos")
 async def grafica_prestamos(
+    desde: date | None = Query(None, description="Primer mes incluido (por defecto, hace 6 meses)"),
+    hasta: date | None = Query(None, description="Último mes incluido (por defecto, el actual)"),
     current_user: dict = Depends(get_current_user)
 ):
     """Obtiene datos para gráfica de préstamos por mes"""
     verificar_bibliotecario(current_user)
     
-    resultado = await obtener_datos_grafica_prestamos()
+    resultado = await obtener_datos_grafica_prestamos(
+        desde.isoformat() if desde else None,
+        hasta.isoformat() if hasta else None,
+    )
     
     if resultado.get("status") == "success":
         return resultado
@@ -81,12 +87,14 @@ async def grafica_prestamos(
 @router.get("/bibliotecario/libros-populares")
 async def libros_populares(
     tipo: str = "prestamos",  # valores: prestamos | wishlist
+    ventana: str = "total",  # valores: 7d | 30d | total
+    limit: int = Query(5, ge=1, le=100),
     current_user: dict = Depends(get_current_user)
 ):
     """Obtiene los libros más prestados o más guardados en wishlist"""
     verificar_bibliotecario(current_user)
 
-    resultado = await obtener_libros_populares(tipo)
+    resultado = await obtener_libros_populares(tipo, ventana, limit)
     if resultado.get("status") == "success":
         return resultado
 
@@ -1,15 +1,13 @@
 from fastapi import APIRouter, HTTPException, Query, BackgroundTasks
 from app.models import user_model, password_recovery_model
 from app.utils.email_sender import send_password_recovery_email
-from app.utils.security import hash_password
+from app.utils.security import hash_password_async
 from typing import Annotated
 from app.dependencias.redis import r
 import secrets
 import logging
 import os
 
-# 🔥 CONFIGURA LOGGING
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/password", tags=["PasswordRecovery"])
@@ -109,7 +107,7 @@ async def restablecer_contrasena(
             raise HTTPException(status_code=400, detail="El enlace ha expirado o no es válido.")
         user_id = recovery["usuario_id"]
     
-    hashed_password = hash_password(nueva_contrasena)
+    hashed_password = await hash_password_async(nueva_contrasena)
     updated = await user_model.update_password(user_id, hashed_password)
     
     if not updated:
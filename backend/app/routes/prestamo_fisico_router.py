@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
 from pydantic import BaseModel
 from datetime import datetime, timedelta
 from app.task.verificar_mora import verificar_y_bloquear_usuarios_con_mora
@@ -6,69 +6,58 @@ import pytz
 
 from app.models.prestamo_fisico_model import (
     crear_prestamo_fisico, 
+    enviar_confirmacion_prestamo, 
     obtener_prestamos_usuario, 
     cancelar_prestamo_fisico, 
     actualizar_estado_prestamo
 )
 from app.schemas.prestamos_schema import PrestamoFisicoRequest, EstadoRequest
 from app.utils.security import get_current_user
-from app.config.database import get_cursor
-from app.dependencias.redis import r
+from app.config.database import get_cursor, get_db, UnidadDeTrabajo
+from app.utils.cache import invalidar_tags
+from app.utils.contadores import prestamos_activos_usuario
 from app.utils.email_prestamos import send_prestamo_cancelado_bibliotecario 
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/prestamos-fisicos", tags=["Préstamos Físicos"])
 
 def limpiar_cache_prestamos(usuario_id: int = None, prestamo_id: int = None):
-    """Limpia cachés de préstamos de forma eficiente"""
-    try:
-        if prestamo_id:
-            r.delete(f"prestamo:{prestamo_id}")
-        
-        if usuario_id:
-            r.delete(f"prestamos_fisicos_usuario:{usuario_id}")
-        
-        # Limpiar estadísticas globales
-        r.delete("estadisticas:bibliotecario")
-        r.delete("prestamos:recientes")
-        
-        # Limpiar gráficas
-        pattern = "grafica_prestamos:*"
-        for key in r.scan_iter(pattern):
-            r.delete(key)
-    except Exception as e:
-        print(f"⚠️ Error limpiando caché: {e}")
+    """Invalida los cachés de préstamos: un INCR por namespace, sin recorrer claves"""
+    namespaces = ["estadisticas", "graficas"]
+    if prestamo_id:
+        namespaces.append(f"prestamo:{prestamo_id}")
+    if usuario_id:
+        namespaces.append(f"prestamos_usuario:{usuario_id}")
+    invalidar_tags(*namespaces)
 
 @router.get("/puede-solicitar")
-async def puede_solicitar_prestamo(current_user: dict = Depends(get_current_user)):
+async def puede_solicitar_prestamo(current_user: dict = Depends(get_current_user), db: UnidadDeTrabajo = Depends(get_db)):
     """Verifica si el usuario puede solicitar un nuevo préstamo físico (límite: 2)"""
     usuario_id = current_user.get("sub")
     if not usuario_id:
         raise HTTPException(status_code=401, detail="Usuario no autenticado")
     
-    async with get_cursor() as (conn, cursor):
-        await cursor.execute("""
-            SELECT COUNT(*) as total
-            FROM prestamos_fisicos
-            WHERE usuario_id = %s 
-            AND estado IN ('pendiente', 'activo')
-        """, (int(usuario_id),))
-        
-        result = await cursor.fetchone()
-        prestamos_activos = result['total'] if result else 0
-        
-        puede_solicitar = prestamos_activos < 2
-        
-        return {
-            "puede_solicitar": puede_solicitar,
-            "prestamos_activos": prestamos_activos,
-            "limite": 2,
-            "message": "OK" if puede_solicitar else "Has alcanzado el límite de 2 préstamos activos"
-        }
+    # 🔢 Un GET en Redis (prestamos_activos:{id}); COUNT(*) en SQL si falta la clave
+    #    o si ya marca el límite (se confirma antes de negar)
+    prestamos_activos = await prestamos_activos_usuario(int(usuario_id), limite=2)
+    
+    puede_solicitar = prestamos_activos < 2
+    
+    return {
+        "puede_solicitar": puede_solicitar,
+        "prestamos_activos": prestamos_activos,
+        "limite": 2,
+        "message": "OK" if puede_solicitar else "Has alcanzado el límite de 2 préstamos activos"
+    }
 
 @router.post("/solicitar")
 async def solicitar_prestamo_fisico(
     data: PrestamoFisicoRequest,
-    current_user: dict = Depends(get_current_user)
+    background_tasks: BackgroundTasks,
+    current_user: dict = Depends(get_current_user),
+    db: UnidadDeTrabajo = Depends(get_db)
 ):
     usuario_id = current_user.get("sub")
     if not usuario_id:
@@ -92,13 +81,17 @@ async def solicitar_prestamo_fisico(
     resultado = await crear_prestamo_fisico(
         usuario_id=int(usuario_id),
         libro_id=data.libro_id,
-        fecha_recogida=data.fecha_recogida
+        fecha_recogida=data.fecha_recogida,
+        uow=db
     )
 
     if resultado.get("status") == "success":
         # 🧹 Limpiar TODOS los cachés relacionados inmediatamente
         limpiar_cache_prestamos(usuario_id=int(usuario_id))
         
+        # 📧 Confirmación por correo después de responder (fuera de la transacción)
+        background_tasks.add_task(enviar_confirmacion_prestamo, **resultado.pop("notificacion"))
+        
         return {
             "status": "success",
             "message": "📚 Préstamo físico solicitado exitosamente",
@@ -109,12 +102,12 @@ async def solicitar_prestamo_fisico(
 
 
 @router.get("/mis-prestamos")
-async def mis_prestamos_fisicos(current_user: dict = Depends(get_current_user)):
+async def mis_prestamos_fisicos(current_user: dict = Depends(get_current_user), db: UnidadDeTrabajo = Depends(get_db)):
     usuario_id = current_user.get("sub")
     if not usuario_id:
         raise HTTPException(status_code=401, detail="Usuario no autenticado")
 
-    resultado = await obtener_prestamos_usuario(int(usuario_id))
+    resultado = await obtener_prestamos_usuario(int(usuario_id), uow=db)
 
     if resultado.get("status") == "success":
         return resultado
@@ -123,12 +116,12 @@ async def mis_prestamos_fisicos(current_user: dict = Depends(get_current_user)):
 
 
 @router.put("/cancelar/{prestamo_id}")
-async def cancelar_prestamo(prestamo_id: int, current_user: dict = Depends(get_current_user)):
+async def cancelar_prestamo(prestamo_id: int, current_user: dict = Depends(get_current_user), db: UnidadDeTrabajo = Depends(get_db)):
     usuario_id = current_user.get("sub")
     if not usuario_id:
         raise HTTPException(status_code=401, detail="Usuario no autenticado")
 
-    resultado = await cancelar_prestamo_fisico(prestamo_id=prestamo_id, usuario_id=int(usuario_id))
+    resultado = await cancelar_prestamo_fisico(prestamo_id=prestamo_id, usuario_id=int(usuario_id), uow=db)
 
     if resultado.get("status") == "success":
         # 🧹 Limpiar cachés relacionados
@@ -139,7 +132,7 @@ async def cancelar_prestamo(prestamo_id: int, current_user: dict = Depends(get_c
     raise HTTPException(status_code=400, detail=resultado.get("message"))
 
 
-async def verificar_y_desbloquear_usuario(usuario_id: int):
+async def verificar_y_desbloquear_usuario(usuario_id: int, uow: UnidadDeTrabajo | None = None):
     """
     Verifica si un usuario ya no tiene préstamos vencidos y lo desbloquea automáticamente
     """
@@ -149,13 +142,13 @@ async def verificar_y_desbloquear_usuario(usuario_id: int):
     tz = pytz.timezone("America/Bogota")
     hoy = datetime.now(tz).date()
     
-    async with get_cursor() as (conn, cursor):
-        # Verificar si tiene préstamos vencidos activos
+    async with get_cursor(uow=uow) as (conn, cursor):
+        # Verificar si tiene préstamos vencidos sin devolver (atrasados o aún activos)
         await cursor.execute("""
             SELECT COUNT(*) as total_vencidos
             FROM prestamos_fisicos
             WHERE usuario_id = %s
-            AND estado = 'activo'
+            AND estado IN ('activo', 'atrasado')
             AND fecha_devolucion < %s
         """, (usuario_id, hoy))
         
@@ -175,7 +168,7 @@ async def verificar_y_desbloquear_usuario(usuario_id: int):
             await conn.commit()
             
             if cursor.rowcount > 0:
-                print(f"🔓 Usuario {usuario_id} desbloqueado automáticamente")
+                logger.info(f"🔓 Usuario {usuario_id} desbloqueado automáticamente")
                 return True
         
         return False
@@ -185,7 +178,8 @@ async def verificar_y_desbloquear_usuario(usuario_id: int):
 async def cambiar_estado_prestamo(
     prestamo_id: int, 
     data: EstadoRequest, 
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: UnidadDeTrabajo = Depends(get_db)
 ):
     usuario_id = current_user.get("sub")
     rol = current_user.get("rol") or current_user.get("role")
@@ -197,7 +191,7 @@ async def cambiar_estado_prestamo(
         raise HTTPException(status_code=403, detail="Acceso restringido")
 
     # ✅ Obtener datos del préstamo ANTES de actualizar
-    async with get_cursor() as (conn, cursor):
+    async with get_cursor(uow=db) as (conn, cursor):
         await cursor.execute("""
             SELECT 
                 pf.id,
@@ -219,7 +213,7 @@ async def cambiar_estado_prestamo(
         raise HTTPException(status_code=404, detail="Préstamo no encontrado")
 
     # ✅ Actualizar estado del préstamo
-    resultado = await actualizar_estado_prestamo(prestamo_id, data.estado)
+    resultado = await actualizar_estado_prestamo(prestamo_id, data.estado, uow=db)
 
     if resultado.get("status") == "success":
         # ✅ Limpiar cachés
@@ -227,7 +221,7 @@ async def cambiar_estado_prestamo(
 
         # 🔓 NUEVO: Si se marca como "devuelto", verificar desbloqueo automático
         if data.estado.lower() == "devuelto":
-            await verificar_y_desbloquear_usuario(prestamo_info['usuario_id'])
+            await verificar_y_desbloquear_usuario(prestamo_info['usuario_id'], uow=db)
 
         # ✅ Enviar correo si se cancela
         if data.estado.lower() == "cancelado":
@@ -240,10 +234,10 @@ async def cambiar_estado_prestamo(
                     titulo_libro=prestamo_info['titulo']
                 )
                 
-                print(f"✅ Correo de cancelación enviado a {prestamo_info['correo']}")
+                logger.info(f"✅ Correo de cancelación enviado a {prestamo_info['correo']}")
                 
             except Exception as e:
-                print(f"⚠️ Error al enviar correo: {e}")
+                logger.warning(f"⚠️ Error al enviar correo: {e}")
 
         return resultado
 
@@ -257,7 +251,11 @@ async def verificar_mora_manual(current_user: dict = Depends(get_current_user)):
     if rol != "bibliotecario":
         raise HTTPException(status_code=403, detail="Solo bibliotecarios")
     
+    from app.task.jobs import ejecutar_con_lease
     from app.task.verificar_mora import verificar_y_bloquear_usuarios_con_mora
-    resultado = await verificar_y_bloquear_usuarios_con_mora()
+    # Mismo lease que el job nocturno: nunca corren dos verificaciones a la vez
+    resultado = await ejecutar_con_lease("verificar_mora_diaria", verificar_y_bloquear_usuarios_con_mora)
+    if resultado is None:
+        raise HTTPException(status_code=409, detail="La verificación de mora ya se está ejecutando")
     
     return resultado
\ No newline at end of file
@@ -1,18 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException
+import json
+from datetime import date
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from app.models.prestamo_model import (
     registrar_prestamo,
     obtener_todos_prestamos_digitales,
+    recorrer_prestamos_digitales,
     obtener_libros_digitales_populares
 )
 from app.utils.security import get_current_user
-from app.dependencias.redis import r
+from app.config.database import get_db, UnidadDeTrabajo
+from app.utils.cache import invalidar_tags
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/prestamos", tags=["Préstamos"])
 
 
 def invalidate_user_loans_cache(user_id: int):
-    """Invalida el cache de préstamos del usuario"""
-    r.delete(f"user_loans:{user_id}")
+    """Invalida el cache de préstamos del usuario (y sus recomendaciones, que usan el mismo tag)"""
+    invalidar_tags(f"user_loans:{user_id}")
 
 
 def verificar_bibliotecario(current_user: dict):
@@ -29,14 +37,15 @@ def verificar_bibliotecario(current_user: dict):
 @router.post("/digital")
 async def registrar_prestamo_route(
     data: dict,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: UnidadDeTrabajo = Depends(get_db)
 ):
     usuario_id = current_user.get("sub")
     if not usuario_id:
         raise HTTPException(status_code=401, detail="Usuario no autenticado")
 
     try:
-        resultado = await registrar_prestamo(usuario_id, data)
+        resultado = await registrar_prestamo(usuario_id, data, uow=db)
 
         if resultado.get("status") != "success":
             return {
@@ -61,18 +70,61 @@ async def registrar_prestamo_route(
     except HTTPException:
         raise
     except Exception as e:
-        print(f"❌ Error inesperado en préstamo digital: {e}")
+        logger.error(f"❌ Error inesperado en préstamo digital: {e}")
         raise HTTPException(status_code=500, detail="Error interno del servidor")
 
 
+def _fila_ndjson(fila: dict) -> bytes:
+    return (json.dumps(fila, default=lambda v: v.isoformat() if hasattr(v, "isoformat") else str(v),
+                       ensure_ascii=False) + "\n").encode("utf-8")
+
+
+async def _stream_ndjson(filas):
+    # Se agrupan varias líneas por chunk para no pagar un write por fila
+    buffer = []
+    async for fila in filas:
+        buffer.append(_fila_ndjson(fila))
+        if len(buffer) >= 500:
+            yield b"".join(buffer)
+            buffer.clear()
+    if buffer:
+        yield b"".join(buffer)
+
+
 #  Obtener todos los préstamos digitales (Bibliotecario)
 @router.get("/all-digital")
 async def obtener_prestamos_digitales(
+    request: Request,
+    usuario_id: int | None = None,
+    libro_id: int | None = None,
+    desde: date | None = Query(None, description="Fecha de préstamo desde (inclusive)"),
+    hasta: date | None = Query(None, description="Fecha de préstamo hasta (inclusive)"),
+    cursor: int | None = Query(None, description="Valor `siguiente` de la página anterior"),
+    limit: int = Query(100, ge=1, le=1000),
+    formato: str = Query("json", description="json (paginado) | ndjson (historial completo en streaming)"),
     current_user: dict = Depends(get_current_user)
 ):
+    """
+    Paginado por keyset (`cursor` + `limit`, respuesta con `siguiente`).
+    Con formato=ndjson o `Accept: application/x-ndjson` devuelve todos los
+    préstamos que cumplen los filtros, una fila JSON por línea, en streaming.
+    """
     verificar_bibliotecario(current_user)
+
+    filtros = {
+        "usuario_id": usuario_id,
+        "libro_id": libro_id,
+        "desde": desde.isoformat() if desde else None,
+        "hasta": hasta.isoformat() if hasta else None,
+    }
+
+    if formato == "ndjson" or "application/x-ndjson" in request.headers.get("accept", ""):
+        return StreamingResponse(
+            _stream_ndjson(recorrer_prestamos_digitales(**filtros)),
+            media_type="application/x-ndjson",
+        )
     
-    resultado = await obtener_todos_prestamos_digitales()
+    resultado = await obtener_todos_prestamos_digitales(**filtros, cursor_id=cursor, limit=limit)
     
     if resultado.get("status") == "success":
         return resultado
@@ -87,11 +139,12 @@ async def obtener_prestamos_digitales(
 @router.get("/digitales-populares")
 async def libros_digitales_populares(
     limit: int = 10,
+    ventana: str = "total",  # valores: 7d | 30d | total
     current_user: dict = Depends(get_current_user)
 ):
     verificar_bibliotecario(current_user)
     
-    resultado = await obtener_libros_digitales_populares(limit)
+    resultado = await obtener_libros_digitales_populares(limit, ventana)
     
     if resultado.get("status") == "success":
         return resultado
@@ -0,0 +1,32 @@
+from fastapi import APIRouter, Depends, Query
+from app.models.recomendaciones_model import obtener_recomendaciones_libro, obtener_recomendaciones_usuario
+from app.utils.contadores import disponibles_libros
+from app.utils.security import get_current_user
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/recommendations", tags=["Recomendaciones"])
+
+
+async def _con_disponibilidad(libros: list[dict]) -> list[dict]:
+    """Disponibilidad fresca desde Redis (copias: la lista puede venir del L1 compartido)"""
+    disponibles = await disponibles_libros({l["id"]: l["cantidad_disponible"] for l in libros})
+    return [{**l, "cantidad_disponible": disponibles.get(l["id"], l["cantidad_disponible"])} for l in libros]
+
+
+@router.get("/me")
+async def recomendaciones_para_mi(
+    limit: int = Query(10, ge=1, le=50),
+    current_user: dict = Depends(get_current_user)
+):
+    """Recomendaciones a partir de los préstamos y la wishlist recientes del usuario"""
+    libros = await obtener_recomendaciones_usuario(int(current_user["sub"]), limit)
+    return {"libros": await _con_disponibilidad(libros)}
+
+
+@router.get("/{libro_id}")
+async def recomendaciones_de_libro(libro_id: int, limit: int = Query(10, ge=1, le=50)):
+    """Libros que suelen usar los mismos lectores (vecinos precalculados cada noche)"""
+    libros = await obtener_recomendaciones_libro(libro_id, limit)
+    return {"libro_id": libro_id, "libros": await _con_disponibilidad(libros)}
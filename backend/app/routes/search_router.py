@@ -2,24 +2,25 @@ from fastapi import APIRouter, Query
 from app.config.database import get_cursor
 from typing import List, Dict, Any
 import httpx
+import os
+from app.utils.metricas import medir_upstream
+from app.utils.contadores import disponibles_libros
+from app.utils.cache import cacheado
+from app.utils.sugerencias import sugerir
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Apuntable a un doble local (p. ej. en app/scripts/bench_carga.py)
+OPENLIBRARY_URL = os.getenv("OPENLIBRARY_URL", "https://openlibrary.org")
 
 router = APIRouter(prefix="/search", tags=["Search"])
 
 
-@router.get("/books")
-async def search_books_hybrid(
-    q: str = Query(..., min_length=3, description="Término de búsqueda"),
-    limit: int = Query(20, ge=1, le=100, description="Límite de resultados")
-):
-    """
-    Búsqueda híbrida: Primero busca en libros locales, luego en OpenLibrary.
-    Los libros locales aparecen primero y están marcados con 'es_local: true'
-    """
-    
-    resultados_locales = []
-    resultados_openlibrary = []
-    
-    # 1️⃣ Buscar en base de datos local
+# Primario (no réplica): se invalida al editar libros y un miss tras invalidar
+# no debe cachear datos atrasados
+@cacheado("busqueda_local", ttl=300, tags=["libros"])
+async def _buscar_locales(q: str, limit: int) -> list[dict]:
     async with get_cursor() as (conn, cursor):
         await cursor.execute("""
             SELECT 
@@ -49,7 +50,48 @@ async def search_books_hybrid(
             LIMIT %s
         """, (f"%{q}%", f"%{q}%", f"%{q}%", f"%{q}%", limit))
         
-        libros_locales = await cursor.fetchall()
+        return await cursor.fetchall()
+
+
+@cacheado("busqueda_openlibrary", ttl=3600)
+async def _buscar_openlibrary(q: str, limit: int) -> list[dict] | None:
+    """Docs de OpenLibrary; None si falló (no se cachea y se reintenta en el próximo request)"""
+    try:
+        async with httpx.AsyncClient(timeout=10.0) as client:
+            with medir_upstream("openlibrary") as llamada:
+                response = await client.get(
+                    f"{OPENLIBRARY_URL}/search.json",
+                    params={"q": q, "limit": limit}
+                )
+                llamada.status = response.status_code
+            
+            if response.status_code == 200:
+                return response.json().get("docs", [])
+    
+    except Exception as e:
+        logger.warning(f"⚠️ Error al buscar en OpenLibrary: {e}")
+    return None
+
+
+@router.get("/books")
+async def search_books_hybrid(
+    q: str = Query(..., min_length=3, description="Término de búsqueda"),
+    limit: int = Query(20, ge=1, le=100, description="Límite de resultados")
+):
+    """
+    Búsqueda híbrida: Primero busca en libros locales, luego en OpenLibrary.
+    Los libros locales aparecen primero y están marcados con 'es_local: true'
+    """
+    
+    resultados_locales = []
+    resultados_openlibrary = []
+    q = q.strip().lower()
+    
+    # 1️⃣ Buscar en base de datos local (caché por término, se invalida al editar libros)
+    libros_locales = await _buscar_locales(q, limit)
+
+    # 🔢 Disponibilidad fresca desde Redis (la consulta pudo salir de una réplica o de caché)
+    disponibles = await disponibles_libros({l["id"]: l["cantidad_disponible"] for l in libros_locales})
 
     for libro in libros_locales:
         resultado = {
@@ -60,7 +102,7 @@ async def search_books_hybrid(
             "first_publish_year": int(str(libro["fecha_publicacion"])[:4]) if libro["fecha_publicacion"] else None,
             "editorial": libro["editorial_nombre"],
             "genero": libro["genero_nombre"],
-            "cantidad_disponible": libro["cantidad_disponible"],
+            "cantidad_disponible": disponibles.get(libro["id"], libro["cantidad_disponible"]),
             
             "es_local": True,
             "libro_id": libro["id"],
@@ -73,25 +115,10 @@ async def search_books_hybrid(
     libros_restantes = limit - len(resultados_locales)
     
     if libros_restantes > 0:
-        try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.get(
-                    f"https://openlibrary.org/search.json",
-                    params={"q": q, "limit": libros_restantes}
-                )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    libros_openlibrary = data.get("docs", [])
-                    
-                    # Marcar libros de OpenLibrary
-                    for libro in libros_openlibrary:
-                        libro["es_local"] = False
-                    
-                    resultados_openlibrary = libros_openlibrary
+        libros_openlibrary = await _buscar_openlibrary(q, libros_restantes) or []
         
-        except Exception as e:
-            print(f"⚠️ Error al buscar en OpenLibrary: {e}")
+        # Marcar libros de OpenLibrary (copias: la lista puede venir del L1 compartido)
+        resultados_openlibrary = [{**libro, "es_local": False} for libro in libros_openlibrary]
     
     # Combinar resultados: Locales primero, luego OpenLibrary
     resultados_combinados = resultados_locales + resultados_openlibrary
@@ -104,6 +131,20 @@ async def search_books_hybrid(
     }
 
 
+@router.get("/suggest")
+async def suggest(
+    q: str = Query(..., min_length=1, max_length=100, description="Lo que lleva escrito el usuario"),
+    limit: int = Query(8, ge=1, le=20)
+):
+    """
+    Autocompletado para cada tecla: títulos activos, autores y géneros que
+    empiezan (o tienen una palabra que empieza) por `q`. Sale del índice en
+    memoria (app/utils/sugerencias.py): sin BD ni OpenLibrary.
+    """
+    sugerencias = sugerir(q, limit)
+    return {"q": q, "listo": sugerencias is not None, "sugerencias": sugerencias or []}
+
+
 @router.get("/books/local-only")
 async def get_local_books(
     limit: int = Query(12, ge=1, le=100),
@@ -113,7 +154,7 @@ async def get_local_books(
     Obtiene solo libros locales (para recomendaciones mezcladas con OpenLibrary)
     """
     
-    async with get_cursor() as (conn, cursor):
+    async with get_cursor(intent="read") as (conn, cursor):
         await cursor.execute("""
             SELECT 
                 l.id,
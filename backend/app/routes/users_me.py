@@ -6,17 +6,21 @@ from app.models.user_model import (
     deactivate_user_by_id,
 )
 from app.utils.security import get_current_user
+from app.config.database import get_db, UnidadDeTrabajo
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
 
 @router.get("/me")
-async def get_current_user_data(current_user: dict = Depends(get_current_user)):
+async def get_current_user_data(current_user: dict = Depends(get_current_user), db: UnidadDeTrabajo = Depends(get_db)):
     user_id = current_user.get("sub")
     if not user_id:
         raise HTTPException(status_code=401, detail="Token inválido o expirado.")
     
-    user = await get_user_by_id(user_id)
+    user = await get_user_by_id(user_id, uow=db)
 
     if not user:
         raise HTTPException(status_code=404, detail="Usuario no encontrado.")
@@ -99,9 +103,9 @@ async def delete_current_user(current_user: dict = Depends(get_current_user)):
     
     try:
         resultado_prestamos = await cancelar_prestamos_por_desactivacion_cuenta(int(user_id))
-        print(f"📚 Préstamos cancelados: {resultado_prestamos}")
+        logger.info(f"📚 Préstamos cancelados: {resultado_prestamos}")
     except Exception as e:
-        print(f"⚠️ Error al cancelar préstamos: {e}")
+        logger.warning(f"⚠️ Error al cancelar préstamos: {e}")
         # No fallar si hay error, continuar con la desactivación
 
     # Desactivar cuenta
@@ -111,10 +115,8 @@ async def delete_current_user(current_user: dict = Depends(get_current_user)):
         raise HTTPException(status_code=500, detail="No se pudo desactivar el usuario")
 
     # 🧹 Limpiar caché de Redis
-    from app.dependencias.redis import r
-    r.delete(f"login_attempts:{user_id}")
-    r.delete(f"account_locked:{user_id}")
-    r.delete(f"prestamos_fisicos_usuario:{user_id}")
+    from app.utils.cache import invalidar_tags
+    invalidar_tags(f"prestamos_usuario:{user_id}", "estadisticas")
 
     return {
         "status": "success", 
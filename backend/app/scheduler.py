@@ -1,22 +1,82 @@
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from app.task.verificar_mora import verificar_y_bloquear_usuarios_con_mora
+from app.task.recordatorios import enviar_recordatorios_devolucion
+from app.task.atrasos import marcar_prestamos_atrasados
+from app.utils.contadores import reconciliar_contadores
+from app.utils.rankings import expirar_rankings, reconstruir_rankings
+from app.task.recomendaciones import recalcular_recomendaciones
+from app.task.jobs import programar
 
 scheduler = AsyncIOScheduler()
 
 def start_scheduler():
     """Inicia el scheduler de tareas automáticas"""
     
+    # Pasar préstamos vencidos a 'atrasado' a la 1:00 AM (antes de la verificación de mora)
+    scheduler.add_job(
+        programar('marcar_atrasados', marcar_prestamos_atrasados),
+        'cron',
+        hour=1,
+        minute=0,
+        id='marcar_atrasados'
+    )
+    
     # Ejecutar verificación diaria a las 2:00 AM
     scheduler.add_job(
-        verificar_y_bloquear_usuarios_con_mora,
+        programar('verificar_mora_diaria', verificar_y_bloquear_usuarios_con_mora),
         'cron',
         hour=2,
         minute=0,
         id='verificar_mora_diaria'
     )
     
+    # Recordatorios de devolución a las 8:00 AM (préstamos que vencen mañana)
+    scheduler.add_job(
+        programar('recordatorios_devolucion', enviar_recordatorios_devolucion),
+        'cron',
+        hour=8,
+        minute=0,
+        id='recordatorios_devolucion'
+    )
+    
+    # Reconciliar contadores de Redis contra MySQL cada 15 minutos
+    scheduler.add_job(
+        programar('reconciliar_contadores', reconciliar_contadores),
+        'interval',
+        minutes=15,
+        id='reconciliar_contadores'
+    )
+    
+    # Rankings: sacar de las ventanas 7d/30d el día que sale, justo después de medianoche
+    scheduler.add_job(
+        programar('expirar_rankings', expirar_rankings),
+        'cron',
+        hour=0,
+        minute=5,
+        id='expirar_rankings'
+    )
+    
+    # Rankings: reconstrucción semanal desde SQL (corrige cualquier desvío)
+    scheduler.add_job(
+        programar('reconstruir_rankings', reconstruir_rankings),
+        'cron',
+        day_of_week='sun',
+        hour=3,
+        minute=30,
+        id='reconstruir_rankings'
+    )
+    
+    # Recomendaciones: vecinos de cada libro recalculados cada noche a las 4:00 AM
+    scheduler.add_job(
+        programar('recalcular_recomendaciones', recalcular_recomendaciones),
+        'cron',
+        hour=4,
+        minute=0,
+        id='recalcular_recomendaciones'
+    )
+    
     scheduler.start()
-    print("Scheduler iniciado: Verificación de mora a las 2:00 AM")
+    print("Scheduler iniciado: atrasos a la 1:00 AM, mora a las 2:00 AM, recordatorios a las 8:00 AM")
 
 def stop_scheduler():
     """Detiene el scheduler"""
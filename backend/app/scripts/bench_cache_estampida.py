@@ -0,0 +1,84 @@
+"""
+Benchmark: estampida de misses sobre una función con @cacheado.
+
+Lanza N llamadas concurrentes a una función lenta (simula una consulta de
+200 ms) con la caché vacía. Con single-flight debe ejecutarse una sola vez y
+el resto esperar ese mismo resultado. Después repite la ronda ya caliente
+(hits de L1) y una tercera tras invalidar el tag.
+Funciona sin Redis (solo L1 + single-flight); con Redis también prueba L2.
+
+Uso: python -m app.scripts.bench_cache_estampida [clientes] [ms_consulta]
+"""
+import asyncio
+import statistics
+import sys
+import time
+
+from app.utils.cache import cacheado, invalidar_tags
+from app.utils.metricas import CACHE_CONSULTAS
+
+ejecuciones = 0
+
+
+def percentil(valores, p):
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(len(valores) * p))]
+
+
+def crear_funcion(ms_consulta: int):
+    @cacheado("bench_estampida", ttl=60, tags=["bench_estampida"])
+    async def consulta_lenta(libro_id: int) -> dict:
+        global ejecuciones
+        ejecuciones += 1
+        await asyncio.sleep(ms_consulta / 1000)
+        return {"libro_id": libro_id, "total": 42}
+
+    return consulta_lenta
+
+
+async def ronda(func, clientes: int, etiqueta: str):
+    global ejecuciones
+    ejecuciones = 0
+
+    async def cliente():
+        inicio = time.perf_counter()
+        valor = await func(7)
+        return valor, (time.perf_counter() - inicio) * 1000
+
+    inicio = time.perf_counter()
+    resultados = await asyncio.gather(*[cliente() for _ in range(clientes)])
+    total = time.perf_counter() - inicio
+
+    latencias = [ms for _, ms in resultados]
+    iguales = all(v == {"libro_id": 7, "total": 42} for v, _ in resultados)
+    print(f"{etiqueta:<22} ejecuciones={ejecuciones:<3} total={total * 1000:7.1f} ms · "
+          f"p50 {statistics.median(latencias):6.1f} ms · p99 {percentil(latencias, 0.99):6.1f} ms"
+          f"{'' if iguales else ' ❌ resultados distintos'}")
+    return ejecuciones
+
+
+async def main(clientes: int, ms_consulta: int):
+    func = crear_funcion(ms_consulta)
+    invalidar_tags("bench_estampida")
+
+    print(f"🐃 {clientes} clientes concurrentes · consulta de {ms_consulta} ms\n")
+    frias = await ronda(func, clientes, "Caché vacía")
+    calientes = await ronda(func, clientes, "Caché caliente")
+    invalidar_tags("bench_estampida")
+    tras_invalidar = await ronda(func, clientes, "Tras invalidar_tags")
+
+    print("\n📈 Métrica aeternum_cache_requests_total{cache=bench_estampida}:")
+    for (cache, resultado), valor in sorted(CACHE_CONSULTAS._valores.items()):
+        if cache == "bench_estampida":
+            print(f"   {resultado:<10} {valor:.0f}")
+
+    correcto = frias == 1 and calientes == 0 and tras_invalidar == 1
+    print(f"\n{'✅' if correcto else '❌'} Ejecuciones: {frias} / {calientes} / {tras_invalidar} (esperado 1 / 0 / 1)")
+    if not correcto:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    clientes = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    ms_consulta = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    asyncio.run(main(clientes, ms_consulta))
@@ -0,0 +1,356 @@
+"""
+Prueba de carga de punta a punta contra la app real (MySQL + Redis locales).
+
+1. --sembrar: llena la BD con una biblioteca sintética con app.scripts.generar_dataset
+   (mismas opciones de tamaño; por defecto --filas 100000). --limpiar la borra.
+2. Levanta dobles locales de OpenLibrary (/search.json) y Brevo (/v3/smtp/email)
+   con latencia configurable, para no depender de (ni golpear) los servicios reales.
+3. Arranca `uvicorn app.main:app` en un subproceso con OPENLIBRARY_URL y
+   BREVO_API_URL apuntando a los dobles. Con --url usa una app ya levantada
+   (que debe tener esas variables apuntando a los dobles).
+4. Reproduce una mezcla de tráfico con lectores virtuales (login, búsqueda,
+   wishlist, solicitud de préstamo, mis préstamos) y bibliotecarios que sondean
+   el dashboard y exportan.
+5. Reporta req/s y p50/p95/p99 por ruta. --salida guarda el reporte en JSON y
+   --comparar lo contrasta con uno anterior (exit 1 si alguna ruta empeora más
+   que --tolerancia).
+
+Requiere las variables DB_* (y REDIS_* si se usa Redis) del .env.
+
+Uso:
+  python -m app.scripts.bench_carga --sembrar [--filas 100000] [--usuarios 2000] ...
+  python -m app.scripts.bench_carga [--lectores 50] [--bibliotecarios 2] [--duracion 60]
+         [--latencia-upstream-ms 150] [--salida carga.json] [--comparar base.json]
+  python -m app.scripts.bench_carga --limpiar
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from app.config.database import init_db, close_db, get_cursor
+from app.scripts import generar_dataset
+from app.scripts.generar_dataset import BIBLIOTECARIO, CLAVE, DOMINIO, PALABRAS, pesos_zipf
+
+# Mezcla de acciones de un lector (pesos relativos)
+MEZCLA_LECTOR = {"buscar": 45, "wishlist": 20, "mis_prestamos": 15, "prestamo": 10, "login": 10}
+# Cada cuántos sondeos del dashboard exporta un bibliotecario
+EXPORTAR_CADA = 6
+
+
+# ---------------------------------------------------------------------------
+# 🎭 Dobles de OpenLibrary y Brevo
+# ---------------------------------------------------------------------------
+
+dobles = FastAPI()
+ESTADO_DOBLES = {"latencia_ms": 150.0, "busquedas": 0, "correos": 0}
+
+
+async def _latencia():
+    media = ESTADO_DOBLES["latencia_ms"] / 1000
+    await asyncio.sleep(random.uniform(0.5 * media, 1.5 * media))
+
+
+@dobles.get("/search.json")
+async def doble_openlibrary(q: str = "", limit: int = 20):
+    await _latencia()
+    ESTADO_DOBLES["busquedas"] += 1
+    return {
+        "numFound": limit,
+        "docs": [
+            {"key": f"/works/OLFALSO{i}W", "title": f"{q.title()} {i}", "author_name": ["Autor Externo"],
+             "cover_i": None, "first_publish_year": 2000 + i % 20}
+            for i in range(limit)
+        ],
+    }
+
+
+@dobles.post("/v3/smtp/email")
+async def doble_brevo(request: Request):
+    await _latencia()
+    cuerpo = await request.json()
+    ESTADO_DOBLES["correos"] += len(cuerpo.get("messageVersions") or [None])
+    return JSONResponse({"messageId": f"<carga-{ESTADO_DOBLES['correos']}@brevo.test>"}, status_code=201)
+
+
+async def iniciar_dobles(puerto: int) -> tuple[uvicorn.Server, asyncio.Task]:
+    servidor = uvicorn.Server(uvicorn.Config(dobles, host="127.0.0.1", port=puerto, log_level="warning"))
+    tarea = asyncio.create_task(servidor.serve())
+    while not servidor.started:
+        await asyncio.sleep(0.05)
+    return servidor, tarea
+
+
+async def iniciar_app(puerto: int, puerto_dobles: int, con_rate_limit: bool):
+    entorno = {
+        **os.environ,
+        "OPENLIBRARY_URL": f"http://127.0.0.1:{puerto_dobles}",
+        "BREVO_API_URL": f"http://127.0.0.1:{puerto_dobles}/v3/smtp/email",
+        "BREVO_API_KEY": os.getenv("BREVO_API_KEY") or "carga",
+        # Todos los lectores virtuales salen de 127.0.0.1
+        "LOGIN_MAX_ATTEMPTS_IP": "1000000",
+    }
+    if not con_rate_limit:
+        entorno["RATE_LIMIT_ACTIVO"] = "0"
+    proceso = await asyncio.create_subprocess_exec(
+        sys.executable, "-m", "uvicorn", "app.main:app",
+        "--host", "127.0.0.1", "--port", str(puerto), "--log-level", "warning",
+        env=entorno,
+    )
+    url = f"http://127.0.0.1:{puerto}"
+    async with httpx.AsyncClient(base_url=url) as client:
+        for _ in range(120):
+            try:
+                if (await client.get("/")).status_code == 200:
+                    return proceso, url
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.5)
+    proceso.terminate()
+    raise RuntimeError("La app no respondió en 60s")
+
+
+# ---------------------------------------------------------------------------
+# 🚦 Generador de carga
+# ---------------------------------------------------------------------------
+
+class Registro:
+    """Latencias (ms) y códigos de estado por ruta"""
+
+    def __init__(self):
+        self.latencias: dict[str, list[float]] = defaultdict(list)
+        self.estados: dict[str, Counter] = defaultdict(Counter)
+
+    async def pedir(self, client: httpx.AsyncClient, metodo: str, ruta: str, etiqueta: str | None = None, **kwargs):
+        etiqueta = etiqueta or f"{metodo} {ruta.split('?')[0]}"
+        inicio = time.perf_counter()
+        try:
+            respuesta = await client.request(metodo, ruta, **kwargs)
+            estado = str(respuesta.status_code)
+        except httpx.HTTPError as e:
+            respuesta, estado = None, type(e).__name__
+        self.latencias[etiqueta].append((time.perf_counter() - inicio) * 1000)
+        self.estados[etiqueta][estado] += 1
+        return respuesta
+
+
+def percentil(valores: list[float], p: float) -> float:
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(len(valores) * p))]
+
+
+async def _login(client, registro: Registro, correo: str) -> dict:
+    respuesta = await registro.pedir(client, "POST", "/auth/login", json={"correo": correo, "clave": CLAVE})
+    if respuesta is None or respuesta.status_code != 200:
+        return {}
+    return {"Authorization": f"Bearer {respuesta.json()['access_token']}"}
+
+
+async def lector(client, registro: Registro, correo: str, libros: list[dict], pesos: list[float], fin: float, pausa: float):
+    cabeceras = await _login(client, registro, correo)
+    acciones, pesos_accion = zip(*MEZCLA_LECTOR.items())
+    while time.monotonic() < fin:
+        accion = random.choices(acciones, weights=pesos_accion)[0]
+        libro = random.choices(libros, cum_weights=pesos)[0]
+
+        if accion == "login" or not cabeceras:
+            cabeceras = await _login(client, registro, correo) or cabeceras
+        elif accion == "buscar":
+            termino = random.choice(PALABRAS)
+            await registro.pedir(client, "GET", f"/search/books?q={termino}&limit=20")
+        elif accion == "mis_prestamos":
+            await registro.pedir(client, "GET", "/prestamos-fisicos/mis-prestamos", headers=cabeceras)
+        elif accion == "wishlist":
+            if random.random() < 0.75:
+                await registro.pedir(client, "GET", "/wishlist/list", headers=cabeceras)
+            else:
+                await registro.pedir(client, "POST", "/wishlist/add", headers=cabeceras, json={
+                    "openlibrary_key": libro["openlibrary_key"], "titulo": libro["titulo"],
+                    "autor": "Autor Carga", "genero": "No Clasificado", "editorial": "Desconocida",
+                })
+                await registro.pedir(client, "DELETE", f"/wishlist/delete/{libro['id']}",
+                                     etiqueta="DELETE /wishlist/delete/{id}", headers=cabeceras)
+        elif accion == "prestamo":
+            # Solicitar y cancelar: el lector no llega al límite de 2 activos
+            manana = (date.today() + timedelta(days=1)).isoformat()
+            respuesta = await registro.pedir(client, "POST", "/prestamos-fisicos/solicitar", headers=cabeceras,
+                                             json={"libro_id": libro["id"], "fecha_recogida": manana})
+            if respuesta is not None and respuesta.status_code == 200:
+                prestamo_id = respuesta.json()["data"]["prestamo_id"]
+                await registro.pedir(client, "PUT", f"/prestamos-fisicos/cancelar/{prestamo_id}",
+                                     etiqueta="PUT /prestamos-fisicos/cancelar/{id}", headers=cabeceras)
+
+        if pausa:
+            await asyncio.sleep(random.expovariate(1 / pausa))
+
+
+async def bibliotecario(client, registro: Registro, fin: float, intervalo: float):
+    cabeceras = await _login(client, registro, BIBLIOTECARIO)
+    sondeos = 0
+    while time.monotonic() < fin:
+        # El dashboard pide sus paneles en paralelo
+        await asyncio.gather(*(
+            registro.pedir(client, "GET", f"/estadisticas/bibliotecario/{panel}", headers=cabeceras)
+            for panel in ("generales", "prestamos-recientes", "alertas", "grafica-prestamos", "libros-populares")
+        ))
+        sondeos += 1
+        if sondeos % EXPORTAR_CADA == 0:
+            if sondeos // EXPORTAR_CADA % 2:
+                await registro.pedir(client, "GET", "/admin/books/export/excel", headers=cabeceras)
+            else:
+                await registro.pedir(client, "GET", "/prestamos/all-digital?formato=ndjson", headers=cabeceras)
+        await asyncio.sleep(intervalo)
+
+
+async def correr_carga(args, url: str) -> dict:
+    async with get_cursor() as (conn, cursor):
+        await cursor.execute(
+            "SELECT id, titulo, openlibrary_key FROM libros WHERE openlibrary_key LIKE %s", ("/works/CARGA%",)
+        )
+        libros = list(await cursor.fetchall())
+        await cursor.execute("SELECT correo FROM usuarios WHERE correo LIKE %s AND rol = 'usuario'", (f"carga%@{DOMINIO}",))
+        correos = [f["correo"] for f in await cursor.fetchall()]
+    if not libros or not correos:
+        print("❌ No hay datos de carga: corre primero con --sembrar")
+        sys.exit(1)
+    random.shuffle(libros)
+    pesos = pesos_zipf(len(libros))
+
+    registro = Registro()
+    limites = httpx.Limits(max_connections=args.lectores + 5 * args.bibliotecarios)
+    async with httpx.AsyncClient(base_url=url, timeout=60.0, limits=limites) as client:
+        inicio = time.monotonic()
+        fin = inicio + args.duracion
+        await asyncio.gather(
+            *(lector(client, registro, random.choice(correos), libros, pesos, fin, args.pausa)
+              for _ in range(args.lectores)),
+            *(bibliotecario(client, registro, fin, args.intervalo_dashboard) for _ in range(args.bibliotecarios)),
+        )
+        duracion = time.monotonic() - inicio
+
+    rutas = {}
+    for ruta, latencias in sorted(registro.latencias.items()):
+        rutas[ruta] = {
+            "peticiones": len(latencias),
+            "rps": round(len(latencias) / duracion, 2),
+            "p50_ms": round(percentil(latencias, 0.50), 1),
+            "p95_ms": round(percentil(latencias, 0.95), 1),
+            "p99_ms": round(percentil(latencias, 0.99), 1),
+            "estados": dict(registro.estados[ruta]),
+        }
+    return {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "config": {
+            "lectores": args.lectores, "bibliotecarios": args.bibliotecarios, "duracion_s": args.duracion,
+            "pausa_s": args.pausa, "latencia_upstream_ms": args.latencia_upstream_ms,
+            "libros": len(libros), "usuarios": len(correos),
+        },
+        "total": {
+            "peticiones": sum(r["peticiones"] for r in rutas.values()),
+            "rps": round(sum(r["peticiones"] for r in rutas.values()) / duracion, 2),
+        },
+        "upstream": {"openlibrary_busquedas": ESTADO_DOBLES["busquedas"], "brevo_correos": ESTADO_DOBLES["correos"]},
+        "rutas": rutas,
+    }
+
+
+def imprimir(reporte: dict):
+    print(f"\n{'ruta':<52}{'n':>7}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}  estados")
+    for ruta, datos in reporte["rutas"].items():
+        estados = " ".join(f"{k}:{v}" for k, v in sorted(datos["estados"].items()))
+        print(f"{ruta:<52}{datos['peticiones']:>7}{datos['rps']:>9.1f}"
+              f"{datos['p50_ms']:>9.1f}{datos['p95_ms']:>9.1f}{datos['p99_ms']:>9.1f}  {estados}")
+    total = reporte["total"]
+    print(f"\n🚦 {total['peticiones']} peticiones · {total['rps']:.1f} req/s · "
+          f"OpenLibrary {reporte['upstream']['openlibrary_busquedas']} búsquedas · "
+          f"Brevo {reporte['upstream']['brevo_correos']} correos")
+
+
+def comparar(reporte: dict, ruta_base: str, tolerancia: float) -> bool:
+    """Compara p95 y req/s por ruta contra un reporte anterior; True si no hay regresiones"""
+    with open(ruta_base, encoding="utf-8") as f:
+        base = json.load(f)
+    regresiones = 0
+    print(f"\n📊 Contra {ruta_base} ({base.get('fecha')}), tolerancia {tolerancia:.0%}")
+    for ruta, datos in reporte["rutas"].items():
+        anterior = base["rutas"].get(ruta)
+        if not anterior:
+            continue
+        cambio = (datos["p95_ms"] - anterior["p95_ms"]) / max(anterior["p95_ms"], 0.1)
+        peor = cambio > tolerancia
+        regresiones += peor
+        print(f"{'❌' if peor else '  '} {ruta:<52} p95 {anterior['p95_ms']:>8.1f} → {datos['p95_ms']:>8.1f} ms "
+              f"({cambio:+.0%}) · req/s {anterior['rps']:.1f} → {datos['rps']:.1f}")
+    print(f"{'✅' if not regresiones else '❌'} {regresiones} ruta(s) con regresión de p95")
+    return not regresiones
+
+
+async def main(args):
+    await init_db(None)
+    try:
+        if args.limpiar:
+            await generar_dataset.limpiar()
+            return
+        if args.sembrar:
+            tamanos = generar_dataset.tamanos_para(
+                args.filas, **{tabla: getattr(args, tabla) for tabla in generar_dataset.PROPORCIONES}
+            )
+            await generar_dataset.generar(tamanos, args)
+            return
+
+        ESTADO_DOBLES["latencia_ms"] = args.latencia_upstream_ms
+        servidor_dobles, tarea_dobles = await iniciar_dobles(args.puerto_dobles)
+        proceso = None
+        try:
+            url = args.url
+            if not url:
+                proceso, url = await iniciar_app(args.puerto_app, args.puerto_dobles, args.con_rate_limit)
+            reporte = await correr_carga(args, url)
+        finally:
+            if proceso is not None:
+                proceso.terminate()
+                await proceso.wait()
+            servidor_dobles.should_exit = True
+            await tarea_dobles
+    finally:
+        await close_db()
+
+    imprimir(reporte)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(reporte, f, ensure_ascii=False, indent=2)
+        print(f"💾 Reporte guardado en {args.salida}")
+    if args.comparar and not comparar(reporte, args.comparar, args.tolerancia):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prueba de carga de punta a punta")
+    parser.add_argument("--sembrar", action="store_true")
+    parser.add_argument("--limpiar", action="store_true")
+    generar_dataset.agregar_argumentos(parser)
+    parser.set_defaults(filas=100_000)
+    parser.add_argument("--lectores", type=int, default=50)
+    parser.add_argument("--bibliotecarios", type=int, default=2)
+    parser.add_argument("--duracion", type=float, default=60)
+    parser.add_argument("--pausa", type=float, default=0.5, help="Pausa media entre acciones de un lector (s)")
+    parser.add_argument("--intervalo-dashboard", type=float, default=5)
+    parser.add_argument("--latencia-upstream-ms", type=float, default=150)
+    parser.add_argument("--puerto-app", type=int, default=8765)
+    parser.add_argument("--puerto-dobles", type=int, default=8766)
+    parser.add_argument("--url", help="App ya levantada (no se arranca un subproceso)")
+    parser.add_argument("--con-rate-limit", action="store_true", help="No desactivar RATE_LIMIT_ACTIVO en la app")
+    parser.add_argument("--salida", help="Archivo JSON para el reporte")
+    parser.add_argument("--comparar", help="Reporte JSON anterior contra el que comparar")
+    parser.add_argument("--tolerancia", type=float, default=0.2, help="Empeoramiento de p95 admitido (0.2 = 20%%)")
+    asyncio.run(main(parser.parse_args()))
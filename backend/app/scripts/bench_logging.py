@@ -0,0 +1,86 @@
+"""
+Benchmark: throughput de un endpoint que loguea como get_current_user
+(~6 líneas por request) con print() contra el logging en cola de
+app.config.logging_config (DEBUG muestreado / solo INFO).
+No necesita MySQL ni Redis: monta una app mínima y la llama con httpx.
+
+Los resultados salen por stderr; stdout recibe los logs. Para ver el efecto
+de un pipe lento/lleno:
+    python -m app.scripts.bench_logging 5000 | (sleep 3; cat > /dev/null)
+
+Uso: python -m app.scripts.bench_logging [requests] [concurrencia]
+"""
+import asyncio
+import logging
+import sys
+import time
+
+import httpx
+from fastapi import FastAPI
+
+from app.config import logging_config
+
+app = FastAPI()
+logger = logging.getLogger("app.bench")
+
+
+@app.get("/print/{user_id}")
+async def con_print(user_id: int):
+    print(f"🔍 Verificando sesión usuario {user_id}: user_session_invalid=None")
+    print(f"🔍 Ejecutando query: SELECT estado, motivo_bloqueo FROM usuarios WHERE id = %s con user_id={user_id}")
+    print(f"🔍 Usuario {user_id} - Estado en BD: Activo")
+    print(f"✅ Usuario {user_id} validado correctamente con estado: Activo")
+    print(f"🔄 Obteniendo wishlist para usuario {user_id}")
+    print(f"⚡ Cache hit para usuario {user_id}")
+    return {"ok": True}
+
+
+@app.get("/logging/{user_id}")
+async def con_logging(user_id: int):
+    logger.debug(f"🔍 Verificando sesión usuario {user_id}: user_session_invalid=None")
+    logger.debug(f"🔍 Ejecutando query: SELECT estado, motivo_bloqueo FROM usuarios WHERE id = %s con user_id={user_id}")
+    logger.debug(f"🔍 Usuario {user_id} - Estado en BD: Activo")
+    logger.debug(f"✅ Usuario {user_id} validado correctamente con estado: Activo")
+    logger.debug(f"🔄 Obteniendo wishlist para usuario {user_id}")
+    logger.info(f"⚡ Cache hit para usuario {user_id}")
+    return {"ok": True}
+
+
+async def medir(client, ruta: str, total: int, concurrencia: int) -> float:
+    semaforo = asyncio.Semaphore(concurrencia)
+
+    async def uno(i):
+        async with semaforo:
+            await client.get(f"{ruta}/{i}")
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(uno(i) for i in range(total)))
+    return total / (time.perf_counter() - inicio)
+
+
+async def main(total: int, concurrencia: int):
+    logging_config.configurar_logging()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.get("/logging/0")
+
+        resultados = {"print": await medir(client, "/print", total, concurrencia)}
+
+        logger.setLevel(logging.DEBUG)
+        resultados[f"logging DEBUG (1 de {logging_config.LOG_MUESTREO_DEBUG})"] = \
+            await medir(client, "/logging", total, concurrencia)
+
+        logger.setLevel(logging.INFO)
+        resultados["logging INFO"] = await medir(client, "/logging", total, concurrencia)
+
+    logging_config.detener_logging()
+    for modo, rps in resultados.items():
+        print(f"{modo:<28} {rps:>10.0f} req/s", file=sys.stderr)
+    print(f"logs descartados (cola llena): {logging_config.logs_descartados()}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 3000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 50,
+    ))
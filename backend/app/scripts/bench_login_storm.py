@@ -0,0 +1,91 @@
+"""
+Benchmark: latencia de otros endpoints durante una ráfaga de logins.
+
+Compara bcrypt ejecutado dentro del handler async (bloquea el event loop)
+contra bcrypt en el pool de procesos (app.utils.cpu_offload).
+No necesita MySQL ni Redis: monta una app mínima y la llama con httpx.
+
+Uso: python -m app.scripts.bench_login_storm [logins_concurrentes]
+"""
+import asyncio
+import statistics
+import sys
+import time
+
+import httpx
+from fastapi import FastAPI
+
+from app.utils.security import hash_password, verify_password, verify_password_async
+from app.utils.cpu_offload import iniciar_pool_cpu, cerrar_pool_cpu, obtener_metricas_cpu
+
+HASH = hash_password("clave-de-prueba")
+
+app = FastAPI()
+
+
+@app.post("/login-inline")
+async def login_inline():
+    return {"ok": verify_password("clave-de-prueba", HASH)}
+
+
+@app.post("/login-pool")
+async def login_pool():
+    return {"ok": await verify_password_async("clave-de-prueba", HASH)}
+
+
+@app.get("/ping")
+async def ping():
+    return {"ok": True}
+
+
+def percentil(valores, p):
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(len(valores) * p))]
+
+
+async def medir(client, ruta_login: str, logins: int):
+    latencias_ping = []
+    terminado = asyncio.Event()
+
+    async def sondear():
+        while not terminado.is_set():
+            inicio = time.perf_counter()
+            await client.get("/ping")
+            latencias_ping.append((time.perf_counter() - inicio) * 1000)
+            await asyncio.sleep(0.01)
+
+    sonda = asyncio.create_task(sondear())
+    inicio = time.perf_counter()
+    respuestas = await asyncio.gather(*(client.post(ruta_login) for _ in range(logins)))
+    duracion = time.perf_counter() - inicio
+    terminado.set()
+    await sonda
+
+    return {
+        "ruta": ruta_login,
+        "logins": logins,
+        "duracion_s": round(duracion, 2),
+        "rechazos_429": sum(1 for resp in respuestas if resp.status_code == 429),
+        "ping_muestras": len(latencias_ping),
+        "ping_p50_ms": round(statistics.median(latencias_ping), 2),
+        "ping_p99_ms": round(percentil(latencias_ping, 0.99), 2),
+        "ping_max_ms": round(max(latencias_ping), 2),
+    }
+
+
+async def main(logins: int):
+    iniciar_pool_cpu()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        # Calentar los procesos del pool
+        await client.post("/login-pool")
+
+        for ruta in ("/login-inline", "/login-pool"):
+            print(await medir(client, ruta, logins))
+
+    print("Pool CPU:", obtener_metricas_cpu())
+    cerrar_pool_cpu()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 20))
@@ -0,0 +1,165 @@
+"""
+Benchmark del listado de préstamos digitales (bibliotecario).
+
+Compara, sobre la tabla `prestamos` tal como esté:
+  1. Legado: el SELECT completo con fetchall (lo que hacía /all-digital).
+  2. Streaming NDJSON: recorrer_prestamos_digitales (cursor de servidor) + serialización.
+  3. Paginación: primera página, página profunda por keyset y la misma con OFFSET.
+Para 1 y 2 mide tiempo y pico de memoria de Python (tracemalloc).
+
+Con --sembrar N primero completa la tabla hasta N préstamos con filas de prueba
+(título "[bench] ..."), usando usuarios y libros existentes. --limpiar las borra.
+Requiere las variables DB_* del .env.
+
+Uso: python -m app.scripts.bench_prestamos_digitales [--sembrar 1000000] [--limpiar]
+"""
+import asyncio
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from app.config.database import init_db, close_db, get_cursor
+from app.models.prestamo_model import (
+    _SELECT_PRESTAMOS_DIGITALES,
+    obtener_todos_prestamos_digitales,
+    recorrer_prestamos_digitales,
+)
+from app.routes.prestamo_router import _fila_ndjson
+
+LOTE_INSERT = 5000
+PREFIJO = "[bench] "
+
+
+async def sembrar(objetivo: int):
+    async with get_cursor() as (conn, cursor):
+        await cursor.execute("SELECT COUNT(*) as total FROM prestamos")
+        actuales = (await cursor.fetchone())["total"]
+        await cursor.execute("SELECT id FROM usuarios")
+        usuarios = [f["id"] for f in await cursor.fetchall()]
+        await cursor.execute("SELECT id, titulo, autor_id FROM libros")
+        libros = await cursor.fetchall()
+    if not usuarios or not libros:
+        print("❌ Se necesitan usuarios y libros en la BD")
+        sys.exit(1)
+
+    faltan = objetivo - actuales
+    if faltan <= 0:
+        print(f"📦 Ya hay {actuales} préstamos digitales")
+        return
+    print(f"🌱 Insertando {faltan} préstamos digitales de prueba...")
+
+    inicio_fechas = datetime.now() - timedelta(days=3 * 365)
+    inicio = time.perf_counter()
+    # Las fechas crecen con el id, como en producción
+    paso = (3 * 365 * 86400) / faltan
+    for desde in range(0, faltan, LOTE_INSERT):
+        filas = []
+        for i in range(desde, min(desde + LOTE_INSERT, faltan)):
+            libro = random.choice(libros)
+            filas += [
+                random.choice(usuarios), libro["id"], PREFIJO + libro["titulo"][:180],
+                libro["autor_id"], inicio_fechas + timedelta(seconds=i * paso),
+            ]
+        async with get_cursor() as (conn, cursor):
+            await cursor.execute(
+                f"""
+                INSERT INTO prestamos (usuario_id, libro_id, titulo, autor_id, fecha_prestamo)
+                VALUES {", ".join(["(%s, %s, %s, %s, %s)"] * (len(filas) // 5))}
+                """,
+                filas,
+            )
+            await conn.commit()
+    print(f"   {faltan} filas en {time.perf_counter() - inicio:.1f}s\n")
+
+
+async def limpiar():
+    borradas = 0
+    while True:
+        async with get_cursor() as (conn, cursor):
+            await cursor.execute("DELETE FROM prestamos WHERE titulo LIKE %s LIMIT 10000", (PREFIJO + "%",))
+            n = cursor.rowcount
+            await conn.commit()
+        borradas += n
+        if n == 0:
+            break
+    print(f"🧹 {borradas} préstamos de prueba borrados")
+
+
+async def medir(nombre: str, corrutina):
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    filas = await corrutina
+    segundos = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{nombre:<28} {filas:>9} filas · {segundos:6.2f}s · pico memoria {pico / 1024 / 1024:8.1f} MB")
+
+
+async def legado():
+    async with get_cursor("reporting", intent="read") as (conn, cursor):
+        await cursor.execute(f"{_SELECT_PRESTAMOS_DIGITALES} ORDER BY p.fecha_prestamo DESC")
+        prestamos = await cursor.fetchall()
+        cuerpo = [_fila_ndjson(p) for p in prestamos]
+    return len(cuerpo)
+
+
+async def streaming():
+    filas = 0
+    async for fila in recorrer_prestamos_digitales():
+        _fila_ndjson(fila)
+        filas += 1
+    return filas
+
+
+async def latencia(consulta, params, repeticiones: int = 20) -> float:
+    tiempos = []
+    for _ in range(repeticiones):
+        async with get_cursor("reporting", intent="read") as (conn, cursor):
+            inicio = time.perf_counter()
+            await cursor.execute(consulta, params)
+            await cursor.fetchall()
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos)
+
+
+async def paginacion():
+    async with get_cursor("reporting", intent="read") as (conn, cursor):
+        await cursor.execute("SELECT COUNT(*) as total, MAX(id) as max_id FROM prestamos")
+        info = await cursor.fetchone()
+    profundidad = info["total"] // 2
+    async with get_cursor("reporting", intent="read") as (conn, cursor):
+        await cursor.execute("SELECT id FROM prestamos ORDER BY id DESC LIMIT 1 OFFSET %s", (profundidad,))
+        fila = await cursor.fetchone()
+    corte = fila["id"] if fila else info["max_id"]
+
+    inicio = time.perf_counter()
+    await obtener_todos_prestamos_digitales(limit=100)
+    primera = (time.perf_counter() - inicio) * 1000
+
+    keyset = await latencia(f"{_SELECT_PRESTAMOS_DIGITALES} WHERE p.id < %s ORDER BY p.id DESC LIMIT 101", (corte,))
+    offset = await latencia(f"{_SELECT_PRESTAMOS_DIGITALES} ORDER BY p.id DESC LIMIT 101 OFFSET %s", (profundidad,))
+    print(f"\n📄 Página 1: {primera:.1f} ms")
+    print(f"📄 Página a {profundidad} filas de profundidad: keyset {keyset:.1f} ms · OFFSET {offset:.1f} ms")
+
+
+async def main():
+    await init_db(None)
+    try:
+        if "--limpiar" in sys.argv:
+            await limpiar()
+            return
+        if "--sembrar" in sys.argv:
+            await sembrar(int(sys.argv[sys.argv.index("--sembrar") + 1]))
+
+        await medir("Legado (fetchall)", legado())
+        await medir("Streaming NDJSON", streaming())
+        await paginacion()
+    finally:
+        await close_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,119 @@
+"""
+Benchmark del job de recomendaciones (app/task/recomendaciones.py).
+
+Sintético (por defecto, sin BD): genera N interacciones con popularidad Zipf y
+mide tiempo y pico de memoria de calcular_vecinos para cada tamaño de bloque.
+Con --bd corre el job completo contra MySQL (leer, calcular, guardar) y mide la
+latencia de /recommendations/{libro_id} sin caché y con caché.
+Requiere numpy y scipy; --bd además las variables DB_* del .env.
+
+Uso: python -m app.scripts.bench_recomendaciones [--interacciones 1000000]
+         [--usuarios 50000] [--libros 20000] [--bloques 500,2000,8000]
+     python -m app.scripts.bench_recomendaciones --bd
+"""
+import argparse
+import asyncio
+import json
+import resource
+import statistics
+import time
+import tracemalloc
+from array import array
+
+from app.task.recomendaciones import RECOMENDACIONES_K, calcular_vecinos
+
+
+def interacciones_sinteticas(n: int, usuarios: int, libros: int) -> tuple[array, array, array]:
+    import numpy as np
+
+    rng = np.random.default_rng(42)
+
+    def zipf(tamano: int, s: float) -> np.ndarray:
+        pesos = 1 / np.arange(1, tamano + 1) ** s
+        return rng.choice(tamano, size=n, p=pesos / pesos.sum())
+
+    u = zipf(usuarios, 0.8).astype(np.int64) + 1
+    l = rng.permutation(libros)[zipf(libros, 1.1)].astype(np.int64) + 1
+    p = rng.choice(np.array([1, 2, 3], dtype=np.float32), size=n, p=[0.4, 0.25, 0.35])
+    return array("q", u.tobytes()), array("q", l.tobytes()), array("f", p.tobytes())
+
+
+def medir_calculo(datos: tuple, bloque: int) -> dict:
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    filas = calcular_vecinos(*datos, bloque=bloque)
+    segundos = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    vecinos = [len(json.loads(v)) for _, v in filas]
+    return {
+        "bloque": bloque,
+        "segundos": segundos,
+        "pico_mb": pico / 1024 / 1024,
+        "libros": len(filas),
+        "vecinos_promedio": statistics.mean(vecinos) if vecinos else 0,
+    }
+
+
+def sintetico(args):
+    inicio = time.perf_counter()
+    datos = interacciones_sinteticas(args.interacciones, args.usuarios, args.libros)
+    entrada_mb = sum(len(a) * a.itemsize for a in datos) / 1024 / 1024
+    print(f"🎲 {args.interacciones} interacciones ({args.usuarios} usuarios, {args.libros} libros) "
+          f"generadas en {time.perf_counter() - inicio:.1f}s · {entrada_mb:.0f} MB de entrada\n")
+
+    print(f"{'bloque':>8}{'tiempo':>10}{'pico memoria':>15}{'libros':>9}{'vecinos/libro':>15}")
+    for bloque in args.bloques:
+        r = medir_calculo(datos, bloque)
+        print(f"{r['bloque']:>8}{r['segundos']:>9.1f}s{r['pico_mb']:>12.0f} MB{r['libros']:>9}"
+              f"{r['vecinos_promedio']:>15.1f}")
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"\nRSS máximo del proceso: {maxrss:.0f} MB (k={RECOMENDACIONES_K})")
+
+
+async def con_bd():
+    from app.config.database import init_db, close_db, get_cursor
+    from app.models.recomendaciones_model import obtener_recomendaciones_libro
+    from app.task.recomendaciones import recalcular_recomendaciones
+
+    await init_db(None)
+    try:
+        inicio = time.perf_counter()
+        resultado = await recalcular_recomendaciones()
+        print(f"🤝 {resultado['detalle']} ({time.perf_counter() - inicio:.1f}s)")
+
+        async with get_cursor("reporting", intent="read") as (conn, cursor):
+            await cursor.execute("SELECT libro_id FROM recomendaciones_libros ORDER BY RAND() LIMIT 200")
+            libros = [f["libro_id"] for f in await cursor.fetchall()]
+        if not libros:
+            return
+
+        for nombre, consulta in (("sin caché", obtener_recomendaciones_libro.sin_cache),
+                                 ("con caché", obtener_recomendaciones_libro)):
+            if nombre == "con caché":
+                for libro_id in libros:
+                    await consulta(libro_id, 10)
+            tiempos = []
+            for libro_id in libros:
+                t = time.perf_counter()
+                await consulta(libro_id, 10)
+                tiempos.append((time.perf_counter() - t) * 1000)
+            tiempos.sort()
+            print(f"   /recommendations/{{id}} {nombre}: p50 {statistics.median(tiempos):.3f} ms · "
+                  f"p99 {tiempos[int(len(tiempos) * 0.99) - 1]:.3f} ms")
+    finally:
+        await close_db()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de recomendaciones item-item")
+    parser.add_argument("--bd", action="store_true", help="Job completo contra MySQL")
+    parser.add_argument("--interacciones", type=int, default=1_000_000)
+    parser.add_argument("--usuarios", type=int, default=50_000)
+    parser.add_argument("--libros", type=int, default=20_000)
+    parser.add_argument("--bloques", type=lambda v: [int(b) for b in v.split(",")], default=[500, 2000, 8000])
+    argumentos = parser.parse_args()
+    if argumentos.bd:
+        asyncio.run(con_bd())
+    else:
+        sintetico(argumentos)
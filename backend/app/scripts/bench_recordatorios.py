@@ -0,0 +1,109 @@
+"""
+Benchmark: recordatorios de devolución para N préstamos que vencen mañana.
+
+Compara el envío anterior (un request a Brevo por préstamo, en serie) con el
+pipeline por lotes (render masivo + messageVersions + token bucket), contra un
+Brevo simulado con latencia fija. Verifica además que una segunda corrida no
+reenvía nada. No necesita MySQL, Redis ni BREVO_API_KEY.
+
+Uso: python -m app.scripts.bench_recordatorios [prestamos] [latencia_ms]
+"""
+import asyncio
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+# Tope de tasa alto por defecto para medir el pipeline y no el límite del plan de Brevo
+os.environ.setdefault("BREVO_CORREOS_POR_SEGUNDO", "5000")
+os.environ.setdefault("BREVO_LOTE", "500")
+os.environ.setdefault("BREVO_CONCURRENCIA", "4")
+
+import httpx
+
+from app.task.recordatorios import armar_recordatorios
+from app.utils.email_lotes import BREVO_CONCURRENCIA, BREVO_CORREOS_POR_SEGUNDO, BREVO_LOTE, enviar_correos_en_lotes
+
+MUESTRA_SERIE = 200
+
+
+def generar_prestamos(n: int) -> list[dict]:
+    manana = date.today() + timedelta(days=1)
+    return [
+        {
+            "id": i,
+            "titulo": f"Libro de prueba {random.randint(1, 5000)}",
+            "fecha_devolucion": manana,
+            "nombre": f"Usuario{i}",
+            "apellido": "Bench",
+            "correo": f"usuario{i}@bench.test",
+        }
+        for i in range(1, n + 1)
+    ]
+
+
+def brevo_simulado(latencia_s: float, contador: dict):
+    async def handler(request: httpx.Request):
+        contador["requests"] += 1
+        await asyncio.sleep(latencia_s)
+        return httpx.Response(201, json={"messageId": f"<{contador['requests']}@bench>"})
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://brevo")
+
+
+async def envio_en_serie(prestamos: list[dict], latencia_s: float) -> float:
+    """Un request por préstamo (como send_recordatorio_devolucion en un bucle); extrapolado"""
+    contador = {"requests": 0}
+    muestra = prestamos[:MUESTRA_SERIE]
+    async with brevo_simulado(latencia_s, contador) as cliente:
+        inicio = time.perf_counter()
+        for mensaje in armar_recordatorios(muestra, 1):
+            await enviar_correos_en_lotes([mensaje], cliente=cliente)
+        transcurrido = time.perf_counter() - inicio
+    return transcurrido / len(muestra) * len(prestamos)
+
+
+async def envio_en_lotes(prestamos: list[dict], latencia_s: float, marcados: set) -> dict:
+    contador = {"requests": 0}
+
+    async def marcar(lote):
+        marcados.update(m["prestamo_id"] for m in lote)
+
+    pendientes = [p for p in prestamos if p["id"] not in marcados]
+    async with brevo_simulado(latencia_s, contador) as cliente:
+        inicio = time.perf_counter()
+        mensajes = armar_recordatorios(pendientes, 1)
+        render = time.perf_counter() - inicio
+        resultado = await enviar_correos_en_lotes(mensajes, al_enviar=marcar, cliente=cliente)
+        total = time.perf_counter() - inicio
+    return {**resultado, "render_s": render, "total_s": total}
+
+
+async def main(n: int, latencia_ms: float):
+    import logging
+    logging.disable(logging.INFO)
+    latencia_s = latencia_ms / 1000
+    prestamos = generar_prestamos(n)
+    print(f"📦 {n} préstamos · Brevo simulado a {latencia_ms:.0f} ms/request · "
+          f"lote={BREVO_LOTE} concurrencia={BREVO_CONCURRENCIA} tope={BREVO_CORREOS_POR_SEGUNDO:.0f}/s\n")
+
+    serie = await envio_en_serie(prestamos, latencia_s)
+    print(f"🐢 En serie (1 request/correo): ~{serie:.1f}s estimado a partir de {MUESTRA_SERIE} envíos")
+
+    marcados: set = set()
+    lotes = await envio_en_lotes(prestamos, latencia_s, marcados)
+    print(f"🚀 Por lotes: {lotes['total_s']:.2f}s ({lotes['enviados'] / lotes['total_s']:.0f} correos/s), "
+          f"render {lotes['render_s'] * 1000:.0f} ms, {lotes['requests']} requests, "
+          f"{lotes['fallidos']} fallidos")
+    print(f"   Mejora: x{serie / lotes['total_s']:.0f}")
+
+    repeticion = await envio_en_lotes(prestamos, latencia_s, marcados)
+    estado = "✅" if repeticion["enviados"] == 0 else "❌"
+    print(f"{estado} Segunda corrida: {repeticion['enviados']} reenviados, {repeticion['requests']} requests")
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    latencia = float(sys.argv[2]) if len(sys.argv) > 2 else 150
+    asyncio.run(main(n, latencia))
@@ -0,0 +1,115 @@
+"""
+Benchmark del índice de autocompletado (app/utils/sugerencias.py), sin BD.
+
+Arma el índice con N títulos sintéticos (vocabulario amplio, popularidad Zipf),
+mide memoria retenida y pico de construcción (tracemalloc), tiempo de
+construcción, latencia de /search/suggest para prefijos reales de 1 a 10
+caracteres y el costo de un alta/edición de libro.
+
+Uso: python -m app.scripts.bench_sugerencias [--titulos 100000] [--consultas 20000]
+"""
+import argparse
+import random
+import statistics
+import time
+import tracemalloc
+
+from app.scripts.generar_dataset import PALABRAS
+from app.utils.sugerencias import SUGERENCIAS_MAX_CLAVES, IndiceSugerencias, normalizar
+
+SILABAS = ["ma", "ri", "to", "sa", "le", "con", "dor", "mi", "pe", "ra", "na", "tos", "cu", "ve",
+           "al", "ba", "lo", "en", "gar", "ti", "que", "ro", "nes", "la", "ci", "bre", "des", "mon"]
+ARTICULOS = ["el", "la", "de", "los", "las", "del", "y", "en"]
+
+
+def catalogo(titulos: int, rng: random.Random) -> tuple[list, list, list, dict]:
+    vocabulario = PALABRAS + ["".join(rng.choices(SILABAS, k=rng.randint(2, 4))) for _ in range(20000)]
+    libros = []
+    for libro_id in range(1, titulos + 1):
+        palabras = []
+        for _ in range(rng.randint(1, 6)):
+            if palabras and rng.random() < 0.3:
+                palabras.append(rng.choice(ARTICULOS))
+            palabras.append(rng.choice(vocabulario))
+        libros.append((libro_id, " ".join(palabras).capitalize()))
+    autores = [(i, f"{rng.choice(vocabulario).capitalize()} {rng.choice(vocabulario).capitalize()}",
+                rng.randint(1, 30)) for i in range(1, titulos // 20 + 1)]
+    generos = [(i, f"Género {p}", rng.randint(10, 5000)) for i, p in enumerate(PALABRAS, 1)]
+    pesos = {libro_id: int(1000 / k) for k, libro_id in enumerate(rng.sample(range(1, titulos + 1), titulos // 5), 1)}
+    return libros, autores, generos, pesos
+
+
+def percentil(valores: list[float], p: float) -> float:
+    return valores[min(len(valores) - 1, int(len(valores) * p))]
+
+
+def main(args):
+    rng = random.Random(7)
+    libros, autores, generos, pesos = catalogo(args.titulos, rng)
+
+    inicio = time.perf_counter()
+    IndiceSugerencias(libros, autores, generos, pesos)
+    construccion = time.perf_counter() - inicio
+
+    # tracemalloc aparte: multiplica el tiempo de construcción
+    tracemalloc.start()
+    indice = IndiceSugerencias(libros, autores, generos, pesos)
+    retenida, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"🔤 {len(indice.textos)} entradas ({args.titulos} títulos), {len(indice.codigos)} claves "
+          f"(tope {SUGERENCIAS_MAX_CLAVES}), {len(indice.top)} prefijos precalculados")
+    # Los títulos ya existían antes de tracemalloc (el índice los comparte): memoria() sí los cuenta
+    memoria = indice.memoria()
+    print(f"   construcción {construccion:.2f}s · índice {memoria / 1024 / 1024:.1f} MB "
+          f"({memoria / args.titulos:.0f} B/título; {retenida / 1024 / 1024:.1f} MB nuevos según tracemalloc) · "
+          f"pico de construcción {pico / 1024 / 1024:.1f} MB\n")
+
+    # Prefijos como los escribe un usuario: inicio del título o de una palabra
+    muestras = []
+    for _ in range(args.consultas):
+        texto = normalizar(rng.choice(libros)[1])
+        palabras = texto.split()
+        desde = texto.find(rng.choice(palabras))
+        muestras.append(texto[desde:desde + rng.randint(1, 10)])
+
+    por_largo: dict[int, list[float]] = {}
+    vacias = 0
+    for q in muestras:
+        t = time.perf_counter()
+        resultado = indice.sugerir(q, 8)
+        por_largo.setdefault(min(len(q), 6), []).append((time.perf_counter() - t) * 1000)
+        vacias += not resultado
+    print(f"{'prefijo':>8}{'consultas':>11}{'p50 ms':>9}{'p99 ms':>9}{'máx ms':>9}")
+    todas = []
+    for largo in sorted(por_largo):
+        tiempos = sorted(por_largo[largo])
+        todas += tiempos
+        etiqueta = f"{largo}+" if largo == 6 else str(largo)
+        print(f"{etiqueta:>8}{len(tiempos):>11}{statistics.median(tiempos):>9.3f}"
+              f"{percentil(tiempos, 0.99):>9.3f}{tiempos[-1]:>9.3f}")
+    todas.sort()
+    print(f"{'total':>8}{len(todas):>11}{statistics.median(todas):>9.3f}{percentil(todas, 0.99):>9.3f}"
+          f"{todas[-1]:>9.3f}")
+    print(f"   {vacias} sin resultados (artículos o palabras más allá de SUGERENCIAS_PALABRAS)\n")
+
+    tiempos = []
+    for libro_id in rng.sample(range(1, args.titulos + 1), 500):
+        t = time.perf_counter()
+        indice.aplicar_libro(libro_id, f"Edición revisada {libro_id}", (1, autores[0][1]), (1, generos[0][1]))
+        tiempos.append((time.perf_counter() - t) * 1000)
+    tiempos.sort()
+    t = time.perf_counter()
+    for q in muestras[:2000]:
+        indice.sugerir(q, 8)
+    con_delta = (time.perf_counter() - t) / 2000 * 1000
+    print(f"✏️ 500 ediciones: p50 {statistics.median(tiempos):.3f} ms · máx {tiempos[-1]:.3f} ms; "
+          f"consulta media con delta de {indice.cambios} cambios: {con_delta:.3f} ms")
+    print(f"   'edición revi' → {[s['texto'] for s in indice.sugerir('edición revi', 3)]}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark del índice de autocompletado")
+    parser.add_argument("--titulos", type=int, default=100_000)
+    parser.add_argument("--consultas", type=int, default=20_000)
+    main(parser.parse_args())
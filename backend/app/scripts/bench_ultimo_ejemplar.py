@@ -0,0 +1,144 @@
+"""
+Benchmark: N clientes piden a la vez el último ejemplar de un libro.
+
+Deja el libro con cantidad_disponible = 1 y lanza N llamadas concurrentes a
+crear_prestamo_fisico con usuarios distintos. Debe salir exactamente un
+préstamo y el stock debe quedar en 0. Con --legado corre la secuencia anterior
+(leer, insertar, descontar sin condición) para comparar: ahí se vende de más.
+Al terminar borra los préstamos creados y restaura el stock.
+Requiere las variables DB_* apuntando a un MySQL con datos (sube DB_POOL_MAX
+para que el pool no sea el cuello de botella).
+
+Uso: python -m app.scripts.bench_ultimo_ejemplar [clientes] [libro_id] [--legado]
+"""
+import asyncio
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+
+from fastapi import HTTPException
+
+from app.config import database
+from app.config.database import init_db, close_db
+from app.models.prestamo_fisico_model import crear_prestamo_fisico
+
+
+def percentil(valores, p):
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(len(valores) * p))]
+
+
+async def preparar(libro_id: int | None, clientes: int):
+    async with database.get_cursor() as (conn, cursor):
+        if libro_id is None:
+            await cursor.execute("SELECT id FROM libros ORDER BY id LIMIT 1")
+            fila = await cursor.fetchone()
+            if not fila:
+                print("❌ No hay libros en la BD")
+                sys.exit(1)
+            libro_id = fila["id"]
+        await cursor.execute("SELECT cantidad_disponible FROM libros WHERE id = %s", (libro_id,))
+        original = (await cursor.fetchone())["cantidad_disponible"]
+
+        # Usuarios sin préstamos vigentes, para que el límite de 2 no interfiera
+        await cursor.execute("""
+            SELECT u.id FROM usuarios u
+            WHERE NOT EXISTS (
+                SELECT 1 FROM prestamos_fisicos pf
+                WHERE pf.usuario_id = u.id AND pf.estado IN ('pendiente', 'activo', 'atrasado')
+            )
+            LIMIT %s
+        """, (clientes,))
+        usuarios = [f["id"] for f in await cursor.fetchall()]
+        if not usuarios:
+            print("❌ No hay usuarios sin préstamos vigentes")
+            sys.exit(1)
+
+        await cursor.execute("SELECT COALESCE(MAX(id), 0) as max_id FROM prestamos_fisicos")
+        max_id = (await cursor.fetchone())["max_id"]
+        await cursor.execute("UPDATE libros SET cantidad_disponible = 1 WHERE id = %s", (libro_id,))
+        await conn.commit()
+    return libro_id, original, usuarios, max_id
+
+
+async def crear_legado(usuario_id: int, libro_id: int, fecha_recogida: str):
+    """Secuencia anterior: sin lock ni condición sobre el stock"""
+    async with database.get_cursor() as (conn, cursor):
+        await cursor.execute("SELECT id, titulo, autor_id, cantidad_disponible, openlibrary_key FROM libros WHERE id = %s", (libro_id,))
+        libro = await cursor.fetchone()
+        await cursor.execute("SELECT nombre FROM autores WHERE id = %s", (libro["autor_id"],))
+        await cursor.fetchone()
+        await cursor.execute("""
+            INSERT INTO prestamos_fisicos (usuario_id, libro_id, titulo, autor, openlibrary_key,
+                fecha_recogida, fecha_devolucion, estado)
+            VALUES (%s, %s, %s, 'Desconocido', %s, %s, %s, 'pendiente')
+        """, (usuario_id, libro_id, libro["titulo"], libro["openlibrary_key"], fecha_recogida, fecha_recogida))
+        await cursor.execute("UPDATE libros SET cantidad_disponible = cantidad_disponible - 1 WHERE id = %s", (libro_id,))
+        await conn.commit()
+        return {"status": "success"}
+
+
+async def cliente(usuario_id: int, libro_id: int, fecha: str, legado: bool):
+    inicio = time.perf_counter()
+    try:
+        if legado:
+            resultado = await crear_legado(usuario_id, libro_id, fecha)
+        else:
+            resultado = await crear_prestamo_fisico(usuario_id, libro_id, fecha)
+        estado = "ok" if resultado["status"] == "success" else resultado["message"]
+    except HTTPException as e:
+        estado = f"HTTP {e.status_code}"
+    except Exception as e:
+        estado = f"{type(e).__name__}: {e}"[:80]
+    return estado, (time.perf_counter() - inicio) * 1000
+
+
+async def main(clientes: int, libro_id: int | None, legado: bool):
+    await init_db(None)
+    try:
+        libro_id, original, usuarios, max_id = await preparar(libro_id, clientes)
+        fecha = (date.today() + timedelta(days=1)).isoformat()
+        print(f"📦 Libro {libro_id} con 1 ejemplar · {clientes} clientes · {len(usuarios)} usuarios distintos"
+              f" · modo {'legado' if legado else 'nuevo'}\n")
+
+        inicio = time.perf_counter()
+        resultados = await asyncio.gather(*[
+            cliente(usuarios[i % len(usuarios)], libro_id, fecha, legado) for i in range(clientes)
+        ])
+        total = time.perf_counter() - inicio
+
+        conteo: dict[str, int] = {}
+        for estado, _ in resultados:
+            conteo[estado] = conteo.get(estado, 0) + 1
+        latencias = [ms for _, ms in resultados]
+
+        async with database.get_cursor() as (conn, cursor):
+            await cursor.execute("SELECT cantidad_disponible FROM libros WHERE id = %s", (libro_id,))
+            stock = (await cursor.fetchone())["cantidad_disponible"]
+            await cursor.execute(
+                "SELECT COUNT(*) as total FROM prestamos_fisicos WHERE id > %s AND libro_id = %s",
+                (max_id, libro_id),
+            )
+            creados = (await cursor.fetchone())["total"]
+
+            # 🧹 Limpieza
+            await cursor.execute("DELETE FROM prestamos_fisicos WHERE id > %s AND libro_id = %s", (max_id, libro_id))
+            await cursor.execute("UPDATE libros SET cantidad_disponible = %s WHERE id = %s", (original, libro_id))
+            await conn.commit()
+
+        for estado, n in sorted(conteo.items(), key=lambda x: -x[1]):
+            print(f"   {n:>5} × {estado}")
+        print(f"\n⏱️  {total:.2f}s total · p50 {statistics.median(latencias):.0f} ms · "
+              f"p99 {percentil(latencias, 0.99):.0f} ms · max {max(latencias):.0f} ms")
+        correcto = creados == 1 and stock == 0
+        print(f"{'✅' if correcto else '❌'} Préstamos creados: {creados} · stock final: {stock} (esperado 1 y 0)")
+    finally:
+        await close_db()
+
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    clientes = int(args[0]) if args else 200
+    libro = int(args[1]) if len(args) > 1 else None
+    asyncio.run(main(clientes, libro, "--legado" in sys.argv))
@@ -0,0 +1,98 @@
+"""
+Benchmark: checkouts del pool y latencia por request con y sin unidad de trabajo.
+
+Simula el flujo de calificar un libro (auth + libro_exists + rating + promedio)
+llamando a los modelos con `uow=None` (un get_cursor() por función) y con una
+UnidadDeTrabajo compartida. Solo hace lecturas.
+Requiere las variables DB_* apuntando a un MySQL con datos.
+
+Uso: python -m app.scripts.bench_unidad_trabajo [requests_concurrentes] [rondas]
+"""
+import asyncio
+import statistics
+import sys
+import time
+
+from app.config import database
+from app.config.database import UnidadDeTrabajo, init_db, close_db, obtener_metricas_pool
+from app.models.user_model import get_user_by_id
+from app.models.wishlist_model import libro_exists
+from app.models.review_model import get_user_rating, get_average_rating
+
+
+def percentil(valores, p):
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(len(valores) * p))]
+
+
+async def datos_de_prueba():
+    async with database.get_cursor() as (conn, cursor):
+        await cursor.execute("SELECT id FROM usuarios LIMIT 1")
+        usuario = await cursor.fetchone()
+        await cursor.execute("SELECT id, openlibrary_key FROM libros WHERE openlibrary_key IS NOT NULL LIMIT 1")
+        libro = await cursor.fetchone()
+    if not usuario or not libro:
+        print("❌ Se necesita al menos un usuario y un libro con openlibrary_key")
+        sys.exit(1)
+    return usuario["id"], libro["id"], libro["openlibrary_key"]
+
+
+async def flujo(usuario_id, libro_id, key, uow):
+    await get_user_by_id(usuario_id, uow=uow)
+    await libro_exists(key, uow=uow)
+    await get_user_rating(usuario_id, libro_id, uow=uow)
+    await get_average_rating(libro_id, uow=uow)
+
+
+async def request(datos, con_uow: bool):
+    inicio = time.perf_counter()
+    if con_uow:
+        uow = UnidadDeTrabajo()
+        try:
+            await flujo(*datos, uow)
+        finally:
+            await uow.cerrar()
+    else:
+        await flujo(*datos, None)
+    return (time.perf_counter() - inicio) * 1000
+
+
+async def medir(datos, con_uow: bool, concurrentes: int, rondas: int):
+    antes = obtener_metricas_pool()["default"]["adquisiciones"]
+    latencias = []
+    inicio = time.perf_counter()
+    for _ in range(rondas):
+        latencias += await asyncio.gather(*(request(datos, con_uow) for _ in range(concurrentes)))
+    duracion = time.perf_counter() - inicio
+    metricas = obtener_metricas_pool()["default"]
+    total = concurrentes * rondas
+
+    return {
+        "modo": "uow" if con_uow else "get_cursor por modelo",
+        "requests": total,
+        "req_s": round(total / duracion, 1),
+        "checkouts_por_request": round((metricas["adquisiciones"] - antes) / total, 2),
+        "p50_ms": round(statistics.median(latencias), 2),
+        "p99_ms": round(percentil(latencias, 0.99), 2),
+        "espera_pool_max_ms": metricas["espera_max_ms"],
+        "timeouts_pool": metricas["timeouts"],
+    }
+
+
+async def main(concurrentes: int, rondas: int):
+    await init_db(None)
+    try:
+        datos = await datos_de_prueba()
+        # Calentar el pool
+        await medir(datos, True, concurrentes, 1)
+        for con_uow in (False, True):
+            print(await medir(datos, con_uow, concurrentes, rondas))
+    finally:
+        await close_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 50,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 20,
+    ))
@@ -0,0 +1,450 @@
+"""
+Generador de datos sintéticos para benchmarks y pruebas de índices.
+
+Crea usuarios, autores, editoriales, géneros, libros, préstamos físicos y
+digitales, wishlist, calificaciones y comentarios marcados como "[carga]", con
+sesgo realista: la popularidad de los libros sigue una Zipf (s=1.1) y la
+actividad de los usuarios otra más suave (s=0.8). Las fechas crecen con el id,
+como en producción, y los préstamos abiertos (últimos 30 días) respetan el
+límite de 2 activos por usuario.
+
+Carga con INSERT multi-fila (por defecto) o LOAD DATA LOCAL INFILE (--modo
+load-data, requiere local_infile=1 en el servidor), con varias conexiones en
+paralelo y foreign_key_checks=0 (los ids salen de este mismo proceso).
+Al terminar reconstruye el rollup mensual y los rankings.
+
+Todos los usuarios tienen la clave CLAVE; el bibliotecario es BIBLIOTECARIO.
+--limpiar borra todo lo generado. Requiere las variables DB_* del .env.
+
+Uso:
+  python -m app.scripts.generar_dataset [--filas 10000000] [--modo insert|load-data]
+         [--conexiones 4] [--lote 5000] [--semilla 42] [--usuarios N] [--libros N] ...
+  python -m app.scripts.generar_dataset --limpiar
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta
+from itertools import accumulate
+
+import aiomysql
+
+from app.config.database import init_db, close_db, get_cursor
+from app.dependencias.redis import r_async
+from app.models.prestamos_mensuales_model import reconstruir_prestamos_mensuales
+from app.utils.rankings import reconstruir_rankings
+from app.utils.security import hash_password
+
+MARCA = "[carga]"
+DOMINIO = "aeternum.test"
+CLAVE = "Carga-2025!"
+BIBLIOTECARIO = f"carga-bibliotecario@{DOMINIO}"
+CLAVE_LIBRO = "/works/CARGA{}W"
+
+PALABRAS = [
+    "sombra", "jardin", "ciudad", "memoria", "silencio", "viaje", "fuego", "mar", "noche",
+    "tiempo", "espejo", "camino", "laberinto", "invierno", "ceniza", "historia", "rio",
+    "montaña", "secreto", "guerra", "amor", "olvido", "isla", "estrella", "lluvia", "reino",
+    "desierto", "sueño", "biblioteca", "ciencia", "palabra", "tierra", "cielo", "hielo",
+]
+
+# Reparto de --filas entre tablas (editoriales y géneros son fijos)
+PROPORCIONES = {
+    "usuarios": 0.01,
+    "autores": 0.002,
+    "libros": 0.02,
+    "prestamos_fisicos": 0.35,
+    "prestamos": 0.20,
+    "lista_deseos": 0.15,
+    "calificaciones": 0.17,
+    "comentarios": 0.098,
+}
+EDITORIALES = 500
+GENEROS = 40
+DIAS_HISTORIA = 730
+DIAS_ABIERTOS = 30
+PUNTUACIONES = ([1, 2, 3, 4, 5], [5, 8, 20, 35, 32])
+
+
+def pesos_zipf(n: int, s: float = 1.1) -> list[float]:
+    """Pesos acumulados para random.choices: el k-ésimo elemento pesa 1/k^s"""
+    return list(accumulate(1 / (k + 1) ** s for k in range(n)))
+
+
+def tamanos_para(filas: int, **fijos: int | None) -> dict[str, int]:
+    tamanos = {tabla: max(1, int(filas * p)) for tabla, p in PROPORCIONES.items()}
+    tamanos.update({tabla: n for tabla, n in fijos.items() if n is not None})
+    tamanos["editoriales"] = EDITORIALES
+    tamanos["generos"] = GENEROS
+    return tamanos
+
+
+class Contexto:
+    """Rangos de ids asignados y distribuciones compartidas por los generadores"""
+
+    def __init__(self, tamanos: dict[str, int], bases: dict[str, int], clave: str):
+        self.tamanos = tamanos
+        self.bases = bases
+        self.clave = clave
+        self.ahora = datetime.now().replace(microsecond=0)
+        self.inicio = self.ahora - timedelta(days=DIAS_HISTORIA)
+        self.hoy = self.ahora.date()
+
+        self.libros = list(self.rango("libros"))
+        random.shuffle(self.libros)
+        self.pesos_libros = pesos_zipf(len(self.libros))
+        self.usuarios = list(self.rango("usuarios"))
+        random.shuffle(self.usuarios)
+        self.pesos_usuarios = pesos_zipf(len(self.usuarios), 0.8)
+        self.activos = Counter()
+
+    def rango(self, tabla: str) -> range:
+        return range(self.bases[tabla] + 1, self.bases[tabla] + self.tamanos[tabla] + 1)
+
+    def autor_de(self, libro_id: int) -> int:
+        return self.bases["autores"] + 1 + (libro_id * 7919) % self.tamanos["autores"]
+
+    @staticmethod
+    def titulo_de(libro_id: int) -> str:
+        h = (libro_id * 2654435761) % 2**32
+        return f"{MARCA} {PALABRAS[h % len(PALABRAS)].capitalize()} de {PALABRAS[(h >> 8) % len(PALABRAS)]} {libro_id}"
+
+    def parejas(self, n: int) -> zip:
+        """n pares (usuario_id, libro_id) con ambos sesgos"""
+        return zip(
+            random.choices(self.usuarios, cum_weights=self.pesos_usuarios, k=n),
+            random.choices(self.libros, cum_weights=self.pesos_libros, k=n),
+        )
+
+    def fechas(self, tabla: str, indices: range) -> list[datetime]:
+        """Fechas crecientes con el índice, repartidas en la historia"""
+        paso = DIAS_HISTORIA * 86400 / self.tamanos[tabla]
+        return [self.inicio + timedelta(seconds=int((i + random.random()) * paso)) for i in indices]
+
+
+# ---------------------------------------------------------------------------
+# 🏭 Generadores: (ctx, índices del lote) -> filas
+# ---------------------------------------------------------------------------
+
+def _usuarios(ctx: Contexto, indices: range) -> list[tuple]:
+    base = ctx.bases["usuarios"]
+    return [
+        (base + i + 1, f"Lector{base + i + 1}", MARCA, "CC", f"CARGA{base + i + 1}",
+         f"carga{base + i + 1}@{DOMINIO}", ctx.clave, "usuario", "Activo")
+        for i in indices
+    ]
+
+
+def _autores(ctx: Contexto, indices: range) -> list[tuple]:
+    return [(ctx.bases["autores"] + i + 1, f"Autor{i}", MARCA, "Desconocida") for i in indices]
+
+
+def _editoriales(ctx: Contexto, indices: range) -> list[tuple]:
+    return [(ctx.bases["editoriales"] + i + 1, f"{MARCA} Editorial {i}") for i in indices]
+
+
+def _generos(ctx: Contexto, indices: range) -> list[tuple]:
+    return [(ctx.bases["generos"] + i + 1, f"{MARCA} Género {i}") for i in indices]
+
+
+def _libros(ctx: Contexto, indices: range) -> list[tuple]:
+    filas = []
+    for i in indices:
+        libro_id = ctx.bases["libros"] + i + 1
+        filas.append((
+            libro_id, ctx.titulo_de(libro_id), "Libro sintético para pruebas de carga",
+            ctx.autor_de(libro_id),
+            ctx.bases["editoriales"] + 1 + libro_id % EDITORIALES,
+            ctx.bases["generos"] + 1 + libro_id % GENEROS,
+            date(1950 + libro_id % 75, 1, 1), 1 + libro_id % 5,
+            CLAVE_LIBRO.format(libro_id), 0, None, "Activo",
+        ))
+    return filas
+
+
+def _prestamos_fisicos(ctx: Contexto, indices: range) -> list[tuple]:
+    filas = []
+    abiertos_desde = ctx.ahora - timedelta(days=DIAS_ABIERTOS)
+    for creado, (usuario_id, libro_id) in zip(ctx.fechas("prestamos_fisicos", indices), ctx.parejas(len(indices))):
+        recogida = (creado + timedelta(days=random.randint(0, 3))).date()
+        devolucion = recogida + timedelta(days=12)
+        devuelto_el = recogida + timedelta(days=random.randint(1, 14))
+
+        if creado < abiertos_desde or random.random() < 0.5 or ctx.activos[usuario_id] >= 2:
+            estado = "devuelto" if random.random() < 0.93 and devuelto_el <= ctx.hoy else "cancelado"
+            real = devuelto_el if estado == "devuelto" else None
+        else:
+            ctx.activos[usuario_id] += 1
+            estado = "pendiente" if recogida > ctx.hoy else "activo" if devolucion >= ctx.hoy else "atrasado"
+            real = None
+        # Correos marcados como enviados: los jobs no escriben a direcciones ficticias
+        filas.append((
+            usuario_id, libro_id, ctx.titulo_de(libro_id), f"Autor{ctx.autor_de(libro_id)}",
+            CLAVE_LIBRO.format(libro_id), recogida, devolucion, real, estado,
+            True, True, True, creado, creado,
+        ))
+    return filas
+
+
+def _prestamos(ctx: Contexto, indices: range) -> list[tuple]:
+    return [
+        (usuario_id, libro_id, ctx.titulo_de(libro_id), ctx.autor_de(libro_id), fecha)
+        for fecha, (usuario_id, libro_id) in zip(ctx.fechas("prestamos", indices), ctx.parejas(len(indices)))
+    ]
+
+
+def _lista_deseos(ctx: Contexto, indices: range) -> list[tuple]:
+    return [
+        (usuario_id, libro_id, fecha)
+        for fecha, (usuario_id, libro_id) in zip(ctx.fechas("lista_deseos", indices), ctx.parejas(len(indices)))
+    ]
+
+
+def _calificaciones(ctx: Contexto, indices: range) -> list[tuple]:
+    puntuaciones = random.choices(*PUNTUACIONES, k=len(indices))
+    return [(u, l, p) for (u, l), p in zip(ctx.parejas(len(indices)), puntuaciones)]
+
+
+def _comentarios(ctx: Contexto, indices: range) -> list[tuple]:
+    return [
+        (usuario_id, libro_id, f"{MARCA} comentario sobre el libro {libro_id}", fecha)
+        for fecha, (usuario_id, libro_id) in zip(ctx.fechas("comentarios", indices), ctx.parejas(len(indices)))
+    ]
+
+
+# tabla -> (columnas, generador, ignorar duplicados de (usuario_id, libro_id))
+TABLAS = {
+    "usuarios": ("id, nombre, apellido, tipo_identificacion, num_identificacion, correo, clave, rol, estado",
+                 _usuarios, False),
+    "autores": ("id, nombre, apellido, nacionalidad", _autores, False),
+    "editoriales": ("id, nombre", _editoriales, False),
+    "generos": ("id, nombre", _generos, False),
+    "libros": ("id, titulo, descripcion, autor_id, editorial_id, genero_id, fecha_publicacion, "
+               "cantidad_disponible, openlibrary_key, cover_id, imagen_local, estado", _libros, False),
+    "prestamos_fisicos": ("usuario_id, libro_id, titulo, autor, openlibrary_key, fecha_recogida, fecha_devolucion, "
+                          "fecha_devolucion_real, estado, correo_confirmacion_enviado, correo_recordatorio_enviado, "
+                          "correo_atrasado_enviado, fecha_solicitud, created_at", _prestamos_fisicos, False),
+    "prestamos": ("usuario_id, libro_id, titulo, autor_id, fecha_prestamo", _prestamos, False),
+    "lista_deseos": ("usuario_id, libro_id, fecha_agregado", _lista_deseos, True),
+    "calificaciones": ("usuario_id, libro_id, puntuacion", _calificaciones, True),
+    "comentarios": ("usuario_id, libro_id, texto, fecha_comentario", _comentarios, False),
+}
+
+
+# ---------------------------------------------------------------------------
+# 🚚 Carga
+# ---------------------------------------------------------------------------
+
+def _literal(valor) -> str:
+    """Literal SQL de los tipos que producen los generadores (sin pasar por el escape de pymysql)"""
+    if valor is None:
+        return "NULL"
+    if isinstance(valor, bool):
+        return "1" if valor else "0"
+    if isinstance(valor, int):
+        return str(valor)
+    return "'" + str(valor).replace("\\", "\\\\").replace("'", "\\'") + "'"
+
+
+def _campo_tsv(valor) -> str:
+    if valor is None:
+        return "\\N"
+    if isinstance(valor, bool):
+        return "1" if valor else "0"
+    return str(valor)
+
+
+async def _conectar(load_data: bool):
+    conn = await aiomysql.connect(
+        host=os.getenv("DB_HOST"),
+        port=int(os.getenv("DB_PORT")),
+        user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASSWORD"),
+        db=os.getenv("DB_NAME"),
+        autocommit=True,
+        local_infile=load_data,
+    )
+    async with conn.cursor() as cursor:
+        await cursor.execute("SET SESSION foreign_key_checks = 0")
+    return conn
+
+
+async def _escribir(cursor, tabla: str, columnas: str, filas: list[tuple], ignorar: bool, load_data: bool) -> int:
+    if load_data:
+        with tempfile.NamedTemporaryFile("w", suffix=".tsv", encoding="utf-8", delete=False) as archivo:
+            archivo.writelines("\t".join(map(_campo_tsv, fila)) + "\n" for fila in filas)
+        try:
+            await cursor.execute(
+                f"LOAD DATA LOCAL INFILE %s IGNORE INTO TABLE {tabla} CHARACTER SET utf8mb4 "
+                f"FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n' ({columnas})",
+                (archivo.name,),
+            )
+        finally:
+            os.unlink(archivo.name)
+    else:
+        valores = ",".join("(" + ",".join(map(_literal, fila)) + ")" for fila in filas)
+        await cursor.execute(f"INSERT {'IGNORE ' if ignorar else ''}INTO {tabla} ({columnas}) VALUES {valores}")
+    return cursor.rowcount
+
+
+async def _cargar_tabla(ctx: Contexto, tabla: str, args) -> int:
+    """Genera en el loop principal y escribe con `args.conexiones` conexiones en paralelo"""
+    columnas, generador, ignorar = TABLAS[tabla]
+    load_data = args.modo == "load-data"
+    cola: asyncio.Queue = asyncio.Queue(maxsize=args.conexiones * 2)
+    errores: list[Exception] = []
+    insertadas = 0
+
+    async def escritor():
+        nonlocal insertadas
+        conn = None
+        try:
+            conn = await _conectar(load_data)
+            async with conn.cursor() as cursor:
+                while (filas := await cola.get()) is not None:
+                    if not errores:
+                        insertadas += await _escribir(cursor, tabla, columnas, filas, ignorar, load_data)
+        except Exception as e:
+            errores.append(e)
+            # Seguir vaciando la cola para no dejar bloqueado al productor
+            while await cola.get() is not None:
+                pass
+        finally:
+            if conn is not None:
+                conn.close()
+
+    tareas = [asyncio.create_task(escritor()) for _ in range(args.conexiones)]
+    total = ctx.tamanos[tabla]
+    for desde in range(0, total, args.lote):
+        if errores:
+            break
+        await cola.put(generador(ctx, range(desde, min(desde + args.lote, total))))
+        await asyncio.sleep(0)
+    for _ in tareas:
+        await cola.put(None)
+    await asyncio.gather(*tareas)
+    if errores:
+        raise errores[0]
+    return insertadas
+
+
+async def _bases() -> dict[str, int]:
+    """MAX(id) actual de las tablas con ids asignados aquí"""
+    bases = {}
+    async with get_cursor() as (conn, cursor):
+        for tabla in ("usuarios", "autores", "editoriales", "generos", "libros"):
+            await cursor.execute(f"SELECT COALESCE(MAX(id), 0) as maximo FROM {tabla}")
+            bases[tabla] = (await cursor.fetchone())["maximo"]
+    return bases
+
+
+async def generar(tamanos: dict[str, int], args) -> dict[str, int]:
+    """Genera y carga el dataset; retorna filas insertadas por tabla"""
+    async with get_cursor() as (conn, cursor):
+        await cursor.execute("SELECT id FROM usuarios WHERE correo = %s", (BIBLIOTECARIO,))
+        if await cursor.fetchone():
+            raise RuntimeError("Ya hay datos de carga generados; usa --limpiar primero")
+
+    ctx = Contexto(tamanos, await _bases(), hash_password(CLAVE))
+    resultado = {}
+    inicio_total = time.perf_counter()
+    for tabla in TABLAS:
+        inicio = time.perf_counter()
+        resultado[tabla] = await _cargar_tabla(ctx, tabla, args)
+        segundos = time.perf_counter() - inicio
+        print(f"   {tabla:<18} {resultado[tabla]:>10} filas · {segundos:7.1f}s · "
+              f"{resultado[tabla] / max(segundos, 1e-9):>9.0f} filas/s")
+
+    async with get_cursor() as (conn, cursor):
+        await cursor.execute(
+            "INSERT INTO usuarios (nombre, apellido, tipo_identificacion, num_identificacion, correo, clave, rol, estado) "
+            "VALUES ('Bibliotecario', %s, 'CC', 'CARGA-BIB', %s, %s, 'bibliotecario', 'Activo')",
+            (MARCA, BIBLIOTECARIO, ctx.clave),
+        )
+        await conn.commit()
+
+    total = sum(resultado.values())
+    segundos = time.perf_counter() - inicio_total
+    print(f"🌱 {total} filas en {segundos:.1f}s ({total / max(segundos, 1e-9):.0f} filas/s, modo {args.modo})")
+
+    if not args.sin_derivados:
+        inicio = time.perf_counter()
+        await reconstruir_prestamos_mensuales()
+        if r_async is not None:
+            await reconstruir_rankings()
+        print(f"📅 Rollup mensual y rankings reconstruidos en {time.perf_counter() - inicio:.1f}s")
+    return resultado
+
+
+async def limpiar(lote: int = 50000):
+    """Borra todo lo generado, en lotes para no retener locks sobre millones de filas"""
+    usuarios = f"SELECT id FROM usuarios WHERE correo LIKE 'carga%%@{DOMINIO}'"
+    libros = "SELECT id FROM libros WHERE openlibrary_key LIKE '/works/CARGA%%'"
+    sentencias = [
+        (f"DELETE FROM {tabla} WHERE usuario_id IN ({usuarios}) OR libro_id IN ({libros})", ())
+        for tabla in ("lista_deseos", "calificaciones", "comentarios", "prestamos", "prestamos_fisicos")
+    ] + [
+        ("DELETE FROM libros WHERE openlibrary_key LIKE '/works/CARGA%%'", ()),
+        (f"DELETE FROM usuarios WHERE correo LIKE 'carga%%@{DOMINIO}'", ()),
+        ("DELETE FROM autores WHERE apellido = %s", (MARCA,)),
+        ("DELETE FROM editoriales WHERE nombre LIKE %s", (MARCA + "%",)),
+        ("DELETE FROM generos WHERE nombre LIKE %s", (MARCA + "%",)),
+    ]
+    for sentencia, params in sentencias:
+        borradas = 0
+        while True:
+            async with get_cursor() as (conn, cursor):
+                await cursor.execute(f"{sentencia} LIMIT {lote}", params)
+                n = cursor.rowcount
+                await conn.commit()
+            borradas += n
+            if n < lote:
+                break
+        print(f"🧹 {borradas:>10} filas · {sentencia.split(' WHERE')[0]}")
+    await reconstruir_prestamos_mensuales()
+    if r_async is not None:
+        await reconstruir_rankings()
+
+
+async def main(args):
+    await init_db(None)
+    try:
+        if args.limpiar:
+            await limpiar()
+            return
+        tamanos = tamanos_para(args.filas, **{tabla: getattr(args, tabla) for tabla in PROPORCIONES})
+        print(f"🏭 Generando {sum(tamanos.values())} filas con {args.conexiones} conexión(es), lotes de {args.lote}")
+        try:
+            await generar(tamanos, args)
+        except RuntimeError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+    finally:
+        await close_db()
+
+
+def agregar_argumentos(parser: argparse.ArgumentParser):
+    """Opciones de tamaño y carga (las reutiliza bench_carga --sembrar)"""
+    parser.add_argument("--filas", type=int, default=10_000_000, help="Total aproximado a repartir entre tablas")
+    for tabla in PROPORCIONES:
+        parser.add_argument(f"--{tabla.replace('_', '-')}", dest=tabla, type=int, help=f"Filas de {tabla}")
+    parser.add_argument("--modo", choices=("insert", "load-data"), default="insert")
+    parser.add_argument("--conexiones", type=int, default=4)
+    parser.add_argument("--lote", type=int, default=5000)
+    parser.add_argument("--semilla", type=int)
+    parser.add_argument("--sin-derivados", action="store_true", help="No reconstruir rollup ni rankings")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera un dataset sintético grande")
+    parser.add_argument("--limpiar", action="store_true")
+    agregar_argumentos(parser)
+    argumentos = parser.parse_args()
+    if argumentos.semilla is not None:
+        random.seed(argumentos.semilla)
+    asyncio.run(main(argumentos))
@@ -0,0 +1,69 @@
+"""
+Aplica las migraciones SQL de app/migrations en orden (NNN_nombre.sql).
+Las ya aplicadas quedan registradas en la tabla schema_migrations.
+Requiere las variables DB_* del .env.
+
+Uso: python -m app.scripts.migrar [--listar]
+"""
+import asyncio
+import os
+import sys
+
+import pymysql
+
+from app.config.database import init_db, close_db, get_cursor
+
+DIR_MIGRACIONES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations")
+
+
+def _sentencias(sql: str) -> list[str]:
+    """Separa el archivo en sentencias (una por ';' al final de línea), sin comentarios"""
+    lineas = [l for l in sql.splitlines() if not l.strip().startswith("--")]
+    return [s.strip() for s in "\n".join(lineas).split(";\n") if s.strip().rstrip(";")]
+
+
+async def main(solo_listar: bool):
+    await init_db(None)
+    try:
+        async with get_cursor() as (conn, cursor):
+            await cursor.execute("""
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    version VARCHAR(150) PRIMARY KEY,
+                    aplicada_en DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            await cursor.execute("SELECT version FROM schema_migrations")
+            aplicadas = {fila["version"] for fila in await cursor.fetchall()}
+            await conn.commit()
+
+        archivos = sorted(f for f in os.listdir(DIR_MIGRACIONES) if f.endswith(".sql"))
+        pendientes = [f for f in archivos if f not in aplicadas]
+
+        for archivo in archivos:
+            print(f"{'✅' if archivo in aplicadas else '⏳'} {archivo}")
+        if solo_listar or not pendientes:
+            return
+
+        for archivo in pendientes:
+            with open(os.path.join(DIR_MIGRACIONES, archivo), encoding="utf-8") as f:
+                sentencias = _sentencias(f.read())
+
+            async with get_cursor() as (conn, cursor):
+                # MySQL hace commit implícito con DDL: cada archivo debe ser idempotente
+                for sentencia in sentencias:
+                    try:
+                        await cursor.execute(sentencia.rstrip(";"))
+                    except pymysql.err.OperationalError as e:
+                        # 1061: el índice ya existe (archivo aplicado a medias antes)
+                        if e.args[0] != 1061:
+                            raise
+                        print(f"   ↪️ {e.args[1]}, se omite")
+                await cursor.execute("INSERT INTO schema_migrations (version) VALUES (%s)", (archivo,))
+                await conn.commit()
+            print(f"🆕 Aplicada {archivo} ({len(sentencias)} sentencias)")
+    finally:
+        await close_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(main("--listar" in sys.argv))
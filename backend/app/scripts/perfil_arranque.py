@@ -0,0 +1,111 @@
+"""
+Perfil de arranque de la API: tiempo de `import app.main`, RSS después del
+import y los módulos que más tardan en importarse (python -X importtime).
+
+Sale con código 1 si se supera el presupuesto, para usarlo en CI:
+- ARRANQUE_MAX_MS: tiempo máximo de import (mediana de varias corridas)
+- ARRANQUE_MAX_RSS_MB: memoria residente máxima tras el import
+- Ninguna dependencia de exportación (pandas, fpdf) debe cargarse al arrancar
+
+Cada medición corre en un proceso nuevo (import en frío).
+Uso: python -m app.scripts.perfil_arranque [corridas] [top]
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ARRANQUE_MAX_MS = float(os.getenv("ARRANQUE_MAX_MS", 1300))
+ARRANQUE_MAX_RSS_MB = float(os.getenv("ARRANQUE_MAX_RSS_MB", 120))
+MODULOS_PROHIBIDOS = ("pandas", "fpdf", "numpy", "openpyxl")
+
+_MEDIR = """
+import json, sys, time
+inicio = time.perf_counter()
+import app.main
+ms = (time.perf_counter() - inicio) * 1000
+rss_kb = 0
+try:
+    with open("/proc/self/status") as f:
+        rss_kb = int(next(l for l in f if l.startswith("VmRSS:")).split()[1])
+except OSError:
+    import resource
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        rss_kb //= 1024
+print("##" + json.dumps({"ms": ms, "rss_mb": rss_kb / 1024,
+                         "cargados": [m for m in %r if m in sys.modules]}))
+""" % (MODULOS_PROHIBIDOS,)
+
+DIR_BACKEND = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _ejecutar(*opciones) -> subprocess.CompletedProcess:
+    env = dict(os.environ, LOG_LEVEL="ERROR")
+    return subprocess.run(
+        [sys.executable, *opciones, "-c", _MEDIR],
+        cwd=DIR_BACKEND, env=env, capture_output=True, text=True, timeout=120,
+    )
+
+
+def medir() -> dict:
+    proceso = _ejecutar()
+    linea = next((l for l in proceso.stdout.splitlines() if l.startswith("##")), None)
+    if linea is None:
+        print(proceso.stdout[-2000:], proceso.stderr[-2000:], sep="\n")
+        print("❌ No se pudo importar app.main")
+        sys.exit(2)
+    return json.loads(linea[2:])
+
+
+def reporte_importtime(top: int):
+    """Top de módulos por tiempo acumulado de import (µs → ms)"""
+    filas = []
+    for linea in _ejecutar("-X", "importtime").stderr.splitlines():
+        if not linea.startswith("import time:") or "cumulative" in linea:
+            continue
+        _, propio, acumulado, modulo = (parte.strip() for parte in linea.replace("import time:", "|").split("|"))
+        filas.append((int(acumulado) / 1000, int(propio) / 1000, modulo))
+
+    print(f"\n{'acumulado ms':>13} {'propio ms':>10}  módulo")
+    for acumulado, propio, modulo in sorted(filas, reverse=True)[:top]:
+        print(f"{acumulado:>13.1f} {propio:>10.1f}  {modulo}")
+
+    print("\nRouters y módulos de la app:")
+    for acumulado, propio, modulo in sorted(filas, reverse=True):
+        if modulo.startswith("app.") and modulo.count(".") >= 2 and acumulado >= 5:
+            print(f"{acumulado:>13.1f} {propio:>10.1f}  {modulo}")
+
+
+def main(corridas: int, top: int):
+    mediciones = [medir() for _ in range(corridas)]
+    ms = statistics.median(m["ms"] for m in mediciones)
+    rss = statistics.median(m["rss_mb"] for m in mediciones)
+    cargados = sorted({mod for m in mediciones for mod in m["cargados"]})
+
+    reporte_importtime(top)
+
+    print(f"\nimport app.main: {ms:.0f} ms (mediana de {corridas}, presupuesto {ARRANQUE_MAX_MS:.0f} ms)")
+    print(f"RSS tras import: {rss:.1f} MB (presupuesto {ARRANQUE_MAX_RSS_MB:.0f} MB)")
+
+    fallos = []
+    if ms > ARRANQUE_MAX_MS:
+        fallos.append(f"tiempo de import {ms:.0f} ms > {ARRANQUE_MAX_MS:.0f} ms")
+    if rss > ARRANQUE_MAX_RSS_MB:
+        fallos.append(f"RSS {rss:.1f} MB > {ARRANQUE_MAX_RSS_MB:.0f} MB")
+    if cargados:
+        fallos.append(f"dependencias pesadas cargadas al arrancar: {', '.join(cargados)}")
+
+    if fallos:
+        for fallo in fallos:
+            print(f"❌ {fallo}")
+        sys.exit(1)
+    print("✅ Arranque dentro del presupuesto")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 3,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 25,
+    )
@@ -0,0 +1,63 @@
+"""
+Reconstruye el rollup prestamos_mensuales desde prestamos_fisicos.
+
+Sirve para el llenado inicial (después de la migración 004) y para corregirlo
+si alguna vez se desvía (p. ej. tras editar préstamos a mano en la BD).
+Con --verificar solo compara el rollup contra un GROUP BY en vivo, sin escribir.
+Requiere las variables DB_* del .env.
+
+Uso: python -m app.scripts.reconstruir_prestamos_mensuales [--verificar]
+"""
+import asyncio
+import sys
+import time
+
+from app.config.database import init_db, close_db, get_cursor
+from app.models.prestamos_mensuales_model import reconstruir_prestamos_mensuales
+
+
+async def verificar():
+    async with get_cursor("reporting") as (conn, cursor):
+        await cursor.execute("SELECT mes, estado, total FROM prestamos_mensuales WHERE total <> 0")
+        rollup = {(str(f["mes"]), f["estado"]): f["total"] for f in await cursor.fetchall()}
+
+        inicio = time.perf_counter()
+        await cursor.execute("""
+            SELECT DATE_FORMAT(created_at, '%Y-%m-01') as mes, estado, COUNT(*) as total
+            FROM prestamos_fisicos
+            GROUP BY 1, 2
+        """)
+        real = {(str(f["mes"]), f["estado"]): f["total"] for f in await cursor.fetchall()}
+        ms = (time.perf_counter() - inicio) * 1000
+
+    diferencias = [
+        (clave, rollup.get(clave, 0), real.get(clave, 0))
+        for clave in sorted(set(rollup) | set(real))
+        if rollup.get(clave, 0) != real.get(clave, 0)
+    ]
+    print(f"🔎 GROUP BY en vivo sobre prestamos_fisicos: {ms:.0f} ms · {len(real)} filas (mes, estado)")
+    for (mes, estado), en_rollup, en_tabla in diferencias:
+        print(f"   {mes[:7]} {estado:<10} rollup={en_rollup} real={en_tabla}")
+    print(f"{'✅' if not diferencias else '❌'} {len(diferencias)} diferencia(s)")
+    return not diferencias
+
+
+async def main(solo_verificar: bool):
+    await init_db(None)
+    try:
+        if solo_verificar:
+            if not await verificar():
+                sys.exit(1)
+            return
+
+        inicio = time.perf_counter()
+        resultado = await reconstruir_prestamos_mensuales()
+        print(f"📅 Rollup reconstruido en {time.perf_counter() - inicio:.2f}s · {resultado['filas']} filas")
+        for clave, cambio in resultado["diferencias"].items():
+            print(f"   {clave}: {cambio['antes']} → {cambio['ahora']}")
+    finally:
+        await close_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(main("--verificar" in sys.argv))
@@ -0,0 +1,69 @@
+"""
+Reconstruye los rankings de popularidad (sorted sets de Redis) desde MySQL.
+
+Úsalo en el primer despliegue, después de vaciar Redis o si un ranking se
+desvió. Al terminar mide el top-N de cada ranking y ventana contra el
+GROUP BY equivalente en SQL.
+Requiere las variables DB_* y REDIS_* del .env.
+
+Uso: python -m app.scripts.reconstruir_rankings [tipo ...]
+     (tipos: prestamos, wishlist, digitales; por defecto todos)
+"""
+import asyncio
+import statistics
+import sys
+import time
+
+from app.config.database import init_db, close_db, get_cursor
+from app.dependencias.redis import r_async
+from app.utils.rankings import TIPOS, VENTANAS, ORIGENES, reconstruir_rankings, top_libros
+
+REPETICIONES = 200
+
+
+async def medir_redis(tipo: str, ventana: str) -> float:
+    tiempos = []
+    for _ in range(REPETICIONES):
+        inicio = time.perf_counter()
+        await top_libros(tipo, ventana, 10)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos)
+
+
+async def medir_sql(tipo: str, ventana: str) -> float:
+    tabla, columna = ORIGENES[tipo]
+    dias = VENTANAS[ventana]
+    filtro = f"WHERE {columna} >= CURDATE() - INTERVAL {dias - 1} DAY" if dias else ""
+    async with get_cursor("reporting") as (conn, cursor):
+        inicio = time.perf_counter()
+        await cursor.execute(f"""
+            SELECT libro_id, COUNT(*) as total FROM {tabla} {filtro}
+            GROUP BY libro_id ORDER BY total DESC LIMIT 10
+        """)
+        await cursor.fetchall()
+        return (time.perf_counter() - inicio) * 1000
+
+
+async def main(tipos: tuple):
+    if r_async is None:
+        print("❌ Redis no disponible")
+        sys.exit(1)
+    await init_db(None)
+    try:
+        inicio = time.perf_counter()
+        resultado = await reconstruir_rankings(tipos=tipos)
+        print(f"🏆 {resultado['detalle']} · {time.perf_counter() - inicio:.2f}s\n")
+
+        print(f"{'ranking':<12}{'ventana':<9}{'Redis p50':>12}{'SQL':>12}")
+        for tipo in tipos:
+            for ventana in VENTANAS:
+                redis_ms = await medir_redis(tipo, ventana)
+                sql_ms = await medir_sql(tipo, ventana)
+                print(f"{tipo:<12}{ventana:<9}{redis_ms:>9.3f} ms{sql_ms:>9.1f} ms")
+    finally:
+        await close_db()
+
+
+if __name__ == "__main__":
+    elegidos = tuple(t for t in sys.argv[1:] if t in TIPOS) or TIPOS
+    asyncio.run(main(elegidos))
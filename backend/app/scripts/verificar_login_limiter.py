@@ -0,0 +1,36 @@
+"""
+Prueba de concurrencia del limitador de login (app.utils.login_limiter).
+
+Lanza N intentos simultáneos (hilos, cada uno con su llamada a Redis) contra
+el mismo correo y verifica que solo MAX_ATTEMPTS pasan la reserva.
+Requiere REDIS_HOST/REDIS_PORT apuntando a un Redis local.
+
+Uso: python -m app.scripts.verificar_login_limiter [intentos_concurrentes]
+"""
+import secrets
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from app.utils.login_limiter import MAX_ATTEMPTS, reservar_intento, limpiar_bloqueo_login
+
+
+def main(concurrentes: int):
+    correo = f"bench-{secrets.token_hex(4)}@aeternum.test"
+    ip = f"10.0.{secrets.randbelow(255)}.{secrets.randbelow(255)}"
+
+    with ThreadPoolExecutor(max_workers=concurrentes) as pool:
+        resultados = list(pool.map(lambda _: reservar_intento(correo, ip), range(concurrentes)))
+
+    permitidos = sum(1 for res in resultados if res["permitido"])
+    bloqueados = sum(1 for res in resultados if res["bloqueo"] == "correo")
+    limpiar_bloqueo_login(correo)
+
+    print(f"Intentos: {concurrentes} | permitidos: {permitidos} | bloqueados: {bloqueados}")
+    if permitidos != min(concurrentes, MAX_ATTEMPTS):
+        print(f"❌ El límite no se respetó (esperado {MAX_ATTEMPTS})")
+        sys.exit(1)
+    print("✅ El límite se mantiene bajo concurrencia")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
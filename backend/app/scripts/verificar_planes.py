@@ -0,0 +1,123 @@
+"""
+Regresión de planes de consulta: ejecuta las consultas de lectura de los modelos,
+captura el SQL que mandan (query_stats.capturar_consultas) y corre EXPLAIN sobre
+cada una con los mismos parámetros. Falla (exit 1) si alguna hace un full scan
+(type = ALL) estimado en MIN_FILAS filas o más, salvo las de PERMITIDAS.
+
+Los planes dependen del volumen: correrlo contra una BD local sembrada con datos
+de tamaño realista (python -m app.scripts.generar_dataset), después de
+`python -m app.scripts.migrar`.
+Requiere las variables DB_* del .env.
+
+Uso: python -m app.scripts.verificar_planes [--min-filas 1000] [--detalle]
+"""
+import asyncio
+import sys
+from datetime import date, timedelta
+
+from app.config.database import init_db, close_db, get_cursor
+from app.utils.query_stats import capturar_consultas
+from app.models import estadisticas_model, prestamo_fisico_model, prestamo_model, review_model, wishlist_model
+from app.routes.search_router import _buscar_locales
+from app.routes.wishlist_router import _wishlist_usuario
+
+MIN_FILAS = 1000
+
+# (consulta, alias de tabla) -> motivo por el que el full scan es aceptable
+PERMITIDAS = {
+    ("busqueda_local", "l"): "LIKE '%q%' no puede usar índices B-tree; pendiente de índice de prefijos",
+    ("ranking_total", "prestamos_fisicos"): "ranking histórico: recorre la tabla por diseño (solo respaldo sin Redis)",
+    ("ranking_total", "lista_deseos"): "ranking histórico: recorre la tabla por diseño (solo respaldo sin Redis)",
+    ("ranking_total", "prestamos"): "ranking histórico: recorre la tabla por diseño (solo respaldo sin Redis)",
+}
+
+
+async def _ids_de_muestra() -> dict:
+    """Ids reales para que los EXPLAIN usen valores con datos"""
+    async with get_cursor("reporting", intent="read") as (conn, cursor):
+        await cursor.execute("SELECT usuario_id FROM prestamos_fisicos ORDER BY id DESC LIMIT 1")
+        fila = await cursor.fetchone()
+        usuario_id = fila["usuario_id"] if fila else 1
+        await cursor.execute("SELECT libro_id FROM comentarios ORDER BY id DESC LIMIT 1")
+        fila = await cursor.fetchone()
+        libro_id = fila["libro_id"] if fila else 1
+        await cursor.execute("SELECT usuario_id FROM lista_deseos ORDER BY id DESC LIMIT 1")
+        fila = await cursor.fetchone()
+        usuario_wishlist = fila["usuario_id"] if fila else usuario_id
+    return {"usuario": usuario_id, "libro": libro_id, "usuario_wishlist": usuario_wishlist}
+
+
+def _consultas(ids: dict) -> dict:
+    """Nombre -> fábrica de la corrutina que ejecuta las consultas (solo lecturas)"""
+    hace_un_mes = date.today() - timedelta(days=30)
+    consultas = {
+        "estadisticas_dashboard": lambda: estadisticas_model.obtener_estadisticas_bibliotecario(),
+        "prestamos_recientes": lambda: estadisticas_model.obtener_prestamos_recientes(10),
+        "alertas_bibliotecario": lambda: estadisticas_model.obtener_alertas_bibliotecario(),
+        "grafica_prestamos": lambda: estadisticas_model.obtener_datos_grafica_prestamos(),
+        "prestamos_usuario": lambda: prestamo_fisico_model.obtener_prestamos_usuario(ids["usuario"]),
+        "prestamos_digitales": lambda: prestamo_model.obtener_todos_prestamos_digitales(limit=100),
+        "prestamos_digitales_filtro": lambda: prestamo_model.obtener_todos_prestamos_digitales(
+            usuario_id=ids["usuario"], desde=hace_un_mes, limit=100
+        ),
+        "promedio_calificaciones": lambda: review_model.get_average_rating(ids["libro"]),
+        "calificacion_usuario": lambda: review_model.get_user_rating(ids["usuario"], ids["libro"]),
+        "comentarios_libro": lambda: review_model._comentarios_libro.sin_cache(ids["libro"]),
+        "wishlist_modelo": lambda: wishlist_model.get_wishlist(ids["usuario_wishlist"]),
+        "wishlist_usuario": lambda: _wishlist_usuario.sin_cache(ids["usuario_wishlist"]),
+        "busqueda_local": lambda: _buscar_locales.sin_cache("a", 20),
+    }
+    for ventana in ("7d", "30d", "total"):
+        for ranking in ("prestamos", "wishlist", "digitales"):
+            nombre = "ranking_total" if ventana == "total" else f"ranking_{ventana}"
+            consultas[f"{nombre}:{ranking}"] = (
+                lambda r=ranking, v=ventana: estadisticas_model._top_libros_sql(r, v, 10)
+            )
+    return consultas
+
+
+async def _explicar(sql: str, args) -> list[dict]:
+    async with get_cursor("reporting", intent="read") as (conn, cursor):
+        await cursor.execute("EXPLAIN " + sql, args)
+        return await cursor.fetchall()
+
+
+async def main(min_filas: int, detalle: bool):
+    await init_db(None)
+    fallos = []
+    try:
+        ids = await _ids_de_muestra()
+        for nombre, fabrica in _consultas(ids).items():
+            with capturar_consultas() as capturadas:
+                await fabrica()
+            base = nombre.split(":")[0]
+            for sql, args in capturadas:
+                if not sql.lstrip().upper().startswith(("SELECT", "WITH")):
+                    continue
+                for fila in await _explicar(sql, args):
+                    tabla = fila.get("table") or ""
+                    filas = fila.get("rows") or 0
+                    if detalle:
+                        print(f"   {nombre:<32} {tabla:<20} {fila.get('type') or '-':<8} "
+                              f"{fila.get('key') or '-':<28} {filas:>9}")
+                    # Tablas derivadas (<derived2>, <union1,2>) dependen de la consulta interna
+                    if fila.get("type") != "ALL" or tabla.startswith("<") or filas < min_filas:
+                        continue
+                    motivo = PERMITIDAS.get((base, tabla))
+                    if motivo:
+                        print(f"⚪ {nombre}: full scan en {tabla} ({filas} filas) permitido: {motivo}")
+                        continue
+                    fallos.append((nombre, tabla, filas, " ".join(sql.split())[:160]))
+    finally:
+        await close_db()
+
+    for nombre, tabla, filas, sql in fallos:
+        print(f"❌ {nombre}: full scan en {tabla} (~{filas} filas)\n   {sql}")
+    print(f"{'✅' if not fallos else '❌'} {len(fallos)} consulta(s) con full scan")
+    if fallos:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    minimo = int(sys.argv[sys.argv.index("--min-filas") + 1]) if "--min-filas" in sys.argv else MIN_FILAS
+    asyncio.run(main(minimo, "--detalle" in sys.argv))
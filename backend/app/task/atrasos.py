@@ -0,0 +1,140 @@
+import logging
+import os
+from datetime import datetime, timedelta
+from itertools import groupby
+
+import pytz
+from app.config.database import get_cursor
+from app.models.prestamos_mensuales_model import capturar_estados, registrar_cambio_estado
+from app.utils.email_lotes import enviar_correos_en_lotes
+from app.utils.email_prestamos import render_prestamo_atrasado
+
+logger = logging.getLogger(__name__)
+
+# ⚙️ Avisos de atraso que fallaron se reintentan durante estos días
+ATRASO_REINTENTO_DIAS = int(os.getenv("ATRASO_REINTENTO_DIAS", 3))
+
+
+async def pasar_vencidos_a_atrasado(hoy, lease=None) -> list[int]:
+    """
+    Mueve todos los préstamos activos con fecha_devolucion < hoy a 'atrasado'
+    en una sola transacción. Retorna los ids afectados (MySQL no tiene
+    RETURNING: se bloquean con FOR UPDATE y se actualiza el mismo conjunto).
+    """
+    async with get_cursor() as (conn, cursor):
+        try:
+            if lease is not None:
+                await lease.fencing(cursor)
+            await cursor.execute("""
+                SELECT id
+                FROM prestamos_fisicos
+                WHERE estado = 'activo'
+                AND fecha_devolucion < %s
+                FOR UPDATE
+            """, (hoy,))
+            ids = [fila["id"] for fila in await cursor.fetchall()]
+
+            if ids:
+                capturados = await capturar_estados(
+                    cursor, "estado = 'activo' AND fecha_devolucion < %s", (hoy,)
+                )
+                await cursor.execute("""
+                    UPDATE prestamos_fisicos
+                    SET estado = 'atrasado'
+                    WHERE estado = 'activo'
+                    AND fecha_devolucion < %s
+                """, (hoy,))
+                await registrar_cambio_estado(cursor, capturados, "atrasado")
+            await conn.commit()
+            return ids
+        except Exception:
+            await conn.rollback()
+            raise
+
+
+async def buscar_atrasos_sin_aviso(hoy) -> list[dict]:
+    """Préstamos atrasados sin correo enviado (incluye reintentos recientes), por usuario"""
+    async with get_cursor("reporting") as (conn, cursor):
+        await cursor.execute("""
+            SELECT
+                pf.id,
+                pf.usuario_id,
+                pf.titulo,
+                pf.fecha_devolucion,
+                u.nombre,
+                u.apellido,
+                u.correo
+            FROM prestamos_fisicos pf
+            JOIN usuarios u ON pf.usuario_id = u.id
+            WHERE pf.estado = 'atrasado'
+            AND pf.correo_atrasado_enviado = FALSE
+            AND pf.fecha_devolucion >= %s
+            AND pf.fecha_devolucion < %s
+            ORDER BY pf.usuario_id, pf.fecha_devolucion
+        """, (hoy - timedelta(days=ATRASO_REINTENTO_DIAS + 1), hoy))
+        return await cursor.fetchall()
+
+
+def armar_avisos_atraso(prestamos: list[dict]) -> list[dict]:
+    """Un correo por usuario con todos sus libros atrasados"""
+    mensajes = []
+    for _, grupo in groupby(prestamos, key=lambda p: p["usuario_id"]):
+        grupo = list(grupo)
+        nombre = f"{grupo[0]['nombre']} {grupo[0]['apellido']}"
+        asunto, html = render_prestamo_atrasado(nombre, [
+            {"titulo": p["titulo"], "fecha_devolucion": p["fecha_devolucion"].strftime("%d/%m/%Y")}
+            for p in grupo
+        ])
+        mensajes.append({
+            "prestamo_ids": [p["id"] for p in grupo],
+            "correo": grupo[0]["correo"],
+            "nombre": nombre,
+            "asunto": asunto,
+            "html": html,
+        })
+    return mensajes
+
+
+async def marcar_avisos_enviados(lote: list[dict]):
+    ids = [prestamo_id for m in lote for prestamo_id in m["prestamo_ids"]]
+    async with get_cursor() as (conn, cursor):
+        await cursor.execute(
+            f"""
+            UPDATE prestamos_fisicos
+            SET correo_atrasado_enviado = TRUE
+            WHERE id IN ({", ".join(["%s"] * len(ids))})
+            """,
+            ids,
+        )
+        await conn.commit()
+
+
+async def marcar_prestamos_atrasados(lease=None):
+    """
+    Job nocturno: pasa a 'atrasado' todos los préstamos vencidos con un único
+    UPDATE y después avisa a cada usuario (un correo con todos sus libros),
+    enviando los correos por lotes.
+    """
+    tz = pytz.timezone("America/Bogota")
+    hoy = datetime.now(tz).date()
+
+    ids = await pasar_vencidos_a_atrasado(hoy, lease)
+    logger.info(f"⛔ {len(ids)} préstamo(s) pasaron a 'atrasado' ({hoy})")
+
+    pendientes = await buscar_atrasos_sin_aviso(hoy)
+    mensajes = armar_avisos_atraso(pendientes)
+    envio = await enviar_correos_en_lotes(
+        mensajes,
+        al_enviar=marcar_avisos_enviados,
+        antes_de_lote=lease.verificar if lease is not None else None,
+    )
+
+    return {
+        "status": "success" if not envio["fallidos"] else "partial",
+        "atrasados": len(ids),
+        "usuarios_notificados": envio["enviados"],
+        "avisos_fallidos": envio["fallidos"],
+        "filas_afectadas": len(ids),
+        "detalle": f"{len(ids)} atrasados, {envio['enviados']}/{len(mensajes)} usuarios avisados",
+        "fecha_verificacion": hoy.isoformat(),
+    }
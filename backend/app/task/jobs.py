@@ -0,0 +1,294 @@
+import asyncio
+import logging
+import os
+import secrets
+import socket
+import time
+from datetime import datetime
+
+from app.config.database import get_cursor
+from app.dependencias.redis import r_async
+from app.utils.metricas import JOB_DURACION
+
+logger = logging.getLogger(__name__)
+
+# ⚙️ Lease por job: lo renueva el dueño cada JOB_LEASE_TTL/3 segundos
+JOB_LEASE_TTL = int(os.getenv("JOB_LEASE_TTL", 60))
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+# 🔒 Toma el lease si está libre y genera un fencing token creciente
+_LUA_ADQUIRIR = """
+if redis.call('EXISTS', KEYS[1]) == 1 then return 0 end
+local token = redis.call('INCR', KEYS[2])
+redis.call('SET', KEYS[1], ARGV[1] .. '|' .. token, 'PX', ARGV[2])
+return token
+"""
+
+# Renueva / libera solo si el lease sigue siendo nuestro (mismo dueño y token)
+_LUA_RENOVAR = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+# Sube el contador de tokens si quedó atrás del registrado en BD (p. ej. tras usar GET_LOCK)
+_LUA_SINCRONIZAR = """
+if (tonumber(redis.call('GET', KEYS[1])) or 0) < tonumber(ARGV[1]) then
+    redis.call('SET', KEYS[1], ARGV[1])
+end
+return 1
+"""
+_LUA_LIBERAR = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class LeasePerdido(Exception):
+    """Otro worker tomó el job (lease expirado o fencing token más nuevo)"""
+
+
+class Lease:
+    """
+    Lease de un job. La tarea recibe el lease y, antes de cada efecto:
+      - escritura en MySQL: `await lease.fencing(cursor)` en la misma transacción
+        (el token se comprueba y queda bloqueado hasta el commit);
+      - correo, Redis u otro efecto externo: `await lease.verificar()` (best-effort).
+    Si otro worker tomó el job, lanza LeasePerdido y la tarea se detiene.
+    """
+
+    def __init__(self, job: str, token: int, dueno: str):
+        self.job = job
+        self.token = token
+        self.dueno = dueno
+        self.perdido = False
+        self.conexion_bloqueo = None  # fallback GET_LOCK sin Redis
+
+    @property
+    def valor(self) -> str:
+        return f"{self.dueno}|{self.token}"
+
+    async def verificar(self):
+        """
+        Best-effort: consulta el token en otra conexión, así que un worker que se
+        pausa entre esta verificación y su efecto todavía puede actuar con el
+        lease perdido. Para escrituras en MySQL usar `fencing`.
+        """
+        if self.perdido:
+            raise LeasePerdido(f"Lease de '{self.job}' perdido (token {self.token})")
+        async with get_cursor() as (conn, cursor):
+            await cursor.execute("SELECT fencing_token FROM job_locks WHERE job = %s", (self.job,))
+            fila = await cursor.fetchone()
+        if fila and fila["fencing_token"] > self.token:
+            self.perdido = True
+            raise LeasePerdido(f"Token {self.token} obsoleto para '{self.job}' (actual {fila['fencing_token']})")
+
+    async def fencing(self, cursor):
+        """
+        Fencing dentro de la transacción de la escritura protegida (mismo cursor,
+        antes del UPDATE/INSERT). FOR SHARE deja la fila de job_locks bloqueada
+        hasta el commit: un worker nuevo no puede registrar su token
+        (_registrar_fencing) en medio, y después de registrarlo esta comprobación
+        falla. Así un worker pausado no escribe con un lease perdido.
+        """
+        if self.perdido:
+            raise LeasePerdido(f"Lease de '{self.job}' perdido (token {self.token})")
+        await cursor.execute("SELECT fencing_token FROM job_locks WHERE job = %s FOR SHARE", (self.job,))
+        fila = await cursor.fetchone()
+        if fila and fila["fencing_token"] > self.token:
+            self.perdido = True
+            raise LeasePerdido(f"Token {self.token} obsoleto para '{self.job}' (actual {fila['fencing_token']})")
+
+
+async def _adquirir_lease(job: str) -> Lease | None:
+    dueno = f"{WORKER_ID}:{secrets.token_hex(4)}"
+
+    if r_async is not None:
+        try:
+            token = await r_async.eval(
+                _LUA_ADQUIRIR, 2, f"job_lease:{job}", f"job_fence:{job}", dueno, JOB_LEASE_TTL * 1000
+            )
+            return Lease(job, int(token), dueno) if token else None
+        except Exception as e:
+            logger.warning(f"⚠️ Redis no disponible para el lease de '{job}', usando GET_LOCK: {e}")
+
+    # Fallback sin Redis: lock con nombre de MySQL, retenido en una conexión propia
+    from app.config import database
+    conn = await database.pool.acquire()
+    try:
+        async with conn.cursor() as cursor:
+            await cursor.execute("SELECT GET_LOCK(%s, 0)", (f"job:{job}",))
+            (obtenido,) = await cursor.fetchone()
+            if obtenido != 1:
+                database.pool.release(conn)
+                return None
+            await cursor.execute("SELECT COALESCE(MAX(fencing_token), 0) + 1 FROM job_locks WHERE job = %s", (job,))
+            (token,) = await cursor.fetchone()
+        await conn.commit()
+    except Exception:
+        database.pool.release(conn)
+        raise
+    lease = Lease(job, int(token), dueno)
+    lease.conexion_bloqueo = conn
+    return lease
+
+
+async def _registrar_fencing(lease: Lease) -> int:
+    """Guarda el token en job_locks solo si es el más nuevo (rechaza tokens viejos)"""
+    async with get_cursor() as (conn, cursor):
+        await cursor.execute("""
+            INSERT INTO job_locks (job, fencing_token, actualizado_en)
+            VALUES (%s, %s, NOW(3))
+            ON DUPLICATE KEY UPDATE
+                actualizado_en = IF(VALUES(fencing_token) > fencing_token, VALUES(actualizado_en), actualizado_en),
+                fencing_token = GREATEST(fencing_token, VALUES(fencing_token))
+        """, (lease.job, lease.token))
+        await cursor.execute("SELECT fencing_token FROM job_locks WHERE job = %s", (lease.job,))
+        fila = await cursor.fetchone()
+        await conn.commit()
+    return fila["fencing_token"]
+
+
+async def _renovar(lease: Lease):
+    while not lease.perdido:
+        await asyncio.sleep(JOB_LEASE_TTL / 3)
+        if lease.conexion_bloqueo is not None:
+            continue  # GET_LOCK dura lo que dure la conexión
+        try:
+            renovado = await r_async.eval(
+                _LUA_RENOVAR, 1, f"job_lease:{lease.job}", lease.valor, JOB_LEASE_TTL * 1000
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo renovar el lease de '{lease.job}': {e}")
+            continue
+        if not renovado:
+            lease.perdido = True
+            logger.error(f"❌ Lease de '{lease.job}' perdido (token {lease.token})")
+
+
+async def _liberar(lease: Lease):
+    if lease.conexion_bloqueo is not None:
+        from app.config import database
+        try:
+            async with lease.conexion_bloqueo.cursor() as cursor:
+                await cursor.execute("SELECT RELEASE_LOCK(%s)", (f"job:{lease.job}",))
+        finally:
+            database.pool.release(lease.conexion_bloqueo)
+        return
+    try:
+        await r_async.eval(_LUA_LIBERAR, 1, f"job_lease:{lease.job}", lease.valor)
+    except Exception as e:
+        logger.warning(f"⚠️ No se pudo liberar el lease de '{lease.job}' (expira solo): {e}")
+
+
+async def _abrir_registro(lease: Lease, inicio: datetime) -> int:
+    async with get_cursor() as (conn, cursor):
+        await cursor.execute("""
+            INSERT INTO job_runs (job, fencing_token, worker, estado, iniciado_en)
+            VALUES (%s, %s, %s, 'ejecutando', %s)
+        """, (lease.job, lease.token, WORKER_ID, inicio))
+        await conn.commit()
+        return cursor.lastrowid
+
+
+async def _cerrar_registro(run_id: int, estado: str, duracion_ms: int, filas: int | None, detalle: str | None):
+    try:
+        async with get_cursor() as (conn, cursor):
+            await cursor.execute("""
+                UPDATE job_runs
+                SET estado = %s, finalizado_en = NOW(3), duracion_ms = %s,
+                    filas_afectadas = %s, detalle = %s
+                WHERE id = %s
+            """, (estado, duracion_ms, filas, detalle, run_id))
+            await conn.commit()
+    except Exception as e:
+        logger.error(f"❌ No se pudo cerrar el registro {run_id} de job_runs: {e}")
+
+
+async def ejecutar_con_lease(job: str, func, *args, **kwargs) -> dict | None:
+    """
+    Ejecuta `func(*args, lease=lease, **kwargs)` solo en el worker que obtiene el
+    lease del job. Retorna el resultado de la tarea, o None si otro worker la
+    tiene. Cada ejecución queda en job_runs (duración, filas afectadas, estado).
+    """
+    lease = await _adquirir_lease(job)
+    if lease is None:
+        logger.info(f"⏭️ '{job}' ya se está ejecutando en otro worker")
+        return None
+
+    inicio = time.perf_counter()
+    renovacion = None
+    run_id = None
+    estado, filas, detalle, resultado = "error", None, None, None
+    try:
+        token_actual = await _registrar_fencing(lease)
+        if token_actual != lease.token:
+            estado, detalle = "lease_perdido", f"Fencing token {lease.token} obsoleto al iniciar (actual {token_actual})"
+            lease.perdido = True
+            if lease.conexion_bloqueo is None:
+                await r_async.eval(_LUA_SINCRONIZAR, 1, f"job_fence:{job}", token_actual)
+            return None
+
+        run_id = await _abrir_registro(lease, datetime.now())
+        renovacion = asyncio.create_task(_renovar(lease))
+        logger.info(f"▶️ '{job}' iniciado (token {lease.token}, worker {WORKER_ID})")
+
+        resultado = await func(*args, lease=lease, **kwargs)
+        estado = "lease_perdido" if lease.perdido else "ok"
+        if isinstance(resultado, dict):
+            filas = resultado.get("filas_afectadas")
+            detalle = resultado.get("detalle")
+        return resultado
+
+    except LeasePerdido as e:
+        estado, detalle = "lease_perdido", str(e)
+        logger.error(f"❌ {e}")
+        return None
+    except Exception as e:
+        detalle = f"{type(e).__name__}: {e}"
+        logger.exception(f"❌ Error ejecutando '{job}': {e}")
+        raise
+    finally:
+        duracion = time.perf_counter() - inicio
+        if renovacion is not None:
+            renovacion.cancel()
+        if run_id is not None:
+            await _cerrar_registro(run_id, estado, int(duracion * 1000), filas, detalle)
+        JOB_DURACION.observar(duracion, job, estado)
+        await _liberar(lease)
+        logger.info(f"⏹️ '{job}' terminado: {estado} en {duracion:.1f}s")
+
+
+def programar(job: str, func):
+    """Callable para scheduler.add_job: la tarea corre con lease y ledger"""
+    async def ejecutar():
+        await ejecutar_con_lease(job, func)
+
+    ejecutar.__name__ = job
+    return ejecutar
+
+
+async def obtener_ejecuciones(job: str | None = None, limite: int = 50) -> list[dict]:
+    """Últimas ejecuciones registradas en job_runs"""
+    async with get_cursor(intent="read") as (conn, cursor):
+        if job:
+            await cursor.execute("""
+                SELECT * FROM job_runs WHERE job = %s ORDER BY iniciado_en DESC LIMIT %s
+            """, (job, limite))
+        else:
+            await cursor.execute("SELECT * FROM job_runs ORDER BY iniciado_en DESC LIMIT %s", (limite,))
+        return await cursor.fetchall()
+
+
+async def obtener_leases(jobs: list[str]) -> dict:
+    """Dueño y token actual del lease de cada job (None si está libre)"""
+    if r_async is None or not jobs:
+        return {}
+    try:
+        valores = await r_async.mget([f"job_lease:{job}" for job in jobs])
+    except Exception:
+        return {}
+    return {job: valor.decode() if valor else None for job, valor in zip(jobs, valores)}
@@ -0,0 +1,180 @@
+import asyncio
+import importlib.util
+import json
+import logging
+import os
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from app.config.database import get_cursor
+from app.utils.cache import invalidar_tags
+
+logger = logging.getLogger(__name__)
+
+# 🤝 Recomendaciones "quienes usaron este libro también usaron": similitud coseno
+# entre columnas de la matriz usuario × libro (interacciones ponderadas y
+# amortiguadas con log1p). Se guardan los K vecinos de cada libro en
+# recomendaciones_libros; /recommendations los sirve desde caché.
+RECOMENDACIONES_K = int(os.getenv("RECOMENDACIONES_K", 20))
+# Libros por bloque de M^T·M: acota la memoria a bloque × libros similares
+RECOMENDACIONES_BLOQUE = int(os.getenv("RECOMENDACIONES_BLOQUE", 2000))
+# Usuarios con más libros que esto (cuentas de prueba, cargas masivas) se ignoran:
+# co-ocurren con todo y cuestan O(n²) pares
+RECOMENDACIONES_MAX_POR_USUARIO = int(os.getenv("RECOMENDACIONES_MAX_POR_USUARIO", 500))
+RECOMENDACIONES_MIN_SCORE = float(os.getenv("RECOMENDACIONES_MIN_SCORE", 0.01))
+
+# Fuente -> SELECT (usuario_id, libro_id, peso). Calificaciones bajas no cuentan.
+FUENTES = {
+    "prestamos_fisicos": "SELECT usuario_id, libro_id, 3 FROM prestamos_fisicos WHERE estado <> 'cancelado'",
+    "prestamos": "SELECT usuario_id, libro_id, 2 FROM prestamos",
+    "lista_deseos": "SELECT usuario_id, libro_id, 1 FROM lista_deseos",
+    "calificaciones": "SELECT usuario_id, libro_id, puntuacion - 2 FROM calificaciones WHERE puntuacion >= 3",
+}
+
+
+async def leer_interacciones(lote: int = 10000) -> tuple[array, array, array]:
+    """
+    (usuarios, libros, pesos) de todas las fuentes, leídos en streaming a
+    arrays compactos (8 + 8 + 4 bytes por interacción, sin dicts por fila).
+    """
+    usuarios, libros, pesos = array("q"), array("q"), array("f")
+    for fuente, consulta in FUENTES.items():
+        async with get_cursor("reporting", intent="read", streaming=True) as (conn, cursor):
+            await cursor.execute(consulta)
+            while True:
+                filas = await cursor.fetchmany(lote)
+                if not filas:
+                    break
+                for fila in filas:
+                    usuario_id, libro_id, peso = fila.values()
+                    usuarios.append(usuario_id)
+                    libros.append(libro_id)
+                    pesos.append(peso)
+    return usuarios, libros, pesos
+
+
+def calcular_vecinos(
+    usuarios: array,
+    libros: array,
+    pesos: array,
+    k: int = RECOMENDACIONES_K,
+    bloque: int = RECOMENDACIONES_BLOQUE,
+    max_por_usuario: int = RECOMENDACIONES_MAX_POR_USUARIO,
+    min_score: float = RECOMENDACIONES_MIN_SCORE,
+) -> list[tuple[int, str]]:
+    """
+    [(libro_id, vecinos_json)] con los k libros más similares de cada libro.
+    Función de módulo (corre en un proceso aparte); importa numpy/scipy aquí.
+    """
+    import numpy as np
+    from scipy import sparse
+
+    u = np.frombuffer(usuarios, dtype=np.int64)
+    l = np.frombuffer(libros, dtype=np.int64)
+    ids_usuarios, filas = np.unique(u, return_inverse=True)
+    ids_libros, columnas = np.unique(l, return_inverse=True)
+
+    # Usuario × libro; los pares repetidos (préstamo + wishlist...) se suman
+    m = sparse.csr_matrix(
+        (np.frombuffer(pesos, dtype=np.float32), (filas, columnas)),
+        shape=(len(ids_usuarios), len(ids_libros)),
+    )
+    m.sum_duplicates()
+    if max_por_usuario:
+        m = m[np.diff(m.indptr) <= max_por_usuario]
+    m.data = np.log1p(m.data)
+
+    mt = m.T.tocsr()
+    normas = np.sqrt(np.asarray(mt.multiply(mt).sum(axis=1)).ravel())
+    inversas = np.divide(1.0, normas, out=np.zeros_like(normas), where=normas > 0).astype(np.float32)
+
+    resultado = []
+    for inicio in range(0, len(ids_libros), bloque):
+        fin = min(inicio + bloque, len(ids_libros))
+        # Filas inicio..fin de M^T·M (producto punto entre libros), escaladas a coseno
+        s = (mt[inicio:fin] @ m).tocsr()
+        s.data *= inversas[s.indices]
+        s.data *= np.repeat(inversas[inicio:fin], np.diff(s.indptr))
+
+        for i in range(fin - inicio):
+            a, b = s.indptr[i], s.indptr[i + 1]
+            cols, vals = s.indices[a:b], s.data[a:b]
+            otros = (cols != inicio + i) & (vals >= min_score)
+            cols, vals = cols[otros], vals[otros]
+            if len(vals) > k:
+                top = np.argpartition(-vals, k)[:k]
+                cols, vals = cols[top], vals[top]
+            if not len(vals):
+                continue
+            orden = np.argsort(-vals, kind="stable")
+            vecinos = [[int(ids_libros[c]), round(float(v), 4)] for c, v in zip(cols[orden], vals[orden])]
+            resultado.append((int(ids_libros[inicio + i]), json.dumps(vecinos)))
+    return resultado
+
+
+async def guardar_recomendaciones(filas: list[tuple[int, str]], lease=None, lote: int = 1000) -> int:
+    """
+    Upsert por lotes y luego borra los libros que ya no tienen vecinos. Cada
+    libro conserva su lista anterior hasta que llega la nueva: no hay ventana vacía.
+    """
+    ahora = datetime.now().replace(microsecond=0)
+    for desde in range(0, len(filas), lote):
+        parte = filas[desde:desde + lote]
+        async with get_cursor() as (conn, cursor):
+            if lease is not None:
+                await lease.fencing(cursor)
+            await cursor.execute(
+                f"""
+                INSERT INTO recomendaciones_libros (libro_id, vecinos, actualizado_en)
+                VALUES {", ".join(["(%s, %s, %s)"] * len(parte))}
+                ON DUPLICATE KEY UPDATE vecinos = VALUES(vecinos), actualizado_en = VALUES(actualizado_en)
+                """,
+                [valor for libro_id, vecinos in parte for valor in (libro_id, vecinos, ahora)],
+            )
+            await conn.commit()
+
+    async with get_cursor() as (conn, cursor):
+        if lease is not None:
+            await lease.fencing(cursor)
+        await cursor.execute("DELETE FROM recomendaciones_libros WHERE actualizado_en < %s", (ahora,))
+        borrados = cursor.rowcount
+        await conn.commit()
+    return borrados
+
+
+async def recalcular_recomendaciones(lease=None):
+    """
+    Job nocturno: lee las interacciones, calcula los vecinos en un proceso
+    aparte (el cálculo es CPU puro y no debe congelar el event loop ni ocupar
+    el pool de bcrypt; al terminar el proceso su memoria vuelve al sistema)
+    y reemplaza recomendaciones_libros.
+    """
+    if importlib.util.find_spec("scipy") is None:
+        logger.warning("⚠️ scipy no está instalado: recomendaciones sin recalcular (pip install scipy)")
+        return {"status": "skipped", "filas_afectadas": 0, "detalle": "scipy no instalado"}
+
+    inicio = time.perf_counter()
+    usuarios, libros, pesos = await leer_interacciones()
+    lectura = time.perf_counter() - inicio
+    if not usuarios:
+        return {"status": "success", "filas_afectadas": 0, "detalle": "Sin interacciones"}
+
+    if lease is not None:
+        await lease.verificar()
+    loop = asyncio.get_running_loop()
+    with ProcessPoolExecutor(max_workers=1) as ejecutor:
+        filas = await loop.run_in_executor(ejecutor, calcular_vecinos, usuarios, libros, pesos)
+    calculo = time.perf_counter() - inicio - lectura
+
+    borrados = await guardar_recomendaciones(filas, lease)
+    invalidar_tags("recomendaciones")
+
+    detalle = (
+        f"{len(usuarios)} interacciones → {len(filas)} libros con vecinos "
+        f"({borrados} sin vecinos eliminados); lectura {lectura:.1f}s, "
+        f"cálculo {calculo:.1f}s, total {time.perf_counter() - inicio:.1f}s"
+    )
+    logger.info(f"🤝 Recomendaciones recalculadas: {detalle}")
+    return {"status": "success", "filas_afectadas": len(filas), "detalle": detalle}
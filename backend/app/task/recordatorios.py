@@ -0,0 +1,107 @@
+import logging
+import os
+from datetime import datetime, timedelta
+
+import pytz
+from app.config.database import get_cursor
+from app.utils.email_lotes import enviar_correos_en_lotes
+from app.utils.email_prestamos import render_recordatorio_devolucion
+
+logger = logging.getLogger(__name__)
+
+# ⚙️ Días antes del vencimiento en que se envía el recordatorio
+RECORDATORIO_DIAS_ANTES = int(os.getenv("RECORDATORIO_DIAS_ANTES", 1))
+
+
+async def buscar_prestamos_por_vencer(fecha_vencimiento) -> list[dict]:
+    """
+    Préstamos activos que vencen en `fecha_vencimiento` y aún no tienen recordatorio.
+    Rango [fecha, fecha + 1 día) sobre fecha_devolucion para usar el índice
+    idx_pf_recordatorio (sirve tanto si la columna es DATE como DATETIME).
+    Lee del primario: una réplica atrasada podría no ver las marcas recientes.
+    """
+    async with get_cursor("reporting") as (conn, cursor):
+        await cursor.execute("""
+            SELECT
+                pf.id,
+                pf.titulo,
+                pf.fecha_devolucion,
+                u.nombre,
+                u.apellido,
+                u.correo
+            FROM prestamos_fisicos pf
+            JOIN usuarios u ON pf.usuario_id = u.id
+            WHERE pf.estado = 'activo'
+            AND pf.correo_recordatorio_enviado = FALSE
+            AND pf.fecha_devolucion >= %s
+            AND pf.fecha_devolucion < %s
+        """, (fecha_vencimiento, fecha_vencimiento + timedelta(days=1)))
+        return await cursor.fetchall()
+
+
+def armar_recordatorios(prestamos: list[dict], dias_restantes: int) -> list[dict]:
+    """Renderiza todos los correos del lote (uno por préstamo)"""
+    mensajes = []
+    for p in prestamos:
+        nombre = f"{p['nombre']} {p['apellido']}"
+        fecha = p["fecha_devolucion"]
+        asunto, html = render_recordatorio_devolucion(
+            nombre, p["titulo"], fecha.strftime("%d/%m/%Y"), dias_restantes
+        )
+        mensajes.append({
+            "prestamo_id": p["id"],
+            "correo": p["correo"],
+            "nombre": nombre,
+            "asunto": asunto,
+            "html": html,
+        })
+    return mensajes
+
+
+async def marcar_recordatorios_enviados(lote: list[dict]):
+    """Marca el lote como notificado; si el job se repite, ya no lo selecciona"""
+    ids = [m["prestamo_id"] for m in lote]
+    async with get_cursor() as (conn, cursor):
+        await cursor.execute(
+            f"""
+            UPDATE prestamos_fisicos
+            SET correo_recordatorio_enviado = TRUE
+            WHERE id IN ({", ".join(["%s"] * len(ids))})
+            AND correo_recordatorio_enviado = FALSE
+            """,
+            ids,
+        )
+        await conn.commit()
+
+
+async def enviar_recordatorios_devolucion(lease=None):
+    """
+    Envía el recordatorio de devolución a todos los préstamos que vencen en
+    RECORDATORIO_DIAS_ANTES día(s). Corre a diario desde el scheduler.
+    Se marca cada lote después de que Brevo lo acepta, así que repetir el job
+    no reenvía correos.
+    """
+    tz = pytz.timezone("America/Bogota")
+    hoy = datetime.now(tz).date()
+    vence = hoy + timedelta(days=RECORDATORIO_DIAS_ANTES)
+
+    prestamos = await buscar_prestamos_por_vencer(vence)
+    logger.info(f"⏰ {len(prestamos)} préstamo(s) vencen el {vence} sin recordatorio")
+    if not prestamos:
+        return {"status": "success", "enviados": 0, "fallidos": 0, "filas_afectadas": 0}
+
+    mensajes = armar_recordatorios(prestamos, RECORDATORIO_DIAS_ANTES)
+    resultado = await enviar_correos_en_lotes(
+        mensajes,
+        al_enviar=marcar_recordatorios_enviados,
+        antes_de_lote=lease.verificar if lease is not None else None,
+    )
+
+    return {
+        "status": "success" if not resultado["fallidos"] else "partial",
+        "enviados": resultado["enviados"],
+        "fallidos": resultado["fallidos"],
+        "filas_afectadas": resultado["enviados"],
+        "detalle": f"{resultado['requests']} request(s) a Brevo",
+        "fecha_vencimiento": vence.isoformat(),
+    }
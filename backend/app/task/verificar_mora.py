@@ -1,18 +1,24 @@
+import logging
 from datetime import datetime, timedelta
 import pytz
 from app.config.database import get_cursor
 from app.utils.email_mora import send_cuenta_bloqueada_mora
 
-async def verificar_y_bloquear_usuarios_con_mora():
+logger = logging.getLogger(__name__)
+
+async def verificar_y_bloquear_usuarios_con_mora(lease=None):
     """
     Verifica préstamos vencidos y bloquea cuentas automáticamente
     Debe ejecutarse diariamente (cron o scheduler)
+
+    Con `lease` (ver app.task.jobs) se verifica que este worker siga siendo el
+    dueño del job antes de cada bloqueo (fencing en la misma transacción) y de cada correo.
     """
     
     tz = pytz.timezone("America/Bogota")
     hoy = datetime.now(tz).date()
     
-    print(f"🔍 Verificando mora de usuarios - {hoy}")
+    logger.info(f"🔍 Verificando mora de usuarios - {hoy}")
     
     async with get_cursor() as (conn, cursor):
         # 1️⃣ Obtener usuarios con préstamos vencidos
@@ -27,7 +33,7 @@ async def verificar_y_bloquear_usuarios_con_mora():
                 MIN(pf.fecha_devolucion) as fecha_mas_antigua
             FROM usuarios u
             INNER JOIN prestamos_fisicos pf ON u.id = pf.usuario_id
-            WHERE pf.estado = 'activo'
+            WHERE pf.estado IN ('activo', 'atrasado')
             AND pf.fecha_devolucion < %s
             GROUP BY u.id
             HAVING u.estado != 'Bloqueado'
@@ -36,8 +42,8 @@ async def verificar_y_bloquear_usuarios_con_mora():
         usuarios_morosos = await cursor.fetchall()
         
         if not usuarios_morosos:
-            print("✅ No hay usuarios con préstamos vencidos")
-            return {"status": "success", "bloqueados": 0}
+            logger.info("✅ No hay usuarios con préstamos vencidos")
+            return {"status": "success", "bloqueados": 0, "filas_afectadas": 0}
         
         bloqueados = 0
         
@@ -57,7 +63,7 @@ async def verificar_y_bloquear_usuarios_con_mora():
                 FROM prestamos_fisicos pf
                 INNER JOIN libros l ON pf.libro_id = l.id
                 WHERE pf.usuario_id = %s
-                AND pf.estado = 'activo'
+                AND pf.estado IN ('activo', 'atrasado')
                 AND pf.fecha_devolucion < %s
                 ORDER BY pf.fecha_devolucion ASC
             """, (usuario_id, hoy))
@@ -65,6 +71,8 @@ async def verificar_y_bloquear_usuarios_con_mora():
             libros_vencidos = await cursor.fetchall()
             
             # 3️⃣ Bloquear cuenta del usuario
+            if lease is not None:
+                await lease.fencing(cursor)
             await cursor.execute("""
                 UPDATE usuarios 
                 SET estado = 'Bloqueado',
@@ -79,9 +87,11 @@ async def verificar_y_bloquear_usuarios_con_mora():
             
             await conn.commit()
             
-            print(f"🔒 Usuario bloqueado: {nombre_completo} (ID: {usuario_id})")
+            logger.info(f"🔒 Usuario bloqueado: {nombre_completo} (ID: {usuario_id})")
             
             # 4️⃣ Enviar correo de notificación
+            if lease is not None:
+                await lease.verificar()
             try:
                 await send_cuenta_bloqueada_mora(
                     recipient_email=usuario['correo'],
@@ -90,14 +100,15 @@ async def verificar_y_bloquear_usuarios_con_mora():
                     dias_mora=dias_mora
                 )
             except Exception as e:
-                print(f"⚠️ Error enviando correo a {usuario['correo']}: {e}")
+                logger.warning(f"⚠️ Error enviando correo a {usuario['correo']}: {e}")
             
             bloqueados += 1
         
-        print(f"✅ Proceso completado: {bloqueados} usuario(s) bloqueado(s)")
+        logger.info(f"✅ Proceso completado: {bloqueados} usuario(s) bloqueado(s)")
         
         return {
             "status": "success",
             "bloqueados": bloqueados,
+            "filas_afectadas": bloqueados,
             "fecha_verificacion": hoy.isoformat()
         }
\ No newline at end of file
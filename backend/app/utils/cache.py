@@ -0,0 +1,236 @@
+import asyncio
+import functools
+import hashlib
+import inspect
+import json
+import logging
+import os
+import pickle
+import time
+from datetime import date, datetime
+from decimal import Decimal
+
+from app.dependencias.redis import r_async
+from app.utils.cache_ns import invalidar_ns
+from app.utils.metricas import CACHE_CONSULTAS
+
+logger = logging.getLogger(__name__)
+
+# ⚙️ Caché de dos niveles para funciones async (rutas y modelos)
+#   L1: dict en memoria del proceso, TTL corto (CACHE_L1_TTL) para absorber ráfagas
+#   L2: Redis, TTL propio de cada función
+# Los tags son namespaces de app.utils.cache_ns: la versión de cada tag va en la
+# clave de Redis, así que `invalidar_tags("libros")` es un INCR y lo viejo expira solo.
+CACHE_L1_TTL = float(os.getenv("CACHE_L1_TTL", 5))
+CACHE_L1_MAX = int(os.getenv("CACHE_L1_MAX", 5000))
+CACHE_ACTIVO = os.getenv("CACHE_ACTIVO", "1") != "0"
+
+# Parámetros que no forman parte de la clave (conexión del request, etc.)
+_IGNORADOS = {"uow", "db", "current_user", "lease"}
+
+
+def _json_default(valor):
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return float(valor)
+    if isinstance(valor, bytes):
+        return valor.decode("utf-8", "replace")
+    raise TypeError(f"No serializable: {type(valor).__name__}")
+
+
+class SerializadorJson:
+    """Default: legible desde redis-cli; fechas y Decimal salen como str/float"""
+
+    @staticmethod
+    def dumps(valor) -> bytes:
+        return json.dumps(valor, default=_json_default, ensure_ascii=False).encode("utf-8")
+
+    @staticmethod
+    def loads(datos: bytes):
+        return json.loads(datos)
+
+
+class SerializadorPickle:
+    """Conserva tipos (datetime, Decimal); solo para datos generados por la app"""
+
+    @staticmethod
+    def dumps(valor) -> bytes:
+        return pickle.dumps(valor, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def loads(datos: bytes):
+        return pickle.loads(datos)
+
+
+SERIALIZADORES = {"json": SerializadorJson, "pickle": SerializadorPickle}
+
+# L1: clave base -> (expira, valor); índice tag -> claves base para invalidar local
+_l1: dict[str, tuple[float, object]] = {}
+_l1_por_tag: dict[str, set] = {}
+# Generación local de cada tag: un cálculo que empezó antes de invalidar no guarda en L1
+_generaciones: dict[str, int] = {}
+# Single-flight: clave base -> future del cálculo en curso
+_en_vuelo: dict[str, asyncio.Future] = {}
+
+
+def _cachear_por_defecto(valor) -> bool:
+    """No cachear None ni respuestas de error de los modelos ({"status": "error"})"""
+    if valor is None:
+        return False
+    if isinstance(valor, dict) and valor.get("status") == "error":
+        return False
+    return True
+
+
+def _l1_guardar(clave: str, valor, tags: list[str], ttl: float):
+    if len(_l1) >= CACHE_L1_MAX:
+        _l1.clear()
+        _l1_por_tag.clear()
+    _l1[clave] = (time.monotonic() + ttl, valor)
+    for tag in tags:
+        _l1_por_tag.setdefault(tag, set()).add(clave)
+
+
+def _l1_leer(clave: str):
+    entrada = _l1.get(clave)
+    if entrada is None:
+        return None
+    expira, valor = entrada
+    if expira < time.monotonic():
+        _l1.pop(clave, None)
+        return None
+    return entrada
+
+
+def invalidar_tags(*tags: str):
+    """Invalida todas las entradas con estos tags (Redis: INCR por tag; L1 local: borrado)"""
+    for tag in tags:
+        _generaciones[tag] = _generaciones.get(tag, 0) + 1
+        for clave in _l1_por_tag.pop(tag, ()):
+            _l1.pop(clave, None)
+    invalidar_ns(*tags)
+
+
+async def _versiones(tags: list[str]) -> str:
+    if not tags:
+        return ""
+    valores = await r_async.mget([f"cache_ns:{t}" for t in tags])
+    return ":" + ",".join(f"{t}@{int(v) if v else 0}" for t, v in zip(tags, valores))
+
+
+def cacheado(
+    nombre: str,
+    ttl: int,
+    tags=None,
+    serializador: str = "json",
+    l1_ttl: float | None = None,
+    cachear_si=_cachear_por_defecto,
+):
+    """
+    Decorador de caché para funciones async.
+
+        @cacheado("comentarios", ttl=300, tags=lambda libro_id, **_: [f"comentarios:{libro_id}"])
+        async def get_comments_by_book(libro_id, uow=None): ...
+
+    - La clave sale del nombre y los argumentos (sin uow/db/current_user).
+    - `tags`: lista fija o función que recibe los mismos argumentos.
+    - Misses simultáneos de la misma clave en el proceso esperan un único cálculo.
+    - Métrica: aeternum_cache_requests_total{cache=nombre, result=l1_hit|hit|miss|coalesced}
+    """
+    ser = SERIALIZADORES[serializador] if isinstance(serializador, str) else serializador
+    ttl_l1 = min(ttl, CACHE_L1_TTL if l1_ttl is None else l1_ttl)
+
+    def decorador(func):
+        firma = inspect.signature(func)
+
+        def clave_base(args, kwargs) -> tuple[str, list[str], dict]:
+            enlazados = firma.bind(*args, **kwargs)
+            enlazados.apply_defaults()
+            parametros = {k: v for k, v in enlazados.arguments.items() if k not in _IGNORADOS}
+            texto = json.dumps(parametros, sort_keys=True, default=str)
+            if len(texto) > 120:
+                texto = hashlib.sha1(texto.encode()).hexdigest()
+            etiquetas = tags(**enlazados.arguments) if callable(tags) else list(tags or [])
+            return f"cache:{nombre}:{texto}", etiquetas, parametros
+
+        async def calcular(clave: str, etiquetas: list[str], args, kwargs):
+            generacion = [_generaciones.get(t, 0) for t in etiquetas]
+
+            def guardar_l1(valor):
+                # Si se invalidó mientras se calculaba, el valor puede ser anterior a la escritura
+                if generacion == [_generaciones.get(t, 0) for t in etiquetas]:
+                    _l1_guardar(clave, valor, etiquetas, ttl_l1)
+
+            # L2 (Redis)
+            clave_redis = None
+            if r_async is not None:
+                try:
+                    clave_redis = clave + await _versiones(etiquetas)
+                    datos = await r_async.get(clave_redis)
+                    if datos is not None:
+                        valor = ser.loads(datos)
+                        CACHE_CONSULTAS.inc(nombre, "hit")
+                        guardar_l1(valor)
+                        return valor
+                except Exception as e:
+                    logger.warning(f"⚠️ Caché '{nombre}' sin Redis: {e}")
+                    clave_redis = None
+
+            CACHE_CONSULTAS.inc(nombre, "miss")
+            valor = await func(*args, **kwargs)
+            if not cachear_si(valor):
+                return valor
+
+            guardar_l1(valor)
+            if clave_redis is not None:
+                try:
+                    await r_async.set(clave_redis, ser.dumps(valor), ex=ttl)
+                except Exception as e:
+                    logger.warning(f"⚠️ No se pudo guardar '{nombre}' en Redis: {e}")
+            return valor
+
+        @functools.wraps(func)
+        async def envoltura(*args, **kwargs):
+            if not CACHE_ACTIVO:
+                return await func(*args, **kwargs)
+
+            clave, etiquetas, _ = clave_base(args, kwargs)
+
+            entrada = _l1_leer(clave)
+            if entrada is not None:
+                CACHE_CONSULTAS.inc(nombre, "l1_hit")
+                return entrada[1]
+
+            # 🛬 Single-flight: el primero calcula, el resto espera el mismo future.
+            # Si el que calculaba se canceló (cliente desconectado) los que esperaban
+            # no fallan: vuelven a intentar y uno de ellos pasa a calcular.
+            while (pendiente := _en_vuelo.get(clave)) is not None:
+                CACHE_CONSULTAS.inc(nombre, "coalesced")
+                try:
+                    return await asyncio.shield(pendiente)
+                except asyncio.CancelledError:
+                    if not pendiente.cancelled() or asyncio.current_task().cancelling():
+                        raise
+
+            futuro = asyncio.get_running_loop().create_future()
+            _en_vuelo[clave] = futuro
+            try:
+                valor = await calcular(clave, etiquetas, args, kwargs)
+                futuro.set_result(valor)
+                return valor
+            except asyncio.CancelledError:
+                futuro.cancel()
+                raise
+            except Exception as e:
+                futuro.set_exception(e)
+                # Evita "Future exception was never retrieved" si nadie más esperaba
+                futuro.exception()
+                raise
+            finally:
+                _en_vuelo.pop(clave, None)
+
+        envoltura.sin_cache = func
+        return envoltura
+
+    return decorador
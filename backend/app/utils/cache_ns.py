@@ -0,0 +1,44 @@
+import logging
+
+from app.dependencias.redis import r, r_async
+
+logger = logging.getLogger(__name__)
+
+# 🏷️ Namespaces de caché versionados.
+# Cada namespace (p. ej. "graficas", "estadisticas", "prestamos_usuario:15") tiene
+# un contador `cache_ns:{namespace}` que va dentro de sus claves:
+#     graficas:v7:6m
+# Invalidar es un INCR (O(1)): las claves de la versión anterior ya no se leen
+# y expiran solas por su TTL. Nunca se recorre el keyspace con SCAN.
+
+
+def _clave_version(namespace: str) -> str:
+    return f"cache_ns:{namespace}"
+
+
+def version_ns(namespace: str) -> int:
+    try:
+        valor = r.get(_clave_version(namespace))
+        return int(valor) if valor else 0
+    except Exception:
+        return 0
+
+
+def clave_ns(namespace: str, *partes) -> str:
+    """Clave vigente dentro del namespace: {namespace}:v{version}[:partes...]"""
+    sufijo = "".join(f":{p}" for p in partes)
+    return f"{namespace}:v{version_ns(namespace)}{sufijo}"
+
+
+def invalidar_ns(*namespaces: str):
+    """Sube la versión de uno o varios namespaces en un solo viaje a Redis"""
+    # Sin Redis (r es el stub sin pipeline) no hay versiones que subir
+    if r_async is None or not namespaces:
+        return
+    try:
+        pipe = r.pipeline(transaction=False)
+        for namespace in namespaces:
+            pipe.incr(_clave_version(namespace))
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"⚠️ No se pudo invalidar caché {namespaces}: {e}")
@@ -0,0 +1,267 @@
+import logging
+import os
+
+from app.config.database import get_cursor
+from app.dependencias.redis import r_async
+from app.utils.metricas import registrar_cache
+
+logger = logging.getLogger(__name__)
+
+# 🔢 Contadores en Redis (MySQL sigue siendo la fuente de verdad):
+#   prestamos_activos:{usuario_id}  préstamos pendiente/activo/atrasado del usuario
+#   libro_disponible:{libro_id}     copia de libros.cantidad_disponible
+# Se ajustan justo después del commit que cambia las tablas, se llenan desde SQL
+# cuando faltan y el job `reconciliar_contadores` corrige cualquier desvío.
+CONTADORES_TTL = int(os.getenv("CONTADORES_TTL", 6 * 3600))
+ESTADOS_VIGENTES = ("pendiente", "activo", "atrasado")
+
+_USUARIOS_SEGUIDOS = "contadores:usuarios"
+
+# Ajusta solo las claves que existen: si no están, la próxima lectura las llena desde SQL
+_LUA_AJUSTAR = """
+for i, clave in ipairs(KEYS) do
+    if redis.call('EXISTS', clave) == 1 then
+        redis.call('INCRBY', clave, ARGV[i])
+    end
+end
+return 1
+"""
+
+# Compare-and-set del job de reconciliación: reemplaza cada clave solo si sigue
+# valiendo lo que se leyó antes del SELECT ("" = no existía). Un delta aplicado
+# entre la lectura y la escritura gana; el próximo ciclo revisa esa clave de nuevo.
+# KEYS: claves   ARGV: ttl, (anterior, real) por clave.  Retorna los corregidos.
+_LUA_RECONCILIAR = """
+local corregidos = 0
+for i, clave in ipairs(KEYS) do
+    local anterior, real = ARGV[2 * i], ARGV[2 * i + 1]
+    local actual = redis.call('GET', clave) or ''
+    if actual == anterior then
+        redis.call('SET', clave, real, 'EX', ARGV[1])
+        if anterior ~= '' and anterior ~= real then
+            corregidos = corregidos + 1
+        end
+    end
+end
+return corregidos
+"""
+
+
+def clave_usuario(usuario_id: int) -> str:
+    return f"prestamos_activos:{usuario_id}"
+
+
+def clave_libro(libro_id: int) -> str:
+    return f"libro_disponible:{libro_id}"
+
+
+async def ajustar_contadores(
+    usuario_id: int | None = None,
+    delta_usuario: int = 0,
+    libros: dict[int, int] | None = None,
+):
+    """
+    Aplica los deltas de una transacción ya confirmada (llamar después del commit).
+    `libros` es {libro_id: delta}. Si Redis falla, borra las claves para que se
+    recalculen desde SQL en la próxima lectura.
+    """
+    if r_async is None:
+        return
+    claves, deltas = [], []
+    if usuario_id is not None and delta_usuario:
+        claves.append(clave_usuario(usuario_id))
+        deltas.append(delta_usuario)
+    for libro_id, delta in (libros or {}).items():
+        if delta:
+            claves.append(clave_libro(libro_id))
+            deltas.append(delta)
+    if not claves:
+        return
+    try:
+        await r_async.eval(_LUA_AJUSTAR, len(claves), *claves, *deltas)
+    except Exception as e:
+        logger.warning(f"⚠️ No se pudieron ajustar contadores {claves}: {e}")
+        try:
+            await r_async.delete(*claves)
+        except Exception:
+            pass
+
+
+async def invalidar_libro(libro_id: int):
+    """El bibliotecario cambió el stock a mano: se recalcula en la próxima lectura"""
+    if r_async is None:
+        return
+    try:
+        await r_async.delete(clave_libro(libro_id))
+    except Exception as e:
+        logger.warning(f"⚠️ No se pudo invalidar {clave_libro(libro_id)}: {e}")
+
+
+async def prestamos_activos_usuario(usuario_id: int, limite: int | None = None) -> int:
+    """
+    Préstamos vigentes del usuario: un GET en Redis, COUNT(*) solo si falta la clave.
+    Con `limite`, un valor de Redis que ya lo alcanza es solo una pista: se confirma
+    con COUNT(*) en el primario y, si sobraba, se corrige la clave. El llenado
+    puede dejar un conteo alto (una cancelación entre el COUNT y el SET NX no
+    encuentra la clave que ajustar), y eso no debe bloquear al usuario.
+    """
+    clave = clave_usuario(usuario_id)
+    valor = None
+    if r_async is not None:
+        try:
+            valor = await r_async.get(clave)
+            if valor is not None and (limite is None or int(valor) < limite):
+                registrar_cache("prestamos_activos", True)
+                return int(valor)
+        except Exception as e:
+            logger.warning(f"⚠️ Redis no disponible para {clave}: {e}")
+    registrar_cache("prestamos_activos", False)
+
+    async with get_cursor() as (conn, cursor):
+        await cursor.execute("""
+            SELECT COUNT(*) as total
+            FROM prestamos_fisicos
+            WHERE usuario_id = %s
+            AND estado IN ('pendiente', 'activo', 'atrasado')
+        """, (usuario_id,))
+        total = (await cursor.fetchone())["total"]
+
+    if valor is not None:
+        if int(valor) != total:
+            try:
+                # Compare-and-set: un delta aplicado después del GET gana
+                await r_async.eval(_LUA_RECONCILIAR, 1, clave, CONTADORES_TTL, valor, total)
+            except Exception:
+                pass
+        return total
+
+    if r_async is not None:
+        try:
+            async with r_async.pipeline(transaction=False) as pipe:
+                # NX: si un préstamo ya llenó la clave, su valor es más nuevo que este COUNT
+                pipe.set(clave, total, ex=CONTADORES_TTL, nx=True)
+                pipe.sadd(_USUARIOS_SEGUIDOS, usuario_id)
+                await pipe.execute()
+        except Exception:
+            pass
+    return total
+
+
+async def disponibles_libros(valores_sql: dict[int, int]) -> dict[int, int]:
+    """
+    Disponibilidad fresca para una lista de libros con un solo MGET.
+    `valores_sql` es {libro_id: cantidad_disponible} tal como vino de la consulta
+    (que puede salir de una réplica o de caché): solo se usa si Redis no está.
+    Las claves que faltan se llenan leyendo el primario. Retorna {libro_id: cantidad}.
+    """
+    if r_async is None or not valores_sql:
+        return dict(valores_sql)
+    ids = list(valores_sql)
+    try:
+        actuales = await r_async.mget([clave_libro(i) for i in ids])
+    except Exception as e:
+        logger.warning(f"⚠️ Redis no disponible para disponibilidad: {e}")
+        return dict(valores_sql)
+
+    resultado = {libro_id: int(valor) for libro_id, valor in zip(ids, actuales) if valor is not None}
+    faltantes = [libro_id for libro_id in ids if libro_id not in resultado]
+    registrar_cache("libro_disponible", not faltantes)
+    if not faltantes:
+        return resultado
+
+    # Primario: el valor cacheado o de réplica quedaría fijado en Redis hasta el próximo ajuste
+    async with get_cursor() as (conn, cursor):
+        await cursor.execute(
+            f"SELECT id, cantidad_disponible FROM libros WHERE id IN ({', '.join(['%s'] * len(faltantes))})",
+            faltantes,
+        )
+        frescos = {f["id"]: f["cantidad_disponible"] or 0 for f in await cursor.fetchall()}
+    faltantes = {libro_id: frescos.get(libro_id, valores_sql[libro_id] or 0) for libro_id in faltantes}
+    resultado.update(faltantes)
+
+    if faltantes:
+        try:
+            async with r_async.pipeline(transaction=False) as pipe:
+                for libro_id, cantidad in faltantes.items():
+                    # NX: no pisar un valor que otro request ajustó mientras tanto
+                    pipe.set(clave_libro(libro_id), cantidad, ex=CONTADORES_TTL, nx=True)
+                await pipe.execute()
+        except Exception:
+            pass
+    return resultado
+
+
+async def reconciliar_contadores(lease=None):
+    """
+    Job periódico: reescribe los contadores desde las tablas y cuenta los desvíos.
+    Libros: todos (sirve también de precarga). Usuarios: los que tienen clave
+    (registrados en el set contadores:usuarios); los que expiraron salen del set.
+    Por bloque: MGET, luego SELECT en el primario, luego compare-and-set
+    (_LUA_RECONCILIAR) para no pisar los deltas que lleguen en medio.
+    """
+    if r_async is None:
+        return {"status": "skipped", "filas_afectadas": 0, "detalle": "Redis no disponible"}
+
+    corregidos = 0
+
+    # 📚 Libros
+    async with get_cursor("reporting") as (conn, cursor):
+        await cursor.execute("SELECT id FROM libros")
+        libros = [f["id"] for f in await cursor.fetchall()]
+    for i in range(0, len(libros), 1000):
+        if lease is not None:
+            await lease.verificar()
+        bloque = libros[i:i + 1000]
+        claves = [clave_libro(libro_id) for libro_id in bloque]
+        anteriores = await r_async.mget(claves)
+        async with get_cursor("reporting") as (conn, cursor):
+            await cursor.execute(
+                f"SELECT id, cantidad_disponible FROM libros WHERE id IN ({', '.join(['%s'] * len(bloque))})",
+                bloque,
+            )
+            reales = {f["id"]: f["cantidad_disponible"] or 0 for f in await cursor.fetchall()}
+        argumentos = [CONTADORES_TTL]
+        for libro_id, anterior in zip(bloque, anteriores):
+            argumentos += [anterior or "", reales.get(libro_id, 0)]
+        corregidos += await r_async.eval(_LUA_RECONCILIAR, len(claves), *claves, *argumentos)
+
+    # 👤 Usuarios seguidos
+    usuarios = [int(u) for u in await r_async.smembers(_USUARIOS_SEGUIDOS)]
+    for i in range(0, len(usuarios), 1000):
+        if lease is not None:
+            await lease.verificar()
+        bloque = usuarios[i:i + 1000]
+        anteriores = await r_async.mget([clave_usuario(u) for u in bloque])
+        async with get_cursor("reporting") as (conn, cursor):
+            await cursor.execute(
+                f"""
+                SELECT usuario_id, COUNT(*) as total
+                FROM prestamos_fisicos
+                WHERE usuario_id IN ({", ".join(["%s"] * len(bloque))})
+                AND estado IN ('pendiente', 'activo', 'atrasado')
+                GROUP BY usuario_id
+                """,
+                bloque,
+            )
+            reales = {f["usuario_id"]: f["total"] for f in await cursor.fetchall()}
+
+        # Solo las claves que existían: una que expiró sale del set y se llena al leerla
+        claves, argumentos, expirados = [], [CONTADORES_TTL], []
+        for usuario_id, anterior in zip(bloque, anteriores):
+            if anterior is None:
+                expirados.append(usuario_id)
+                continue
+            claves.append(clave_usuario(usuario_id))
+            argumentos += [anterior, reales.get(usuario_id, 0)]
+        if claves:
+            corregidos += await r_async.eval(_LUA_RECONCILIAR, len(claves), *claves, *argumentos)
+        if expirados:
+            await r_async.srem(_USUARIOS_SEGUIDOS, *expirados)
+
+    if corregidos:
+        logger.warning(f"⚠️ Reconciliación: {corregidos} contador(es) corregidos")
+    return {
+        "status": "success",
+        "filas_afectadas": corregidos,
+        "detalle": f"{len(libros)} libros, {len(usuarios)} usuarios revisados; {corregidos} corregidos",
+    }
@@ -0,0 +1,118 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from fastapi import HTTPException
+from app.utils.metricas import GaugeCallback
+
+# ⚙️ Configuración del pool de procesos para trabajo CPU (bcrypt, etc.)
+CPU_POOL_WORKERS = int(os.getenv("CPU_POOL_WORKERS", max(1, (os.cpu_count() or 2) - 1)))
+CPU_POOL_MAX_PENDING = int(os.getenv("CPU_POOL_MAX_PENDING", CPU_POOL_WORKERS * 8))
+CPU_POOL_QUEUE_TIMEOUT = float(os.getenv("CPU_POOL_QUEUE_TIMEOUT", 3))
+
+_executor: ProcessPoolExecutor | None = None
+_slots: asyncio.Semaphore | None = None
+_en_cola = 0
+_en_ejecucion = 0
+
+_metricas = {
+    "ejecutadas": 0,
+    "rechazadas": 0,
+    "timeouts_cola": 0,
+    "espera_total_ms": 0.0,
+    "espera_max_ms": 0.0,
+    "ejecucion_total_ms": 0.0,
+}
+
+
+def iniciar_pool_cpu():
+    """Crea el pool de procesos (se llama en el startup de la app)"""
+    global _executor, _slots
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=CPU_POOL_WORKERS)
+        _slots = asyncio.Semaphore(CPU_POOL_WORKERS)
+        print(f"🧮 Pool CPU iniciado: {CPU_POOL_WORKERS} procesos, cola máx {CPU_POOL_MAX_PENDING}")
+
+
+def cerrar_pool_cpu():
+    """Cierra el pool de procesos"""
+    global _executor, _slots
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+        _slots = None
+        print("🧮 Pool CPU cerrado")
+
+
+async def ejecutar_en_pool(func, *args):
+    """
+    Ejecuta `func(*args)` en el pool de procesos sin bloquear el event loop.
+    Si la cola está llena o la espera supera CPU_POOL_QUEUE_TIMEOUT responde 429.
+    `func` debe ser una función de módulo (picklable).
+    """
+    global _en_cola, _en_ejecucion
+
+    if _executor is None:
+        iniciar_pool_cpu()
+
+    if _en_cola >= CPU_POOL_MAX_PENDING:
+        _metricas["rechazadas"] += 1
+        raise HTTPException(
+            status_code=429,
+            detail="Servidor ocupado, intenta de nuevo en unos segundos.",
+            headers={"Retry-After": "1"}
+        )
+
+    inicio_espera = time.perf_counter()
+    _en_cola += 1
+    try:
+        await asyncio.wait_for(_slots.acquire(), timeout=CPU_POOL_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        _metricas["timeouts_cola"] += 1
+        raise HTTPException(
+            status_code=429,
+            detail="Servidor ocupado, intenta de nuevo en unos segundos.",
+            headers={"Retry-After": "1"}
+        )
+    finally:
+        _en_cola -= 1
+
+    espera_ms = (time.perf_counter() - inicio_espera) * 1000
+    _metricas["espera_total_ms"] += espera_ms
+    _metricas["espera_max_ms"] = max(_metricas["espera_max_ms"], espera_ms)
+
+    _en_ejecucion += 1
+    inicio = time.perf_counter()
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_executor, func, *args)
+    finally:
+        _en_ejecucion -= 1
+        _slots.release()
+        _metricas["ejecutadas"] += 1
+        _metricas["ejecucion_total_ms"] += (time.perf_counter() - inicio) * 1000
+
+
+def obtener_metricas_cpu() -> dict:
+    """Métricas del pool CPU: cola, espera y ejecución"""
+    ejecutadas = _metricas["ejecutadas"] or 1
+    return {
+        "workers": CPU_POOL_WORKERS,
+        "max_pendientes": CPU_POOL_MAX_PENDING,
+        "en_cola": _en_cola,
+        "en_ejecucion": _en_ejecucion,
+        "ejecutadas": _metricas["ejecutadas"],
+        "rechazadas": _metricas["rechazadas"],
+        "timeouts_cola": _metricas["timeouts_cola"],
+        "espera_promedio_ms": round(_metricas["espera_total_ms"] / ejecutadas, 2),
+        "espera_max_ms": round(_metricas["espera_max_ms"], 2),
+        "ejecucion_promedio_ms": round(_metricas["ejecucion_total_ms"] / ejecutadas, 2),
+    }
+
+
+GaugeCallback("aeternum_cpu_pool_queued", "Tareas CPU (bcrypt) esperando un proceso", (),
+              lambda: [((), _en_cola)])
+GaugeCallback("aeternum_cpu_pool_running", "Tareas CPU en ejecución", (),
+              lambda: [((), _en_ejecucion)])
+GaugeCallback("aeternum_cpu_pool_rejected_total", "Tareas CPU rechazadas con 429", (),
+              lambda: [((), _metricas["rechazadas"] + _metricas["timeouts_cola"])], tipo="counter")
@@ -0,0 +1,29 @@
+import asyncio
+import importlib
+from fastapi import HTTPException
+
+# 📦 Dependencias pesadas (pandas ~400 ms, fpdf ~300 ms de import) que solo usan
+# las exportaciones: se importan la primera vez que se necesitan, en un hilo
+# para no congelar el event loop, y quedan en caché en sys.modules.
+
+_INSTRUCCIONES = {
+    "pandas": "pandas no está instalado. Ejecuta: pip install pandas openpyxl",
+    "fpdf": "fpdf2 no está instalado. Ejecuta: pip install fpdf2",
+}
+
+
+async def _importar(nombre: str):
+    try:
+        return await asyncio.to_thread(importlib.import_module, nombre)
+    except ImportError:
+        raise HTTPException(status_code=500, detail=_INSTRUCCIONES[nombre])
+
+
+async def cargar_pandas():
+    """Módulo pandas (500 si no está instalado)"""
+    return await _importar("pandas")
+
+
+async def cargar_fpdf():
+    """Clase FPDF de fpdf2 (500 si no está instalado)"""
+    return (await _importar("fpdf")).FPDF
@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import os
+import time
+
+import httpx
+from app.utils.metricas import medir_upstream
+
+logger = logging.getLogger(__name__)
+
+BREVO_API_KEY = os.getenv("BREVO_API_KEY")
+SENDER_EMAIL = os.getenv("SENDER_EMAIL")
+SENDER_NAME = os.getenv("SENDER_NAME")
+
+# ⚙️ Envío masivo: Brevo acepta varios destinatarios por request con `messageVersions`
+# BREVO_LOTE: versiones (correos) por request (Brevo admite hasta 1000)
+# BREVO_CORREOS_POR_SEGUNDO: tope de correos/segundo hacia Brevo (token bucket)
+# BREVO_CONCURRENCIA: requests de lote simultáneos
+BREVO_URL = os.getenv("BREVO_API_URL", "https://api.brevo.com/v3/smtp/email")
+BREVO_LOTE = int(os.getenv("BREVO_LOTE", 100))
+BREVO_CORREOS_POR_SEGUNDO = float(os.getenv("BREVO_CORREOS_POR_SEGUNDO", 200))
+BREVO_CONCURRENCIA = int(os.getenv("BREVO_CONCURRENCIA", 2))
+BREVO_REINTENTOS = int(os.getenv("BREVO_REINTENTOS", 3))
+
+
+class LimitadorTasa:
+    """Token bucket en memoria: `await adquirir(n)` espera hasta tener n tokens"""
+
+    def __init__(self, por_segundo: float, rafaga: float | None = None):
+        self.por_segundo = por_segundo
+        self.capacidad = rafaga or max(por_segundo, 1)
+        self.tokens = self.capacidad
+        self.ts = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def adquirir(self, n: int = 1):
+        async with self._lock:
+            while True:
+                ahora = time.monotonic()
+                self.tokens = min(self.capacidad, self.tokens + (ahora - self.ts) * self.por_segundo)
+                self.ts = ahora
+                # Un lote más grande que la ráfaga pasa cuando el bucket está lleno
+                if self.tokens >= min(n, self.capacidad):
+                    self.tokens -= n
+                    return
+                await asyncio.sleep((min(n, self.capacidad) - self.tokens) / self.por_segundo)
+
+
+def _payload(mensajes: list[dict]) -> dict:
+    """
+    Un request de Brevo para todo el lote. Cada mensaje es
+    {"correo", "nombre", "asunto", "html"}; el primero hace de base.
+    """
+    base = mensajes[0]
+    return {
+        "sender": {"name": SENDER_NAME, "email": SENDER_EMAIL},
+        "subject": base["asunto"],
+        "htmlContent": base["html"],
+        "messageVersions": [
+            {
+                "to": [{"email": m["correo"], "name": m.get("nombre") or m["correo"].split("@")[0].capitalize()}],
+                "subject": m["asunto"],
+                "htmlContent": m["html"],
+            }
+            for m in mensajes
+        ],
+    }
+
+
+async def _enviar_request(cliente: httpx.AsyncClient, mensajes: list[dict]) -> tuple[bool, str]:
+    headers = {
+        "accept": "application/json",
+        "api-key": BREVO_API_KEY or "",
+        "content-type": "application/json",
+    }
+    for intento in range(1, BREVO_REINTENTOS + 1):
+        try:
+            with medir_upstream("brevo") as llamada:
+                response = await cliente.post(BREVO_URL, json=_payload(mensajes), headers=headers)
+                llamada.status = response.status_code
+        except httpx.HTTPError as e:
+            error = f"Error de red: {e}"
+            espera = 2 ** intento
+        else:
+            if response.status_code in (200, 201, 202):
+                return True, "ok"
+            error = f"Error {response.status_code}: {response.text[:200]}"
+            if response.status_code != 429 and response.status_code < 500:
+                return False, error
+            espera = float(response.headers.get("retry-after") or 2 ** intento)
+
+        if intento < BREVO_REINTENTOS:
+            logger.warning(f"⚠️ Lote de {len(mensajes)} correos falló ({error}), reintento en {espera:.0f}s")
+            await asyncio.sleep(espera)
+    return False, error
+
+
+async def enviar_correos_en_lotes(
+    mensajes: list[dict],
+    al_enviar=None,
+    cliente: httpx.AsyncClient | None = None,
+    antes_de_lote=None,
+) -> dict:
+    """
+    Envía `mensajes` agrupados en requests de BREVO_LOTE correos, respetando
+    BREVO_CORREOS_POR_SEGUNDO y BREVO_CONCURRENCIA.
+
+    al_enviar(lote): corrutina llamada con cada lote aceptado por Brevo
+    (p. ej. para marcar los registros como notificados).
+    antes_de_lote(): corrutina llamada antes de cada request (p. ej. lease.verificar).
+    Retorna {"enviados": n, "fallidos": n, "requests": n}.
+    """
+    if not mensajes:
+        return {"enviados": 0, "fallidos": 0, "requests": 0}
+    if not BREVO_API_KEY and cliente is None:
+        logger.error("❌ BREVO_API_KEY no está configurada")
+        return {"enviados": 0, "fallidos": len(mensajes), "requests": 0}
+
+    lotes = [mensajes[i:i + BREVO_LOTE] for i in range(0, len(mensajes), BREVO_LOTE)]
+    limitador = LimitadorTasa(BREVO_CORREOS_POR_SEGUNDO, rafaga=max(BREVO_LOTE, BREVO_CORREOS_POR_SEGUNDO))
+    semaforo = asyncio.Semaphore(BREVO_CONCURRENCIA)
+    totales = {"enviados": 0, "fallidos": 0, "requests": 0}
+
+    async def procesar(http: httpx.AsyncClient, lote: list[dict]):
+        async with semaforo:
+            if antes_de_lote is not None:
+                await antes_de_lote()
+            await limitador.adquirir(len(lote))
+            ok, detalle = await _enviar_request(http, lote)
+            totales["requests"] += 1
+            if not ok:
+                totales["fallidos"] += len(lote)
+                logger.error(f"❌ Lote de {len(lote)} correos no enviado: {detalle}")
+                return
+            if al_enviar is not None:
+                await al_enviar(lote)
+            totales["enviados"] += len(lote)
+
+    async def ejecutar(http: httpx.AsyncClient):
+        tareas = [asyncio.create_task(procesar(http, lote)) for lote in lotes]
+        try:
+            await asyncio.gather(*tareas)
+        finally:
+            for tarea in tareas:
+                tarea.cancel()
+
+    if cliente is not None:
+        await ejecutar(cliente)
+    else:
+        async with httpx.AsyncClient(timeout=30.0) as http:
+            await ejecutar(http)
+
+    logger.info(
+        f"📧 Envío masivo: {totales['enviados']} enviados, {totales['fallidos']} fallidos "
+        f"en {totales['requests']} request(s)"
+    )
+    return totales
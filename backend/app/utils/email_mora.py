@@ -1,11 +1,13 @@
 import logging
 import os
 import requests
+from app.utils.metricas import medir_upstream
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
 BREVO_API_KEY = os.getenv("BREVO_API_KEY")
+BREVO_URL = os.getenv("BREVO_API_URL", "https://api.brevo.com/v3/smtp/email")
 SENDER_EMAIL = os.getenv("SENDER_EMAIL")
 SENDER_NAME = os.getenv("SENDER_NAME")
 FRONTEND_URL = os.getenv("FRONTEND_URL", "https://aeternum-app-production.up.railway.app")
@@ -139,12 +141,14 @@ async def _send_email_brevo(recipient_email: str, subject: str, html_content: st
     }
     
     try:
-        response = requests.post(
-            "https://api.brevo.com/v3/smtp/email",
-            json=payload,
-            headers=headers,
-            timeout=10
-        )
+        with medir_upstream("brevo") as llamada:
+            response = requests.post(
+                BREVO_URL,
+                json=payload,
+                headers=headers,
+                timeout=10
+            )
+            llamada.status = response.status_code
         
         if response.status_code == 201:
             result = response.json()
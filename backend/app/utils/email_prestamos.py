@@ -1,10 +1,13 @@
+import asyncio
 import logging
 import os
 import requests
+from app.utils.metricas import medir_upstream
 
 logger = logging.getLogger(__name__)
 
 BREVO_API_KEY = os.getenv("BREVO_API_KEY")
+BREVO_URL = os.getenv("BREVO_API_URL", "https://api.brevo.com/v3/smtp/email")
 SENDER_EMAIL = os.getenv("SENDER_EMAIL")
 SENDER_NAME = os.getenv("SENDER_NAME")
 
@@ -98,14 +101,13 @@ async def send_prestamo_cancelado(
     return await _send_email_brevo(recipient_email, subject, html_content, nombre_usuario)
 
 
-async def send_recordatorio_devolucion(
-    recipient_email: str,
+def render_recordatorio_devolucion(
     nombre_usuario: str,
     titulo_libro: str,
     fecha_devolucion: str,
     dias_restantes: int
-):
-    """Envía recordatorio de devolución próxima"""
+) -> tuple[str, str]:
+    """Arma (asunto, html) del recordatorio; lo usan el envío individual y el masivo"""
     
     subject = "⏰ Recordatorio de Devolución - Aeternum"
     
@@ -140,19 +142,40 @@ async def send_recordatorio_devolucion(
     </html>
     """
 
-    return await _send_email_brevo(recipient_email, subject, html_content, nombre_usuario)
+    return subject, html_content
 
 
-async def send_prestamo_atrasado(
+async def send_recordatorio_devolucion(
     recipient_email: str,
     nombre_usuario: str,
     titulo_libro: str,
-    fecha_devolucion: str
+    fecha_devolucion: str,
+    dias_restantes: int
 ):
-    """Envía correo cuando un préstamo pasa a estado atrasado"""
+    """Envía recordatorio de devolución próxima"""
+    
+    subject, html_content = render_recordatorio_devolucion(
+        nombre_usuario, titulo_libro, fecha_devolucion, dias_restantes
+    )
+
+    return await _send_email_brevo(recipient_email, subject, html_content, nombre_usuario)
+
+
+def render_prestamo_atrasado(nombre_usuario: str, libros: list) -> tuple[str, str]:
+    """
+    Arma (asunto, html) del aviso de atraso. `libros` es una lista de dicts con
+    {titulo, fecha_devolucion}: el job nocturno agrupa todos los del usuario.
+    """
     
     subject = "⛔ Préstamo Atrasado - Aeternum"
     
+    libros_html = "".join(
+        f"""
+                    <p><strong>Libro:</strong> {libro['titulo']}</p>
+                    <p><strong>Fecha límite:</strong> {libro['fecha_devolucion']}</p>"""
+        for libro in libros
+    )
+    
     html_content = f"""
     <html>
         <body>
@@ -163,9 +186,7 @@ async def send_prestamo_atrasado(
 
                 <p>El tiempo para devolver el libro ha expirado y tu préstamo ahora aparece como <strong>atrasado</strong>.</p>
 
-                <div style="background-color: #f8d7da; padding: 15px; border-radius: 5px; margin: 20px 0; border-left: 4px solid #d9534f;">
-                    <p><strong>Libro:</strong> {titulo_libro}</p>
-                    <p><strong>Fecha límite:</strong> {fecha_devolucion}</p>
+                <div style="background-color: #f8d7da; padding: 15px; border-radius: 5px; margin: 20px 0; border-left: 4px solid #d9534f;">{libros_html}
                 </div>
 
                 <p>Por favor devuelve el libro lo antes posible para evitar sanciones adicionales.</p>
@@ -180,6 +201,21 @@ async def send_prestamo_atrasado(
     </html>
     """
 
+    return subject, html_content
+
+
+async def send_prestamo_atrasado(
+    recipient_email: str,
+    nombre_usuario: str,
+    titulo_libro: str,
+    fecha_devolucion: str
+):
+    """Envía correo cuando un préstamo pasa a estado atrasado"""
+    
+    subject, html_content = render_prestamo_atrasado(
+        nombre_usuario, [{"titulo": titulo_libro, "fecha_devolucion": fecha_devolucion}]
+    )
+
     return await _send_email_brevo(recipient_email, subject, html_content, nombre_usuario)
 
 
@@ -272,12 +308,16 @@ async def _send_email_brevo(recipient_email: str, subject: str, html_content: st
     }
     
     try:
-        response = requests.post(
-            "https://api.brevo.com/v3/smtp/email",
-            json=payload,
-            headers=headers,
-            timeout=10
-        )
+        # En un hilo: requests es bloqueante y no debe frenar el event loop
+        with medir_upstream("brevo") as llamada:
+            response = await asyncio.to_thread(
+                requests.post,
+                BREVO_URL,
+                json=payload,
+                headers=headers,
+                timeout=10
+            )
+            llamada.status = response.status_code
         
         if response.status_code == 201:
             result = response.json()
@@ -1,10 +1,12 @@
 import logging
 import os
 import requests
+from app.utils.metricas import medir_upstream
 
 logger = logging.getLogger(__name__)
 
 BREVO_API_KEY = os.getenv("BREVO_API_KEY")
+BREVO_URL = os.getenv("BREVO_API_URL", "https://api.brevo.com/v3/smtp/email")
 SENDER_EMAIL = os.getenv("SENDER_EMAIL")
 SENDER_NAME = os.getenv("SENDER_NAME")
 
@@ -83,12 +85,14 @@ def send_verification_email(recipient_email: str, verification_url: str, user_na
     try:
         logger.info("📤 Enviando email de verificación vía Brevo API...")
         
-        response = requests.post(
-            "https://api.brevo.com/v3/smtp/email",
-            json=payload,
-            headers=headers,
-            timeout=10
-        )
+        with medir_upstream("brevo") as llamada:
+            response = requests.post(
+                BREVO_URL,
+                json=payload,
+                headers=headers,
+                timeout=10
+            )
+            llamada.status = response.status_code
         
         if response.status_code == 201:
             result = response.json()
@@ -0,0 +1,145 @@
+import os
+import secrets
+import time
+from app.dependencias.redis import r
+
+# ⚙️ Límites de intentos de login (ventana deslizante)
+MAX_ATTEMPTS = 3
+MAX_ATTEMPTS_IP = int(os.getenv("LOGIN_MAX_ATTEMPTS_IP", 20))
+LOCK_TIME_SECONDS = 15 * 60  # 15 min
+
+# 🔒 Reserva atómica de un intento: revisa bloqueos, limpia la ventana y
+# cuenta el intento para el correo y la IP en una sola operación en Redis.
+# Retorna {codigo, ttl_ms}: codigo > 0 es el número de intento del correo,
+# -1 correo bloqueado, -2 IP bloqueada.
+_LUA_RESERVAR = """
+local ahora = tonumber(ARGV[1])
+local ventana = tonumber(ARGV[2])
+if redis.call('EXISTS', KEYS[2]) == 1 then return {-1, redis.call('PTTL', KEYS[2])} end
+if redis.call('EXISTS', KEYS[4]) == 1 then return {-2, redis.call('PTTL', KEYS[4])} end
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ahora - ventana)
+redis.call('ZREMRANGEBYSCORE', KEYS[3], '-inf', ahora - ventana)
+local n_correo = redis.call('ZCARD', KEYS[1])
+if n_correo >= tonumber(ARGV[3]) then
+    redis.call('SET', KEYS[2], '1', 'PX', ventana)
+    return {-1, ventana}
+end
+if redis.call('ZCARD', KEYS[3]) >= tonumber(ARGV[4]) then
+    redis.call('SET', KEYS[4], '1', 'PX', ventana)
+    return {-2, ventana}
+end
+redis.call('ZADD', KEYS[1], ahora, ARGV[5])
+redis.call('PEXPIRE', KEYS[1], ventana)
+redis.call('ZADD', KEYS[3], ahora, ARGV[5])
+redis.call('PEXPIRE', KEYS[3], ventana)
+return {n_correo + 1, 0}
+"""
+
+_script_reservar = None
+
+# 🧠 Fallback en memoria si Redis no está disponible (por proceso)
+_local_intentos: dict[str, list] = {}
+_local_bloqueos: dict[str, float] = {}
+
+
+def _claves(correo: str, ip: str):
+    return (
+        f"login_attempts:{correo}",
+        f"account_locked:{correo}",
+        f"login_attempts_ip:{ip}",
+        f"ip_locked:{ip}",
+    )
+
+
+def _reservar_local(claves, ahora_ms: int, miembro: str):
+    intentos_correo, bloqueo_correo, intentos_ip, bloqueo_ip = claves
+    ventana = LOCK_TIME_SECONDS * 1000
+
+    for codigo, clave in ((-1, bloqueo_correo), (-2, bloqueo_ip)):
+        expira = _local_bloqueos.get(clave)
+        if expira and expira > ahora_ms:
+            return codigo, int(expira - ahora_ms)
+
+    for clave in (intentos_correo, intentos_ip):
+        _local_intentos[clave] = [
+            (ts, m) for ts, m in _local_intentos.get(clave, []) if ts > ahora_ms - ventana
+        ]
+
+    n_correo = len(_local_intentos[intentos_correo])
+    if n_correo >= MAX_ATTEMPTS:
+        _local_bloqueos[bloqueo_correo] = ahora_ms + ventana
+        return -1, ventana
+    if len(_local_intentos[intentos_ip]) >= MAX_ATTEMPTS_IP:
+        _local_bloqueos[bloqueo_ip] = ahora_ms + ventana
+        return -2, ventana
+
+    _local_intentos[intentos_correo].append((ahora_ms, miembro))
+    _local_intentos[intentos_ip].append((ahora_ms, miembro))
+    return n_correo + 1, 0
+
+
+def reservar_intento(correo: str, ip: str) -> dict:
+    """
+    Registra un intento de login ANTES de consultar la BD o verificar la clave.
+    Cada intento cuenta como fallido hasta que se llame a `limpiar_intentos`.
+    """
+    global _script_reservar
+    correo = correo.strip().lower()
+    claves = _claves(correo, ip)
+    ahora_ms = int(time.time() * 1000)
+    miembro = f"{ahora_ms}-{secrets.token_hex(4)}"
+
+    try:
+        if _script_reservar is None:
+            _script_reservar = r.register_script(_LUA_RESERVAR)
+        codigo, ttl_ms = _script_reservar(
+            keys=list(claves),
+            args=[ahora_ms, LOCK_TIME_SECONDS * 1000, MAX_ATTEMPTS, MAX_ATTEMPTS_IP, miembro],
+        )
+        codigo, ttl_ms = int(codigo), int(ttl_ms)
+    except Exception:
+        codigo, ttl_ms = _reservar_local(claves, ahora_ms, miembro)
+
+    return {
+        "permitido": codigo > 0,
+        "intento": max(codigo, 0),
+        "bloqueo": "correo" if codigo == -1 else "ip" if codigo == -2 else None,
+        "retry_after": max(1, ttl_ms // 1000) if codigo < 0 else 0,
+        "miembro": miembro,
+    }
+
+
+def bloquear_cuenta(correo: str):
+    """Bloquea el correo por LOCK_TIME_SECONDS tras agotar los intentos"""
+    clave = _claves(correo.strip().lower(), "")[1]
+    try:
+        r.setex(clave, LOCK_TIME_SECONDS, "1")
+    except Exception:
+        pass
+    _local_bloqueos[clave] = time.time() * 1000 + LOCK_TIME_SECONDS * 1000
+
+
+def limpiar_intentos(correo: str, ip: str, miembro: str):
+    """Login exitoso: borra los intentos del correo y libera el de la IP"""
+    intentos_correo, bloqueo_correo, intentos_ip, _ = _claves(correo.strip().lower(), ip)
+    try:
+        r.delete(intentos_correo, bloqueo_correo)
+        r.zrem(intentos_ip, miembro)
+    except Exception:
+        pass
+    _local_intentos.pop(intentos_correo, None)
+    _local_bloqueos.pop(bloqueo_correo, None)
+    _local_intentos[intentos_ip] = [
+        (ts, m) for ts, m in _local_intentos.get(intentos_ip, []) if m != miembro
+    ]
+
+
+def limpiar_bloqueo_login(correo: str):
+    """Quita bloqueo e intentos de un correo (reactivación por bibliotecario)"""
+    intentos_correo, bloqueo_correo, _, _ = _claves(correo.strip().lower(), "")
+    try:
+        r.delete(intentos_correo, bloqueo_correo)
+    except Exception:
+        pass
+    _local_intentos.pop(intentos_correo, None)
+    _local_bloqueos.pop(bloqueo_correo, None)
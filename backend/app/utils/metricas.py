@@ -0,0 +1,209 @@
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# 📈 Registro de métricas en formato Prometheus (texto plano).
+# Sin locks: todo corre en el event loop y cada observación es un par de
+# operaciones sobre dicts; el costo se paga al exportar, no al medir.
+
+_registro = []
+
+BUCKETS_HTTP = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_RAPIDOS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+BUCKETS_LENTOS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900)
+
+
+def _escapar(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _etiquetas(nombres, valores, extra: str = "") -> str:
+    pares = [f'{n}="{_escapar(v)}"' for n, v in zip(nombres, valores)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+def _numero(valor: float) -> str:
+    if valor == float("inf"):
+        return "+Inf"
+    return repr(float(valor)) if isinstance(valor, float) and not valor.is_integer() else str(int(valor))
+
+
+class Contador:
+    def __init__(self, nombre: str, ayuda: str, etiquetas: tuple = ()):
+        self.nombre, self.ayuda, self.etiquetas = nombre, ayuda, etiquetas
+        self._valores: dict[tuple, float] = {}
+        _registro.append(self)
+
+    def inc(self, *valores_etiquetas, cantidad: float = 1):
+        self._valores[valores_etiquetas] = self._valores.get(valores_etiquetas, 0) + cantidad
+
+    def exportar(self) -> list[str]:
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} counter"]
+        for valores, total in self._valores.items():
+            lineas.append(f"{self.nombre}{_etiquetas(self.etiquetas, valores)} {_numero(total)}")
+        return lineas
+
+
+class Histograma:
+    def __init__(self, nombre: str, ayuda: str, etiquetas: tuple = (), buckets: tuple = BUCKETS_HTTP):
+        self.nombre, self.ayuda, self.etiquetas = nombre, ayuda, etiquetas
+        self.buckets = tuple(sorted(buckets))
+        self._series: dict[tuple, list] = {}
+        _registro.append(self)
+
+    def observar(self, valor: float, *valores_etiquetas):
+        serie = self._series.get(valores_etiquetas)
+        if serie is None:
+            # [conteo por bucket (no acumulado) ..., +Inf, suma]
+            serie = self._series[valores_etiquetas] = [0] * (len(self.buckets) + 1) + [0.0]
+        serie[bisect_left(self.buckets, valor)] += 1
+        serie[-1] += valor
+
+    def exportar(self) -> list[str]:
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} histogram"]
+        for valores, serie in self._series.items():
+            acumulado = 0
+            for limite, conteo in zip(self.buckets + (float("inf"),), serie):
+                acumulado += conteo
+                le = f'le="{_numero(limite)}"'
+                lineas.append(f"{self.nombre}_bucket{_etiquetas(self.etiquetas, valores, le)} {acumulado}")
+            lineas.append(f"{self.nombre}_sum{_etiquetas(self.etiquetas, valores)} {serie[-1]!r}")
+            lineas.append(f"{self.nombre}_count{_etiquetas(self.etiquetas, valores)} {acumulado}")
+        return lineas
+
+
+class GaugeCallback:
+    """
+    Valor calculado al exportar: `func` retorna [(valores_etiquetas, valor), ...].
+    tipo="counter" para contadores que ya lleva otro módulo (p. ej. timeouts del pool).
+    """
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: tuple, func, tipo: str = "gauge"):
+        self.nombre, self.ayuda, self.etiquetas, self.func = nombre, ayuda, etiquetas, func
+        self.tipo = tipo
+        _registro.append(self)
+
+    def exportar(self) -> list[str]:
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} {self.tipo}"]
+        try:
+            muestras = self.func()
+        except Exception:
+            muestras = []
+        for valores, valor in muestras:
+            if valor is None:
+                continue
+            lineas.append(f"{self.nombre}{_etiquetas(self.etiquetas, valores)} {_numero(valor)}")
+        return lineas
+
+
+def exportar_metricas() -> str:
+    lineas = []
+    for metrica in _registro:
+        lineas.extend(metrica.exportar())
+    return "\n".join(lineas) + "\n"
+
+
+# ============================================================
+# 📊 MÉTRICAS DE LA APLICACIÓN
+# ============================================================
+
+HTTP_LATENCIA = Histograma(
+    "aeternum_http_request_duration_seconds",
+    "Latencia de requests HTTP por ruta (plantilla), método y status",
+    ("method", "route", "status"),
+)
+REDIS_LATENCIA = Histograma(
+    "aeternum_redis_command_duration_seconds",
+    "Latencia de comandos Redis",
+    ("command",),
+    BUCKETS_RAPIDOS,
+)
+REDIS_ERRORES = Contador(
+    "aeternum_redis_errors_total",
+    "Comandos Redis que fallaron",
+    ("command",),
+)
+CACHE_CONSULTAS = Contador(
+    "aeternum_cache_requests_total",
+    "Consultas a caché por nombre y resultado (hit/miss/l1_hit/coalesced)",
+    ("cache", "result"),
+)
+UPSTREAM_LATENCIA = Histograma(
+    "aeternum_upstream_request_duration_seconds",
+    "Latencia de llamadas a servicios externos (OpenLibrary, Brevo)",
+    ("service", "result"),
+)
+UPSTREAM_ERRORES = Contador(
+    "aeternum_upstream_errors_total",
+    "Llamadas a servicios externos con error o status >= 400",
+    ("service",),
+)
+JOB_DURACION = Histograma(
+    "aeternum_scheduler_job_duration_seconds",
+    "Duración de las tareas programadas",
+    ("job", "result"),
+    BUCKETS_LENTOS,
+)
+
+
+def registrar_cache(cache: str, hit: bool):
+    CACHE_CONSULTAS.inc(cache, "hit" if hit else "miss")
+
+
+class _LlamadaUpstream:
+    __slots__ = ("status",)
+
+    def __init__(self):
+        self.status = None
+
+
+@contextmanager
+def medir_upstream(servicio: str):
+    """
+    Mide una llamada externa:
+        with medir_upstream("brevo") as llamada:
+            response = requests.post(...)
+            llamada.status = response.status_code
+    """
+    llamada = _LlamadaUpstream()
+    inicio = time.perf_counter()
+    error = False
+    try:
+        yield llamada
+    except Exception:
+        error = True
+        raise
+    finally:
+        error = error or (llamada.status is not None and llamada.status >= 400)
+        UPSTREAM_LATENCIA.observar(time.perf_counter() - inicio, servicio, "error" if error else "ok")
+        if error:
+            UPSTREAM_ERRORES.inc(servicio)
+
+
+class MetricasHTTPMiddleware:
+    """Middleware ASGI puro (sin BaseHTTPMiddleware) para no sumar overhead por request"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        inicio = time.perf_counter()
+        status = [500]
+
+        async def send_con_status(mensaje):
+            if mensaje["type"] == "http.response.start":
+                status[0] = mensaje["status"]
+            await send(mensaje)
+
+        try:
+            await self.app(scope, receive, send_con_status)
+        finally:
+            ruta = scope.get("route")
+            # Plantilla (/prestamos/estado/{prestamo_id}) para no explotar la cardinalidad
+            plantilla = getattr(ruta, "path", None) or "<sin_ruta>"
+            HTTP_LATENCIA.observar(time.perf_counter() - inicio, scope["method"], plantilla, str(status[0]))
@@ -0,0 +1,175 @@
+import logging
+import os
+import re
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+# ⚙️ Umbral del slow-query log y tamaño de la muestra de latencias por sentencia
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 200))
+QUERY_STATS_MUESTRAS = int(os.getenv("QUERY_STATS_MUESTRAS", 500))
+QUERY_STATS_MAX_SENTENCIAS = int(os.getenv("QUERY_STATS_MAX_SENTENCIAS", 500))
+
+_estadisticas: dict[str, dict] = {}
+
+# Sentencias que ejecuta el código dentro de `capturar_consultas()` (scripts de diagnóstico)
+_capturadas: ContextVar[list | None] = ContextVar("consultas_capturadas", default=None)
+
+_RE_COMENTARIO = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_RE_CADENA = re.compile(r"'(?:[^'\\]|\\.)*'")
+_RE_NUMERO = re.compile(r"\b\d+(?:\.\d+)?\b")
+_RE_LISTA = re.compile(r"\(\s*(?:\?|%s)(?:\s*,\s*(?:\?|%s))+\s*\)")
+_RE_ESPACIOS = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def normalizar_sql(sql: str) -> str:
+    """SQL sin comentarios, literales ni espacios repetidos: agrupa la misma sentencia"""
+    sql = _RE_COMENTARIO.sub(" ", sql)
+    sql = _RE_CADENA.sub("?", sql)
+    sql = _RE_NUMERO.sub("?", sql)
+    sql = _RE_LISTA.sub("(...)", sql)
+    return _RE_ESPACIOS.sub(" ", sql).strip()
+
+
+def forma_parametros(args) -> str:
+    """Tipos (y largo de textos/listas) de los parámetros, sin sus valores"""
+    if args is None:
+        return "()"
+    if isinstance(args, dict):
+        return "{" + ", ".join(f"{k}: {forma_parametros((v,))[1:-1]}" for k, v in args.items()) + "}"
+    if not isinstance(args, (list, tuple)):
+        args = (args,)
+    formas = []
+    for valor in args:
+        if valor is None:
+            formas.append("None")
+        elif isinstance(valor, (str, bytes)):
+            formas.append(f"{type(valor).__name__}[{len(valor)}]")
+        elif isinstance(valor, (list, tuple, set)):
+            formas.append(f"{type(valor).__name__}[{len(valor)}]")
+        else:
+            formas.append(type(valor).__name__)
+    return "(" + ", ".join(formas) + ")"
+
+
+def registrar_query(sql: str, duracion_ms: float, filas: int, args=None, error: bool = False):
+    """Acumula tiempo y filas por sentencia normalizada; imprime las lentas"""
+    sentencia = normalizar_sql(sql)
+    stats = _estadisticas.get(sentencia)
+    if stats is None:
+        if len(_estadisticas) >= QUERY_STATS_MAX_SENTENCIAS:
+            return
+        stats = _estadisticas[sentencia] = {
+            "llamadas": 0,
+            "errores": 0,
+            "lentas": 0,
+            "total_ms": 0.0,
+            "max_ms": 0.0,
+            "filas": 0,
+            "latencias": deque(maxlen=QUERY_STATS_MUESTRAS),
+        }
+
+    stats["llamadas"] += 1
+    stats["total_ms"] += duracion_ms
+    stats["max_ms"] = max(stats["max_ms"], duracion_ms)
+    filas = max(filas, 0)  # SSCursor reporta -1 hasta leer todo
+    stats["filas"] += filas
+    stats["latencias"].append(duracion_ms)
+    if error:
+        stats["errores"] += 1
+
+    if duracion_ms >= SLOW_QUERY_MS:
+        stats["lentas"] += 1
+        logger.warning(f"🐢 Query lenta ({duracion_ms:.1f} ms, {filas} filas) {forma_parametros(args)}: {sentencia[:300]}")
+
+
+def _percentil(ordenadas: list, p: float) -> float:
+    if not ordenadas:
+        return 0.0
+    return round(ordenadas[min(len(ordenadas) - 1, int(len(ordenadas) * p))], 2)
+
+
+def obtener_estadisticas_queries(top: int = 50, orden: str = "total_ms") -> list[dict]:
+    """Sentencias ordenadas por tiempo total (u otra métrica) con p50/p95/p99"""
+    resultado = []
+    for sentencia, stats in _estadisticas.items():
+        latencias = sorted(stats["latencias"])
+        llamadas = stats["llamadas"] or 1
+        resultado.append({
+            "sql": sentencia,
+            "llamadas": stats["llamadas"],
+            "errores": stats["errores"],
+            "lentas": stats["lentas"],
+            "total_ms": round(stats["total_ms"], 2),
+            "promedio_ms": round(stats["total_ms"] / llamadas, 2),
+            "p50_ms": _percentil(latencias, 0.50),
+            "p95_ms": _percentil(latencias, 0.95),
+            "p99_ms": _percentil(latencias, 0.99),
+            "max_ms": round(stats["max_ms"], 2),
+            "filas_promedio": round(stats["filas"] / llamadas, 1),
+        })
+    resultado.sort(key=lambda fila: fila.get(orden, 0), reverse=True)
+    return resultado[:top]
+
+
+def reiniciar_estadisticas_queries():
+    _estadisticas.clear()
+
+
+@contextmanager
+def capturar_consultas():
+    """
+    Junta (sql, args) de cada execute hecho dentro del bloque, en esta tarea:
+        with capturar_consultas() as consultas:
+            await obtener_alertas_bibliotecario()
+    """
+    consultas = []
+    token = _capturadas.set(consultas)
+    try:
+        yield consultas
+    finally:
+        _capturadas.reset(token)
+
+
+class CursorInstrumentado:
+    """
+    Envuelve el cursor de aiomysql: mide execute/executemany y delega el resto
+    (fetchone, fetchall, rowcount, lastrowid...) al cursor original.
+    """
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __getattr__(self, nombre):
+        return getattr(self._cursor, nombre)
+
+    async def execute(self, query, args=None):
+        capturadas = _capturadas.get()
+        if capturadas is not None:
+            capturadas.append((query, args))
+        inicio = time.perf_counter()
+        error = False
+        try:
+            return await self._cursor.execute(query, args)
+        except Exception:
+            error = True
+            raise
+        finally:
+            registrar_query(query, (time.perf_counter() - inicio) * 1000, self._cursor.rowcount or 0, args, error)
+
+    async def executemany(self, query, args):
+        inicio = time.perf_counter()
+        error = False
+        try:
+            return await self._cursor.executemany(query, args)
+        except Exception:
+            error = True
+            raise
+        finally:
+            muestra = args[0] if args else None
+            registrar_query(query, (time.perf_counter() - inicio) * 1000, self._cursor.rowcount or 0, muestra, error)
@@ -0,0 +1,244 @@
+import logging
+import os
+from datetime import date, datetime, timedelta
+
+import pytz
+from app.config.database import get_cursor
+from app.dependencias.redis import r_async
+
+logger = logging.getLogger(__name__)
+
+# 🏆 Rankings de popularidad en sorted sets (miembro = libro_id, score = eventos)
+#   ranking:{tipo}:total          histórico completo
+#   ranking:{tipo}:dia:{fecha}    eventos de un día (expira a los RANKING_DIAS_DETALLE)
+#   ranking:{tipo}:7d / :30d      ventanas móviles: cada evento suma aquí también y el
+#                                 job diario `expirar_rankings` resta el día que sale
+#   ranking:{tipo}:cortes         hash ventana -> primer día incluido en esa ventana
+#   ranking:{tipo}:construido     existe si el ranking se llenó desde SQL
+# Mientras un ranking no esté construido (o sin Redis) las consultas usan SQL.
+TIPOS = ("prestamos", "wishlist", "digitales")
+VENTANAS = {"7d": 7, "30d": 30, "total": None}
+RANKING_DIAS_DETALLE = int(os.getenv("RANKING_DIAS_DETALLE", 35))
+
+# Origen de cada ranking: tabla y columna de fecha del evento
+ORIGENES = {
+    "prestamos": ("prestamos_fisicos", "created_at"),
+    "wishlist": ("lista_deseos", "fecha_agregado"),
+    "digitales": ("prestamos", "fecha_prestamo"),
+}
+
+# Suma el evento al total, al día y a cada ventana que todavía incluye ese día.
+# KEYS: total, dia, cortes, ventanas...   ARGV: libro, delta, dia, ttl_dia, nombres de ventana...
+_LUA_EVENTO = """
+local libro, delta, dia = ARGV[1], tonumber(ARGV[2]), ARGV[3]
+redis.call('ZINCRBY', KEYS[1], delta, libro)
+redis.call('ZINCRBY', KEYS[2], delta, libro)
+redis.call('EXPIRE', KEYS[2], ARGV[4])
+local tocadas = {KEYS[1], KEYS[2]}
+for i = 4, #KEYS do
+    local corte = redis.call('HGET', KEYS[3], ARGV[i + 1])
+    if corte and dia >= corte then
+        redis.call('ZINCRBY', KEYS[i], delta, libro)
+        table.insert(tocadas, KEYS[i])
+    end
+end
+if delta < 0 then
+    for _, clave in ipairs(tocadas) do
+        redis.call('ZREMRANGEBYSCORE', clave, '-inf', 0)
+    end
+end
+return 1
+"""
+
+
+def _clave(tipo: str, ventana: str) -> str:
+    return f"ranking:{tipo}:{ventana}"
+
+
+def _clave_dia(tipo: str, dia: date) -> str:
+    return f"ranking:{tipo}:dia:{dia.isoformat()}"
+
+
+def _hoy() -> date:
+    return datetime.now(pytz.timezone("America/Bogota")).date()
+
+
+def _ventanas_moviles() -> dict[str, int]:
+    return {nombre: dias for nombre, dias in VENTANAS.items() if dias}
+
+
+async def registrar_evento(tipo: str, libro_id: int, delta: int = 1, fecha: date | datetime | None = None):
+    """
+    Suma (o resta, con delta negativo) un evento al ranking. Llamar después del
+    commit. `fecha` es el día del evento original (p. ej. al quitar de la
+    wishlist, el día en que se agregó); por defecto, hoy.
+    """
+    if r_async is None:
+        return
+    if isinstance(fecha, datetime):
+        fecha = fecha.date()
+    dia = fecha or _hoy()
+    moviles = _ventanas_moviles()
+    claves = [_clave(tipo, "total"), _clave_dia(tipo, dia), _clave(tipo, "cortes")]
+    claves += [_clave(tipo, nombre) for nombre in moviles]
+    try:
+        await r_async.eval(
+            _LUA_EVENTO, len(claves), *claves,
+            libro_id, delta, dia.isoformat(), RANKING_DIAS_DETALLE * 86400, *moviles,
+        )
+    except Exception as e:
+        logger.warning(f"⚠️ No se pudo actualizar ranking {tipo} (libro {libro_id}): {e}")
+
+
+async def top_libros(tipo: str, ventana: str = "total", n: int = 10) -> list[tuple[int, int]] | None:
+    """
+    [(libro_id, total)] de mayor a menor. None si el ranking no está disponible
+    (sin Redis o sin construir): el llamador debe ir a SQL.
+    """
+    if r_async is None:
+        return None
+    try:
+        async with r_async.pipeline(transaction=False) as pipe:
+            pipe.exists(_clave(tipo, "construido"))
+            pipe.zrevrange(_clave(tipo, ventana), 0, n - 1, withscores=True)
+            construido, filas = await pipe.execute()
+    except Exception as e:
+        logger.warning(f"⚠️ Ranking {tipo}:{ventana} no disponible: {e}")
+        return None
+    if not construido:
+        return None
+    return [(int(libro_id), int(score)) for libro_id, score in filas if score > 0]
+
+
+async def _conteos_sql(tipo: str, desde: date) -> tuple[dict[int, int], dict[date, dict[int, int]]]:
+    """Totales históricos y detalle por día (desde `desde`) leídos de MySQL"""
+    tabla, columna = ORIGENES[tipo]
+    async with get_cursor("reporting") as (conn, cursor):
+        await cursor.execute(f"""
+            SELECT libro_id, COUNT(*) as total
+            FROM {tabla}
+            GROUP BY libro_id
+        """)
+        totales = {f["libro_id"]: f["total"] for f in await cursor.fetchall()}
+
+        await cursor.execute(f"""
+            SELECT libro_id, DATE({columna}) as dia, COUNT(*) as total
+            FROM {tabla}
+            WHERE {columna} >= %s
+            GROUP BY libro_id, dia
+        """, (desde,))
+        por_dia: dict[date, dict[int, int]] = {}
+        for f in await cursor.fetchall():
+            por_dia.setdefault(f["dia"], {})[f["libro_id"]] = f["total"]
+    return totales, por_dia
+
+
+async def _reconstruir_tipo(tipo: str, hoy: date):
+    desde = hoy - timedelta(days=RANKING_DIAS_DETALLE - 1)
+    totales, por_dia = await _conteos_sql(tipo, desde)
+
+    conjuntos = {"total": totales}
+    for nombre, dias in _ventanas_moviles().items():
+        inicio = hoy - timedelta(days=dias - 1)
+        ventana: dict[int, int] = {}
+        for dia, conteos in por_dia.items():
+            if dia >= inicio:
+                for libro_id, total in conteos.items():
+                    ventana[libro_id] = ventana.get(libro_id, 0) + total
+        conjuntos[nombre] = ventana
+
+    # Se escribe en claves temporales y se renombran juntas (MULTI): nadie lee a medias
+    async with r_async.pipeline(transaction=False) as pipe:
+        for nombre, conteos in conjuntos.items():
+            temporal = _clave(tipo, nombre) + ":tmp"
+            pipe.delete(temporal)
+            if conteos:
+                pipe.zadd(temporal, conteos)
+        await pipe.execute()
+
+    async with r_async.pipeline(transaction=True) as pipe:
+        for nombre, conteos in conjuntos.items():
+            if conteos:
+                pipe.rename(_clave(tipo, nombre) + ":tmp", _clave(tipo, nombre))
+            else:
+                pipe.delete(_clave(tipo, nombre))
+        for i in range(RANKING_DIAS_DETALLE):
+            dia = desde + timedelta(days=i)
+            pipe.delete(_clave_dia(tipo, dia))
+            if por_dia.get(dia):
+                pipe.zadd(_clave_dia(tipo, dia), por_dia[dia])
+                pipe.expireat(_clave_dia(tipo, dia), datetime.combine(dia, datetime.min.time()) + timedelta(days=RANKING_DIAS_DETALLE))
+        pipe.hset(_clave(tipo, "cortes"), mapping={
+            nombre: (hoy - timedelta(days=dias - 1)).isoformat() for nombre, dias in _ventanas_moviles().items()
+        })
+        pipe.set(_clave(tipo, "construido"), hoy.isoformat())
+        await pipe.execute()
+
+    return len(totales)
+
+
+async def reconstruir_rankings(lease=None, tipos=TIPOS):
+    """
+    Llena los rankings desde SQL (primer arranque, tras perder Redis o si se
+    sospecha desvío). Los eventos que lleguen mientras corre pueden perderse:
+    es una foto, y la próxima reconstrucción los recupera.
+    """
+    if r_async is None:
+        return {"status": "skipped", "filas_afectadas": 0, "detalle": "Redis no disponible"}
+    hoy = _hoy()
+    libros = {}
+    for tipo in tipos:
+        if lease is not None:
+            await lease.verificar()
+        libros[tipo] = await _reconstruir_tipo(tipo, hoy)
+    detalle = ", ".join(f"{tipo}: {n} libros" for tipo, n in libros.items())
+    logger.info(f"🏆 Rankings reconstruidos ({detalle})")
+    return {"status": "success", "filas_afectadas": sum(libros.values()), "detalle": detalle}
+
+
+async def expirar_rankings(lease=None):
+    """
+    Job diario: saca de cada ventana móvil los días que ya quedaron fuera,
+    restando el sorted set de ese día (ZUNIONSTORE con peso -1). El corte se
+    guarda en la misma transacción, así correrlo dos veces no resta dos veces.
+    """
+    if r_async is None:
+        return {"status": "skipped", "filas_afectadas": 0, "detalle": "Redis no disponible"}
+    hoy = _hoy()
+    dias_restados = 0
+    reconstruir = []
+
+    for tipo in TIPOS:
+        if lease is not None:
+            await lease.verificar()
+        if not await r_async.exists(_clave(tipo, "construido")):
+            reconstruir.append(tipo)
+            continue
+        cortes = await r_async.hgetall(_clave(tipo, "cortes"))
+        for nombre, dias in _ventanas_moviles().items():
+            objetivo = hoy - timedelta(days=dias - 1)
+            valor = cortes.get(nombre.encode())
+            if valor is None:
+                reconstruir.append(tipo)
+                break
+            corte = date.fromisoformat(valor.decode())
+            # Los sorted sets diarios ya expiraron: no hay qué restar, se reconstruye
+            if corte < hoy - timedelta(days=RANKING_DIAS_DETALLE - 1):
+                reconstruir.append(tipo)
+                break
+            clave = _clave(tipo, nombre)
+            while corte < objetivo:
+                async with r_async.pipeline(transaction=True) as pipe:
+                    pipe.zunionstore(clave, {clave: 1, _clave_dia(tipo, corte): -1})
+                    pipe.zremrangebyscore(clave, "-inf", 0)
+                    corte += timedelta(days=1)
+                    pipe.hset(_clave(tipo, "cortes"), nombre, corte.isoformat())
+                    await pipe.execute()
+                dias_restados += 1
+
+    detalle = f"{dias_restados} día(s) restados de las ventanas"
+    if reconstruir:
+        tipos = tuple(dict.fromkeys(reconstruir))
+        await reconstruir_rankings(lease, tipos)
+        detalle += f"; reconstruidos: {', '.join(tipos)}"
+    return {"status": "success", "filas_afectadas": dias_restados, "detalle": detalle}
@@ -2,11 +2,15 @@ import os
 from passlib.context import CryptContext
 from datetime import datetime, timedelta, timezone
 from jose import JWTError, jwt
-from fastapi import Depends, HTTPException
+from fastapi import Depends, HTTPException, Request
 from fastapi.security import OAuth2PasswordBearer
-from app.config.database import get_cursor    
+from app.config.database import get_cursor, get_db, UnidadDeTrabajo, fijar_usuario_request, marcar_escritura
 from app.models import user_model 
+from app.utils.cpu_offload import ejecutar_en_pool
 from dotenv import load_dotenv
+import logging
+
+logger = logging.getLogger(__name__)
 
 load_dotenv()
 
@@ -16,7 +20,11 @@ ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 480))
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
-async def get_current_user(token: str = Depends(oauth2_scheme)):
+async def get_current_user(
+    request: Request,
+    token: str = Depends(oauth2_scheme),
+    db: UnidadDeTrabajo = Depends(get_db)
+):
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM], options={"verify_exp": True})
         user_id: str = payload.get("sub")
@@ -33,45 +41,48 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
         session_invalid_key = f"user_session_invalid:{user_id}"
         
         session_invalid_value = r.get(session_invalid_key)
-        print(f"🔍 Verificando sesión usuario {user_id}: user_session_invalid={session_invalid_value}")
+        logger.debug(f"🔍 Verificando sesión usuario {user_id}: user_session_invalid={session_invalid_value}")
         
         if session_invalid_value:
-            print(f"⛔ Usuario {user_id} tiene sesión invalidada en Redis")
+            logger.warning(f"⛔ Usuario {user_id} tiene sesión invalidada en Redis")
             raise HTTPException(
                 status_code=401, 
                 detail="Tu sesión ha sido cerrada por el administrador. Inicia sesión nuevamente."
             )
         
         # 🔥 IMPORTANTE: SIEMPRE consultar BD - NO usar caché aquí
+        # Conexión propia que se devuelve al pool enseguida: la del request (db)
+        # solo se pide si la ruta encadena consultas
         async with get_cursor() as (conn, cursor):
             # 🔍 LOG: Ver query exacta
             query = "SELECT estado, motivo_bloqueo FROM usuarios WHERE id = %s"
-            print(f"🔍 Ejecutando query: {query} con user_id={user_id}")
+            logger.debug(f"🔍 Ejecutando query: {query} con user_id={user_id}")
             
             await cursor.execute(query, (int(user_id),))
             user_data = await cursor.fetchone()
             
             if not user_data:
-                print(f"⚠️ Usuario {user_id} NO encontrado en BD")
+                logger.warning(f"⚠️ Usuario {user_id} NO encontrado en BD")
                 raise HTTPException(status_code=401, detail="Usuario no encontrado.")
             
             estado_actual = user_data["estado"]
-            print(f"🔍 Usuario {user_id} - Estado en BD: {estado_actual}")
+            logger.debug(f"🔍 Usuario {user_id} - Estado en BD: {estado_actual}")
             
             # 🔥 NUEVO: Ver si el estado cambió desde el último check
             cache_estado_key = f"last_estado_check:{user_id}"
             ultimo_estado = r.get(cache_estado_key)
             
             if ultimo_estado and ultimo_estado.decode('utf-8') != estado_actual:
-                print(f"⚠️ CAMBIO DE ESTADO DETECTADO para usuario {user_id}:")
-                print(f"   - Último estado conocido: {ultimo_estado.decode('utf-8')}")
-                print(f"   - Estado actual en BD: {estado_actual}")
+                logger.warning(
+                    f"⚠️ CAMBIO DE ESTADO DETECTADO para usuario {user_id}: "
+                    f"{ultimo_estado.decode('utf-8')} → {estado_actual}"
+                )
             
             # Guardar estado actual para tracking
             r.setex(cache_estado_key, 60, estado_actual)  # 60 segundos
             
             if estado_actual == "Desactivado":
-                print(f"⛔ Usuario {user_id} está desactivado")
+                logger.warning(f"⛔ Usuario {user_id} está desactivado")
                 raise HTTPException(
                     status_code=403, 
                     detail="Tu cuenta ha sido desactivada. Contacta al administrador."
@@ -79,13 +90,20 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
             
             if estado_actual == "Bloqueado":
                 motivo = user_data.get("motivo_bloqueo", "Cuenta bloqueada")
-                print(f"⛔ Usuario {user_id} está bloqueado: {motivo}")
+                logger.warning(f"⛔ Usuario {user_id} está bloqueado: {motivo}")
                 raise HTTPException(
                     status_code=403, 
                     detail=f"Tu cuenta está bloqueada. Motivo: {motivo}. Contacta a la biblioteca."
                 )
         
-        print(f"✅ Usuario {user_id} validado correctamente con estado: {estado_actual}")
+        logger.debug(f"✅ Usuario {user_id} validado correctamente con estado: {estado_actual}")
+
+        # 📖 Read-your-writes: tras un request de escritura sus lecturas van al primario
+        fijar_usuario_request(user_id)
+        if request.method not in ("GET", "HEAD", "OPTIONS"):
+            db.usuario_escritura = user_id
+            await marcar_escritura(user_id)
+
         return {
             "sub": user_id,
             "rol": rol
@@ -94,12 +112,10 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
     except HTTPException:
         raise
     except JWTError as e:
-        print(f"❌ Error JWT: {e}")
+        logger.warning(f"❌ Error JWT: {e}")
         raise HTTPException(status_code=401, detail="Token inválido o expirado.")
     except Exception as e:
-        print(f"❌ Error inesperado en get_current_user: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"❌ Error inesperado en get_current_user: {e}")
         raise HTTPException(status_code=500, detail="Error interno del servidor.")
 
 pwd_context = CryptContext(
@@ -114,6 +130,13 @@ def hash_password(password: str) -> str:
 def verify_password(password: str, hashed: str) -> bool:
     return pwd_context.verify(password[:72], hashed)
 
+# 🧮 Versiones async: bcrypt corre en el pool de procesos, no en el event loop
+async def hash_password_async(password: str) -> str:
+    return await ejecutar_en_pool(hash_password, password)
+
+async def verify_password_async(password: str, hashed: str) -> bool:
+    return await ejecutar_en_pool(verify_password, password, hashed)
+
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
@@ -0,0 +1,402 @@
+import asyncio
+import heapq
+import logging
+import os
+import re
+import sys
+import unicodedata
+from array import array
+from bisect import bisect_left, insort
+from itertools import accumulate
+
+from app.config.database import get_cursor
+from app.utils.metricas import GaugeCallback
+from app.utils.rankings import top_libros
+
+logger = logging.getLogger(__name__)
+
+# 🔤 Autocompletado (/search/suggest): índice de prefijos en memoria del proceso
+# sobre títulos activos, autores y géneros. Cada texto se normaliza (minúsculas,
+# sin acentos ni signos) y se indexa por su inicio y por el inicio de sus
+# palabras internas ("harry potter" responde a "har" y a "pot").
+#   Base: todas las claves ordenadas en un solo str + offsets en array('I')
+#         (~1 byte por carácter, sin un objeto por clave); búsqueda con bisect.
+#   Top:  para prefijos con más de SUGERENCIAS_MAX_ESCANEO claves (p. ej. "l")
+#         se precalculan los mejores resultados al construir.
+#   Delta: altas y cambios de libros (book_router) van a una lista ordenada
+#         pequeña y las bajas a un set; se funden en la próxima reconstrucción.
+# Cada proceso reconstruye su índice cada SUGERENCIAS_REFRESCO segundos, así los
+# cambios hechos en otro worker llegan a todos.
+SUGERENCIAS_REFRESCO = int(os.getenv("SUGERENCIAS_REFRESCO", 900))
+# Claves más largas se recortan: el prefijo escrito también
+SUGERENCIAS_LARGO_CLAVE = int(os.getenv("SUGERENCIAS_LARGO_CLAVE", 24))
+SUGERENCIAS_LARGO_TEXTO = int(os.getenv("SUGERENCIAS_LARGO_TEXTO", 120))
+# Palabras internas indexadas por texto (las de menos de 3 letras no cuentan)
+SUGERENCIAS_PALABRAS = int(os.getenv("SUGERENCIAS_PALABRAS", 3))
+# Tope de claves: con el índice lleno solo los títulos más prestados tienen palabras internas
+SUGERENCIAS_MAX_CLAVES = int(os.getenv("SUGERENCIAS_MAX_CLAVES", 600_000))
+SUGERENCIAS_MAX_ESCANEO = int(os.getenv("SUGERENCIAS_MAX_ESCANEO", 500))
+SUGERENCIAS_TOP = int(os.getenv("SUGERENCIAS_TOP", 40))
+# Altas + bajas acumuladas que disparan una reconstrucción anticipada
+SUGERENCIAS_MAX_DELTA = int(os.getenv("SUGERENCIAS_MAX_DELTA", 2000))
+# Libros del ranking de préstamos usados como peso de los títulos
+SUGERENCIAS_POPULARES = int(os.getenv("SUGERENCIAS_POPULARES", 20000))
+
+TITULO, AUTOR, GENERO = 0, 1, 2
+TIPOS = ("titulo", "autor", "genero")
+_NO_ALFANUMERICO = re.compile(r"[^a-z0-9]+")
+_PALABRA_INTERNA = re.compile(r" (?=[a-z0-9]{3})")
+# Mayor que cualquier carácter de una clave normalizada: p + _FIN acota el rango de p
+_FIN = "~"
+# Bits del entero de orden (ver IndiceSugerencias)
+_BITS_ENTRADA = 24
+_MAX_ENTRADAS = 1 << _BITS_ENTRADA
+_MASCARA_ENTRADA = _MAX_ENTRADAS - 1
+_MAX_PESO = (1 << 20) - 1
+_BIT_INTERIOR = _BITS_ENTRADA + 10 + 20
+
+
+def normalizar(texto: str) -> str:
+    """Minúsculas ASCII sin acentos; todo lo que no es letra o dígito queda como un espacio"""
+    ascii_ = unicodedata.normalize("NFKD", texto.lower()).encode("ascii", "ignore").decode()
+    return _NO_ALFANUMERICO.sub(" ", ascii_).strip()
+
+
+def claves_de(normalizado: str, palabras: int = SUGERENCIAS_PALABRAS) -> list[str]:
+    """Inicio del texto + inicio de hasta `palabras` palabras internas, recortados"""
+    claves = [normalizado[:SUGERENCIAS_LARGO_CLAVE]]
+    for m in _PALABRA_INTERNA.finditer(normalizado):
+        if len(claves) > palabras:
+            break
+        claves.append(normalizado[m.end():m.end() + SUGERENCIAS_LARGO_CLAVE])
+    return claves
+
+
+class _Claves:
+    """Vista de secuencia sobre las claves concatenadas (para bisect)"""
+    __slots__ = ("texto", "inicios")
+
+    def __init__(self, claves: list[str]):
+        self.texto = "".join(claves)
+        self.inicios = array("I", [0])
+        self.inicios.extend(accumulate(map(len, claves)))
+
+    def __len__(self):
+        return len(self.inicios) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return self.texto[self.inicios[i]:self.inicios[i + 1]]
+
+
+class IndiceSugerencias:
+    """
+    Entradas en arrays paralelos (texto, tipo, id, orden). Cada clave apunta a
+    su entrada con un código `entrada * 2 + interior` (interior = la clave es
+    una palabra interna, rankea después que un inicio de texto).
+
+    `orden` empaqueta el ranking en un entero para comparar en C:
+    interior | peso invertido | largo del texto | entrada (el menor va primero).
+    """
+
+    def __init__(self, titulos, autores, generos, pesos_titulos: dict[int, int] | None = None):
+        pesos_titulos = pesos_titulos or {}
+        self.textos: list[str] = []
+        self.tipos = array("b")
+        self.ids = array("i")
+        self.orden = array("q")
+        # tipo -> array indexado por id con entrada + 1 (0 = no está)
+        self.posiciones = (array("i"), array("i"), array("i"))
+        self.bajas: set[int] = set()
+        self.extra: list[tuple[str, int]] = []
+
+        # Los títulos más prestados primero: si se llega a SUGERENCIAS_MAX_CLAVES
+        # son los que conservan sus palabras internas
+        titulos = sorted(titulos, key=lambda t: -pesos_titulos.get(t[0], 0))
+        entradas = [(TITULO, libro_id, titulo, pesos_titulos.get(libro_id, 0)) for libro_id, titulo in titulos]
+        entradas += [(AUTOR, autor_id, nombre, libros) for autor_id, nombre, libros in autores]
+        entradas += [(GENERO, genero_id, nombre, libros) for genero_id, nombre, libros in generos]
+
+        pares = []
+        for tipo, id_, texto, peso in entradas:
+            normalizado = normalizar(texto or "")
+            if not normalizado:
+                continue
+            entrada = self._agregar_entrada(tipo, id_, texto, peso)
+            palabras = SUGERENCIAS_PALABRAS if len(pares) < SUGERENCIAS_MAX_CLAVES else 0
+            for n, clave in enumerate(claves_de(normalizado, palabras)):
+                pares.append((clave, entrada * 2 + (n > 0)))
+        del entradas
+        pares.sort()
+
+        self.claves = _Claves([clave for clave, _ in pares])
+        self.codigos = array("I", [codigo for _, codigo in pares])
+        del pares
+        self.top: dict[str, array] = {}
+        self._precalcular(0, len(self.codigos), 1)
+
+    def _agregar_entrada(self, tipo: int, id_: int, texto: str, peso: int) -> int:
+        entrada = len(self.textos)
+        if entrada >= _MAX_ENTRADAS:
+            raise OverflowError("Índice de sugerencias lleno: hace falta reconstruirlo")
+        texto = texto[:SUGERENCIAS_LARGO_TEXTO]
+        peso = min(max(int(peso or 0), 0), _MAX_PESO)
+        self.textos.append(texto)
+        self.tipos.append(tipo)
+        self.ids.append(id_)
+        self.orden.append(((_MAX_PESO - peso) << 10 | min(len(texto), 1023)) << _BITS_ENTRADA | entrada)
+
+        posiciones = self.posiciones[tipo]
+        if id_ >= len(posiciones):
+            posiciones.extend(array("i", [0]) * (id_ + 1 - len(posiciones)))
+        posiciones[id_] = entrada + 1
+        return entrada
+
+    def _peso(self, entrada: int) -> int:
+        return _MAX_PESO - (self.orden[entrada] >> (_BITS_ENTRADA + 10))
+
+    def _mejores(self, codigos, n: int) -> list[tuple[int, int]]:
+        """[(entrada, interior)] de los n mejores códigos, sin bajas ni entradas repetidas"""
+        orden, bajas = self.orden, self.bajas
+        puntajes = [orden[c >> 1] | (c & 1) << _BIT_INTERIOR for c in codigos if c >> 1 not in bajas]
+        # Una entrada puede aparecer una vez por clave (inicio + palabras internas)
+        mejores, vistas = [], set()
+        for puntaje in heapq.nsmallest(n * (SUGERENCIAS_PALABRAS + 1), puntajes):
+            entrada = puntaje & _MASCARA_ENTRADA
+            if entrada not in vistas:
+                vistas.add(entrada)
+                mejores.append((entrada, puntaje >> _BIT_INTERIOR))
+                if len(mejores) == n:
+                    break
+        return mejores
+
+    def _precalcular(self, desde: int, hasta: int, largo: int):
+        """Top de cada prefijo de `largo` caracteres con demasiadas claves; recursivo"""
+        i = desde
+        while i < hasta:
+            clave = self.claves[i]
+            if len(clave) < largo:
+                i += 1
+                continue
+            prefijo = clave[:largo]
+            fin = bisect_left(self.claves, prefijo + _FIN, i, hasta)
+            if fin - i > SUGERENCIAS_MAX_ESCANEO:
+                mejores = self._mejores(self.codigos[i:fin], SUGERENCIAS_TOP)
+                self.top[prefijo] = array("I", [entrada * 2 + interior for entrada, interior in mejores])
+                self._precalcular(i, fin, largo + 1)
+            i = fin
+
+    def sugerir(self, q: str, limit: int = 8) -> list[dict]:
+        prefijo = normalizar(q)[:SUGERENCIAS_LARGO_CLAVE]
+        if not prefijo:
+            return []
+        codigos = self.top.get(prefijo)
+        if codigos is None:
+            desde = bisect_left(self.claves, prefijo)
+            hasta = bisect_left(self.claves, prefijo + _FIN, desde)
+            codigos = self.codigos[desde:hasta]
+        if self.extra:
+            i = bisect_left(self.extra, (prefijo,))
+            adicionales = []
+            while i < len(self.extra) and self.extra[i][0].startswith(prefijo):
+                adicionales.append(self.extra[i][1])
+                i += 1
+            codigos = list(codigos) + adicionales
+        return [
+            {"texto": self.textos[e], "tipo": TIPOS[self.tipos[e]], "id": self.ids[e]}
+            for e, _ in self._mejores(codigos, limit)
+        ]
+
+    def _vigente(self, tipo: int, id_: int) -> int | None:
+        posiciones = self.posiciones[tipo]
+        entrada = posiciones[id_] - 1 if 0 <= id_ < len(posiciones) else -1
+        return entrada if entrada >= 0 and entrada not in self.bajas else None
+
+    def _alta(self, tipo: int, id_: int, texto: str, peso: int = 0):
+        normalizado = normalizar(texto)
+        if not normalizado:
+            return
+        entrada = self._agregar_entrada(tipo, id_, texto, peso)
+        for n, clave in enumerate(claves_de(normalizado)):
+            insort(self.extra, (clave, entrada * 2 + (n > 0)))
+
+    def aplicar_libro(self, libro_id: int, titulo: str | None, autor: tuple | None, genero: tuple | None):
+        """
+        Refleja el estado actual de un libro: titulo=None si no está activo.
+        Autor y género (id, nombre) se agregan si todavía no estaban; no se
+        quitan al desactivar (pueden tener otros libros): eso lo hace la reconstrucción.
+        """
+        anterior = self._vigente(TITULO, libro_id)
+        if titulo and anterior is not None and self.textos[anterior] == titulo[:SUGERENCIAS_LARGO_TEXTO]:
+            return
+        if anterior is not None:
+            self.bajas.add(anterior)
+        if not titulo:
+            return
+        self._alta(TITULO, libro_id, titulo, self._peso(anterior) if anterior is not None else 0)
+        for tipo, par in ((AUTOR, autor), (GENERO, genero)):
+            if par and par[0] and par[1] and self._vigente(tipo, par[0]) is None:
+                self._alta(tipo, par[0], par[1], 1)
+
+    @property
+    def cambios(self) -> int:
+        return len(self.extra) + len(self.bajas)
+
+    def memoria(self) -> int:
+        """Bytes aproximados (sin contar el delta)"""
+        arrays = [self.claves.inicios, self.codigos, self.tipos, self.ids, self.orden, *self.posiciones]
+        return (
+            sys.getsizeof(self.claves.texto)
+            + sum(a.itemsize * len(a) for a in arrays)
+            + sys.getsizeof(self.textos) + sum(sys.getsizeof(t) for t in self.textos)
+            + sum(sys.getsizeof(p) + 64 + t.itemsize * len(t) for p, t in self.top.items())
+        )
+
+
+_indice: IndiceSugerencias | None = None
+_memoria = 0
+_tarea: asyncio.Task | None = None
+_reconstruyendo: asyncio.Task | None = None
+# El refresco periódico y el anticipado no se solapan (comparten _pendientes)
+_candado_reconstruccion = asyncio.Lock()
+# Libros editados mientras se lee el catálogo: se reaplican sobre el índice nuevo
+_pendientes: set[int] | None = None
+
+
+def sugerir(q: str, limit: int = 8) -> list[dict] | None:
+    """Sugerencias para el prefijo `q`; None si el índice todavía no se construyó"""
+    if _indice is None:
+        return None
+    return _indice.sugerir(q, limit)
+
+
+async def _leer_catalogo() -> tuple[list, list, list]:
+    # Primario (pool de reportes): una réplica atrasada perdería ediciones ya aplicadas
+    # al índice anterior hasta el próximo refresco
+    async with get_cursor("reporting", streaming=True) as (conn, cursor):
+        await cursor.execute("SELECT id, titulo FROM libros WHERE estado = 'Activo'")
+        titulos = []
+        while filas := await cursor.fetchmany(10000):
+            titulos.extend((f["id"], f["titulo"]) for f in filas)
+
+    async with get_cursor("reporting") as (conn, cursor):
+        await cursor.execute("""
+            SELECT a.id, CONCAT_WS(' ', a.nombre, a.apellido) AS nombre, COUNT(*) AS libros
+            FROM libros l
+            JOIN autores a ON l.autor_id = a.id
+            WHERE l.estado = 'Activo'
+            GROUP BY a.id
+        """)
+        autores = [(f["id"], f["nombre"], f["libros"]) for f in await cursor.fetchall()]
+
+        await cursor.execute("""
+            SELECT g.id, g.nombre, COUNT(*) AS libros
+            FROM libros l
+            JOIN generos g ON l.genero_id = g.id
+            WHERE l.estado = 'Activo'
+            GROUP BY g.id
+        """)
+        generos = [(f["id"], f["nombre"], f["libros"]) for f in await cursor.fetchall()]
+    return titulos, autores, generos
+
+
+async def reconstruir_indice():
+    """Lee el catálogo, arma un índice nuevo en un hilo y lo reemplaza de una vez"""
+    async with _candado_reconstruccion:
+        await _reconstruir()
+
+
+async def _reconstruir():
+    global _indice, _memoria, _pendientes
+    _pendientes = set()
+    try:
+        titulos, autores, generos = await _leer_catalogo()
+        pesos = dict(await top_libros("prestamos", "total", SUGERENCIAS_POPULARES) or [])
+        indice = await asyncio.to_thread(IndiceSugerencias, titulos, autores, generos, pesos)
+        memoria = await asyncio.to_thread(indice.memoria)
+    except BaseException:
+        _pendientes = None
+        raise
+
+    _indice, _memoria = indice, memoria
+    pendientes, _pendientes = _pendientes, None
+    for libro_id in pendientes:
+        await actualizar_libro(libro_id)
+    logger.info(
+        f"🔤 Índice de sugerencias: {len(indice.textos)} entradas, "
+        f"{len(indice.codigos)} claves, {memoria / 1024 / 1024:.1f} MB"
+    )
+
+
+async def actualizar_libro(libro_id: int):
+    """Llamar tras crear, editar, activar o desactivar un libro. Nunca lanza."""
+    global _reconstruyendo
+    if _pendientes is not None:
+        _pendientes.add(libro_id)
+    if _indice is None:
+        return
+    try:
+        # Primario (sin intent="read"): la réplica puede no tener el cambio todavía
+        async with get_cursor() as (conn, cursor):
+            await cursor.execute("""
+                SELECT
+                    l.titulo,
+                    l.estado,
+                    l.autor_id,
+                    CONCAT_WS(' ', a.nombre, a.apellido) AS autor,
+                    l.genero_id,
+                    g.nombre AS genero
+                FROM libros l
+                LEFT JOIN autores a ON l.autor_id = a.id
+                LEFT JOIN generos g ON l.genero_id = g.id
+                WHERE l.id = %s
+            """, (libro_id,))
+            libro = await cursor.fetchone()
+
+        activo = libro is not None and libro["estado"] == "Activo"
+        _indice.aplicar_libro(
+            libro_id,
+            libro["titulo"] if activo else None,
+            (libro["autor_id"], libro["autor"]) if activo else None,
+            (libro["genero_id"], libro["genero"]) if activo else None,
+        )
+    except Exception as e:
+        logger.warning(f"⚠️ No se pudo actualizar el libro {libro_id} en el índice de sugerencias: {e}")
+        return
+
+    if _indice.cambios > SUGERENCIAS_MAX_DELTA and (_reconstruyendo is None or _reconstruyendo.done()):
+        _reconstruyendo = asyncio.create_task(_reconstruir_seguro())
+
+
+async def _reconstruir_seguro():
+    try:
+        await reconstruir_indice()
+    except Exception as e:
+        logger.warning(f"⚠️ No se pudo reconstruir el índice de sugerencias: {e}")
+
+
+async def _refrescar_periodicamente():
+    while True:
+        await _reconstruir_seguro()
+        await asyncio.sleep(SUGERENCIAS_REFRESCO)
+
+
+def iniciar_sugerencias():
+    """
+    Startup: construye el índice en segundo plano (no demora el arranque) y lo
+    refresca periódicamente. Mientras no esté listo /search/suggest responde vacío.
+    """
+    global _tarea
+    _tarea = asyncio.create_task(_refrescar_periodicamente())
+
+
+def detener_sugerencias():
+    global _tarea
+    if _tarea is not None:
+        _tarea.cancel()
+        _tarea = None
+
+
+GaugeCallback("aeternum_suggest_index_entries", "Entradas del índice de autocompletado", (),
+              lambda: [((), len(_indice.textos) if _indice else 0)])
+GaugeCallback("aeternum_suggest_index_bytes", "Memoria aproximada del índice de autocompletado", (),
+              lambda: [((), _memoria)])
@@ -27,6 +27,8 @@ const Prestamos = () => {
   // Estados
   const [prestamosFisicos, setPrestamosFisicos] = useState([]);
   const [prestamosDigitales, setPrestamosDigitales] = useState([]);
+  const [siguienteDigitales, setSiguienteDigitales] = useState(null);
+  const [cargandoMasDigitales, setCargandoMasDigitales] = useState(false);
   const [estadisticas, setEstadisticas] = useState(null);
   const [graficaData, setGraficaData] = useState([]);
   const [librosPopulares, setLibrosPopulares] = useState([]);
@@ -131,6 +133,7 @@ const Prestamos = () => {
 
       setPrestamosFisicos(fisicos.prestamos || []);
       setPrestamosDigitales(digitales.prestamos || []);
+      setSiguienteDigitales(digitales.siguiente ?? null);
       setEstadisticas(stats.estadisticas || null);
       setGraficaData(grafica.grafica || []);
       setLibrosPopulares(populares.libros || []);
@@ -144,6 +147,30 @@ const Prestamos = () => {
     }
   }, []);
 
+  // 📄 /prestamos/all-digital viene paginado: cada página trae `siguiente` para pedir la próxima
+  const cargarMasDigitales = async () => {
+    if (!siguienteDigitales || cargandoMasDigitales) return;
+    setCargandoMasDigitales(true);
+
+    try {
+      const token = getToken();
+      const res = await fetch(
+        `${API_BASE}/prestamos/all-digital?cursor=${siguienteDigitales}&_t=${Date.now()}`,
+        { headers: { Authorization: `Bearer ${token}` } }
+      );
+      if (!res.ok) throw new Error(`Error ${res.status}`);
+      const data = await res.json();
+
+      setPrestamosDigitales((prev) => [...prev, ...(data.prestamos || [])]);
+      setSiguienteDigitales(data.siguiente ?? null);
+    } catch (err) {
+      console.error("Error cargando más préstamos digitales:", err);
+      showNotification("Error al cargar más préstamos digitales", "error");
+    } finally {
+      setCargandoMasDigitales(false);
+    }
+  };
+
   // Cargar datos al montar el componente
   useEffect(() => {
     fetchAllData();
@@ -556,6 +583,18 @@ const Prestamos = () => {
                 </tbody>
               </table>
             </div>
+
+            {siguienteDigitales && (
+              <div className="prestamos-cargar-mas">
+                <button
+                  className="tab-btn"
+                  onClick={cargarMasDigitales}
+                  disabled={cargandoMasDigitales}
+                >
+                  {cargandoMasDigitales ? "Cargando..." : "Cargar préstamos más antiguos"}
+                </button>
+              </div>
+            )}
           </>
         )}
 